@@ -0,0 +1,78 @@
+"""
+本フォルダを1つの CBZ/ZIP アーカイブにまとめる（アップロード用）。
+
+MEGA の転送はファイルごとのオーバーヘッドが大きいため、数百〜千枚のページを1ファイルにして送る。
+画像は圧縮済みなので無圧縮 (ZIP_STORED) で格納し、1ファイルずつ一定サイズのチャンクで
+書き込むためメモリ使用量はページ数に依存しない。フォルダの内容が変わっていなければ
+前回作ったアーカイブをそのまま使う。
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+
+from scripts.manifest import is_upload_candidate
+
+
+ARCHIVE_FORMATS = {"cbz": ".cbz", "zip": ".zip"}
+
+
+@dataclass(frozen=True)
+class ArchiveInfo:
+    path: Path
+    files: int
+    bytes_in: int
+    bytes_out: int
+    elapsed: float
+    reused: bool = False
+
+
+def archive_name(folder: str | Path, fmt: str = "cbz") -> str:
+    return f"{Path(folder).name}{ARCHIVE_FORMATS[fmt]}"
+
+
+def archive_members(folder: str | Path) -> list[Path]:
+    """アーカイブに入れるファイル（隠しファイル・一時ファイルを除く）を名前順に返す。"""
+    return sorted(p for p in Path(folder).iterdir() if p.is_file() and is_upload_candidate(p.name))
+
+
+def is_archive_current(folder: str | Path, archive_path: str | Path) -> bool:
+    """アーカイブがフォルダの現在の内容（ファイル名・サイズ・更新時刻）と一致するか。"""
+    archive_path = Path(archive_path)
+    try:
+        archive_mtime = archive_path.stat().st_mtime
+        with zipfile.ZipFile(archive_path) as zf:
+            stored = {info.filename: info.file_size for info in zf.infolist()}
+    except (OSError, zipfile.BadZipFile):
+        return False
+    members = archive_members(folder)
+    if stored != {p.name: p.stat().st_size for p in members}:
+        return False
+    return all(p.stat().st_mtime <= archive_mtime for p in members)
+
+
+def pack_folder(folder: str | Path, archive_path: str | Path, reuse: bool = True) -> ArchiveInfo:
+    """フォルダを無圧縮の ZIP に書き出す。書き込み途中のファイルが残らないよう一時ファイル経由で置き換える。"""
+    folder, archive_path = Path(folder), Path(archive_path)
+    members = archive_members(folder)
+    bytes_in = sum(p.stat().st_size for p in members)
+    if reuse and is_archive_current(folder, archive_path):
+        return ArchiveInfo(archive_path, len(members), bytes_in, archive_path.stat().st_size, 0.0, reused=True)
+
+    archive_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = archive_path.with_name(f".{archive_path.name}.tmp")
+    started = time.perf_counter()
+    try:
+        with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+            for path in members:
+                zf.write(path, arcname=path.name)
+        os.replace(tmp_path, archive_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    elapsed = time.perf_counter() - started
+    return ArchiveInfo(archive_path, len(members), bytes_in, archive_path.stat().st_size, elapsed)
@@ -0,0 +1,209 @@
+"""
+余白・リーダーの UI を除いた本文領域の自動クロップ。
+
+最初の数ページを保存せずに保持し、それぞれの「紙の色と違う画素」の行/列の投影プロファイルから
+本文の外接矩形を求めて和を取る。端にある塗りつぶしの帯（ツールバー・スクロールバー）は本文に含めない。
+決まった範囲は保持していたページにも適用し、以降のページは grim に狭い範囲を渡して撮影する
+（出力倍率が整数でない場合はメモリ上でクロップする）。
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+
+from PIL import Image, ImageChops
+
+
+DEFAULT_SAMPLES = 3
+DEFAULT_PADDING = 8
+DEFAULT_TOLERANCE = 32  # 紙の色からこれ以上離れた画素をインクとみなす
+CHROME_FILL = 0.9  # 端の行/列でインクがこの割合以上なら UI の帯とみなす
+MIN_SAVING = 0.05  # 面積がこの割合以上減らない場合はクロップしない
+
+Box = tuple[int, int, int, int]  # (left, top, right, bottom)
+
+
+@dataclass(frozen=True)
+class HeldFrame:
+    page: int
+    file: str
+    frame: Image.Image
+
+
+def paper_color(image: Image.Image) -> tuple[int, int, int]:
+    """チャンネルごとに最も多い値を紙の色とする。"""
+    hist = image.histogram()
+    r, g, b = (max(range(256), key=lambda v, base=band * 256: hist[base + v]) for band in range(3))
+    return r, g, b
+
+
+def ink_mask(image: Image.Image, tolerance: int = DEFAULT_TOLERANCE) -> Image.Image:
+    """紙の色からの差が tolerance を超える画素を 1.0 とする F モードのマスク。"""
+    rgb = image if image.mode == "RGB" else image.convert("RGB")
+    diff = ImageChops.difference(rgb, Image.new("RGB", rgb.size, paper_color(rgb)))
+    r, g, b = diff.split()
+    strongest = ImageChops.lighter(ImageChops.lighter(r, g), b)
+    return strongest.point(lambda v: 1 if v > tolerance else 0).convert("F")
+
+
+def _profile(mask: Image.Image, axis: str) -> list[float]:
+    """行 (axis="rows") または列ごとのインクの割合。"""
+    size = (1, mask.height) if axis == "rows" else (mask.width, 1)
+    return list(mask.resize(size, Image.Resampling.BOX).getdata())
+
+
+def _strip_chrome(profile: list[float]) -> tuple[int, int]:
+    """両端から塗りつぶしの帯を除いた範囲 [start, end) を返す。"""
+    start, end = 0, len(profile)
+    while start < end and profile[start] >= CHROME_FILL:
+        start += 1
+    while end > start and profile[end - 1] >= CHROME_FILL:
+        end -= 1
+    return start, end
+
+
+def _extent(profile: list[float], start: int, end: int) -> tuple[int, int] | None:
+    inked = [i for i in range(start, end) if profile[i] > 0]
+    if not inked:
+        return None
+    return inked[0], inked[-1] + 1
+
+
+def content_box(image: Image.Image, tolerance: int = DEFAULT_TOLERANCE) -> Box | None:
+    """1ページの本文の外接矩形。インクが無ければ None。"""
+    mask = ink_mask(image, tolerance)
+    rows = _profile(mask, "rows")
+    top, bottom = _strip_chrome(rows)
+    vertical = _extent(rows, top, bottom)
+    if vertical is None:
+        return None
+    columns = _profile(mask.crop((0, vertical[0], mask.width, vertical[1])), "columns")
+    left, right = _strip_chrome(columns)
+    horizontal = _extent(columns, left, right)
+    if horizontal is None:
+        return None
+    return horizontal[0], vertical[0], horizontal[1], vertical[1]
+
+
+def detect_crop(
+    samples: list[Image.Image],
+    padding: int = DEFAULT_PADDING,
+    tolerance: int = DEFAULT_TOLERANCE,
+    min_saving: float = MIN_SAVING,
+) -> Box | None:
+    """サンプルページの本文矩形の和に余白を足した範囲。クロップする価値が無ければ None。"""
+    if not samples or any(image.size != samples[0].size for image in samples):
+        return None
+    boxes = [box for box in (content_box(image, tolerance) for image in samples) if box is not None]
+    if not boxes:
+        return None
+    width, height = samples[0].size
+    box = (
+        max(0, min(b[0] for b in boxes) - padding),
+        max(0, min(b[1] for b in boxes) - padding),
+        min(width, max(b[2] for b in boxes) + padding),
+        min(height, max(b[3] for b in boxes) + padding),
+    )
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    if area > (1 - min_saving) * width * height:
+        return None
+    return box
+
+
+class AutoCropper:
+    """撮影ループでのクロップ範囲の決定と適用。
+
+    範囲が決まるまでは ``hold`` で新しいページを保持し、``decide`` で範囲を決めたら
+    ``take_held`` で保持していたページを取り出して保存する。
+    """
+
+    def __init__(
+        self,
+        samples: int = DEFAULT_SAMPLES,
+        padding: int = DEFAULT_PADDING,
+        tolerance: int = DEFAULT_TOLERANCE,
+    ) -> None:
+        if samples < 1:
+            raise ValueError("samples は1以上で指定してください")
+        self.samples = samples
+        self.padding = padding
+        self.tolerance = tolerance
+        self.box: Box | None = None
+        self.frame_size: tuple[int, int] | None = None
+        self.scale: float | None = None
+        self.decided = False
+        self._held: list[HeldFrame] = []
+        self._warned = False
+
+    @classmethod
+    def from_record(cls, record: dict) -> AutoCropper:
+        """撮影ジャーナルに記録済みのクロップ範囲 (box, frame, scale) で初期化する（再開用）。"""
+        cropper = cls()
+        box, frame = record.get("box"), record.get("frame")
+        cropper.box = (box[0], box[1], box[2], box[3]) if box else None
+        cropper.frame_size = (frame[0], frame[1]) if frame else None
+        cropper.scale = record.get("scale")
+        cropper.decided = True
+        return cropper
+
+    @property
+    def sampling(self) -> bool:
+        return not self.decided
+
+    @property
+    def held(self) -> int:
+        return len(self._held)
+
+    def hold(self, page: int, file: str, frame: Image.Image, window: dict) -> None:
+        if self.frame_size is None:
+            self.frame_size = frame.size
+            width = window.get("size", [0, 0])[0]
+            self.scale = frame.width / width if width else None
+        self._held.append(HeldFrame(page, file, frame))
+
+    def ready(self) -> bool:
+        return len(self._held) >= self.samples
+
+    def decide(self) -> Box | None:
+        self.box = detect_crop([h.frame for h in self._held], self.padding, self.tolerance)
+        self.decided = True
+        return self.box
+
+    def take_held(self) -> list[HeldFrame]:
+        held, self._held = self._held, []
+        return held
+
+    def crop(self, frame: Image.Image) -> Image.Image:
+        """撮影した全体フレームをクロップする。"""
+        if self.box is None or frame.size != self.frame_size:
+            return frame
+        return frame.crop(self.box)
+
+    def region(self, window: dict) -> tuple[dict, Box | None]:
+        """撮影に使うウィンドウ範囲と、撮影後にメモリ上で切り出す範囲を返す。
+
+        出力倍率が整数なら grim に渡す範囲自体を狭め、残りの端数だけをメモリ上で切り出す。
+        """
+        if self.box is None or self.frame_size is None or self.scale is None:
+            return window, None
+        size = window.get("size", [0, 0])
+        if round(size[0] * self.scale) != self.frame_size[0] or round(size[1] * self.scale) != self.frame_size[1]:
+            if not self._warned:
+                print("[警告] ウィンドウサイズが変わったためクロップを無効にします")
+                self._warned = True
+            return window, None
+        scale = self.scale
+        if abs(scale - round(scale)) > 1e-6:
+            return window, self.box
+        left, top, right, bottom = self.box
+        x0, y0 = math.floor(left / scale), math.floor(top / scale)
+        x1, y1 = math.ceil(right / scale), math.ceil(bottom / scale)
+        at = window.get("at", [0, 0])
+        cropped = {**window, "at": [at[0] + x0, at[1] + y0], "size": [x1 - x0, y1 - y0]}
+        residual = (
+            round(left - x0 * scale), round(top - y0 * scale), round(right - x0 * scale), round(bottom - y0 * scale),
+        )
+        if residual == (0, 0, round((x1 - x0) * scale), round((y1 - y0) * scale)):
+            return cropped, None
+        return cropped, residual
@@ -0,0 +1,358 @@
+"""
+スクリーンショット撮影のバックエンド（ウィンドウ取得・フレーム撮影・キー送信）。
+
+- HyprlandBackend: hyprctl / IPCソケット, grim, wtype を使う実環境用
+- VirtualBookBackend: 決定的なページを描画する仮想の本。描画遅延・遷移フレーム・
+  終端の挙動を設定でき、Hyprland なしで撮影ループを動かせる（テスト・ベンチマーク用）
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import random
+import shutil
+import subprocess
+import time
+from abc import ABC, abstractmethod
+from typing import Callable
+
+from PIL import Image, ImageDraw
+
+from scripts.hyprland import HyprlandError, WindowCache, find_client, window_matches
+
+
+BACKENDS = ("hyprland", "virtual")
+# auto=IPC ソケットの sendshortcut（失敗したら wtype に切り替える）, ipc=sendshortcut のみ, wtype=毎回 wtype を起動
+KEY_METHODS = ("auto", "ipc", "wtype")
+END_BEHAVIOURS = ("stay", "wrap")
+# blocks=単語ほどの大きさの矩形（ページごとの差が大きい）, text=文字ほどの大きさの線（実際の本文に近い）
+LAYOUTS = ("blocks", "text")
+
+
+class CaptureBackend(ABC):
+    """撮影ループが使う外部環境とのインターフェース。"""
+
+    name = "base"
+
+    def missing_requirements(self) -> list[str]:
+        """利用に必要で見つからないもの（コマンド等）の一覧を返す。"""
+        return []
+
+    @abstractmethod
+    def active_window(self) -> dict | None:
+        """アクティブウィンドウの情報 (title, at, size) を返す。"""
+
+    @abstractmethod
+    def grab(self, window: dict, scale: float | None = None) -> Image.Image | None:
+        """ウィンドウ領域を撮影してメモリ上のイメージを返す。"""
+
+    @abstractmethod
+    def send_key(self, key: str) -> None:
+        """キー入力を送る。"""
+
+    def focus_window(self, window_class: str | None = None, window_title: str | None = None) -> dict | None:
+        """クラス・タイトル（正規表現）に一致するウィンドウをフォーカスし、その情報を返す。見つからなければ None。"""
+        return None
+
+    def close(self) -> None:
+        pass
+
+
+def _window_geometry(window: dict) -> tuple[int, int, int, int] | None:
+    at = window.get("at", [0, 0])
+    size = window.get("size", [0, 0])
+    x, y = at[0], at[1]
+    w, h = size[0], size[1]
+    if w <= 0 or h <= 0:
+        return None
+    return x, y, w, h
+
+
+class HyprlandBackend(CaptureBackend):
+    """Hyprland 上で hyprctl (または IPC ソケット), grim, wtype を使うバックエンド。"""
+
+    name = "hyprland"
+
+    def __init__(self, use_ipc: bool = True, key_method: str = "auto") -> None:
+        if key_method not in KEY_METHODS:
+            raise ValueError(f"未対応のキー送信方式: {key_method}")
+        self.window_cache: WindowCache | None = None
+        if use_ipc:
+            self.window_cache = WindowCache.from_env()
+            if self.window_cache is None:
+                print("[警告] Hyprland の IPC ソケットが見つからないため hyprctl を使用します")
+        self.key_method = key_method
+        if key_method != "wtype" and self.window_cache is None:
+            if key_method == "ipc":
+                print("[警告] IPC ソケットを使えないため、キー入力は wtype で送ります")
+            self.key_method = "wtype"
+        self._key_target: str | None = None
+
+    def missing_requirements(self) -> list[str]:
+        commands = ["hyprctl", "grim"]
+        if self.key_method != "ipc":
+            commands.append("wtype")
+        return [cmd for cmd in commands if shutil.which(cmd) is None]
+
+    def active_window(self) -> dict | None:
+        """アクティブウィンドウの情報を取得する。
+
+        IPC キャッシュがあれば Hyprland のソケット経由で取得し、無ければ hyprctl を使う。
+        """
+        if self.window_cache is not None:
+            try:
+                window = self.window_cache.get()
+            except HyprlandError as e:
+                print(f"ウィンドウ取得エラー: {e}")
+                return None
+            # sendshortcut はフォーカスに関係なく撮影中のウィンドウへ送る
+            self._key_target = window.get("address") if window else None
+            return window
+        try:
+            result = subprocess.run(
+                ["hyprctl", "activewindow", "-j"],
+                capture_output=True, text=True, timeout=5,
+            )
+            if result.returncode != 0:
+                return None
+            data = json.loads(result.stdout)
+            if not data or not data.get("title"):
+                return None
+            return data
+        except (subprocess.TimeoutExpired, json.JSONDecodeError, OSError) as e:
+            print(f"ウィンドウ取得エラー: {e}")
+            return None
+
+    def grab(self, window: dict, scale: float | None = None) -> Image.Image | None:
+        """grim でウィンドウ領域を PPM として標準出力に撮影する。
+
+        ``scale`` を指定すると grim の出力倍率を変えて低解像度で撮影する。
+        """
+        geometry = _window_geometry(window)
+        if geometry is None:
+            print("ウィンドウサイズが不正です")
+            return None
+
+        x, y, w, h = geometry
+        cmd = ["grim", "-t", "ppm", "-g", f"{x},{y} {w}x{h}"]
+        if scale is not None:
+            cmd += ["-s", str(scale)]
+        try:
+            result = subprocess.run([*cmd, "-"], capture_output=True, timeout=10)
+            if result.returncode != 0:
+                msg = (result.stderr or result.stdout or b"").decode(errors="replace").strip()
+                print(f"grim エラー: {msg}")
+                return None
+            img = Image.open(io.BytesIO(result.stdout))
+            img.load()
+            return img
+        except (subprocess.TimeoutExpired, OSError) as e:
+            print(f"スクリーンショットエラー: {e}")
+            return None
+
+    def send_key(self, key: str) -> None:
+        """IPC ソケットの sendshortcut でキーを送る。使えなければ wtype を起動して送る。"""
+        if self.key_method != "wtype" and self.window_cache is not None:
+            try:
+                self.window_cache.client.send_shortcut(key, address=self._key_target)
+                return
+            except HyprlandError as e:
+                if self.key_method == "ipc":
+                    print(f"[警告] キー入力を送れませんでした: {e}")
+                    return
+                print(f"[警告] {e}（以降のキー入力は wtype で送ります）")
+                self.key_method = "wtype"
+        self._send_key_wtype(key)
+
+    def _send_key_wtype(self, key: str) -> None:
+        result = subprocess.run(["wtype", "-k", key], capture_output=True, text=True, timeout=5, check=False)
+        if result.returncode != 0:
+            msg = (result.stderr or result.stdout or "").strip()
+            print(f"[警告] wtype が失敗しました (exit {result.returncode}): {msg}")
+
+    def focus_window(self, window_class: str | None = None, window_title: str | None = None) -> dict | None:
+        """一致するウィンドウを ``dispatch focuswindow address:...`` でフォーカスする。"""
+        client = self.window_cache.client if self.window_cache is not None else None
+        try:
+            if client is not None:
+                clients = client.clients()
+            else:
+                result = subprocess.run(["hyprctl", "clients", "-j"], capture_output=True, text=True, timeout=5)
+                clients = json.loads(result.stdout) if result.returncode == 0 else []
+            target = find_client(clients, window_class, window_title)
+            if target is None or not target.get("address"):
+                return None
+            command = f"focuswindow address:{target['address']}"
+            if client is not None:
+                client.dispatch(command)
+            else:
+                result = subprocess.run(
+                    ["hyprctl", "dispatch", *command.split(" ", 1)], capture_output=True, text=True, timeout=5,
+                )
+                if result.returncode != 0 or result.stdout.strip() != "ok":
+                    raise HyprlandError(f"hyprctl dispatch が失敗しました: {(result.stdout or result.stderr).strip()}")
+        except (HyprlandError, subprocess.TimeoutExpired, json.JSONDecodeError, OSError) as e:
+            print(f"ウィンドウのフォーカスに失敗しました: {e}")
+            return None
+        if self.window_cache is not None:
+            # イベントが届く前に古いアクティブウィンドウを返さないようにする
+            self.window_cache.invalidate()
+        return target
+
+    def close(self) -> None:
+        if self.window_cache is not None:
+            self.window_cache.close()
+
+
+def _draw_text(draw: ImageDraw.ImageDraw, rng: random.Random, width: int, height: int, margin: int) -> None:
+    """1文字を縦線と横線1本ずつで表し、2〜8文字の単語を行いっぱいに並べる。"""
+    glyph = max(5, height // 135)
+    advance = max(3, glyph * 6 // 10) + 1
+    line_height = glyph * 8 // 5
+    ink = (40, 40, 40)
+    for top in range(margin, height - margin - line_height, line_height):
+        x = margin
+        letters = rng.randint(2, 8)
+        while x + advance <= width - margin:
+            if letters == 0:
+                x += advance
+                letters = rng.randint(2, 8)
+                continue
+            letters -= 1
+            stem = x + rng.randrange(advance - 1)
+            draw.line([(stem, top), (stem, top + glyph - 1)], fill=ink)
+            bar = top + rng.randrange(glyph)
+            draw.line([(x, bar), (x + advance - 2, bar)], fill=ink)
+            x += advance
+
+
+class VirtualBookBackend(CaptureBackend):
+    """決定的なページを描画する仮想の本。
+
+    ``toolbar`` を指定すると上端にその高さのリーダーの UI（塗りつぶしの帯）を描く。
+    ページは既定 (``layout="text"``) では本文を文字ほどの大きさの線で描く。縮小するとどのページも
+    ほぼ一様な灰色になるため、縮小画像だけで比較すると別のページを見分けられない（実際の本文と同じ）。
+    ``layout="blocks"`` なら単語ほどの大きさの矩形で描く。
+    ``forward_key``（未指定なら任意のキー）を受けると次のページに進み、``render_latency`` 秒かけて
+    ``transition_frames`` 枚の中間フレームを経由して描画が完了する。最終ページで
+    さらに進めた場合、``end="stay"`` なら最終ページのまま、``"wrap"`` なら表紙に戻る。
+    """
+
+    name = "virtual"
+
+    def __init__(
+        self,
+        pages: int = 50,
+        size: tuple[int, int] = (800, 1200),
+        render_latency: float = 0.0,
+        transition_frames: int = 0,
+        end: str = "stay",
+        forward_key: str | None = None,
+        seed: int = 0,
+        clock: Callable[[], float] = time.monotonic,
+        toolbar: int = 0,
+        layout: str = "text",
+    ) -> None:
+        if pages < 1:
+            raise ValueError("pages は1以上で指定してください")
+        if end not in END_BEHAVIOURS:
+            raise ValueError(f"未対応の終端動作: {end}")
+        if layout not in LAYOUTS:
+            raise ValueError(f"未対応のレイアウト: {layout}")
+        self.pages = pages
+        self.size = size
+        self.render_latency = render_latency
+        self.transition_frames = transition_frames
+        self.end = end
+        self.forward_key = forward_key
+        self.seed = seed
+        self.clock = clock
+        self.toolbar = toolbar
+        self.layout = layout
+        self.page = 0
+        self.previous_page = 0
+        self.pressed_at: float | None = None
+        self.key_presses = 0
+        self.grabs = 0
+        self._cache: dict[int, Image.Image] = {}
+
+    def active_window(self) -> dict | None:
+        return {"title": "virtual book", "class": "virtual", "at": [0, 0], "size": list(self.size)}
+
+    def focus_window(self, window_class: str | None = None, window_title: str | None = None) -> dict | None:
+        window = self.active_window()
+        return window if window_matches(window, window_class, window_title) else None
+
+    def send_key(self, key: str) -> None:
+        self.key_presses += 1
+        if self.forward_key is not None and key != self.forward_key:
+            return
+        self.previous_page = self.page
+        if self.page + 1 < self.pages:
+            self.page += 1
+        elif self.end == "wrap":
+            self.page = 0
+        self.pressed_at = self.clock()
+
+    def render_page(self, index: int) -> Image.Image:
+        """ページ番号から決定的にページ画像を描画する。"""
+        cached = self._cache.get(index)
+        if cached is not None:
+            return cached
+        rng = random.Random(self.seed * 1_000_003 + index)
+        width, height = self.size
+        img = Image.new("RGB", self.size, (250, 248, 240))
+        draw = ImageDraw.Draw(img)
+        margin = max(4, width // 16)
+        if self.layout == "text":
+            _draw_text(draw, rng, width, height, margin)
+        else:
+            line_height = max(6, height // 48)
+            for top in range(margin, height - margin - line_height, line_height * 2):
+                x = margin
+                while x < width - margin:
+                    word = rng.randint(line_height, line_height * 5)
+                    draw.rectangle([x, top, min(x + word, width - margin), top + line_height], fill=(25, 25, 25))
+                    x += word + rng.randint(line_height // 2 + 1, line_height)
+            # ページ番号を示すブロック（隣接ページで必ず差が出るように位置を変える）
+            block = max(4, width // 10)
+            left = margin + (index * block) % max(1, width - 2 * margin - block)
+            draw.rectangle([left, height - margin, left + block, height - margin // 2], fill=(40, 60, 120))
+        if self.toolbar > 0:
+            draw.rectangle([0, 0, width - 1, self.toolbar - 1], fill=(60, 60, 64))
+        if len(self._cache) >= 8:
+            self._cache.pop(next(iter(self._cache)))
+        self._cache[index] = img
+        return img
+
+    def _current_frame(self) -> Image.Image:
+        if self.pressed_at is None or self.page == self.previous_page:
+            return self.render_page(self.page)
+        elapsed = self.clock() - self.pressed_at
+        if self.render_latency <= 0 or elapsed >= self.render_latency:
+            return self.render_page(self.page)
+        if self.transition_frames <= 0:
+            return self.render_page(self.previous_page)
+        step = int(elapsed / self.render_latency * (self.transition_frames + 1))
+        if step == 0:
+            return self.render_page(self.previous_page)
+        alpha = step / (self.transition_frames + 1)
+        return Image.blend(self.render_page(self.previous_page), self.render_page(self.page), alpha)
+
+    def grab(self, window: dict, scale: float | None = None) -> Image.Image | None:
+        self.grabs += 1
+        frame = self._current_frame()
+        # grim と同様に、ウィンドウ情報の範囲 (at, size) だけを撮影する
+        geometry = _window_geometry(window)
+        if geometry is not None and geometry != (0, 0, *frame.size):
+            x, y, w, h = geometry
+            frame = frame.crop((x, y, x + w, y + h))
+        else:
+            frame = frame.copy()
+        if scale is not None and scale != 1:
+            width = max(1, int(frame.width * scale))
+            height = max(1, int(frame.height * scale))
+            frame = frame.resize((width, height), Image.Resampling.BOX)
+        return frame
+
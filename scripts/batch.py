@@ -0,0 +1,212 @@
+"""
+ジョブファイルによる無人の連続撮影（バッチ撮影）。
+
+ジョブファイル (JSON) には本ごとにフォルダ名・ページ送りキー・最大ページ数と、撮影前に
+フォーカスするウィンドウのクラス・タイトル（正規表現の部分一致, 省略可）を書く::
+
+    {"jobs": [
+        {"folder": "market_wizards", "key": "Right", "max_pages": 600, "window_class": "kindle"},
+        {"folder": "reminiscences", "key": "Left", "window_title": "Reminiscences"}
+    ]}
+
+ジョブは順に実行し、1件終わるごとに結果ファイルへジョブごとの状態と所要時間を書き出す。
+撮り終えたフォルダは飛ばし、途中まで撮ったフォルダは撮影ジャーナルの続きから撮影するため、
+同じジョブファイルで何度実行し直してもよい。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+from scripts.backends import CaptureBackend
+from scripts.hyprland import window_matches
+
+
+FOLDER_RE = re.compile(r"^[a-zA-Z0-9_-]+$")
+KEYS = {"left": "Left", "right": "Right"}
+DEFAULT_FOCUS_TIMEOUT = 3.0
+DEFAULT_JOB_DELAY = 1.0
+# done=本の終端まで撮影, incomplete=最大ページ数に達した, skipped=撮影済み, not_started=停止したため未実行
+OK_STATUSES = ("done", "skipped")
+
+
+class JobFileError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class BatchJob:
+    folder: str
+    key: str
+    max_pages: int | None = None
+    window_class: str | None = None
+    window_title: str | None = None
+
+    @property
+    def has_window(self) -> bool:
+        return bool(self.window_class or self.window_title)
+
+
+@dataclass
+class JobResult:
+    folder: str
+    status: str  # done / incomplete / stopped / skipped / focus_failed / error / not_started
+    started_at: str | None = None
+    elapsed: float = 0.0
+    saved: int = 0
+    resumed_pages: int = 0
+    iterations: int = 0
+    stop_reason: str | None = None
+    window: str | None = None
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status in OK_STATUSES
+
+    @property
+    def pages_per_sec(self) -> float:
+        return self.saved / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def _optional_str(data: dict, name: str, where: str) -> str | None:
+    value = data.get(name)
+    if value is None or value == "":
+        return None
+    if not isinstance(value, str):
+        raise JobFileError(f"{where}: {name} は文字列で指定してください")
+    try:
+        re.compile(value)
+    except re.error as e:
+        raise JobFileError(f"{where}: {name} の正規表現が不正です: {e}") from e
+    return value
+
+
+def parse_job(data: object, index: int) -> BatchJob:
+    where = f"ジョブ {index}"
+    if not isinstance(data, dict):
+        raise JobFileError(f"{where}: オブジェクトで指定してください")
+    unknown = set(data) - {"folder", "key", "max_pages", "window_class", "window_title"}
+    if unknown:
+        raise JobFileError(f"{where}: 不明な項目があります: {', '.join(sorted(unknown))}")
+    folder = data.get("folder")
+    if not isinstance(folder, str) or not FOLDER_RE.match(folder):
+        raise JobFileError(f"{where}: folder は英数字、アンダースコア(_)、ハイフン(-)で指定してください")
+    key = KEYS.get(str(data.get("key", "")).lower())
+    if key is None:
+        raise JobFileError(f"{where} ({folder}): key は Left か Right で指定してください")
+    max_pages = data.get("max_pages")
+    if max_pages is not None and (not isinstance(max_pages, int) or isinstance(max_pages, bool) or max_pages < 1):
+        raise JobFileError(f"{where} ({folder}): max_pages は1以上の整数で指定してください")
+    return BatchJob(
+        folder,
+        key,
+        max_pages,
+        _optional_str(data, "window_class", f"{where} ({folder})"),
+        _optional_str(data, "window_title", f"{where} ({folder})"),
+    )
+
+
+def load_jobs(path: str | Path) -> list[BatchJob]:
+    """ジョブファイルを読み込む。トップレベルはジョブの配列か ``{"jobs": [...]}``。"""
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+    except OSError as e:
+        raise JobFileError(f"ジョブファイルを読めません: {e}") from e
+    except json.JSONDecodeError as e:
+        raise JobFileError(f"ジョブファイルの JSON が不正です: {e}") from e
+    if isinstance(data, dict):
+        data = data.get("jobs")
+    if not isinstance(data, list) or not data:
+        raise JobFileError("ジョブファイルにジョブがありません")
+    jobs = [parse_job(item, i) for i, item in enumerate(data, 1)]
+    seen: set[str] = set()
+    for job in jobs:
+        if job.folder in seen:
+            raise JobFileError(f"フォルダ名が重複しています: {job.folder}")
+        seen.add(job.folder)
+    return jobs
+
+
+def default_results_path(job_file: str | Path) -> Path:
+    path = Path(job_file)
+    return path.with_name(f"{path.stem}.results.json")
+
+
+class BatchResults:
+    """ジョブごとの結果。追加するたびに結果ファイルへ書き出す（途中で止まっても残る）。"""
+
+    def __init__(self, path: str | Path, job_file: str | Path | None = None) -> None:
+        self.path = Path(path)
+        self.job_file = str(job_file) if job_file is not None else None
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.finished_at: str | None = None
+        self.jobs: list[JobResult] = []
+
+    @property
+    def ok(self) -> bool:
+        return all(job.ok for job in self.jobs)
+
+    def add(self, result: JobResult) -> None:
+        self.jobs.append(result)
+        self.save()
+
+    def finish(self) -> None:
+        self.finished_at = datetime.now().isoformat(timespec="seconds")
+        self.save()
+
+    def save(self) -> None:
+        data = {
+            "job_file": self.job_file,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "jobs": [
+                {**asdict(job), "elapsed": round(job.elapsed, 3), "pages_per_sec": round(job.pages_per_sec, 3)}
+                for job in self.jobs
+            ],
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+
+def focus_job_window(
+    backend: CaptureBackend,
+    job: BatchJob,
+    timeout: float = DEFAULT_FOCUS_TIMEOUT,
+    poll: float = 0.1,
+    clock: Callable[[], float] = time.monotonic,
+) -> dict | None:
+    """ジョブのウィンドウをフォーカスし、アクティブになるまで待ってその情報を返す。
+
+    ウィンドウの指定が無いジョブは現在のアクティブウィンドウをそのまま使う。
+    """
+    if not job.has_window:
+        return backend.active_window()
+    if backend.focus_window(job.window_class, job.window_title) is None:
+        return None
+    deadline = clock() + timeout
+    while True:
+        window = backend.active_window()
+        if window is not None and window_matches(window, job.window_class, job.window_title):
+            return window
+        if clock() >= deadline:
+            return None
+        time.sleep(poll)
+
+
+def print_batch_summary(results: BatchResults) -> None:
+    print(f"\n{'フォルダ':<24} {'状態':<12} {'ページ':>6} {'秒':>8} {'ページ/秒':>10}")
+    for job in results.jobs:
+        print(f"{job.folder:<24} {job.status:<12} {job.saved:>6} {job.elapsed:>8.1f} {job.pages_per_sec:>10.2f}")
+        if job.error:
+            print(f"  {job.error}")
+    print(f"結果ファイル: {results.path}")
@@ -0,0 +1,227 @@
+"""
+撮影ループのベンチマーク。
+
+仮想の本 (VirtualBookBackend) で撮影ループを Hyprland なしで動かし、
+ページ/秒・段階ごとのレイテンシ (p50/p95/p99)・最大RSS を計測して JSON で出力する。
+各シナリオは別プロセスで実行するため、最大RSSはシナリオごとの値になる。
+
+使い方:
+  uv run books-bench
+  uv run books-bench --pages 50,200 --sizes 1280x1800,3840x2160 --modes serial,pipeline
+  uv run books-bench --output bench.json
+  uv run books-bench --layout blocks   # 大きな図形だけのページ
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Sequence
+
+from scripts.backends import LAYOUTS, VirtualBookBackend
+from scripts.config import PROJECT_ROOT
+from scripts.fingerprint import METRICS
+from scripts.metrics import StageTimer
+from scripts.screenshot import CaptureConfig, CaptureOptions, run_capture
+
+
+MODES = ("serial", "pipeline", "settle")
+
+
+@dataclass(frozen=True)
+class Scenario:
+    pages: int
+    width: int
+    height: int
+    mode: str = "serial"
+    compare: str = "thumb"
+    render_latency: float = 0.0
+    page_delay: float = 0.0
+    layout: str = "text"
+
+    @property
+    def name(self) -> str:
+        return f"{self.mode}-{self.width}x{self.height}-{self.pages}p"
+
+
+def run_scenario(scenario: Scenario) -> dict:
+    """1つのシナリオを実行し、計測結果を返す。"""
+    backend = VirtualBookBackend(
+        pages=scenario.pages,
+        size=(scenario.width, scenario.height),
+        render_latency=scenario.render_latency,
+        layout=scenario.layout,
+    )
+    options = CaptureOptions(
+        max_pages=scenario.pages + 1,
+        pipeline=scenario.mode == "pipeline",
+        compare=scenario.compare,
+        settle=scenario.mode == "settle",
+        page_delay=scenario.page_delay,
+        retry_wait=0.0,
+    )
+    timer = StageTimer()
+    with tempfile.TemporaryDirectory(prefix="books-bench-") as tmp:
+        config = CaptureConfig(action_key="Right", save_dir=tmp)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            result = run_capture(backend, config, options, timer=timer)
+        bytes_written = sum(entry.stat().st_size for entry in os.scandir(tmp))
+
+    return {
+        "name": scenario.name,
+        "scenario": asdict(scenario),
+        "saved": result.saved,
+        "iterations": result.iterations,
+        "elapsed_sec": result.elapsed,
+        "pages_per_sec": result.saved / result.elapsed if result.elapsed > 0 else 0.0,
+        "bytes_written": bytes_written,
+        "stages": result.stages,
+        "settle": result.settle,
+        # Linux の ru_maxrss は KB 単位
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def _run_isolated(scenario: Scenario) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+        return pool.submit(run_scenario, scenario).result()
+
+
+def _git_revision() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=str(PROJECT_ROOT), capture_output=True, text=True, timeout=5, check=False,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip() or None
+
+
+def _parse_int_list(value: str) -> list[int]:
+    try:
+        items = [int(v) for v in value.split(",") if v.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"整数のカンマ区切りで指定してください: {value}")
+    if not items or any(v < 1 for v in items):
+        raise argparse.ArgumentTypeError(f"1以上の整数で指定してください: {value}")
+    return items
+
+
+def _parse_sizes(value: str) -> list[tuple[int, int]]:
+    sizes = []
+    for item in value.split(","):
+        m = re.fullmatch(r"\s*(\d+)x(\d+)\s*", item)
+        if not m:
+            raise argparse.ArgumentTypeError(f"WxH のカンマ区切りで指定してください: {value}")
+        sizes.append((int(m.group(1)), int(m.group(2))))
+    return sizes
+
+
+def _parse_modes(value: str) -> list[str]:
+    modes = [v.strip() for v in value.split(",") if v.strip()]
+    bad = [m for m in modes if m not in MODES]
+    if not modes or bad:
+        raise argparse.ArgumentTypeError(f"モードは {', '.join(MODES)} から指定してください: {value}")
+    return modes
+
+
+def print_report(results: Sequence[dict]) -> None:
+    print(f"\n{'シナリオ':<32} {'ページ/秒':>10} {'grab p50':>10} {'fp p50':>10} {'write p95':>10} {'RSS':>10}")
+    for r in results:
+        stages = r["stages"]
+
+        def ms(stage: str, key: str) -> str:
+            value = stages.get(stage, {}).get(key)
+            return f"{value * 1000:.1f}ms" if value is not None else "-"
+
+        print(
+            f"{r['name']:<32} {r['pages_per_sec']:>10.2f} {ms('grab', 'p50'):>10} "
+            f"{ms('fingerprint', 'p50'):>10} {ms('write', 'p95'):>10} {r['peak_rss_kb'] / 1024:>8.0f}MB"
+        )
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="仮想の本で撮影ループのベンチマークを実行します。")
+    parser.add_argument("--pages", type=_parse_int_list, default=[50], help="ページ数 (カンマ区切り, デフォルト: 50)")
+    parser.add_argument(
+        "--sizes",
+        type=_parse_sizes,
+        default=[(1280, 1800), (3840, 2160)],
+        help="ページサイズ WxH (カンマ区切り, デフォルト: 1280x1800,3840x2160)",
+    )
+    parser.add_argument(
+        "--modes", type=_parse_modes, default=["serial", "pipeline"],
+        help=f"撮影モード ({', '.join(MODES)} のカンマ区切り, デフォルト: serial,pipeline)",
+    )
+    parser.add_argument("--compare", choices=METRICS, default="thumb", help="重複判定の方式 (デフォルト: thumb)")
+    parser.add_argument(
+        "--render-latency", type=float, default=0.0, help="仮想の本の描画時間 秒 (デフォルト: 0)",
+    )
+    parser.add_argument(
+        "--page-delay", type=float, default=0.0, help="ページ送り後の固定待機 秒 (デフォルト: 0)",
+    )
+    parser.add_argument(
+        "--layout", choices=LAYOUTS, default="text",
+        help="仮想の本のページの内容 (text: 本文のような細かい文字, blocks: 大きな図形。デフォルト: text)",
+    )
+    parser.add_argument("--output", help="結果を書き出す JSON ファイル")
+    args = parser.parse_args(argv)
+
+    scenarios = [
+        Scenario(
+            pages=pages,
+            width=width,
+            height=height,
+            mode=mode,
+            compare=args.compare,
+            render_latency=args.render_latency,
+            page_delay=args.page_delay,
+            layout=args.layout,
+        )
+        for pages in args.pages
+        for width, height in args.sizes
+        for mode in args.modes
+    ]
+
+    results = []
+    for scenario in scenarios:
+        print(f"実行中: {scenario.name}", flush=True)
+        results.append(_run_isolated(scenario))
+
+    print_report(results)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "scenarios": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n結果を書き出しました: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,114 @@
+"""
+本全体のページ索引。直前のページだけでなく、それまでに保存した全ページと照合する。
+
+- 完全一致: フィンガープリントのダイジェストで辞書引き
+- 近似一致: dHash を 16bit ずつ4分割したバケットで候補を引き（ハミング距離3以内なら
+  どれかの区間が必ず一致する）、ハミング距離と縮小画像の類似度で絞り込んだうえで、
+  全画素をカバーする帯チェックサムで変化した面積がほとんど無いことを確かめる
+  （本文のページは縮小するとほぼ一様な灰色になり、dHash と縮小画像だけでは別のページも一致するため）
+
+どちらもページ数に依存せず O(1) で引ける。
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from scripts.fingerprint import Fingerprint, similarity
+
+
+HASH_BITS = 64
+BAND_BITS = 16
+BAND_COUNT = HASH_BITS // BAND_BITS
+
+
+@dataclass(frozen=True)
+class IndexEntry:
+    page: int
+    digest: str
+    dhash: int
+    thumb: bytes
+    size: tuple[int, int]
+    bands: tuple[int, ...]
+
+
+@dataclass(frozen=True)
+class IndexMatch:
+    page: int
+    exact: bool
+    distance: int
+
+
+def _bands(value: int) -> list[tuple[int, int]]:
+    mask = (1 << BAND_BITS) - 1
+    return [(i, (value >> (i * BAND_BITS)) & mask) for i in range(BAND_COUNT)]
+
+
+class BookIndex:
+    """保存済みページのハッシュ索引。"""
+
+    def __init__(self, max_distance: int = 3, threshold: float = 0.995, band_threshold: float = 0.99) -> None:
+        if not 0 <= max_distance < BAND_COUNT:
+            raise ValueError(f"max_distance は 0〜{BAND_COUNT - 1} で指定してください")
+        self.max_distance = max_distance
+        self.threshold = threshold
+        self.band_threshold = band_threshold
+        self._exact: dict[str, IndexEntry] = {}
+        self._buckets: dict[tuple[int, int], list[IndexEntry]] = {}
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    def add(self, page: int, fingerprint: Fingerprint) -> None:
+        if fingerprint.digest in self._exact:
+            return
+        entry = IndexEntry(
+            page, fingerprint.digest, fingerprint.dhash, fingerprint.thumb, fingerprint.size, fingerprint.bands,
+        )
+        self._exact[entry.digest] = entry
+        for key in _bands(entry.dhash):
+            self._buckets.setdefault(key, []).append(entry)
+
+    def remove(self, page: int) -> None:
+        """ページの登録を取り消す（クロップ後にフィンガープリントを登録し直す時など）。"""
+        self._exact = {digest: e for digest, e in self._exact.items() if e.page != page}
+        for key, entries in list(self._buckets.items()):
+            kept = [e for e in entries if e.page != page]
+            if kept:
+                self._buckets[key] = kept
+            else:
+                del self._buckets[key]
+
+    def _bands_match(self, a: tuple[int, ...], b: tuple[int, ...]) -> bool:
+        """帯チェックサムが band_threshold 以上の割合で一致するか。"""
+        if not a or len(a) != len(b):
+            return False
+        changed = sum(1 for x, y in zip(a, b) if x != y)
+        return 1.0 - changed / len(a) >= self.band_threshold
+
+    def lookup(self, fingerprint: Fingerprint) -> IndexMatch | None:
+        """同じ（またはほぼ同じ）ページが既にあればそのページ番号を返す。"""
+        entry = self._exact.get(fingerprint.digest)
+        if entry is not None:
+            return IndexMatch(entry.page, exact=True, distance=0)
+
+        seen: set[str] = set()
+        best: IndexMatch | None = None
+        for key in _bands(fingerprint.dhash):
+            for candidate in self._buckets.get(key, ()):
+                if candidate.digest in seen:
+                    continue
+                seen.add(candidate.digest)
+                if candidate.size != fingerprint.size:
+                    continue
+                distance = bin(candidate.dhash ^ fingerprint.dhash).count("1")
+                if distance > self.max_distance:
+                    continue
+                other = Fingerprint(candidate.size, candidate.thumb, candidate.dhash, (), candidate.digest)
+                if similarity(other, fingerprint, "thumb") < self.threshold:
+                    continue
+                if not self._bands_match(candidate.bands, fingerprint.bands):
+                    continue
+                if best is None or distance < best.distance:
+                    best = IndexMatch(candidate.page, exact=False, distance=distance)
+        return best
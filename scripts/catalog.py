@@ -0,0 +1,191 @@
+"""
+contents/ 以下の本フォルダの一覧（カタログ）の永続キャッシュ。
+
+フォルダごとの画像枚数・合計サイズ・最終更新時刻を SQLite (contents/.catalog.sqlite3) に保存し、
+ディレクトリの inode と更新時刻 (mtime_ns) が前回と同じフォルダは走査を省く。
+ページはすべて一時ファイルからの置き換えで書き込まれるため、ページが増減・更新されれば
+ディレクトリの更新時刻が変わる。追記で更新されるジャーナルなどはディレクトリの更新時刻を変えないので、
+合計サイズ・最終更新時刻は画像ファイルだけで数える。変わったフォルダが多い場合は並列に走査する。
+アップロード先ごとのアップロード状況も記録し、選択メニューに表示する。
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Sequence
+
+from scripts.config import IMAGE_EXTS
+
+
+CATALOG_NAME = ".catalog.sqlite3"
+SCHEMA_VERSION = 1
+PARALLEL_MIN_FOLDERS = 4  # 走査するフォルダがこの数以上なら並列に走査する
+DEFAULT_SCAN_WORKERS = 8
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    name TEXT PRIMARY KEY,
+    inode INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    image_files INTEGER NOT NULL,
+    total_bytes INTEGER NOT NULL,
+    last_modified REAL,
+    scanned_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS uploads (
+    name TEXT NOT NULL,
+    dest TEXT NOT NULL,
+    status TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    files INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    PRIMARY KEY (name, dest)
+);
+"""
+
+
+@dataclass(frozen=True)
+class FolderStats:
+    image_files: int
+    total_bytes: int
+    last_modified: datetime | None
+
+
+@dataclass(frozen=True)
+class UploadRecord:
+    status: str  # uploaded / skipped / failed / stalled
+    updated_at: datetime
+    files: int = 0
+    bytes: int = 0
+    error: str | None = None
+
+
+@dataclass
+class RefreshStats:
+    folders: int = 0
+    scanned: int = 0
+    removed: int = 0
+    elapsed: float = 0.0
+
+
+def folder_stats(folder: Path) -> FolderStats:
+    """フォルダ直下の画像の枚数・合計サイズ・最終更新時刻（画像以外のファイルは数えない）。"""
+    image_files = 0
+    total_bytes = 0
+    latest_mtime: float | None = None
+
+    try:
+        with os.scandir(folder) as it:
+            for entry in it:
+                if not entry.is_file():
+                    continue
+                if Path(entry.name).suffix.lower() not in IMAGE_EXTS:
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                image_files += 1
+                total_bytes += int(st.st_size)
+                latest_mtime = st.st_mtime if latest_mtime is None else max(latest_mtime, st.st_mtime)
+    except OSError:
+        return FolderStats(0, 0, None)
+
+    last_modified = datetime.fromtimestamp(latest_mtime) if latest_mtime is not None else None
+    return FolderStats(image_files, total_bytes, last_modified)
+
+
+class Catalog:
+    """本フォルダの走査結果とアップロード状況の SQLite キャッシュ。"""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=10)
+        self.conn.row_factory = sqlite3.Row
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self.conn.executescript("DROP TABLE IF EXISTS folders; DROP TABLE IF EXISTS uploads;")
+        self.conn.executescript(SCHEMA)
+        self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.commit()
+
+    @classmethod
+    def open(cls, base_dir: str | Path) -> Catalog:
+        return cls(Path(base_dir) / CATALOG_NAME)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> Catalog:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def refresh(
+        self, folders: Sequence[Path], workers: int = DEFAULT_SCAN_WORKERS, force: bool = False,
+    ) -> tuple[dict[str, FolderStats], RefreshStats]:
+        """folders の統計を返す。inode・更新時刻が記録と違うフォルダだけ走査し、記録に無いフォルダは削除する。"""
+        started = time.perf_counter()
+        rows = {row["name"]: row for row in self.conn.execute("SELECT * FROM folders")}
+        stats: dict[str, FolderStats] = {}
+        changed: list[tuple[Path, os.stat_result]] = []
+        for folder in folders:
+            try:
+                st = folder.stat()
+            except OSError:
+                continue
+            row = rows.get(folder.name)
+            if not force and row is not None and row["inode"] == st.st_ino and row["mtime_ns"] == st.st_mtime_ns:
+                modified = datetime.fromtimestamp(row["last_modified"]) if row["last_modified"] is not None else None
+                stats[folder.name] = FolderStats(row["image_files"], row["total_bytes"], modified)
+            else:
+                changed.append((folder, st))
+
+        if len(changed) >= PARALLEL_MIN_FOLDERS and workers > 1:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="catalog") as pool:
+                scanned = list(pool.map(folder_stats, [folder for folder, _ in changed]))
+        else:
+            scanned = [folder_stats(folder) for folder, _ in changed]
+
+        now = time.time()
+        with self.conn:
+            for (folder, st), result in zip(changed, scanned):
+                stats[folder.name] = result
+                modified = result.last_modified.timestamp() if result.last_modified else None
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO folders VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (folder.name, st.st_ino, st.st_mtime_ns, result.image_files, result.total_bytes, modified, now),
+                )
+            names = {folder.name for folder in folders}
+            removed = [name for name in rows if name not in names]
+            self.conn.executemany("DELETE FROM folders WHERE name = ?", [(name,) for name in removed])
+        return stats, RefreshStats(len(stats), len(changed), len(removed), time.perf_counter() - started)
+
+    def record_upload(
+        self, name: str, dest: str, status: str, files: int = 0, size: int = 0, error: str | None = None,
+    ) -> None:
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (name, dest, status, time.time(), files, size, error),
+            )
+
+    def upload_status(self, names: Iterable[str], dest: str) -> dict[str, UploadRecord]:
+        """dest へのフォルダごとの最新のアップロード状況。"""
+        wanted = set(names)
+        records: dict[str, UploadRecord] = {}
+        for row in self.conn.execute("SELECT * FROM uploads WHERE dest = ?", (dest,)):
+            if row["name"] in wanted:
+                records[row["name"]] = UploadRecord(
+                    row["status"], datetime.fromtimestamp(row["updated_at"]), row["files"], row["bytes"], row["error"],
+                )
+        return records
@@ -7,3 +7,5 @@ SCRIPTS_DIR = PROJECT_ROOT / "scripts"
 CONTENTS_DIR = PROJECT_ROOT / "contents"
 
 MEGA_REMOTE_DEST = "/book"
+
+IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tif", ".tiff"}
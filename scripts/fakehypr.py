@@ -0,0 +1,101 @@
+"""
+Hyprland の IPC ソケットと wtype のローカル代替（ベンチマーク・テスト用）。
+
+- FakeHyprland: リクエストソケット (.socket.sock) とイベントソケット (.socket2.sock) を模倣する。
+  ``j/activewindow``・``j/clients`` に応答し、``dispatch`` は記録して ``ok`` を返す
+- install_wtype: 受け取ったキーをログに追記するだけの ``wtype`` を作る（プロセス起動のコストは実物と同じ）
+
+使い方:
+  fake = FakeHyprland(runtime_dir / "hypr" / signature)
+  env: XDG_RUNTIME_DIR=runtime_dir, HYPRLAND_INSTANCE_SIGNATURE=signature
+"""
+
+from __future__ import annotations
+
+import json
+import socket
+import socketserver
+import stat
+import threading
+import time
+from pathlib import Path
+
+
+WINDOW = {"address": "0x1", "class": "reader", "title": "reader", "at": [10, 20], "size": [800, 600]}
+DISPATCHERS = ("focuswindow", "sendshortcut")
+
+
+class FakeHyprland:
+    """リクエストソケットとイベントソケットを模倣するローカルサーバー。"""
+
+    def __init__(self, directory: str | Path, window: dict | None = None, clients: list[dict] | None = None) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.requests: list[str] = []
+        self.window = dict(window or WINDOW)
+        self.clients = clients if clients is not None else [self.window]
+        self.fail_dispatch = False
+        self.event_clients: list[socket.socket] = []
+        fake = self
+
+        class RequestHandler(socketserver.BaseRequestHandler):
+            def handle(self) -> None:
+                command = self.request.recv(1024).decode()
+                fake.requests.append(command)
+                self.request.sendall(fake.reply(command).encode())
+
+        class EventHandler(socketserver.BaseRequestHandler):
+            def handle(self) -> None:
+                fake.event_clients.append(self.request)
+                while self.request.fileno() != -1:
+                    time.sleep(0.01)
+
+        self.request_server = socketserver.ThreadingUnixStreamServer(
+            str(self.directory / ".socket.sock"), RequestHandler,
+        )
+        self.event_server = socketserver.ThreadingUnixStreamServer(
+            str(self.directory / ".socket2.sock"), EventHandler,
+        )
+        for server in (self.request_server, self.event_server):
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True).start()
+
+    def reply(self, command: str) -> str:
+        if command == "j/activewindow":
+            return json.dumps(self.window)
+        if command == "j/clients":
+            return json.dumps(self.clients)
+        if command.startswith("dispatch "):
+            name = command.split(" ", 2)[1]
+            if name not in DISPATCHERS:
+                return "Invalid dispatcher"
+            return "error: dispatch failed" if self.fail_dispatch else "ok"
+        return "unknown request"
+
+    @property
+    def shortcuts(self) -> list[str]:
+        """受け取った sendshortcut の引数。"""
+        prefix = "dispatch sendshortcut "
+        return [r[len(prefix):] for r in self.requests if r.startswith(prefix)]
+
+    def emit(self, line: str) -> None:
+        for client in self.event_clients:
+            client.sendall(f"{line}\n".encode())
+
+    def close(self) -> None:
+        for client in self.event_clients:
+            client.close()
+        for server in (self.request_server, self.event_server):
+            server.shutdown()
+            server.server_close()
+
+
+def install_wtype(bin_dir: str | Path, log: str | Path | None = None) -> str:
+    """bin_dir に wtype の代替を作り、そのパスを返す。log を指定すると引数を1行ずつ追記する。"""
+    bin_dir = Path(bin_dir)
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    path = bin_dir / "wtype"
+    body = f"echo \"$*\" >> '{Path(log).resolve()}'\n" if log is not None else ""
+    path.write_text(f"#!/bin/sh\n{body}exit 0\n", encoding="utf-8")
+    path.chmod(path.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return str(path)
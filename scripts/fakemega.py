@@ -0,0 +1,365 @@
+"""
+MEGAcmd のローカル代替（ベンチマーク・テスト用）。
+
+``mega-put`` の代わりにファイルをローカルの「リモート」ディレクトリへコピーする。
+ファイルごとの遅延と帯域を環境変数で設定でき、実際の MEGA の転送に近いコストを再現する。
+``mega-ls``・``mega-whoami``・``mega-login`` などと、標準入力からコマンドを1行ずつ読む
+対話シェル ``mega-cmd`` も再現する。ログイン状態はリモートのディレクトリに記録する。
+
+``mega-put -q`` はファイルをコピーし終えてから戻り、その転送を ``.fakemega_transfers.jsonl`` に記録する。
+``mega-transfers --show-completed`` は記録した転送を COMPLETED / FAILED として表示する。
+失敗させるファイルは正規表現か割合で指定できる。割合の場合はシードと「親フォルダ名/ファイル名」
+から決まるため、同じ設定なら毎回同じファイルが失敗する。-q なしの mega-put は失敗したファイルで
+止まって終了コード 1 を返し、-q 付きは 0 を返して転送の状態を FAILED にする。
+
+環境変数:
+  FAKEMEGA_ROOT           リモートとして使うディレクトリ（必須）
+  FAKEMEGA_FILE_LATENCY   ファイルごとの遅延 秒（デフォルト: 0）
+  FAKEMEGA_BANDWIDTH      帯域 バイト/秒（デフォルト: 0=無制限）
+  FAKEMEGA_CMD_LATENCY    コマンドごとのサーバーとのやり取りの遅延 秒（デフォルト: 0）
+  FAKEMEGA_FAIL_RATE      転送を失敗させるファイルの割合 0〜1（デフォルト: 0）
+  FAKEMEGA_FAIL_PATTERN   パスがこの正規表現に一致するファイルの転送を失敗させる
+  FAKEMEGA_SEED           FAKEMEGA_FAIL_RATE のシード（デフォルト: 0）
+  FAKEMEGA_LOG            実行したコマンドを JSON Lines で追記するファイル
+                          （via: process=プロセスとして起動 / shell=mega-cmd のシェル内で実行）
+
+使い方:
+  python -m scripts.fakemega put [-c] [-q] <local>... <remote>
+  python -m scripts.fakemega shell
+  install_commands(bin_dir, root) で mega-put などのラッパースクリプトを作成できる
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import random
+import re
+import shlex
+import shutil
+import stat
+import sys
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Sequence
+
+from scripts.config import PROJECT_ROOT
+
+
+COMMANDS = ("put", "ls", "whoami", "login", "logout", "transfers", "shell")
+WRAPPER_NAMES = {"shell": "mega-cmd"}  # 対話シェルの実物のコマンド名
+SESSION_FILE = ".fakemega_session"
+TRANSFERS_FILE = ".fakemega_transfers.jsonl"
+SHELL_PROMPT = "MEGA CMD> "
+
+
+@dataclass(frozen=True)
+class FakeSettings:
+    latency: float = 0.0
+    bandwidth: float = 0.0
+    cmd_latency: float = 0.0
+    fail_rate: float = 0.0
+    fail_pattern: str | None = None
+    seed: str = "0"
+    log: Path | None = None
+
+    @classmethod
+    def from_env(cls) -> FakeSettings:
+        env = os.environ
+        return cls(
+            latency=float(env.get("FAKEMEGA_FILE_LATENCY", "0") or 0),
+            bandwidth=float(env.get("FAKEMEGA_BANDWIDTH", "0") or 0),
+            cmd_latency=float(env.get("FAKEMEGA_CMD_LATENCY", "0") or 0),
+            fail_rate=float(env.get("FAKEMEGA_FAIL_RATE", "0") or 0),
+            fail_pattern=env.get("FAKEMEGA_FAIL_PATTERN") or None,
+            seed=env.get("FAKEMEGA_SEED", "0") or "0",
+            log=Path(env["FAKEMEGA_LOG"]) if env.get("FAKEMEGA_LOG") else None,
+        )
+
+    def should_fail(self, path: Path) -> bool:
+        if self.fail_pattern and re.search(self.fail_pattern, path.as_posix()):
+            return True
+        if self.fail_rate <= 0:
+            return False
+        return random.Random(f"{self.seed}:{path.parent.name}/{path.name}").random() < self.fail_rate
+
+
+@dataclass
+class Usage:
+    """1つのコマンドで転送したファイル数とバイト数。"""
+
+    files: int = 0
+    bytes: int = 0
+
+
+def _remote_path(root: Path, remote: str) -> Path:
+    return root / remote.strip().lstrip("/")
+
+
+def _transfer(source: Path, target: Path, settings: FakeSettings, usage: Usage) -> bool:
+    size = source.stat().st_size
+    delay = settings.latency + (size / settings.bandwidth if settings.bandwidth > 0 else 0.0)
+    if delay > 0:
+        time.sleep(delay)
+    if settings.should_fail(source):
+        return False
+    target.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(source, target)
+    usage.files += 1
+    usage.bytes += size
+    return True
+
+
+def _record_transfer(root: Path, source: Path, target: Path, size: int, failed: bool) -> None:
+    record = {
+        "source": str(source),
+        "destination": "/" + target.relative_to(root).as_posix(),
+        "size": size,
+        "state": "FAILED" if failed else "COMPLETED",
+    }
+    with (root / TRANSFERS_FILE).open("a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def put(args: Sequence[str], root: Path, settings: FakeSettings | None = None, usage: Usage | None = None) -> int:
+    """mega-put 相当: フォルダは <remote>/<フォルダ名>/ 以下に、ファイルは <remote> にコピーする。"""
+    settings = settings or FakeSettings()
+    usage = usage if usage is not None else Usage()
+    create = "-c" in args
+    queued = "-q" in args
+    paths = [a for a in args if not a.startswith("-")]
+    if len(paths) < 2:
+        print("Usage: put [-c] [-q] localfile [localfile2 ...] remotepath", file=sys.stderr)
+        return 1
+    sources, remote = [Path(p) for p in paths[:-1]], paths[-1]
+    target = _remote_path(root, remote)
+    into_dir = remote.endswith("/") or target.is_dir() or len(sources) > 1 or sources[0].is_dir()
+    if into_dir and not target.is_dir():
+        if not create:
+            print(f"[API:err] Couldn't find destination folder: {remote}", file=sys.stderr)
+            return 53
+        target.mkdir(parents=True, exist_ok=True)
+    for source in sources:
+        if not source.exists():
+            print(f"[API:err] Local file not found: {source}", file=sys.stderr)
+            return 53
+        if source.is_dir():
+            destination = target / source.name
+            files = [(p, destination / p.relative_to(source)) for p in sorted(source.rglob("*")) if p.is_file()]
+        else:
+            destination = target / source.name if into_dir else target
+            files = [(source, destination)]
+        failed = next((path for path, to in files if not _transfer(path, to, settings, usage)), None)
+        if queued:
+            _record_transfer(root, source, destination, sum(p.stat().st_size for p, _ in files), failed is not None)
+        elif failed is not None:
+            print(f"[API:err] Transfer failed: {failed}", file=sys.stderr)
+            return 1
+    return 0
+
+
+def _entry_line(path: Path) -> str:
+    modified = datetime.fromtimestamp(path.stat().st_mtime).strftime("%d%b%Y %H:%M:%S")
+    if path.is_dir():
+        return f"d---    -          -  {modified} {path.name}"
+    return f"-ep-    1  {path.stat().st_size:>9}  {modified} {path.name}"
+
+
+def ls(args: Sequence[str], root: Path) -> int:
+    """mega-ls -l [-r] 相当（-l の有無に関わらず詳細形式で出力する）。"""
+    paths = [a for a in args if not a.startswith("-")]
+    remote = paths[-1] if paths else "/"
+    target = _remote_path(root, remote)
+    if not target.exists():
+        print(f"[API:err: {datetime.now():%H:%M:%S}] Couldn't find {remote}", file=sys.stderr)
+        return 53
+    if target.is_file():
+        print("FLAGS VERS      SIZE            DATE       NAME")
+        print(_entry_line(target))
+        return 0
+    folders = [target]
+    if "-r" in args:
+        folders += sorted(p for p in target.rglob("*") if p.is_dir())
+    for folder in folders:
+        if folder != target:
+            print(f"\n/{folder.relative_to(root).as_posix()}:")
+        print("FLAGS VERS      SIZE            DATE       NAME")
+        for child in sorted(folder.iterdir()):
+            if not child.name.startswith(".fakemega"):
+                print(_entry_line(child))
+    return 0
+
+
+def _progress(size: int, failed: bool) -> str:
+    unit, scale = ("MB", 1024**2) if size >= 1024**2 else ("KB", 1024)
+    return f"{0 if failed else 100:.2f}% of {size / scale:.2f} {unit}"
+
+
+def transfers(args: Sequence[str], root: Path) -> int:
+    """mega-transfers 相当。-q で送った転送は終わっているため、--show-completed のときだけ表示する。"""
+    separator = next((a.split("=", 1)[1] for a in args if a.startswith("--col-separator=")), None)
+    rows = [("TYPE", "TAG", "SOURCEPATH", "DESTINYPATH", "PROGRESS", "STATE")]
+    path = root / TRANSFERS_FILE
+    if "--show-completed" in args and path.exists():
+        for tag, line in enumerate(path.read_text(encoding="utf-8").splitlines(), start=1):
+            r = json.loads(line)
+            progress = _progress(r["size"], r["state"] == "FAILED")
+            rows.append(("\u21d1", str(tag), r["source"], r["destination"], progress, r["state"]))
+    for row in rows:
+        print(separator.join(row) if separator else "  ".join(row))
+    return 0
+
+
+def whoami(root: Path) -> int:
+    session = root / SESSION_FILE
+    if not session.exists():
+        print(f"[err: {datetime.now():%H:%M:%S}] Not logged in.", file=sys.stderr)
+        return 57
+    print(f"Account e-mail: {session.read_text(encoding='utf-8').strip()}")
+    return 0
+
+
+def login(args: Sequence[str], root: Path) -> int:
+    paths = [a for a in args if not a.startswith("-")]
+    if len(paths) < 2:
+        print("Usage: login email password", file=sys.stderr)
+        return 1
+    root.mkdir(parents=True, exist_ok=True)
+    (root / SESSION_FILE).write_text(paths[0], encoding="utf-8")
+    return 0
+
+
+def run_command(
+    command: str, args: Sequence[str], root: Path, settings: FakeSettings, usage: Usage | None = None,
+) -> int:
+    """1つのコマンドを実行して終了コードを返す。"""
+    if command == "put":
+        return put(args, root, settings, usage)
+    if command == "ls":
+        return ls(args, root)
+    if command == "whoami":
+        return whoami(root)
+    if command == "login":
+        return login(args, root)
+    if command == "logout":
+        (root / SESSION_FILE).unlink(missing_ok=True)
+        return 0
+    if command == "transfers":
+        return transfers(args, root)
+    if command == "echo":
+        print(" ".join(args))
+        return 0
+    print(f"[err: {datetime.now():%H:%M:%S}] Command not found: {command}", file=sys.stderr)
+    return 1
+
+
+def log_command(settings: FakeSettings, command: str, via: str, returncode: int, usage: Usage | None = None) -> None:
+    if settings.log is None:
+        return
+    record = {"command": command, "via": via, "returncode": returncode, **asdict(usage or Usage())}
+    with settings.log.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def read_log(path: str | Path) -> list[dict]:
+    """FAKEMEGA_LOG に書かれたコマンドの記録を読む。"""
+    path = Path(path)
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def _run_logged(command: str, args: Sequence[str], root: Path, settings: FakeSettings, via: str) -> int:
+    if settings.cmd_latency > 0:
+        time.sleep(settings.cmd_latency)
+    usage = Usage()
+    returncode = run_command(command, args, root, settings, usage)
+    if command != "echo":  # シェルの目印は MEGA のコマンドではないので記録しない
+        log_command(settings, command, via, returncode, usage)
+    return returncode
+
+
+def shell(root: Path, settings: FakeSettings) -> int:
+    """mega-cmd 相当: 標準入力からコマンドを1行ずつ読んで実行する。エラーも標準出力に出す。"""
+    sys.stderr = sys.stdout
+    while True:
+        sys.stdout.write(SHELL_PROMPT)
+        sys.stdout.flush()
+        line = sys.stdin.readline()
+        if not line:
+            return 0
+        try:
+            words = shlex.split(line)
+        except ValueError as e:
+            print(f"[err: {datetime.now():%H:%M:%S}] {e}")
+            continue
+        if not words:
+            continue
+        if words[0] in ("exit", "quit"):
+            return 0
+        _run_logged(words[0], words[1:], root, settings, via="shell")
+        sys.stdout.flush()
+
+
+def install_commands(
+    bin_dir: str | Path,
+    root: str | Path,
+    latency: float = 0.0,
+    bandwidth: float = 0.0,
+    commands: Sequence[str] = COMMANDS,
+    cmd_latency: float = 0.0,
+    fail_rate: float = 0.0,
+    fail_pattern: str | None = None,
+    seed: str = "0",
+    log: str | Path | None = None,
+) -> dict[str, str]:
+    """bin_dir に mega-<command>（shell は mega-cmd）のラッパースクリプトを作り、コマンド名 → パスを返す。"""
+    env = {
+        "FAKEMEGA_ROOT": str(Path(root).resolve()),
+        "FAKEMEGA_FILE_LATENCY": str(latency),
+        "FAKEMEGA_BANDWIDTH": str(bandwidth),
+        "FAKEMEGA_CMD_LATENCY": str(cmd_latency),
+        "FAKEMEGA_FAIL_RATE": str(fail_rate),
+        "FAKEMEGA_FAIL_PATTERN": fail_pattern or "",
+        "FAKEMEGA_SEED": str(seed),
+        "FAKEMEGA_LOG": str(Path(log).resolve()) if log is not None else "",
+    }
+    exports = "".join(f"export {name}={shlex.quote(value)}\n" for name, value in env.items())
+    bin_dir = Path(bin_dir)
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    paths: dict[str, str] = {}
+    for command in commands:
+        name = WRAPPER_NAMES.get(command, f"mega-{command}")
+        path = bin_dir / name
+        path.write_text(
+            "#!/bin/sh\n"
+            f"export PYTHONPATH='{PROJECT_ROOT}'${{PYTHONPATH:+:$PYTHONPATH}}\n"
+            f"{exports}"
+            f"exec '{sys.executable}' -m scripts.fakemega {command} \"$@\"\n",
+            encoding="utf-8",
+        )
+        path.chmod(path.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+        paths[name] = str(path)
+    return paths
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = list(sys.argv[1:] if argv is None else argv)
+    if not args or args[0] not in COMMANDS:
+        print(f"使い方: python -m scripts.fakemega {{{','.join(COMMANDS)}}} ...", file=sys.stderr)
+        return 2
+    root = os.environ.get("FAKEMEGA_ROOT")
+    if not root:
+        print("FAKEMEGA_ROOT が設定されていません", file=sys.stderr)
+        return 2
+    settings = FakeSettings.from_env()
+    if args[0] == "shell":
+        log_command(settings, "shell", "process", 0)
+        return shell(Path(root), settings)
+    return _run_logged(args[0], args[1:], Path(root), settings, via="process")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,166 @@
+"""
+スクリーンショットの重複判定に使う軽量フィンガープリント。
+
+フル解像度の画像を保持・比較する代わりに、縮小グレースケール画像・dHash・
+横帯ごとのチェックサムだけを保持して比較する。縮小画像・dHash は明らかに違うページを
+早く見分けるためだけに使う。本文のページは縮小するとほぼ一様な灰色になり、別のページでも
+似てしまうため、「同じ」と判定するのはダイジェストか、全画素をカバーする帯チェックサムで
+変化した面積がほとんど無い場合だけにする。
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import zlib
+from dataclasses import dataclass, field
+
+from PIL import Image, ImageChops, ImageStat
+
+
+THUMB_SIZE = (32, 32)
+BAND_COUNT = 256
+AMBIGUITY_MARGIN = 0.005
+METRICS = ("thumb", "dhash", "full")
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    size: tuple[int, int]
+    thumb: bytes
+    dhash: int
+    bands: tuple[int, ...]
+    digest: str
+    image: Image.Image | None = field(default=None, compare=False, repr=False)
+
+    def to_dict(self) -> dict:
+        """JSON に保存できる形式に変換する（画像は含めない）。"""
+        return {
+            "size": list(self.size),
+            "thumb": base64.b64encode(self.thumb).decode("ascii"),
+            "dhash": f"{self.dhash:016x}",
+            "bands": b"".join(crc.to_bytes(4, "big") for crc in self.bands).hex(),
+            "digest": self.digest,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Fingerprint:
+        bands = bytes.fromhex(data["bands"])
+        return cls(
+            size=(int(data["size"][0]), int(data["size"][1])),
+            thumb=base64.b64decode(data["thumb"]),
+            dhash=int(data["dhash"], 16),
+            bands=tuple(int.from_bytes(bands[i:i + 4], "big") for i in range(0, len(bands), 4)),
+            digest=data["digest"],
+        )
+
+
+def images_are_same(img1: Image.Image | None, img2: Image.Image | None, threshold: float = 0.99) -> bool:
+    """2つの画像が同じかどうかを判定する。"""
+    if img1 is None or img2 is None:
+        return False
+    if img1.size != img2.size:
+        return False
+    try:
+        diff = ImageChops.difference(img1, img2)
+        stat = ImageStat.Stat(diff)
+        avg_diff = sum(stat.mean) / len(stat.mean)
+        return avg_diff < (1.0 - threshold) * 255
+    except Exception as e:
+        print(f"画像比較エラー: {e}")
+        return False
+
+
+def _band_checksums(image: Image.Image) -> tuple[int, ...]:
+    raw = memoryview(image.tobytes())
+    height = image.size[1]
+    if height <= 0 or not raw:
+        return ()
+    row_bytes = len(raw) // height
+    bands = min(BAND_COUNT, height)
+    checksums = []
+    for i in range(bands):
+        start = (i * height // bands) * row_bytes
+        end = ((i + 1) * height // bands) * row_bytes
+        checksums.append(zlib.crc32(raw[start:end]))
+    return tuple(checksums)
+
+
+def _dhash(thumb: Image.Image) -> int:
+    small = thumb.resize((9, 8), Image.Resampling.BOX)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+
+def compute_fingerprint(image: Image.Image, keep_image: bool = False) -> Fingerprint:
+    """画像からフィンガープリントを計算する。``keep_image`` の場合は元画像も保持する。"""
+    thumb = image.resize(THUMB_SIZE, Image.Resampling.BOX).convert("L")
+    bands = _band_checksums(image)
+    digest_src = f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode() + b"".join(
+        crc.to_bytes(4, "big") for crc in bands
+    )
+    return Fingerprint(
+        size=image.size,
+        thumb=thumb.tobytes(),
+        dhash=_dhash(thumb),
+        bands=bands,
+        digest=hashlib.blake2b(digest_src, digest_size=16).hexdigest(),
+        image=image if keep_image else None,
+    )
+
+
+def similarity(a: Fingerprint, b: Fingerprint, metric: str = "thumb") -> float:
+    """2つのフィンガープリントの類似度 (0.0〜1.0) を返す。"""
+    if metric == "thumb":
+        img_a = Image.frombytes("L", THUMB_SIZE, a.thumb)
+        img_b = Image.frombytes("L", THUMB_SIZE, b.thumb)
+        mean = ImageStat.Stat(ImageChops.difference(img_a, img_b)).mean[0]
+        return 1.0 - mean / 255.0
+    if metric == "dhash":
+        return 1.0 - bin(a.dhash ^ b.dhash).count("1") / 64.0
+    raise ValueError(f"未対応の比較方式: {metric}")
+
+
+class FrameComparator:
+    """フィンガープリント同士で同一ページかどうかを判定する。"""
+
+    def __init__(self, metric: str = "thumb", threshold: float = 0.99, margin: float = AMBIGUITY_MARGIN) -> None:
+        if metric not in METRICS:
+            raise ValueError(f"未対応の比較方式: {metric}")
+        if not 0.0 <= threshold <= 1.0:
+            raise ValueError("threshold は 0.0〜1.0 で指定してください")
+        self.metric = metric
+        self.threshold = threshold
+        self.margin = margin
+        self.fallbacks = 0
+
+    def fingerprint(self, image: Image.Image) -> Fingerprint:
+        """比較方式に合わせてフィンガープリントを作る（full の場合のみ画像を保持）。"""
+        return compute_fingerprint(image, keep_image=self.metric == "full")
+
+    def is_same(self, prev: Fingerprint | None, current: Fingerprint | None) -> bool:
+        if prev is None or current is None:
+            return False
+        if prev.size != current.size:
+            return False
+        if prev.digest == current.digest:
+            return True
+        if self.metric == "full":
+            return images_are_same(current.image, prev.image, self.threshold)
+
+        if similarity(prev, current, self.metric) < self.threshold - self.margin:
+            return False
+
+        # 縮小画像が似ていても本文の違いは消えてしまうので、全画素をカバーする帯チェックサムで
+        # 変化した面積の割合を見て確かめる
+        self.fallbacks += 1
+        if not current.bands:
+            return False
+        changed = sum(1 for x, y in zip(prev.bands, current.bands) if x != y)
+        return 1.0 - changed / len(current.bands) >= self.threshold
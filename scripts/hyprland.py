@@ -0,0 +1,273 @@
+"""
+Hyprland の IPC ソケットと直接通信するクライアント。
+
+- リクエストソケット (.socket.sock): ``hyprctl`` を起動せずにウィンドウ情報を取得する
+- イベントソケット (.socket2.sock): ウィンドウの移動・フォーカス変更を受け取り、
+  キャッシュしたウィンドウ情報を無効化する
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import socket
+import threading
+from pathlib import Path
+from typing import Callable
+
+
+# アクティブウィンドウの位置・サイズ・内容が変わりうるイベント
+INVALIDATING_EVENTS = frozenset({
+    "activewindow",
+    "activewindowv2",
+    "movewindow",
+    "movewindowv2",
+    "openwindow",
+    "closewindow",
+    "windowtitle",
+    "windowtitlev2",
+    "fullscreen",
+    "changefloatingmode",
+    "workspace",
+    "workspacev2",
+    "focusedmon",
+    "focusedmonv2",
+    "monitoradded",
+    "monitorremoved",
+    "configreloaded",
+})
+
+
+class HyprlandError(RuntimeError):
+    pass
+
+
+def socket_dir() -> Path | None:
+    """現在の Hyprland インスタンスのソケットディレクトリを返す。"""
+    signature = os.environ.get("HYPRLAND_INSTANCE_SIGNATURE", "").strip()
+    if not signature:
+        return None
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR", "").strip()
+    candidates = []
+    if runtime_dir:
+        candidates.append(Path(runtime_dir) / "hypr" / signature)
+    # 古い Hyprland は /tmp/hypr を使う
+    candidates.append(Path("/tmp/hypr") / signature)
+    for candidate in candidates:
+        if (candidate / ".socket.sock").exists():
+            return candidate
+    return None
+
+
+class HyprlandClient:
+    """Hyprland のリクエストソケットにコマンドを送るクライアント。
+
+    Hyprland はリクエストごとに応答を返して接続を閉じるため、接続は1リクエスト
+    ごとに張り直す（プロセス起動は発生しない）。
+    """
+
+    def __init__(self, socket_path: str | Path, timeout: float = 2.0) -> None:
+        self.socket_path = str(socket_path)
+        self.timeout = timeout
+
+    @classmethod
+    def from_env(cls) -> HyprlandClient | None:
+        directory = socket_dir()
+        if directory is None:
+            return None
+        return cls(directory / ".socket.sock")
+
+    def request(self, command: str) -> str:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.socket_path)
+                sock.sendall(command.encode())
+                chunks = []
+                while True:
+                    chunk = sock.recv(65536)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+        except OSError as e:
+            raise HyprlandError(f"Hyprland IPC エラー ({command}): {e}") from e
+        return b"".join(chunks).decode(errors="replace")
+
+    def request_json(self, command: str) -> object:
+        text = self.request(f"j/{command}")
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as e:
+            raise HyprlandError(f"Hyprland IPC の応答を解析できません ({command}): {text[:200]}") from e
+
+    def active_window(self) -> dict | None:
+        data = self.request_json("activewindow")
+        if not isinstance(data, dict) or not data.get("title"):
+            return None
+        return data
+
+    def clients(self) -> list[dict]:
+        data = self.request_json("clients")
+        return [c for c in data if isinstance(c, dict)] if isinstance(data, list) else []
+
+    def dispatch(self, command: str) -> None:
+        """``dispatch`` を送る。Hyprland は成功すると ``ok`` を返す。"""
+        reply = self.request(f"dispatch {command}").strip()
+        if reply != "ok":
+            raise HyprlandError(f"Hyprland の dispatch が失敗しました ({command}): {reply[:200]}")
+
+    def send_shortcut(self, key: str, mods: str = "", address: str | None = None) -> None:
+        """``dispatch sendshortcut`` でキー入力を送る（プロセスを起動しない）。
+
+        ``address`` を指定するとフォーカスに関係なくそのウィンドウへ送る。
+        """
+        target = f",address:{address}" if address else ""
+        self.dispatch(f"sendshortcut {mods},{key}{target}")
+
+
+def window_matches(window: dict, window_class: str | None = None, window_title: str | None = None) -> bool:
+    """ウィンドウのクラスとタイトルがそれぞれの正規表現に一致するか（部分一致, 未指定は無条件）。"""
+    if window_class and not re.search(window_class, str(window.get("class", ""))):
+        return False
+    if window_title and not re.search(window_title, str(window.get("title", ""))):
+        return False
+    return True
+
+
+def find_client(clients: list[dict], window_class: str | None = None, window_title: str | None = None) -> dict | None:
+    """条件に一致する表示中のウィンドウを返す。複数あれば最後にフォーカスされたものを優先する。"""
+    matches = [
+        c for c in clients
+        if c.get("mapped", True) and not c.get("hidden") and window_matches(c, window_class, window_title)
+    ]
+    if not matches:
+        return None
+    return min(matches, key=lambda c: c.get("focusHistoryID", 0))
+
+
+class EventListener(threading.Thread):
+    """イベントソケットを読み、対象イベントごとにコールバックを呼ぶ。"""
+
+    def __init__(
+        self,
+        socket_path: str | Path,
+        on_event: Callable[[str, str], None],
+        on_disconnect: Callable[[], None] | None = None,
+    ) -> None:
+        super().__init__(name="hyprland-events", daemon=True)
+        self.socket_path = str(socket_path)
+        self.on_event = on_event
+        self.on_disconnect = on_disconnect
+        self._sock: socket.socket | None = None
+        self._stopped = threading.Event()
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            raise HyprlandError(f"Hyprland イベントソケットに接続できません: {e}") from e
+        self._sock = sock
+
+    def run(self) -> None:
+        if self._sock is None:
+            return
+        buffer = b""
+        try:
+            while not self._stopped.is_set():
+                chunk = self._sock.recv(4096)
+                if not chunk:
+                    break
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    name, _, data = line.decode(errors="replace").partition(">>")
+                    self.on_event(name, data)
+        except OSError:
+            pass
+        finally:
+            if not self._stopped.is_set() and self.on_disconnect is not None:
+                self.on_disconnect()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._sock.close()
+
+
+class WindowCache:
+    """アクティブウィンドウ情報をキャッシュし、イベント受信時に無効化する。
+
+    イベントソケットを購読できている間だけキャッシュを使い、それ以外は毎回問い合わせる。
+    """
+
+    def __init__(self, client: HyprlandClient, events_path: str | Path | None = None) -> None:
+        self.client = client
+        self._lock = threading.Lock()
+        self._window: dict | None = None
+        self._generation = 0
+        self._listener: EventListener | None = None
+        self.hits = 0
+        self.misses = 0
+        if events_path is not None:
+            listener = EventListener(events_path, self._on_event, self._on_disconnect)
+            try:
+                listener.connect()
+            except HyprlandError as e:
+                print(f"[警告] {e}（ウィンドウ情報をキャッシュしません）")
+            else:
+                listener.start()
+                self._listener = listener
+
+    @classmethod
+    def from_env(cls) -> WindowCache | None:
+        directory = socket_dir()
+        if directory is None:
+            return None
+        events = directory / ".socket2.sock"
+        return cls(HyprlandClient(directory / ".socket.sock"), events if events.exists() else None)
+
+    @property
+    def caching(self) -> bool:
+        return self._listener is not None
+
+    def _on_event(self, name: str, data: str) -> None:
+        if name in INVALIDATING_EVENTS:
+            self.invalidate()
+
+    def _on_disconnect(self) -> None:
+        with self._lock:
+            self._listener = None
+            self._window = None
+            self._generation += 1
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._window = None
+            self._generation += 1
+
+    def get(self) -> dict | None:
+        with self._lock:
+            if self._window is not None:
+                self.hits += 1
+                return dict(self._window)
+            generation = self._generation
+        self.misses += 1
+        window = self.client.active_window()
+        with self._lock:
+            # 問い合わせ中にイベントが届いていたら古い可能性があるのでキャッシュしない
+            if window is not None and self._listener is not None and generation == self._generation:
+                self._window = window
+        return dict(window) if window is not None else None
+
+    def close(self) -> None:
+        listener = self._listener
+        self._listener = None
+        if listener is not None:
+            listener.stop()
@@ -0,0 +1,129 @@
+"""
+本フォルダごとの撮影ジャーナル。
+
+保存したページ（番号・ファイル名・フィンガープリント・時刻）と撮影セッションの
+開始/終了を JSONL で1行ずつ追記し、書き込みごとに fsync する。途中で中断しても
+``--resume`` で番号の続きから撮影を再開でき、保存済みページは撮り直さない。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, replace
+from datetime import datetime
+from pathlib import Path
+from typing import IO
+
+from scripts.config import IMAGE_EXTS
+from scripts.fingerprint import Fingerprint
+
+
+JOURNAL_NAME = ".capture_journal.jsonl"
+
+
+@dataclass(frozen=True)
+class JournalPage:
+    page: int
+    file: str
+    fingerprint: Fingerprint
+    timestamp: str
+
+
+def journal_path(folder: str | Path) -> Path:
+    return Path(folder) / JOURNAL_NAME
+
+
+def _find_page_file(folder: Path, name: str) -> str | None:
+    """記録されたページのファイル名を返す。再圧縮で拡張子が変わっていれば変更後の名前を返す。"""
+    if (folder / name).exists():
+        return name
+    stem = Path(name).stem
+    for suffix in sorted(IMAGE_EXTS):
+        if (folder / f"{stem}{suffix}").exists():
+            return f"{stem}{suffix}"
+    return None
+
+
+def read_journal(folder: str | Path) -> list[dict]:
+    """ジャーナルのレコードを読み込む。途中で途切れた行は無視する。"""
+    path = journal_path(folder)
+    records: list[dict] = []
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict):
+                    records.append(record)
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def load_pages(folder: str | Path) -> list[JournalPage]:
+    """ジャーナルに記録され、実際にファイルが存在するページを番号順に返す。"""
+    folder = Path(folder)
+    pages: dict[int, JournalPage] = {}
+    for record in read_journal(folder):
+        if record.get("type") != "page":
+            continue
+        try:
+            page = JournalPage(
+                page=int(record["page"]),
+                file=str(record["file"]),
+                fingerprint=Fingerprint.from_dict(record["fingerprint"]),
+                timestamp=str(record.get("ts", "")),
+            )
+        except (KeyError, TypeError, ValueError):
+            continue
+        name = _find_page_file(folder, page.file)
+        if name is not None:
+            pages[page.page] = replace(page, file=name)
+    return [pages[i] for i in sorted(pages)]
+
+
+def load_crop(folder: str | Path) -> dict | None:
+    """最後に記録されたクロップ範囲 (box, frame, scale)。記録が無ければ None。"""
+    for record in reversed(read_journal(folder)):
+        if record.get("type") == "session" and record.get("event") == "crop":
+            return {key: record.get(key) for key in ("box", "frame", "scale")}
+    return None
+
+
+def is_complete(folder: str | Path) -> bool:
+    """最後の撮影セッションが本の終端まで撮り終えて終了したか。"""
+    for record in reversed(read_journal(folder)):
+        if record.get("type") == "session":
+            return bool(record.get("complete"))
+    return False
+
+
+class CaptureJournal:
+    """撮影ジャーナルへの追記を行う。"""
+
+    def __init__(self, folder: str | Path, reset: bool = False) -> None:
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.path = journal_path(self.folder)
+        self._file: IO[str] = open(self.path, "w" if reset else "a", encoding="utf-8")
+
+    def _append(self, record: dict) -> None:
+        record = {**record, "ts": datetime.now().isoformat(timespec="milliseconds")}
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def record_page(self, page: int, file: str, fingerprint: Fingerprint) -> None:
+        self._append({"type": "page", "page": page, "file": file, "fingerprint": fingerprint.to_dict()})
+
+    def record_duplicate(self, iteration: int, duplicate_of: int) -> None:
+        self._append({"type": "duplicate", "iteration": iteration, "duplicate_of": duplicate_of})
+
+    def record_session(self, event: str, **fields: object) -> None:
+        self._append({"type": "session", "event": event, **fields})
+
+    def close(self) -> None:
+        self._file.close()
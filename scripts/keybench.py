@@ -0,0 +1,142 @@
+"""
+キー入力（ページ送り）1回あたりのレイテンシのベンチマーク。
+
+HyprlandBackend.send_key を方式ごとに繰り返し呼び、p50/p95/p99 を比べる。
+
+- ipc:   IPC ソケットへの ``dispatch sendshortcut``（プロセスを起動しない）
+- wtype: 毎回 ``wtype -k <key>`` を起動する従来の方式
+
+デフォルトではローカルの代替 (scripts.fakehypr) を使うため、Hyprland なしで実行でき、
+キー入力は実際には送られない。wtype の代替は何もしないスクリプトなので、wtype の値は
+プロセス起動のコストの下限になる。``--real`` を付けると実際の Hyprland と wtype を使う
+（アクティブウィンドウに実際にキーが送られる）。
+
+使い方:
+  uv run books-key-bench
+  uv run books-key-bench --presses 500 --output key-bench.json
+  uv run books-key-bench --real --key Shift_L --presses 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Sequence
+
+from scripts.backends import KEY_METHODS, HyprlandBackend
+from scripts.fakehypr import FakeHyprland, install_wtype
+from scripts.metrics import summarize
+
+
+METHODS = tuple(m for m in KEY_METHODS if m != "auto")
+
+
+@contextlib.contextmanager
+def fake_environment(work: Path) -> Iterator[FakeHyprland]:
+    """代替の Hyprland ソケットと wtype を使うように環境変数を一時的に書き換える。"""
+    fake = FakeHyprland(work / "hypr" / "bench")
+    install_wtype(work / "bin")
+    saved = {name: os.environ.get(name) for name in ("XDG_RUNTIME_DIR", "HYPRLAND_INSTANCE_SIGNATURE", "PATH")}
+    os.environ["XDG_RUNTIME_DIR"] = str(work)
+    os.environ["HYPRLAND_INSTANCE_SIGNATURE"] = "bench"
+    os.environ["PATH"] = f"{work / 'bin'}{os.pathsep}{saved['PATH'] or ''}"
+    try:
+        yield fake
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        fake.close()
+
+
+def measure(method: str, key: str, presses: int, warmup: int = 3) -> dict:
+    """method でキーを presses 回送り、1回あたりの所要時間を集計する。"""
+    backend = HyprlandBackend(key_method=method)
+    try:
+        if backend.key_method != method:
+            raise RuntimeError(f"{method} でキー入力を送れません（IPC ソケットが見つかりません）")
+        backend.active_window()
+        samples = []
+        for i in range(warmup + presses):
+            start = time.perf_counter()
+            backend.send_key(key)
+            if i >= warmup:
+                samples.append(time.perf_counter() - start)
+    finally:
+        backend.close()
+    if backend.key_method != method:
+        raise RuntimeError(f"{method} でのキー入力が失敗しました")
+    return {"method": method, **summarize(samples)}
+
+
+def run_benchmark(methods: Sequence[str], key: str, presses: int, real: bool = False) -> dict:
+    with tempfile.TemporaryDirectory(prefix="books-key-bench-") as tmp, contextlib.ExitStack() as stack:
+        if not real:
+            stack.enter_context(fake_environment(Path(tmp)))
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            results = [measure(method, key, presses) for method in methods]
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "key": key,
+            "presses": presses,
+            "environment": "real" if real else "fake",
+        },
+        "methods": results,
+    }
+
+
+def print_report(report: dict) -> None:
+    meta = report["meta"]
+    print(f"キー入力 {meta['presses']} 回 ({meta['environment']})")
+    print(f"{'方式':<8} {'平均':>10} {'p50':>10} {'p95':>10} {'p99':>10} {'最大':>10}")
+    for r in report["methods"]:
+        cols = " ".join(f"{r[name] * 1000:>8.3f}ms" for name in ("mean", "p50", "p95", "p99", "max"))
+        print(f"{r['method']:<8} {cols}")
+
+
+def _parse_methods(value: str) -> list[str]:
+    methods = [v.strip() for v in value.split(",") if v.strip()]
+    unknown = [m for m in methods if m not in METHODS]
+    if unknown or not methods:
+        raise argparse.ArgumentTypeError(f"不明な方式: {','.join(unknown)} (選択肢: {','.join(METHODS)})")
+    return methods
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="キー入力1回あたりのレイテンシを方式ごとに計測します。")
+    parser.add_argument("--presses", type=int, default=200, help="方式ごとのキー入力回数 (デフォルト: 200)")
+    parser.add_argument(
+        "--methods", type=_parse_methods, default=list(METHODS), help=f"方式 (カンマ区切り, 選択肢: {','.join(METHODS)})",
+    )
+    parser.add_argument("--key", default="Right", help="送るキー (デフォルト: Right)")
+    parser.add_argument(
+        "--real", action="store_true", help="実際の Hyprland と wtype を使う（アクティブウィンドウにキーが送られます）",
+    )
+    parser.add_argument("--output", help="結果を書き出す JSON ファイル")
+    args = parser.parse_args(argv)
+    if args.presses < 1:
+        parser.error("--presses は1以上で指定してください")
+
+    try:
+        report = run_benchmark(args.methods, args.key, args.presses, real=args.real)
+    except RuntimeError as e:
+        print(f"[エラー] {e}")
+        return 1
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"結果を書き出しました: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
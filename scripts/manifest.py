@@ -0,0 +1,152 @@
+"""
+フォルダごとのアップロード記録（マニフェスト）と差分の算出。
+
+アップロードしたファイルの名前・サイズ・更新時刻・内容のハッシュをフォルダ内の
+``.upload_manifest.json`` に記録し、次回はリモートの一覧と照合して新しいファイルと
+変更されたファイルだけを送る。サイズと更新時刻が記録と同じファイルはハッシュを計算し直さない。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+from scripts.remote import RemoteIndex
+
+
+MANIFEST_NAME = ".upload_manifest.json"
+MANIFEST_VERSION = 1
+
+
+@dataclass(frozen=True)
+class LocalFile:
+    name: str
+    size: int
+    mtime_ns: int
+    sha256: str
+
+
+@dataclass
+class DeltaPlan:
+    upload: list[LocalFile]  # 送るファイル
+    adopt: list[LocalFile]  # 記録は無いがリモートに同じサイズで既にあるファイル（送らずに記録だけする）
+    unchanged: int
+
+    @property
+    def upload_bytes(self) -> int:
+        return sum(f.size for f in self.upload)
+
+
+def file_sha256(path: str | Path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_upload_candidate(name: str) -> bool:
+    """隠しファイル（ジャーナル・マニフェスト等）と書き込み途中の一時ファイルは送らない。"""
+    return not name.startswith(".") and not name.endswith(".tmp")
+
+
+class Manifest:
+    """1フォルダ分のアップロード記録。"""
+
+    def __init__(self, folder: str | Path, remote_folder: str, files: dict[str, dict] | None = None) -> None:
+        self.folder = Path(folder)
+        self.remote_folder = remote_folder
+        self.files: dict[str, dict] = files or {}
+
+    @property
+    def path(self) -> Path:
+        return self.folder / MANIFEST_NAME
+
+    @classmethod
+    def load(cls, folder: str | Path, remote_folder: str) -> Manifest:
+        """記録を読み込む。記録が無い・壊れている・アップロード先が違う場合は空の記録を返す。"""
+        path = Path(folder) / MANIFEST_NAME
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return cls(folder, remote_folder)
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION or data.get("dest") != remote_folder:
+            return cls(folder, remote_folder)
+        files = data.get("files")
+        return cls(folder, remote_folder, files if isinstance(files, dict) else {})
+
+    def save(self) -> None:
+        data = {"version": MANIFEST_VERSION, "dest": self.remote_folder, "files": self.files}
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def is_current(self) -> bool:
+        """フォルダ直下のアップロード対象ファイルがすべて、記録と同じサイズ・更新時刻で記録されているか。"""
+        if not self.files:
+            return False
+        try:
+            with os.scandir(self.folder) as it:
+                for entry in it:
+                    if not entry.is_file() or not is_upload_candidate(entry.name):
+                        continue
+                    st = entry.stat()
+                    known = self.files.get(entry.name)
+                    if not known or known.get("size") != st.st_size or known.get("mtime_ns") != st.st_mtime_ns:
+                        return False
+        except OSError:
+            return False
+        return True
+
+    def scan(self) -> list[LocalFile]:
+        """フォルダ直下のアップロード対象ファイルを名前順に返す（未変更のファイルは記録のハッシュを使う）。"""
+        local: list[LocalFile] = []
+        with os.scandir(self.folder) as it:
+            entries = sorted((e for e in it if e.is_file() and is_upload_candidate(e.name)), key=lambda e: e.name)
+        for entry in entries:
+            st = entry.stat()
+            known = self.files.get(entry.name)
+            if known and known.get("size") == st.st_size and known.get("mtime_ns") == st.st_mtime_ns:
+                sha256 = str(known["sha256"])
+            else:
+                sha256 = file_sha256(entry.path)
+            local.append(LocalFile(entry.name, st.st_size, st.st_mtime_ns, sha256))
+        return local
+
+    def plan(self, local: list[LocalFile], remote: RemoteIndex | None = None) -> DeltaPlan:
+        """送る必要のあるファイルを求める。
+
+        記録に無い・内容が変わったファイルに加え、remote を渡した場合はリモートに無いか
+        サイズが違うファイルも送る。記録が無くてもリモートに同じサイズで存在するファイルは、
+        以前にフォルダごとアップロードしたものとみなして送らない。
+        """
+        plan = DeltaPlan([], [], 0)
+        for f in local:
+            remote_size: int | None = None
+            on_remote = False
+            if remote is not None:
+                remote_path = f"{self.remote_folder.rstrip('/')}/{f.name}"
+                on_remote = remote.exists(remote_path)
+                remote_size = remote.size(remote_path)
+            known = self.files.get(f.name)
+            if known is None:
+                if on_remote and remote_size == f.size:
+                    plan.adopt.append(f)
+                else:
+                    plan.upload.append(f)
+            elif known.get("sha256") != f.sha256:
+                plan.upload.append(f)
+            elif remote is not None and (not on_remote or remote_size not in (None, f.size)):
+                plan.upload.append(f)
+            else:
+                plan.unchanged += 1
+        return plan
+
+    def mark_uploaded(self, files: list[LocalFile]) -> None:
+        now = datetime.now().isoformat(timespec="seconds")
+        for f in files:
+            self.files[f.name] = {"size": f.size, "mtime_ns": f.mtime_ns, "sha256": f.sha256, "uploaded_at": now}
@@ -0,0 +1,222 @@
+"""
+MEGAcmd の対話シェル (mega-cmd) を1つ起動したままコマンドを送るセッション。
+
+mega-whoami や mega-ls などはコマンドごとにプロセスを起動し、MEGAcmd サーバーに接続し直す。
+このセッションはシェルを起動したままにし、標準入力にコマンドを1行ずつ書き込む。
+シェルには終了コードが無いため、コマンドの後に ``echo <番号付きの目印>`` を送り、目印の行までを
+そのコマンドの出力とする。``[err`` / ``[API:err`` で始まる行があれば失敗とみなす。
+
+コマンドがタイムアウトした場合やシェルが終了した場合はシェルを閉じ、次のコマンドで起動し直す
+（起動し直せる回数には上限がある）。
+
+制限: 本物の mega-cmd がパイプ越しに ``echo`` を実行し、1行ずつ応答を返すかは確かめていない
+（テストは fakemega の mega-cmd に対してのみ行っている）。そのため起動時に目印だけを送って確かめ、
+目印の行が返らない・未対応のコマンドと言われた・入力がそのまま表示されるだけの場合はシェルを使わず、
+呼び出し側はコマンドごとにプロセスを起動する実行に戻る。また、目印の後に非同期に出力された行は
+次のコマンドの出力に混ざることがある。
+"""
+
+from __future__ import annotations
+
+import queue
+import re
+import subprocess
+import threading
+import time
+import uuid
+from typing import Sequence
+
+
+SHELL_COMMAND = "mega-cmd"
+DEFAULT_START_TIMEOUT = 15.0
+DEFAULT_MAX_RESTARTS = 3
+ERROR_RE = re.compile(r"^\[(?:API:)?err\b", re.IGNORECASE)
+# 標準入力が端末でない場合もシェルはプロンプトを出すので、行頭のプロンプトは取り除く
+PROMPT_RE = re.compile(r"^(?:MEGA CMD> |\S*:/\S*\$ )+")
+UNSUPPORTED_RE = re.compile(r"command not found|unknown command|invalid command", re.IGNORECASE)
+SAFE_ARG_RE = re.compile(r"^[\w@%+=:,./~-]+$")
+
+
+class MegaShellError(RuntimeError):
+    pass
+
+
+def quote_arg(arg: str) -> str | None:
+    """シェルに渡す引数をクォートする。安全にクォートできない引数は None。"""
+    if "\n" in arg or "\r" in arg:
+        return None
+    if arg and SAFE_ARG_RE.match(arg):
+        return arg
+    if '"' not in arg:
+        return f'"{arg}"'
+    if "'" not in arg:
+        return f"'{arg}'"
+    return None
+
+
+def strip_prompt(line: str) -> str:
+    return PROMPT_RE.sub("", line)
+
+
+class MegaShell:
+    """起動したままの mega-cmd にコマンドを送る。コマンドは1つずつ順に実行する。"""
+
+    def __init__(
+        self,
+        shell_path: str,
+        start_timeout: float = DEFAULT_START_TIMEOUT,
+        max_restarts: int = DEFAULT_MAX_RESTARTS,
+    ) -> None:
+        self.shell_path = shell_path
+        self.start_timeout = start_timeout
+        self.max_restarts = max_restarts
+        self.logged_in: bool | None = None  # is_logged_in の結果（セッション中はキャッシュする）
+        self.commands = 0
+        self.restarts = 0
+        self._lock = threading.Lock()
+        self._proc: subprocess.Popen[str] | None = None
+        self._lines: queue.Queue[str | None] = queue.Queue()
+        self._token = uuid.uuid4().hex[:8]
+        self._serial = 0
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def start(self) -> None:
+        """シェルを起動し、目印が返ってくることを確かめる。"""
+        try:
+            self._proc = subprocess.Popen(
+                [self.shell_path],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+                bufsize=1,
+            )
+        except OSError as e:
+            raise MegaShellError(f"MEGAcmd シェルを起動できません: {e}") from e
+        self._lines = queue.Queue()
+        threading.Thread(target=self._read, args=(self._proc, self._lines), name="megacmd-shell", daemon=True).start()
+        try:
+            self._exchange(None, self.start_timeout, handshake=True)
+        except (MegaShellError, subprocess.TimeoutExpired) as e:
+            self._kill()
+            raise MegaShellError(f"MEGAcmd シェルが応答しません: {e}") from e
+
+    @staticmethod
+    def _read(proc: subprocess.Popen[str], lines: queue.Queue[str | None]) -> None:
+        assert proc.stdout is not None
+        for line in proc.stdout:
+            lines.put(line.rstrip("\r\n"))
+        lines.put(None)
+
+    def _exchange(self, command: str | None, timeout: float, handshake: bool = False) -> list[str]:
+        """コマンドと目印を送り、目印の行までの出力を返す。"""
+        assert self._proc is not None and self._proc.stdin is not None
+        self._serial += 1
+        marker = f"__books_{self._token}_{self._serial}__"
+        try:
+            self._proc.stdin.write(f"{command}\necho {marker}\n" if command else f"echo {marker}\n")
+            self._proc.stdin.flush()
+        except OSError as e:
+            raise MegaShellError(f"MEGAcmd シェルに書き込めません: {e}") from e
+        deadline = time.monotonic() + timeout
+        output: list[str] = []
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                line = self._lines.get(timeout=max(0.0, remaining))
+            except queue.Empty:
+                raise subprocess.TimeoutExpired([self.shell_path, command or "echo"], timeout) from None
+            if line is None:
+                raise MegaShellError("MEGAcmd シェルが終了しました")
+            line = strip_prompt(line)
+            if line.strip() == command or line.rstrip().endswith(f"echo {marker}"):
+                continue  # 入力をそのまま表示するシェルの場合（知らないプロンプトが前に付くこともある）
+            if marker in line:
+                head = line.split(marker, 1)[0].strip()
+                if head:
+                    output.append(head)
+                return output
+            if handshake and UNSUPPORTED_RE.search(line):
+                raise MegaShellError(line.strip())
+            output.append(line)
+
+    def run(self, command: str, args: Sequence[str] = (), timeout_sec: float = 60) -> subprocess.CompletedProcess[str]:
+        """コマンドを実行して完了を待つ。出力は subprocess.run と同じ形で返す。
+
+        タイムアウトしたらシェルを閉じて subprocess.TimeoutExpired を送出する。
+        """
+        with self._lock:
+            return self._run_locked(command, args, timeout_sec)
+
+    def try_run(
+        self, command: str, args: Sequence[str] = (), timeout_sec: float = 60,
+    ) -> subprocess.CompletedProcess[str] | None:
+        """シェルが空いていれば実行する。実行中のコマンドがある・シェルを使えない・引数を渡せない場合は None。"""
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            if any(quote_arg(a) is None for a in args):
+                return None
+            if not self.alive:
+                if self._proc is None or self.restarts >= self.max_restarts:
+                    return None
+                self.restarts += 1
+                try:
+                    self.start()
+                except MegaShellError as e:
+                    print(f"[警告] {e}（プロセスごとの実行に戻します）")
+                    self._proc = None
+                    return None
+            return self._run_locked(command, args, timeout_sec)
+        finally:
+            self._lock.release()
+
+    def _run_locked(self, command: str, args: Sequence[str], timeout_sec: float) -> subprocess.CompletedProcess[str]:
+        quoted = [quote_arg(a) for a in args]
+        if any(q is None for q in quoted):
+            raise ValueError(f"MEGAcmd シェルに渡せない引数があります: {list(args)}")
+        if not self.alive:
+            raise MegaShellError("MEGAcmd シェルが起動していません")
+        line = " ".join([command, *(q for q in quoted if q is not None)])
+        try:
+            output = self._exchange(line, timeout_sec)
+        except subprocess.TimeoutExpired:
+            self._kill()
+            raise
+        except MegaShellError as e:
+            # コマンドが実行されたかわからないため、失敗として返す（送り直しは呼び出し側に任せる）
+            self._kill()
+            return subprocess.CompletedProcess([command, *args], 1, "", f"[err] {e}")
+        finally:
+            self.commands += 1
+        errors = [l for l in output if ERROR_RE.match(l.strip())]
+        stdout = "\n".join(l for l in output if not ERROR_RE.match(l.strip()))
+        return subprocess.CompletedProcess(
+            [command, *args], 1 if errors else 0, stdout + "\n" if stdout else "", "\n".join(errors),
+        )
+
+    def _kill(self) -> None:
+        proc = self._proc
+        if proc is not None and proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+    def close(self) -> None:
+        proc = self._proc
+        if proc is None:
+            return
+        if proc.poll() is None:
+            try:
+                assert proc.stdin is not None
+                proc.stdin.write("exit\n")
+                proc.stdin.close()
+                proc.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                proc.kill()
+                proc.wait()
+        self._proc = None
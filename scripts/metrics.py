@@ -0,0 +1,77 @@
+"""撮影ループの段階ごとの所要時間計測と集計。"""
+
+from __future__ import annotations
+
+import math
+import time
+from collections import defaultdict
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from typing import Iterator
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """線形補間で百分位数を返す（values が空なら 0.0）。"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * pct / 100.0
+    lower = math.floor(pos)
+    upper = math.ceil(pos)
+    if lower == upper:
+        return ordered[lower]
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (pos - lower)
+
+
+def summarize(values: list[float]) -> dict[str, float]:
+    """件数・合計・平均・p50/p95/p99・最大値をまとめる。"""
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "total": sum(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values),
+    }
+
+
+class StageTimer:
+    """段階名ごとに所要時間（秒）を記録する。"""
+
+    enabled = True
+
+    def __init__(self) -> None:
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.current: dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.samples[name].append(elapsed)
+            self.current[name] = self.current.get(name, 0.0) + elapsed
+
+    def take_current(self) -> dict[str, float]:
+        """前回呼び出し以降に記録した段階ごとの合計時間を返してリセットする。"""
+        current, self.current = self.current, {}
+        return current
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        return {name: summarize(values) for name, values in self.samples.items()}
+
+
+class NullStageTimer(StageTimer):
+    """計測しないタイマー（無効時のコストをほぼゼロにする）。"""
+
+    enabled = False
+
+    def stage(self, name: str) -> AbstractContextManager[None]:  # type: ignore[override]
+        return nullcontext()
+
+
+NULL_TIMER = NullStageTimer()
@@ -0,0 +1,423 @@
+"""
+撮影済みフォルダの画像を可逆で再圧縮するツール。
+
+grim が書き出す PNG は圧縮が弱く、MEGA の容量とアップロード時間の大半を占める。
+フォルダ内の画像をプロセスプールで並列に再エンコードし（可逆 WebP または最適化 PNG）、
+デコード結果が元画像と画素単位で一致し、かつ小さくなった場合だけ原子的に置き換える。
+
+``--reduce`` を付けると、ヒストグラムからページを文字のみ/挿絵ありに分類し、文字のみのページを
+少色パレットまたはグレースケールに減色してから圧縮する。減色後の最大画素誤差が
+``--max-error`` を超えるページと挿絵のあるページは元の色のまま扱う。
+
+使い方:
+  uv run books-optimize permutation_city
+  uv run books-optimize permutation_city --format png --workers 4
+  uv run books-optimize contents/permutation_city --dry-run
+  uv run books-optimize permutation_city diaspora --reduce --max-error 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Sequence
+
+from PIL import Image, ImageChops
+
+from scripts.config import CONTENTS_DIR, IMAGE_EXTS
+from scripts.upload import human_bytes
+
+
+FORMATS = {"webp": ".webp", "png": ".png"}
+DEFAULT_FORMAT = "webp"
+DEFAULT_METHOD = 4
+
+SATURATION_MIN = 64  # これ以上の彩度を「色がある」とみなす（セピアの紙は 30 前後）
+TONE_TOLERANCE = 24  # 紙・インクの明るさからこの範囲内は中間調に数えない
+
+
+@dataclass(frozen=True)
+class ReduceOptions:
+    max_error: int = 8
+    colors: int = 16
+    max_colorful: float = 0.01
+    max_midtones: float = 0.25
+
+
+@dataclass(frozen=True)
+class PageClass:
+    kind: str  # text / illustrated
+    colorful: float  # 彩度の高い画素の割合
+    midtones: float  # 紙とインクの中間の明るさの画素の割合
+
+
+@dataclass(frozen=True)
+class FileResult:
+    source: str
+    output: str
+    bytes_before: int
+    bytes_after: int
+    status: str  # replaced / kept / mismatch / skipped / error
+    error: str | None = None
+    page_kind: str | None = None  # --reduce 時の分類: text / illustrated
+    reduced: str | None = None  # 減色した場合: palette / gray
+    max_error: int = 0
+
+
+@dataclass
+class OptimizeSummary:
+    folder: str
+    format: str
+    results: list[FileResult] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def count(self, status: str) -> int:
+        return sum(1 for r in self.results if r.status == status)
+
+    def reduced(self, kind: str | None = None) -> int:
+        """減色して置き換えたページ数（kind 指定時はその方式のみ）。"""
+        return sum(
+            1 for r in self.results
+            if r.status == "replaced" and r.reduced is not None and (kind is None or r.reduced == kind)
+        )
+
+    @property
+    def bytes_before(self) -> int:
+        return sum(r.bytes_before for r in self.results)
+
+    @property
+    def bytes_after(self) -> int:
+        return sum(r.bytes_after for r in self.results)
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+
+def find_images(folder: str | Path) -> list[Path]:
+    """フォルダ直下の画像ファイルを名前順に返す（隠しファイルは除く）。"""
+    folder = Path(folder)
+    return sorted(
+        p for p in folder.iterdir()
+        if p.is_file() and not p.name.startswith(".") and p.suffix.lower() in IMAGE_EXTS
+    )
+
+
+def encode_image(image: Image.Image, fmt: str, method: int = DEFAULT_METHOD) -> bytes:
+    """画像を可逆圧縮でエンコードしたバイト列を返す。"""
+    buf = io.BytesIO()
+    if fmt == "webp":
+        # exact=True で透明部分の RGB も保持し、デコード結果を元画像と一致させる
+        image.save(buf, format="WEBP", lossless=True, quality=100, method=method, exact=True)
+    elif fmt == "png":
+        image.save(buf, format="PNG", optimize=True)
+    else:
+        raise ValueError(f"未対応の形式です: {fmt}")
+    return buf.getvalue()
+
+
+def _comparable(image: Image.Image, with_alpha: bool) -> Image.Image:
+    mode = "RGBA" if with_alpha else "RGB"
+    return image if image.mode == mode else image.convert(mode)
+
+
+def _has_alpha(image: Image.Image) -> bool:
+    return image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+
+
+def pixels_identical(a: Image.Image, b: Image.Image) -> bool:
+    """2枚の画像の画素が完全に一致するか（モードの違いは RGB/RGBA に揃えて比較）。"""
+    if a.size != b.size:
+        return False
+    if a.mode == b.mode:
+        return a.tobytes() == b.tobytes()
+    with_alpha = _has_alpha(a) or _has_alpha(b)
+    return _comparable(a, with_alpha).tobytes() == _comparable(b, with_alpha).tobytes()
+
+
+def _opaque_rgb(image: Image.Image) -> Image.Image | None:
+    """完全不透明なら RGB に揃えて返す。透明部分がある画像は減色の対象外として None。"""
+    if _has_alpha(image):
+        rgba = image.convert("RGBA")
+        if rgba.getchannel("A").getextrema() != (255, 255):
+            return None
+        return rgba.convert("RGB")
+    return image if image.mode == "RGB" else image.convert("RGB")
+
+
+def classify_page(image: Image.Image, options: ReduceOptions = ReduceOptions()) -> PageClass:
+    """彩度と明るさのヒストグラムから、文字のみのページか挿絵のあるページかを判定する。"""
+    rgb = image if image.mode == "RGB" else image.convert("RGB")
+    total = rgb.width * rgb.height
+    saturation = rgb.convert("HSV").getchannel("S").histogram()
+    colorful = sum(saturation[SATURATION_MIN:]) / total
+
+    luma = rgb.convert("L").histogram()
+    paper = max(range(256), key=luma.__getitem__)
+    # インクは紙と反対側の端にある明るさ（下位/上位 1% 点）とする
+    cutoff = total // 100
+    levels = range(256) if paper >= 128 else range(255, -1, -1)
+    seen = 0
+    ink = paper
+    for level in levels:
+        seen += luma[level]
+        if seen > cutoff:
+            ink = level
+            break
+    low, high = sorted((ink, paper))
+    midtones = sum(luma[low + TONE_TOLERANCE + 1:max(low + TONE_TOLERANCE + 1, high - TONE_TOLERANCE)]) / total
+
+    text = colorful <= options.max_colorful and midtones <= options.max_midtones
+    return PageClass("text" if text else "illustrated", colorful, midtones)
+
+
+def max_pixel_error(original: Image.Image, reduced: Image.Image) -> int:
+    """RGB 各チャンネルの差の最大値。"""
+    diff = ImageChops.difference(original, reduced.convert("RGB"))
+    return max(high for _, high in diff.getextrema())
+
+
+def reduce_colors(image: Image.Image, options: ReduceOptions = ReduceOptions()) -> tuple[Image.Image, str, int] | None:
+    """少色パレット、だめならグレースケールに減色する。最大画素誤差の上限を超える場合は None。"""
+    candidates = (
+        ("palette", lambda: image.quantize(options.colors, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)),
+        ("gray", lambda: image.convert("L")),
+    )
+    for kind, convert in candidates:
+        reduced = convert()
+        error = max_pixel_error(image, reduced)
+        if error <= options.max_error:
+            return reduced, kind, error
+    return None
+
+
+def _write_atomic(data: bytes, target: Path) -> None:
+    tmp_path = target.with_name(f".{target.name}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, target)
+    except BaseException:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+
+
+def optimize_file(
+    path: str | Path,
+    fmt: str = DEFAULT_FORMAT,
+    method: int = DEFAULT_METHOD,
+    dry_run: bool = False,
+    reduce: ReduceOptions | None = None,
+) -> FileResult:
+    """1ファイルを再圧縮し、画素が一致して小さくなった場合だけ置き換える。
+
+    reduce を指定すると文字のみのページを減色してから圧縮する（一致判定は減色後の画像と行う）。
+    """
+    source = Path(path)
+    target = source.with_suffix(FORMATS[fmt])
+    before = source.stat().st_size
+    page_kind: str | None = None
+    reduced: str | None = None
+    error_max = 0
+
+    def result(status: str, after: int = before, error: str | None = None) -> FileResult:
+        output = target if status == "replaced" else source
+        return FileResult(str(source), str(output), before, after, status, error, page_kind, reduced, error_max)
+
+    if target != source and target.exists():
+        return result("skipped", error=f"{target.name} が既に存在します")
+    try:
+        with Image.open(source) as image:
+            image.load()
+            expected = image
+            rgb = _opaque_rgb(image) if reduce is not None else None
+            if rgb is not None:
+                page_kind = classify_page(rgb, reduce).kind
+                if page_kind == "text":
+                    reduction = reduce_colors(rgb, reduce)
+                    if reduction is not None:
+                        expected, reduced, error_max = reduction
+            data = encode_image(expected, fmt, method)
+            with Image.open(io.BytesIO(data)) as decoded:
+                decoded.load()
+                if not pixels_identical(expected, decoded):
+                    return result("mismatch")
+        if len(data) >= before:
+            reduced, error_max = None, 0
+            return result("kept")
+        if not dry_run:
+            _write_atomic(data, target)
+            if target != source:
+                source.unlink()
+    except (OSError, ValueError) as e:
+        return result("error", error=str(e))
+    return result("replaced", after=len(data))
+
+
+def optimize_folders(
+    folders: Sequence[str | Path],
+    fmt: str = DEFAULT_FORMAT,
+    workers: int | None = None,
+    method: int = DEFAULT_METHOD,
+    dry_run: bool = False,
+    on_result: Callable[[FileResult], None] | None = None,
+    reduce: ReduceOptions | None = None,
+) -> list[OptimizeSummary]:
+    """複数フォルダの画像を1つのプロセスプールで並列に再圧縮する。
+
+    各フォルダの elapsed は開始からそのフォルダの最後のファイルが終わるまでの時間。
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"未対応の形式です: {fmt}")
+    summaries = [OptimizeSummary(folder=str(folder), format=fmt) for folder in folders]
+    jobs = [(summary, path) for summary, folder in zip(summaries, folders) for path in find_images(folder)]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+    start = time.perf_counter()
+
+    def finish(summary: OptimizeSummary, result: FileResult) -> None:
+        summary.results.append(result)
+        summary.elapsed = time.perf_counter() - start
+        if on_result is not None:
+            on_result(result)
+
+    if workers == 1:
+        for summary, path in jobs:
+            finish(summary, optimize_file(path, fmt, method, dry_run, reduce))
+    else:
+        # 撮影中のスレッドを抱えたまま fork しないよう spawn で起動する
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            futures = {
+                pool.submit(optimize_file, path, fmt, method, dry_run, reduce): summary for summary, path in jobs
+            }
+            for future in as_completed(futures):
+                finish(futures[future], future.result())
+        for summary in summaries:
+            summary.results.sort(key=lambda r: r.source)
+    return summaries
+
+
+def optimize_folder(
+    folder: str | Path,
+    fmt: str = DEFAULT_FORMAT,
+    workers: int | None = None,
+    method: int = DEFAULT_METHOD,
+    dry_run: bool = False,
+    on_result: Callable[[FileResult], None] | None = None,
+    reduce: ReduceOptions | None = None,
+) -> OptimizeSummary:
+    """フォルダ内の画像をプロセスプールで並列に再圧縮する。"""
+    return optimize_folders([folder], fmt, workers, method, dry_run, on_result, reduce)[0]
+
+
+def print_summary(summary: OptimizeSummary) -> None:
+    total = len(summary.results)
+    print(f"\n再圧縮 ({summary.format}) {Path(summary.folder).name}: {total} ファイル")
+    print(
+        f"  置き換え: {summary.count('replaced')}, 変更なし: {summary.count('kept')}, "
+        f"不一致: {summary.count('mismatch')}, スキップ: {summary.count('skipped')}, "
+        f"エラー: {summary.count('error')}"
+    )
+    before = summary.bytes_before
+    if before > 0:
+        saved = summary.bytes_saved
+        print(
+            f"  サイズ: {human_bytes(before)} → {human_bytes(summary.bytes_after)} "
+            f"({human_bytes(saved)} 削減, {saved / before:.1%})"
+        )
+    if summary.elapsed > 0:
+        print(
+            f"  所要時間: {summary.elapsed:.1f}秒 "
+            f"({total / summary.elapsed:.1f} ファイル/秒, {before / summary.elapsed / (1024 * 1024):.1f}MB/秒)"
+        )
+    classified = [r for r in summary.results if r.page_kind is not None]
+    if classified:
+        text_pages = sum(1 for r in classified if r.page_kind == "text")
+        worst = max((r.max_error for r in summary.results if r.reduced), default=0)
+        print(
+            f"  減色: {summary.reduced()} / 文字ページ {text_pages} "
+            f"(パレット {summary.reduced('palette')}, グレースケール {summary.reduced('gray')}, "
+            f"最大誤差 {worst}), 挿絵ページ {len(classified) - text_pages}"
+        )
+    for r in summary.results:
+        if r.status in ("mismatch", "error", "skipped"):
+            detail = f": {r.error}" if r.error else ""
+            print(f"  [{r.status}] {Path(r.source).name}{detail}")
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="撮影済みフォルダの画像を可逆で再圧縮します。")
+    parser.add_argument("folders", nargs="+", metavar="folder", help="対象フォルダ名 (contents/ 内) またはパス")
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default=DEFAULT_FORMAT,
+        help="出力形式: webp=可逆WebP, png=最適化PNG（デフォルト: webp）",
+    )
+    parser.add_argument("--workers", type=int, help="並列プロセス数（デフォルト: CPU数）")
+    parser.add_argument(
+        "--method",
+        type=int,
+        default=DEFAULT_METHOD,
+        help=f"WebP の圧縮努力 0〜6。大きいほど小さく遅い（デフォルト: {DEFAULT_METHOD}）",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="置き換えずに削減量だけ表示する")
+    parser.add_argument(
+        "--reduce",
+        action="store_true",
+        help="文字のみのページを少色パレット/グレースケールに減色してから圧縮する（挿絵のあるページはそのまま）",
+    )
+    parser.add_argument(
+        "--max-error",
+        type=int,
+        default=ReduceOptions.max_error,
+        help=f"減色で許す画素値の最大誤差 0〜255（デフォルト: {ReduceOptions.max_error}）",
+    )
+    parser.add_argument(
+        "--colors",
+        type=int,
+        default=ReduceOptions.colors,
+        help=f"減色時のパレット色数 2〜256（デフォルト: {ReduceOptions.colors}）",
+    )
+    args = parser.parse_args(argv)
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers は1以上で指定してください")
+    if not 0 <= args.method <= 6:
+        parser.error("--method は 0〜6 で指定してください")
+    if not 0 <= args.max_error <= 255:
+        parser.error("--max-error は 0〜255 で指定してください")
+    if not 2 <= args.colors <= 256:
+        parser.error("--colors は 2〜256 で指定してください")
+    reduce = ReduceOptions(max_error=args.max_error, colors=args.colors) if args.reduce else None
+
+    folders: list[Path] = []
+    for name in args.folders:
+        folder = Path(name).expanduser()
+        if not folder.is_absolute() and not folder.exists():
+            folder = CONTENTS_DIR / name
+        if not folder.is_dir():
+            print(f"[エラー] フォルダが見つかりません: {folder}")
+            return 2
+        folders.append(folder)
+
+    summaries = optimize_folders(
+        folders, args.format, workers=args.workers, method=args.method, dry_run=args.dry_run, reduce=reduce,
+    )
+    for summary in summaries:
+        print_summary(summary)
+    if args.dry_run:
+        print("\n[dry-run] ファイルは置き換えていません")
+    return 1 if any(summary.count("error") for summary in summaries) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
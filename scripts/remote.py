@@ -0,0 +1,141 @@
+"""
+MEGA 上のアップロード先の一覧 (mega-ls -l) の解析と索引。
+
+アップロード先を1回だけ一覧取得し、フォルダやファイルの有無・サイズの問い合わせに
+メモリ上の索引で答える。一覧は短時間だけディスクにキャッシュでき、続けて実行する場合の
+問い合わせを省ける。
+
+mega-ls -l の出力例（-r の場合はフォルダごとに "パス:" の見出しが付く）:
+
+    FLAGS VERS   SIZE            DATE       NAME
+    d---    -       -  15Jan2024 10:00:00 permutation_city
+    -ep-    1  123456  15Jan2024 10:00:00 cover.png
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+
+ENTRY_RE = re.compile(
+    r"^(?P<flags>[d-][\w-]{3})\s+(?P<vers>\S+)\s+(?P<size>\S+)\s+"
+    r"(?P<date>\d{1,2}[A-Za-z]{3}\d{4}\s+\d{2}:\d{2}:\d{2}|\S+)\s+(?P<name>.+)$"
+)
+HEADER_RE = re.compile(r"^(?P<path>/.*):$")
+
+
+@dataclass(frozen=True)
+class RemoteEntry:
+    path: str
+    is_dir: bool
+    size: int | None
+    modified: str
+
+
+def _normalize(path: str) -> str:
+    return "/" + path.strip().strip("/")
+
+
+def _join(parent: str, name: str) -> str:
+    return f"{parent.rstrip('/')}/{name}"
+
+
+def parse_listing(output: str, root: str) -> list[RemoteEntry]:
+    """mega-ls -l (-r) の出力を解析する。見出しが無い行は root 直下のエントリとみなす。"""
+    parent = _normalize(root)
+    entries: list[RemoteEntry] = []
+    for raw in output.splitlines():
+        line = raw.rstrip()
+        if not line or line.lstrip().startswith("FLAGS"):
+            continue
+        header = HEADER_RE.match(line)
+        if header:
+            parent = _normalize(header.group("path"))
+            continue
+        m = ENTRY_RE.match(line.strip())
+        if not m:
+            continue
+        is_dir = m.group("flags").startswith("d")
+        size_text = m.group("size")
+        size = int(size_text) if size_text.isdigit() else None
+        entries.append(RemoteEntry(_join(parent, m.group("name")), is_dir, size, m.group("date")))
+    return entries
+
+
+class RemoteIndex:
+    """アップロード先の一覧から作ったパスの索引。"""
+
+    def __init__(self, root: str, entries: list[RemoteEntry], recursive: bool = False, fetched_at: float = 0.0):
+        self.root = _normalize(root)
+        self.recursive = recursive
+        self.fetched_at = fetched_at or time.time()
+        self.entries: dict[str, RemoteEntry] = {entry.path: entry for entry in entries}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def exists(self, path: str) -> bool:
+        path = _normalize(path)
+        return path == self.root or path in self.entries
+
+    def size(self, path: str) -> int | None:
+        entry = self.entries.get(_normalize(path))
+        return entry.size if entry is not None else None
+
+    def children(self, path: str) -> list[RemoteEntry]:
+        prefix = _normalize(path).rstrip("/") + "/"
+        return [e for p, e in self.entries.items() if p.startswith(prefix) and "/" not in p[len(prefix):]]
+
+    def files_under(self, path: str) -> list[RemoteEntry]:
+        """path 以下の全ファイル（recursive で取得した場合のみ完全）。"""
+        prefix = _normalize(path).rstrip("/") + "/"
+        return [e for p, e in self.entries.items() if p.startswith(prefix) and not e.is_dir]
+
+    def to_dict(self) -> dict:
+        return {
+            "root": self.root,
+            "recursive": self.recursive,
+            "fetched_at": self.fetched_at,
+            "entries": [asdict(e) for e in self.entries.values()],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> RemoteIndex:
+        entries = [RemoteEntry(**e) for e in data["entries"]]
+        return cls(data["root"], entries, bool(data.get("recursive")), float(data["fetched_at"]))
+
+
+def cache_path(cache_dir: str | Path, root: str, recursive: bool) -> Path:
+    key = hashlib.sha1(f"{_normalize(root)}|{int(recursive)}".encode()).hexdigest()[:16]
+    return Path(cache_dir) / f"mega_ls_{key}.json"
+
+
+def load_cached(cache_dir: str | Path, root: str, recursive: bool, ttl: float) -> RemoteIndex | None:
+    """ttl 秒以内に保存したキャッシュがあれば返す。"""
+    path = cache_path(cache_dir, root, recursive)
+    try:
+        index = RemoteIndex.from_dict(json.loads(path.read_text(encoding="utf-8")))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if time.time() - index.fetched_at > ttl:
+        return None
+    return index
+
+
+def save_cached(cache_dir: str | Path, index: RemoteIndex) -> None:
+    path = cache_path(cache_dir, index.root, index.recursive)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(index.to_dict(), ensure_ascii=False), encoding="utf-8")
+    tmp_path.replace(path)
+
+
+def invalidate_cached(cache_dir: str | Path, root: str) -> None:
+    """アップロードで内容が変わった一覧のキャッシュを削除する。"""
+    for recursive in (False, True):
+        cache_path(cache_dir, root, recursive).unlink(missing_ok=True)
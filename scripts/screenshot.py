@@ -2,29 +2,62 @@
 矢印キー入力でページを進め、Hyprland上のアクティブウィンドウのスクリーンショットを保存するプログラム。
 前回と同じスクリーンショットになったら自動終了。
 
-必要な外部コマンド: hyprctl, grim, wtype
+必要な外部コマンド: hyprctl, grim, wtype（--backend virtual の場合は不要。wtype は --key-method ipc なら不要）
 使用法: uv run python -m scripts.screenshot
 """
 
 from __future__ import annotations
 
 import argparse
-import json
 import os
 import re
-import subprocess
 import sys
 import threading
 import time
-from dataclasses import dataclass
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
+from datetime import datetime
 from pathlib import Path
-from typing import Sequence
+from typing import Callable, Sequence
 
-from PIL import Image, ImageChops, ImageStat
+from PIL import Image
 
-from scripts.config import CONTENTS_DIR
+from scripts.autocrop import AutoCropper
+from scripts.backends import (
+    BACKENDS,
+    END_BEHAVIOURS,
+    KEY_METHODS,
+    LAYOUTS,
+    CaptureBackend,
+    HyprlandBackend,
+    VirtualBookBackend,
+)
+from scripts.batch import (
+    DEFAULT_FOCUS_TIMEOUT,
+    DEFAULT_JOB_DELAY,
+    BatchJob,
+    BatchResults,
+    JobFileError,
+    JobResult,
+    default_results_path,
+    focus_job_window,
+    load_jobs,
+    print_batch_summary,
+)
+from scripts.bookindex import BookIndex
+from scripts.config import CONTENTS_DIR, MEGA_REMOTE_DEST
+from scripts.fingerprint import METRICS, FrameComparator, Fingerprint, compute_fingerprint
+from scripts.journal import CaptureJournal, JournalPage, is_complete, journal_path, load_crop, load_pages
+from scripts.metrics import NULL_TIMER, StageTimer
+from scripts.optimize import FORMATS, optimize_folder, print_summary
+from scripts.settle import SettleTracker, wait_for_settle
+from scripts.stream import DEFAULT_BATCH_BYTES, DEFAULT_BATCH_FILES, StreamUploader, print_stream_summary
+from scripts.trace import TraceWriter
+from scripts.upload import ensure_login, find_megacmd_command
 
 
+PREVIEW_SCALE = 0.25
+
 ACTION_CHOICES = {
     1: {"key": "Left", "description": "左矢印キー"},
     2: {"key": "Right", "description": "右矢印キー"},
@@ -37,19 +70,79 @@ class CaptureConfig:
     save_dir: str
 
 
-def _check_commands() -> None:
-    """必要な外部コマンドが存在するか確認する。"""
-    missing = [cmd for cmd in ("hyprctl", "grim", "wtype") if not _which(cmd)]
-    if missing:
-        print(f"[エラー] 必要なコマンドが見つかりません: {', '.join(missing)}")
-        print("Hyprland 環境で hyprctl, grim, wtype をインストールしてください。")
-        sys.exit(1)
+@dataclass
+class CaptureOptions:
+    max_pages: int = 10000
+    pipeline: bool = False
+    writers: int = 2
+    max_pending: int = 8
+    compare: str = "thumb"
+    threshold: float = 0.99
+    settle: bool = False
+    stable_polls: int = 2
+    page_delay: float = 0.1
+    retry_wait: float = 5.0
+    book_index: bool = False
+    index_threshold: float = 0.995
+    repeat_limit: int = 3
+    autocrop: bool = False
+    crop_samples: int = 3
+
+
+@dataclass
+class CaptureResult:
+    saved: int
+    iterations: int
+    elapsed: float
+    stop_reason: str  # "max" / "end" / "loop" / "stopped"
+    settle: dict[str, float] = field(default_factory=dict)
+    stages: dict[str, dict[str, float]] = field(default_factory=dict)
+    duplicates: list[tuple[int, int]] = field(default_factory=list)  # (実行番号, 既存ページ番号)
+    crop_box: tuple[int, int, int, int] | None = None
+
+
+class FrameWriter:
+    """撮影済みフレームをバックグラウンドで PNG 保存する（保留数の上限付き）。
+
+    保留中のフレーム数が ``max_pending`` に達すると ``submit`` はブロックし、
+    メモリ上に画像が溜まり続けないようにする（バックプレッシャー）。
+    """
 
+    def __init__(
+        self,
+        workers: int = 2,
+        max_pending: int = 8,
+        on_written: Callable[[str, int], None] | None = None,
+    ) -> None:
+        if workers < 1 or max_pending < 1:
+            raise ValueError("workers と max_pending は1以上で指定してください")
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="frame-writer")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._on_written = on_written
+        self.errors: list[str] = []
 
-def _which(cmd: str) -> bool:
-    """コマンドがPATH上に存在するか。"""
-    from shutil import which
-    return which(cmd) is not None
+    def submit(self, image: Image.Image, filepath: str) -> None:
+        """フレームを保存キューに追加する。"""
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(save_frame, image, filepath)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._on_done(f, filepath))
+
+    def _on_done(self, future: Future[int], filepath: str) -> None:
+        self._slots.release()
+        exc = future.exception()
+        if exc is not None:
+            self.errors.append(str(exc))
+        elif self._on_written is not None:
+            self._on_written(filepath, future.result())
+
+    def close(self) -> list[str]:
+        """保留中の書き込みを全て待ってから終了し、発生したエラーを返す。"""
+        self._executor.shutdown(wait=True)
+        return list(self.errors)
 
 
 def _watch_stdin(stop_event: threading.Event) -> None:
@@ -62,112 +155,472 @@ def _watch_stdin(stop_event: threading.Event) -> None:
         pass
 
 
-def get_active_window() -> dict | None:
-    """hyprctl でアクティブウィンドウの情報を取得する。"""
+def save_frame(image: Image.Image, filepath: str) -> int:
+    """フレームを PNG として保存し、書き込んだバイト数を返す。
+
+    書き込み途中のファイルが残らないよう一時ファイル経由で置き換える。
+    """
+    tmp_path = f"{filepath}.tmp"
     try:
-        result = subprocess.run(
-            ["hyprctl", "activewindow", "-j"],
-            capture_output=True, text=True, timeout=5,
-        )
-        if result.returncode != 0:
-            return None
-        data = json.loads(result.stdout)
-        if not data or not data.get("title"):
-            return None
-        return data
-    except (subprocess.TimeoutExpired, json.JSONDecodeError, OSError) as e:
-        print(f"ウィンドウ取得エラー: {e}")
-        return None
+        image.save(tmp_path, format="PNG")
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return size
 
 
-def screenshot_window(window: dict, filepath: str) -> Image.Image | None:
-    """grim でウィンドウ領域のスクリーンショットを撮り、PILイメージとして返す。"""
-    at = window.get("at", [0, 0])
-    size = window.get("size", [0, 0])
-    x, y = at[0], at[1]
-    w, h = size[0], size[1]
-    if w <= 0 or h <= 0:
-        print("ウィンドウサイズが不正です")
-        return None
+def grab_preview(
+    backend: CaptureBackend, window: dict, comparator: FrameComparator | None = None,
+) -> Fingerprint | None:
+    """低解像度でウィンドウを撮影してフィンガープリントを返す（描画完了の検出用）。
 
-    geometry = f"{x},{y} {w}x{h}"
-    try:
-        result = subprocess.run(
-            ["grim", "-g", geometry, filepath],
-            capture_output=True, text=True, timeout=10,
-        )
-        if result.returncode != 0:
-            msg = (result.stderr or result.stdout or "").strip()
-            print(f"grim エラー: {msg}")
-            return None
-        img = Image.open(filepath)
-        img.load()
-        return img
-    except (subprocess.TimeoutExpired, OSError) as e:
-        print(f"スクリーンショットエラー: {e}")
+    ``comparator`` を渡すとその比較方式に必要な情報を含めて計算する。
+    """
+    frame = backend.grab(window, scale=PREVIEW_SCALE)
+    if not frame:
         return None
+    return comparator.fingerprint(frame) if comparator is not None else compute_fingerprint(frame)
 
 
-def images_are_same(img1: Image.Image | None, img2: Image.Image | None, threshold: float = 0.99) -> bool:
-    """2つの画像が同じかどうかを判定する。"""
-    if img1 is None or img2 is None:
-        return False
-    if img1.size != img2.size:
-        return False
-    try:
-        diff = ImageChops.difference(img1, img2)
-        stat = ImageStat.Stat(diff)
-        avg_diff = sum(stat.mean) / len(stat.mean)
-        return avg_diff < (1.0 - threshold) * 255
-    except Exception as e:
-        print(f"画像比較エラー: {e}")
-        return False
-
-
-def advance_page(config: CaptureConfig) -> None:
-    """wtype でキー入力してページを1つ進める。"""
+def advance_page(backend: CaptureBackend, config: CaptureConfig, settle_delay: float = 0.1) -> None:
+    """キー入力してページを1つ進める。"""
     print(f"キー入力: {config.action_key}")
-    result = subprocess.run(["wtype", "-k", config.action_key], capture_output=True, text=True, timeout=5, check=False)
-    if result.returncode != 0:
-        msg = (result.stderr or result.stdout or "").strip()
-        print(f"[警告] wtype が失敗しました (exit {result.returncode}): {msg}")
-    time.sleep(0.1)
+    backend.send_key(config.action_key)
+    if settle_delay > 0:
+        time.sleep(settle_delay)
 
 
 def capture_current(
-    config: CaptureConfig, iteration: int, prev_screenshot: Image.Image | None,
-) -> tuple[Image.Image | None, str]:
-    """現在のアクティブウィンドウをスクリーンショットして保存する。"""
+    backend: CaptureBackend,
+    config: CaptureConfig,
+    page_number: int,
+    prev_fingerprint: Fingerprint | None,
+    writer: FrameWriter | None = None,
+    comparator: FrameComparator | None = None,
+    timer: StageTimer = NULL_TIMER,
+    details: dict | None = None,
+    index: BookIndex | None = None,
+    cropper: AutoCropper | None = None,
+) -> tuple[Fingerprint | None, str]:
+    """現在のアクティブウィンドウをメモリ上に撮影し、新しいページだけを保存する。
+
+    前回のページはフィンガープリントだけで保持・比較する。
+    ``index`` を渡すと本全体の保存済みページとも照合し、一致すれば保存せず
+    ``duplicate`` を返す。
+    ``writer`` を渡すと保存はバックグラウンドで行われる（パイプラインモード）。
+    ``details`` を渡すとウィンドウ情報・保存先・書き込みバイト数を書き込む（トレース用）。
+    ``cropper`` を渡すとクロップ範囲で撮影する。範囲の決定前は新しいページを保存せずに保持する
+    （``details["held"]`` が True になる）。
+    """
+    details = details if details is not None else {}
+    comparator = comparator or FrameComparator()
     try:
-        window = get_active_window()
+        with timer.stage("window"):
+            window = backend.active_window()
         if not window:
             print("ウィンドウが見つかりませんでした")
-            return prev_screenshot, "error"
+            return prev_fingerprint, "error"
 
         print(f"ウィンドウ検出: {window.get('title', '不明')}")
+        details["window"] = window
 
         os.makedirs(config.save_dir, exist_ok=True)
-        filename = f"screenshot_{iteration:04d}.png"
+        filename = f"screenshot_{page_number:04d}.png"
         filepath = os.path.join(config.save_dir, filename)
 
-        screenshot = screenshot_window(window, filepath)
-        if not screenshot:
+        grab_window, residual = cropper.region(window) if cropper is not None else (window, None)
+        with timer.stage("grab"):
+            frame = backend.grab(grab_window)
+            if frame and residual is not None:
+                frame = frame.crop(residual)
+        if not frame:
             print("スクリーンショットの撮影に失敗しました")
-            # 失敗時は不完全なファイルを削除
-            if os.path.exists(filepath):
-                os.remove(filepath)
-            return prev_screenshot, "error"
-
-        if prev_screenshot is not None and images_are_same(screenshot, prev_screenshot):
-            # 同じ画像だったので保存済みファイルを削除
-            os.remove(filepath)
-            return screenshot, "same"
-
-        print(f"保存完了: {filepath}")
-        return screenshot, "new"
+            return prev_fingerprint, "error"
+
+        with timer.stage("fingerprint"):
+            fingerprint = comparator.fingerprint(frame)
+        with timer.stage("compare"):
+            same = comparator.is_same(prev_fingerprint, fingerprint)
+        if same:
+            # 同じ画像なのでディスクには何も書かない
+            return fingerprint, "same"
+
+        if index is not None:
+            with timer.stage("index"):
+                match = index.lookup(fingerprint)
+            if match is not None:
+                details["duplicate_of"] = match.page
+                details["exact"] = match.exact
+                print(f"保存済みのページ {match.page} と同じ内容のため保存しません")
+                return fingerprint, "duplicate"
+
+        details["file"] = filename
+        if cropper is not None and cropper.sampling:
+            cropper.hold(page_number, filename, frame, window)
+            details["held"] = True
+            if index is not None:
+                index.add(page_number, fingerprint)
+            print(f"クロップ範囲の決定用に保持: {filename} ({cropper.held}/{cropper.samples})")
+            return fingerprint, "new"
+        with timer.stage("write"):
+            if writer is not None:
+                writer.submit(frame, filepath)
+            else:
+                details["bytes"] = save_frame(frame, filepath)
+        if index is not None:
+            index.add(page_number, fingerprint)
+        print(f"{'保存キュー追加' if writer is not None else '保存完了'}: {filepath}")
+        return fingerprint, "new"
     except Exception as e:
-        print(f"エラー発生 (実行 {iteration}): {e}")
-        return prev_screenshot, "error"
+        print(f"エラー発生 (ページ {page_number}): {e}")
+        return prev_fingerprint, "error"
+
+
+def flush_held_pages(
+    cropper: AutoCropper,
+    config: CaptureConfig,
+    comparator: FrameComparator,
+    writer: FrameWriter | None = None,
+    index: BookIndex | None = None,
+    journal: CaptureJournal | None = None,
+    trace: TraceWriter | None = None,
+    on_saved: Callable[[str, int], None] | None = None,
+) -> Fingerprint | None:
+    """クロップ範囲を決め、保持していたページをクロップして保存する。
+
+    保持中のページの索引とジャーナルはクロップ後のフィンガープリントで登録し直す。
+    最後に保存したページのフィンガープリントを返す（保持していたページが無ければ None）。
+    ``on_saved`` は writer を使わない場合に保存し終えたページごとに呼ばれる。
+    """
+    box = cropper.decide()
+    if box is None:
+        print("クロップ範囲: なし（本文以外の余白がほとんどないため全体を保存します）")
+    else:
+        width, height = cropper.frame_size or (0, 0)
+        print(f"クロップ範囲: {box} ({box[2] - box[0]}x{box[3] - box[1]} / {width}x{height})")
+    frame_size = list(cropper.frame_size) if cropper.frame_size else None
+    if journal is not None:
+        journal.record_session("crop", box=list(box) if box else None, frame=frame_size, scale=cropper.scale)
+    if trace is not None:
+        trace.event("crop", box=list(box) if box else None, frame=frame_size)
+
+    fingerprint: Fingerprint | None = None
+    for held in cropper.take_held():
+        image = cropper.crop(held.frame)
+        fingerprint = comparator.fingerprint(image)
+        filepath = os.path.join(config.save_dir, held.file)
+        if writer is not None:
+            writer.submit(image, filepath)
+        else:
+            size = save_frame(image, filepath)
+            if trace is not None:
+                trace.written(held.file, size)
+            if on_saved is not None:
+                on_saved(filepath, size)
+        if index is not None:
+            index.remove(held.page)
+            index.add(held.page, fingerprint)
+        if journal is not None:
+            journal.record_page(held.page, held.file, fingerprint)
+    return fingerprint
+
+
+def run_capture(
+    backend: CaptureBackend,
+    config: CaptureConfig,
+    options: CaptureOptions,
+    stop_event: threading.Event | None = None,
+    timer: StageTimer | None = None,
+    trace: TraceWriter | None = None,
+    journal: CaptureJournal | None = None,
+    resume_pages: Sequence[JournalPage] = (),
+    on_saved: Callable[[str, int], None] | None = None,
+) -> CaptureResult:
+    """ページ送りと撮影を繰り返し、同じページが続いたら終了する。
+
+    ``timer`` を渡すと段階ごとの所要時間を記録し、結果の ``stages`` に集計する。
+    ``trace`` を渡すと反復ごとの記録と最後のサマリーを JSONL で書き出す。
+    ``journal`` を渡すと保存したページを撮影ジャーナルに追記する。
+    ``resume_pages`` を渡すとその続きの番号から撮影し、保存済みページは撮り直さない。
+    ``options.autocrop`` のときは最初のページからクロップ範囲を決める。再開時はジャーナルに
+    記録された範囲を使う。
+    ``on_saved`` はページをディスクに保存し終えるたびに (パス, バイト数) で呼ばれる
+    （パイプラインモードでは保存スレッドから呼ばれる）。
+    """
+    if timer is None:
+        timer = StageTimer() if trace is not None else NULL_TIMER
+    success_count = 0
+    iterations = 0
+    stop_reason = "max"
+    prev_fingerprint: Fingerprint | None = None
+    comparator = FrameComparator(options.compare, options.threshold)
+    writer = None
+    if options.pipeline:
+        def on_written(path: str, size: int) -> None:
+            if trace is not None:
+                trace.written(os.path.basename(path), size)
+            if on_saved is not None:
+                on_saved(path, size)
+
+        writer = FrameWriter(options.writers, options.max_pending, on_written if trace or on_saved else None)
+    tracker = SettleTracker(options.stable_polls) if options.settle else None
+    preview_comparator = FrameComparator(options.compare, options.threshold)
+    baseline: Fingerprint | None = None
+    index = BookIndex(threshold=options.index_threshold) if options.book_index else None
+    duplicates: list[tuple[int, int]] = []
+    consecutive_duplicates = 0
+    next_page = 1
+    if resume_pages:
+        if index is None:
+            raise ValueError("再開にはページ索引が必要です (book_index=True)")
+        for page in resume_pages:
+            index.add(page.page, page.fingerprint)
+        next_page = max(page.page for page in resume_pages) + 1
+    # 再開直後は保存済みページを読み飛ばしている最中なので、重複をループとみなさない
+    catching_up = bool(resume_pages)
+    cropper: AutoCropper | None = None
+    if options.autocrop:
+        record = load_crop(config.save_dir) if resume_pages else None
+        if record is not None:
+            cropper = AutoCropper.from_record(record)
+            print(f"記録済みのクロップ範囲を使います: {cropper.box}")
+        elif resume_pages:
+            print("[警告] 前回の撮影はクロップしていないため、クロップせずに再開します")
+        else:
+            cropper = AutoCropper(options.crop_samples)
+    if journal is not None:
+        journal.record_session("start", first_page=next_page, resumed_pages=len(resume_pages))
+    started_at = time.perf_counter()
+
+    try:
+        for i in range(1, options.max_pages + 1):
+            if stop_event is not None and stop_event.is_set():
+                print("\n停止が要求されました")
+                stop_reason = "stopped"
+                break
+
+            iterations = i
+            print(f"\n--- 実行 {i} ---")
+            status = "end"
+            retries = 0
+            details: dict = {}
+            settle_timed_out = False
+
+            # 1回目はページ送りせずにキャプチャ
+            if i > 1:
+                with timer.stage("key"):
+                    advance_page(backend, config, settle_delay=0.0)
+                if tracker is None:
+                    if options.page_delay > 0:
+                        with timer.stage("sleep"):
+                            time.sleep(options.page_delay)
+                else:
+                    window = backend.active_window()
+                    if window:
+                        with timer.stage("settle"):
+                            result = wait_for_settle(
+                                lambda: grab_preview(backend, window, preview_comparator), baseline,
+                                preview_comparator, tracker,
+                            )
+                        if result.status == "timeout":
+                            # 低解像度では変化を見落とすことがあるため、終端かどうかは実際の撮影で確かめる
+                            print(f"{result.latency:.1f}秒待ってもプレビューが変化しないため、撮影して確認します")
+                            settle_timed_out = True
+                        else:
+                            baseline = result.fingerprint
+            elif tracker is not None:
+                window = backend.active_window()
+                baseline = grab_preview(backend, window, preview_comparator) if window else None
+
+            if stop_reason != "end":
+                prev_fingerprint, status = capture_current(
+                    backend, config, next_page, prev_fingerprint, writer, comparator, timer, details, index,
+                    cropper,
+                )
+                if status == "same" and settle_timed_out:
+                    print("撮影した画像も前のページと同じため終了します")
+                    stop_reason = "end"
+                elif status == "same":
+                    # ページ遷移が完了していない可能性 → 待ってリトライ（ページ送りなし）
+                    retries = 1
+                    retry_wait = tracker.timeout() if tracker else options.retry_wait
+                    print(f"同じ画像を検出。{retry_wait:.1f}秒待ってリトライします...")
+                    with timer.stage("sleep"):
+                        time.sleep(retry_wait)
+                    prev_fingerprint, status = capture_current(
+                        backend, config, next_page, prev_fingerprint, writer, comparator, timer, details, index,
+                        cropper,
+                    )
+                    if status == "same":
+                        print("リトライ後も同じ画像のため終了します")
+                        stop_reason = "end"
+                if settle_timed_out and status in ("new", "duplicate"):
+                    # プレビューでは変化が見えなかったので、次のページの基準を撮り直す
+                    window = backend.active_window()
+                    baseline = grab_preview(backend, window, preview_comparator) if window else baseline
+                if status == "new":
+                    success_count += 1
+                    consecutive_duplicates = 0
+                    catching_up = False
+                    if journal is not None and prev_fingerprint is not None and not details.get("held"):
+                        journal.record_page(next_page, details["file"], prev_fingerprint)
+                    if on_saved is not None and "bytes" in details:
+                        on_saved(os.path.join(config.save_dir, details["file"]), details["bytes"])
+                    next_page += 1
+                    if cropper is not None and cropper.sampling and cropper.ready():
+                        prev_fingerprint = flush_held_pages(
+                            cropper, config, comparator, writer, index, journal, trace, on_saved,
+                        )
+                elif status == "duplicate":
+                    duplicates.append((i, details["duplicate_of"]))
+                    if journal is not None:
+                        journal.record_duplicate(i, details["duplicate_of"])
+                    if not catching_up:
+                        consecutive_duplicates += 1
+                    if consecutive_duplicates >= options.repeat_limit:
+                        print(f"保存済みのページが {consecutive_duplicates} 回続いたため終了します（ループを検出）")
+                        stop_reason = "loop"
+
+            finished = stop_reason in ("end", "loop")
+            if not finished and tracker is None and options.page_delay > 0:
+                with timer.stage("sleep"):
+                    time.sleep(options.page_delay)
+
+            if trace is not None:
+                trace.iteration(
+                    i,
+                    status,
+                    timer.take_current(),
+                    retries=retries,
+                    window=details.get("window"),
+                    file=details.get("file"),
+                    bytes_written=details.get("bytes"),
+                    duplicate_of=details.get("duplicate_of"),
+                )
+            if finished:
+                break
+    finally:
+        if cropper is not None and cropper.sampling and cropper.held:
+            # 決定前に撮影が終わった場合も、保持していたページは必ず保存する
+            flush_held_pages(cropper, config, comparator, writer, index, journal, trace, on_saved)
+        if writer is not None:
+            print("保存待ちのフレームを書き込み中...")
+            with timer.stage("flush"):
+                errors = writer.close()
+            for err in errors:
+                print(f"[警告] 保存に失敗しました: {err}")
+
+    elapsed = time.perf_counter() - started_at
+    stages = timer.summary()
+    if journal is not None:
+        journal.record_session(
+            "end", stop_reason=stop_reason, saved=success_count, complete=stop_reason in ("end", "loop"),
+        )
+    if trace is not None:
+        trace.summary(stages, success_count, elapsed, stop_reason)
+    return CaptureResult(
+        saved=success_count,
+        iterations=iterations,
+        elapsed=elapsed,
+        stop_reason=stop_reason,
+        settle=tracker.summary() if tracker is not None else {},
+        stages=stages,
+        duplicates=duplicates,
+        crop_box=cropper.box if cropper is not None else None,
+    )
+
+
+STATUS_BY_STOP_REASON = {"end": "done", "loop": "done", "max": "incomplete", "stopped": "stopped"}
+
+
+def run_batch(
+    backend: CaptureBackend,
+    jobs: Sequence[BatchJob],
+    options: CaptureOptions,
+    results: BatchResults,
+    contents_dir: str | Path = CONTENTS_DIR,
+    stop_event: threading.Event | None = None,
+    focus_timeout: float = DEFAULT_FOCUS_TIMEOUT,
+    job_delay: float = DEFAULT_JOB_DELAY,
+    trace_dir: str | Path | None = None,
+    after_job: Callable[[BatchJob, CaptureResult], None] | None = None,
+) -> BatchResults:
+    """ジョブを順に撮影し、ジョブごとの結果を ``results`` に追加する。
+
+    撮影済みのフォルダは飛ばし、途中まで撮ったフォルダはジャーナルの続きから撮影する。
+    ウィンドウをフォーカスできなかったジョブや例外で失敗したジョブは記録して次に進む。
+    ``options.max_pages`` はジョブに max_pages が無い場合に使う。
+    """
+    for job in jobs:
+        if stop_event is not None and stop_event.is_set():
+            results.add(JobResult(job.folder, "not_started"))
+            continue
+        save_dir = Path(contents_dir) / job.folder
+        if is_complete(save_dir):
+            print(f"\n=== {job.folder}: 撮影済みのため飛ばします ===")
+            results.add(JobResult(job.folder, "skipped"))
+            continue
+
+        print(f"\n=== {job.folder} ({job.key}) ===")
+        started_at = datetime.now().isoformat(timespec="seconds")
+        started = time.perf_counter()
+        window = focus_job_window(backend, job, focus_timeout)
+        if window is None:
+            target = " ".join(f"{k}={v}" for k, v in (("class", job.window_class), ("title", job.window_title)) if v)
+            error = f"ウィンドウをフォーカスできません: {target}" if job.has_window else "アクティブウィンドウがありません"
+            print(f"[エラー] {error}")
+            results.add(JobResult(job.folder, "focus_failed", started_at, time.perf_counter() - started, error=error))
+            continue
+        if job_delay > 0:
+            time.sleep(job_delay)
+
+        resume_pages = load_pages(save_dir) if options.book_index else []
+        if resume_pages:
+            print(f"保存済み {len(resume_pages)} ページの続きから撮影します")
+        config = CaptureConfig(action_key=job.key, save_dir=str(save_dir))
+        job_options = replace(options, max_pages=job.max_pages or options.max_pages)
+        trace = None
+        if trace_dir is not None:
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            trace = TraceWriter(Path(trace_dir) / f"{job.folder}_{stamp}.jsonl")
+            trace.event("start", folder=job.folder, backend=backend.name, key=job.key, options=asdict(job_options))
+        journal = CaptureJournal(save_dir, reset=not resume_pages)
+        try:
+            result = run_capture(
+                backend, config, job_options, stop_event, trace=trace, journal=journal, resume_pages=resume_pages,
+            )
+            if after_job is not None:
+                after_job(job, result)
+        except Exception as e:
+            print(f"[エラー] {job.folder}: {e}")
+            results.add(JobResult(
+                job.folder, "error", started_at, time.perf_counter() - started,
+                resumed_pages=len(resume_pages), window=window.get("title"), error=str(e),
+            ))
+            continue
+        finally:
+            journal.close()
+            if trace is not None:
+                trace.close()
+
+        status = STATUS_BY_STOP_REASON.get(result.stop_reason, "incomplete")
+        print(f"{job.folder}: {status} ({result.saved} ページ, {result.elapsed:.1f}秒)")
+        results.add(JobResult(
+            job.folder,
+            status,
+            started_at,
+            time.perf_counter() - started,
+            saved=result.saved,
+            resumed_pages=len(resume_pages),
+            iterations=result.iterations,
+            stop_reason=result.stop_reason,
+            window=window.get("title"),
+        ))
+    results.finish()
+    return results
 
 
 def select_action_key() -> str:
@@ -207,9 +660,240 @@ def main(argv: Sequence[str] | None = None) -> int:
     )
     parser.add_argument("--max", type=int, default=10000, help="最大繰り返し回数（デフォルト: 10000）")
     parser.add_argument("--delay", type=int, default=10, help="開始前の待機秒数（デフォルト: 10）")
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="PNG保存をバックグラウンドで並行実行する",
+    )
+    parser.add_argument("--writers", type=int, default=2, help="パイプライン時の保存スレッド数（デフォルト: 2）")
+    parser.add_argument(
+        "--max-pending", type=int, default=8, help="パイプライン時に保存待ちにできる最大フレーム数（デフォルト: 8）",
+    )
+    parser.add_argument(
+        "--compare",
+        choices=METRICS,
+        default="thumb",
+        help="重複判定の方式: thumb=縮小グレースケール, dhash=知覚ハッシュ, full=全画素比較（デフォルト: thumb）",
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=0.99, help="同一ページとみなす類似度 0.0〜1.0（デフォルト: 0.99）",
+    )
+    parser.add_argument(
+        "--settle",
+        action="store_true",
+        help="固定待機の代わりに低解像度フレームをポーリングして描画完了を待つ",
+    )
+    parser.add_argument(
+        "--stable-polls", type=int, default=2, help="描画完了とみなす連続一致回数（デフォルト: 2）",
+    )
+    parser.add_argument(
+        "--hyprctl",
+        action="store_true",
+        help="IPCソケットを使わず、毎回 hyprctl でウィンドウ情報を取得する",
+    )
+    parser.add_argument(
+        "--key-method",
+        choices=KEY_METHODS,
+        default="auto",
+        help="キー入力の送り方: auto=IPCソケットの sendshortcut（失敗時は wtype）, ipc=sendshortcut のみ, "
+        "wtype=毎回 wtype を起動（デフォルト: auto）",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="hyprland",
+        help="撮影バックエンド: hyprland=実環境, virtual=仮想の本（デフォルト: hyprland）",
+    )
+    parser.add_argument("--virtual-pages", type=int, default=50, help="virtual: ページ数（デフォルト: 50）")
+    parser.add_argument(
+        "--virtual-size", default="800x1200", help="virtual: ページサイズ WxH（デフォルト: 800x1200）",
+    )
+    parser.add_argument(
+        "--virtual-latency", type=float, default=0.0, help="virtual: ページ送り後の描画時間 秒（デフォルト: 0）",
+    )
+    parser.add_argument(
+        "--virtual-transition", type=int, default=0, help="virtual: 描画中の遷移フレーム数（デフォルト: 0）",
+    )
+    parser.add_argument(
+        "--virtual-end",
+        choices=END_BEHAVIOURS,
+        default="stay",
+        help="virtual: 最終ページで進めた時の動作 stay=留まる, wrap=表紙に戻る（デフォルト: stay）",
+    )
+    parser.add_argument(
+        "--virtual-layout",
+        choices=LAYOUTS,
+        default="text",
+        help="virtual: ページの描き方 text=文字ほどの大きさの線, blocks=単語ほどの大きさの矩形（デフォルト: text）",
+    )
+    parser.add_argument(
+        "--trace",
+        nargs="?",
+        const="auto",
+        help="反復ごとの記録を JSONL で書き出す（パス省略時: contents/.traces/<フォルダ名>_<日時>.jsonl）",
+    )
+    parser.add_argument(
+        "--index",
+        action="store_true",
+        help="本全体の保存済みページとも照合し、重複ページを保存せずループを検出する（--resume / --job-file では常に有効）",
+    )
+    parser.add_argument(
+        "--repeat-limit",
+        type=int,
+        default=3,
+        help="保存済みページがこの回数続いたらループとみなして終了（デフォルト: 3）",
+    )
+    parser.add_argument(
+        "--index-threshold",
+        type=float,
+        default=0.995,
+        help="保存済みページと近似一致とみなす類似度 0.0〜1.0（デフォルト: 0.995）",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="撮影ジャーナルを読み込み、中断した撮影の続きから再開する（保存済みページは撮り直さない）",
+    )
+    parser.add_argument(
+        "--autocrop",
+        action="store_true",
+        help="最初のページから本文の範囲を求め、余白やリーダーの UI を除いて撮影する",
+    )
+    parser.add_argument(
+        "--crop-samples", type=int, default=3, help="クロップ範囲の決定に使う最初のページ数（デフォルト: 3）",
+    )
+    parser.add_argument(
+        "--optimize",
+        choices=FORMATS,
+        help="撮影後にフォルダ内の画像を並列で可逆再圧縮する: webp=可逆WebP, png=最適化PNG",
+    )
+    parser.add_argument(
+        "--stream-upload",
+        action="store_true",
+        help="撮影しながら保存済みのページをまとめて MEGA にアップロードし、最後に一覧と照合する",
+    )
+    parser.add_argument("--dest", default=MEGA_REMOTE_DEST, help=f"--stream-upload のアップロード先（デフォルト: {MEGA_REMOTE_DEST}）")
+    parser.add_argument(
+        "--stream-batch-files",
+        type=int,
+        default=DEFAULT_BATCH_FILES,
+        help=f"--stream-upload で1回に送るページ数（デフォルト: {DEFAULT_BATCH_FILES}）",
+    )
+    parser.add_argument(
+        "--stream-batch-mb",
+        type=float,
+        default=DEFAULT_BATCH_BYTES / (1024 * 1024),
+        help=f"--stream-upload でこのサイズ (MB) たまったら送る（デフォルト: {DEFAULT_BATCH_BYTES // (1024 * 1024)}）",
+    )
+    parser.add_argument(
+        "--job-file",
+        metavar="FILE",
+        help="ジョブファイル (JSON) の本を対話なしで順に撮影する（ウィンドウの指定があればフォーカスしてから撮影）",
+    )
+    parser.add_argument("--results", metavar="FILE", help="--job-file の結果ファイル（デフォルト: <ジョブファイル名>.results.json）")
+    parser.add_argument(
+        "--focus-timeout",
+        type=float,
+        default=DEFAULT_FOCUS_TIMEOUT,
+        help=f"--job-file: ウィンドウがアクティブになるまで待つ秒数（デフォルト: {DEFAULT_FOCUS_TIMEOUT:g}）",
+    )
+    parser.add_argument(
+        "--job-delay",
+        type=float,
+        default=DEFAULT_JOB_DELAY,
+        help=f"--job-file: フォーカスしてから撮影を始めるまでの秒数（デフォルト: {DEFAULT_JOB_DELAY:g}）",
+    )
     args = parser.parse_args(argv)
+    if args.job_file:
+        if args.stream_upload:
+            parser.error("--job-file と --stream-upload は同時に指定できません（撮影後のアップロードは scripts.upload --watch を使ってください）")
+        if args.trace not in (None, "auto"):
+            parser.error("--job-file ではトレースのパスを指定できません（--trace のみでジョブごとに書き出します）")
+        if args.focus_timeout < 0 or args.job_delay < 0:
+            parser.error("--focus-timeout と --job-delay は0以上で指定してください")
+    elif args.results:
+        parser.error("--results は --job-file と一緒に指定してください")
+    if args.stream_upload and args.optimize:
+        parser.error("--stream-upload と --optimize は同時に指定できません（送信後に画像が置き換わるため）")
+    if args.stream_batch_files < 1 or args.stream_batch_mb <= 0:
+        parser.error("--stream-batch-files と --stream-batch-mb は正の値で指定してください")
+    if args.crop_samples < 1:
+        parser.error("--crop-samples は1以上で指定してください")
+    if args.repeat_limit < 1:
+        parser.error("--repeat-limit は1以上で指定してください")
+    if not 0.0 <= args.index_threshold <= 1.0:
+        parser.error("--index-threshold は 0.0〜1.0 で指定してください")
+    if args.stable_polls < 1:
+        parser.error("--stable-polls は1以上で指定してください")
+    if not 0.0 <= args.threshold <= 1.0:
+        parser.error("--threshold は 0.0〜1.0 で指定してください")
+    if args.writers < 1 or args.max_pending < 1:
+        parser.error("--writers と --max-pending は1以上で指定してください")
+    m = re.fullmatch(r"(\d+)x(\d+)", args.virtual_size)
+    if not m or int(m.group(1)) < 1 or int(m.group(2)) < 1:
+        parser.error("--virtual-size は WxH の形式で指定してください (例: 800x1200)")
 
-    _check_commands()
+    jobs: list[BatchJob] = []
+    if args.job_file:
+        try:
+            jobs = load_jobs(args.job_file)
+        except JobFileError as e:
+            parser.error(str(e))
+
+    backend: CaptureBackend
+    if args.backend == "virtual":
+        backend = VirtualBookBackend(
+            pages=args.virtual_pages,
+            size=(int(m.group(1)), int(m.group(2))),
+            render_latency=args.virtual_latency,
+            transition_frames=args.virtual_transition,
+            end=args.virtual_end,
+            layout=args.virtual_layout,
+        )
+    else:
+        backend = HyprlandBackend(use_ipc=not args.hyprctl, key_method=args.key_method)
+
+    missing = backend.missing_requirements()
+    if missing:
+        backend.close()
+        print(f"[エラー] 必要なコマンドが見つかりません: {', '.join(missing)}")
+        print("Hyprland 環境で hyprctl, grim, wtype をインストールしてください。")
+        sys.exit(1)
+
+    mega_put = mega_ls = None
+    if args.stream_upload:
+        mega_put = find_megacmd_command("mega-put")
+        mega_whoami = find_megacmd_command("mega-whoami")
+        mega_ls = find_megacmd_command("mega-ls")
+        if not mega_put or not mega_whoami:
+            backend.close()
+            print("[エラー] --stream-upload には MEGAcmd が必要です。https://mega.io/cmd をインストールしてください。")
+            return 3
+        try:
+            ensure_login(find_megacmd_command("mega-login"), mega_whoami)
+        except RuntimeError as e:
+            backend.close()
+            print(f"[エラー] {e}")
+            return 4
+
+    options = CaptureOptions(
+        max_pages=args.max,
+        pipeline=args.pipeline,
+        writers=args.writers,
+        max_pending=args.max_pending,
+        compare=args.compare,
+        threshold=args.threshold,
+        settle=args.settle,
+        stable_polls=args.stable_polls,
+        # 再開は保存済みページをページ索引で読み飛ばすため、--resume / --job-file では索引を使う
+        book_index=args.index or args.resume or bool(jobs),
+        index_threshold=args.index_threshold,
+        repeat_limit=args.repeat_limit,
+        autocrop=args.autocrop,
+        crop_samples=args.crop_samples,
+    )
+    if jobs:
+        return _run_jobs(args, backend, jobs, options)
 
     english_name = get_english_folder_name()
     action_key = select_action_key()
@@ -218,6 +902,17 @@ def main(argv: Sequence[str] | None = None) -> int:
         save_dir=str(CONTENTS_DIR / english_name),
     )
 
+    resume_pages: list[JournalPage] = []
+    if args.resume:
+        resume_pages = load_pages(config.save_dir)
+        if resume_pages:
+            print(f"\n撮影を再開します: 保存済み {len(resume_pages)} ページ, 次の番号 {resume_pages[-1].page + 1}")
+        else:
+            print("\n[警告] 再開できる撮影ジャーナルが見つかりません。最初から撮影します。")
+    elif journal_path(config.save_dir).exists():
+        print("\n[警告] このフォルダには以前の撮影記録があります。続きから撮影するには --resume を指定してください。")
+    journal = CaptureJournal(config.save_dir, reset=not resume_pages)
+
     print(f"\nスクリーンショット開始")
     print(f"最大繰り返し回数: {args.max}")
     print(f"操作: {config.action_key}")
@@ -232,45 +927,118 @@ def main(argv: Sequence[str] | None = None) -> int:
     watcher.start()
     print("※ Enterキーで停止できます")
 
-    success_count = 0
-    prev_screenshot: Image.Image | None = None
-
-    for i in range(1, args.max + 1):
-        if stop_event.is_set():
-            print("\n停止が要求されました")
-            break
-
-        print(f"\n--- 実行 {i} ---")
-
-        # 1回目はページ送りせずにキャプチャ
-        if i > 1:
-            advance_page(config)
-
-        prev_screenshot, status = capture_current(config, i, prev_screenshot)
-
-        if status == "new":
-            success_count += 1
-        elif status == "same":
-            # ページ遷移が完了していない可能性 → 5秒待ってリトライ（ページ送りなし）
-            print("同じ画像を検出。5秒待ってリトライします...")
-            time.sleep(5)
-            prev_screenshot, retry_status = capture_current(config, i, prev_screenshot)
-            if retry_status == "same":
-                print("リトライ後も同じ画像のため終了します")
-                break
-            elif retry_status == "new":
-                success_count += 1
+    trace = None
+    if args.trace:
+        trace_path = args.trace
+        if trace_path == "auto":
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            trace_path = str(CONTENTS_DIR / ".traces" / f"{english_name}_{stamp}.jsonl")
+        trace = TraceWriter(trace_path)
+        trace.event("start", folder=english_name, backend=backend.name, key=action_key, options=asdict(options))
+        print(f"トレース出力: {trace_path}")
+
+    stream: StreamUploader | None = None
+    if mega_put is not None:
+        stream = StreamUploader(
+            config.save_dir,
+            args.dest,
+            mega_put,
+            mega_ls,
+            batch_files=args.stream_batch_files,
+            batch_bytes=int(args.stream_batch_mb * 1024 * 1024),
+        )
+        print(f"ストリーミングアップロード: {stream.remote_folder} ({args.stream_batch_files} ページごと)")
+
+    try:
+        result = run_capture(
+            backend, config, options, stop_event, trace=trace, journal=journal, resume_pages=resume_pages,
+            on_saved=stream.add if stream is not None else None,
+        )
+    except BaseException:
+        if stream is not None:
+            stream.finish(verify=False)
+        raise
+    finally:
+        backend.close()
+        journal.close()
+        if trace is not None:
+            trace.close()
 
-        time.sleep(0.1)
+    print(f"\n完了: {result.saved} 回保存しました")
+    if result.duplicates:
+        pairs = ", ".join(f"{i}→{page}" for i, page in result.duplicates[:10])
+        more = " ..." if len(result.duplicates) > 10 else ""
+        print(f"保存済みページと重複したため保存しなかった回数: {len(result.duplicates)} ({pairs}{more})")
+    if result.elapsed > 0:
+        print(f"所要時間: {result.elapsed:.1f}秒 ({result.saved / result.elapsed:.2f} ページ/秒)")
+    if result.settle.get("count"):
+        stats = result.settle
+        print(
+            f"描画待ち時間 (n={stats['count']}): "
+            f"min={stats['min'] * 1000:.0f}ms p50={stats['p50'] * 1000:.0f}ms "
+            f"p90={stats['p90'] * 1000:.0f}ms p95={stats['p95'] * 1000:.0f}ms "
+            f"max={stats['max'] * 1000:.0f}ms"
+        )
+
+    if args.optimize and result.saved > 0:
+        print_summary(optimize_folder(config.save_dir, args.optimize))
 
-    print(f"\n完了: {success_count} 回保存しました")
+    if stream is not None:
+        print("\n残りのページを送信し、アップロード先と照合しています...")
+        summary = stream.finish()
+        print_stream_summary(summary)
+        if not summary.complete:
+            print("送り残したページは `uv run python -m scripts.upload --delta` で送れます。")
+            return 5
+        return 0
 
-    if success_count > 0 and os.path.exists(config.save_dir):
+    if result.saved > 0 and os.path.exists(config.save_dir):
         print(f"\n保存フォルダ: {config.save_dir}")
         print("MEGAへアップロードするには: uv run python -m scripts.upload")
+        print("（撮影が終わった本を自動でアップロードするには: uv run python -m scripts.upload --watch）")
 
     return 0
 
 
+def _run_jobs(args: argparse.Namespace, backend: CaptureBackend, jobs: list[BatchJob], options: CaptureOptions) -> int:
+    results = BatchResults(args.results or default_results_path(args.job_file), job_file=args.job_file)
+    print(f"\nバッチ撮影: {len(jobs)} 件 ({args.job_file})")
+    for job in jobs:
+        window = " ".join(f"{k}={v}" for k, v in (("class", job.window_class), ("title", job.window_title)) if v)
+        print(f"  {job.folder}: {job.key}, 最大 {job.max_pages or options.max_pages} ページ {window}")
+    print(f"結果ファイル: {results.path}")
+
+    def optimize(job: BatchJob, result: CaptureResult) -> None:
+        if result.saved > 0:
+            print_summary(optimize_folder(CONTENTS_DIR / job.folder, args.optimize))
+
+    print(f"\n{args.delay}秒後に開始します.")
+    time.sleep(args.delay)
+    stop_event = threading.Event()
+    watcher = threading.Thread(target=_watch_stdin, args=(stop_event,), daemon=True)
+    watcher.start()
+    print("※ Enterキーで現在のジョブを止め、残りのジョブを中止できます")
+
+    try:
+        run_batch(
+            backend,
+            jobs,
+            options,
+            results,
+            stop_event=stop_event,
+            focus_timeout=args.focus_timeout,
+            job_delay=args.job_delay,
+            trace_dir=CONTENTS_DIR / ".traces" if args.trace else None,
+            after_job=optimize if args.optimize else None,
+        )
+    finally:
+        backend.close()
+
+    print_batch_summary(results)
+    if any(job.saved for job in results.jobs):
+        print("MEGAへアップロードするには: uv run python -m scripts.upload")
+    return 0 if results.ok else 1
+
+
 if __name__ == "__main__":
     raise SystemExit(main())
@@ -0,0 +1,128 @@
+"""
+ページ送り後の描画完了（セトル）を低解像度フレームのポーリングで検出する。
+
+キー入力後、前ページから内容が変化し、その後 N 回連続で変化しなくなった時点を
+「描画完了」とみなす。セッション中の描画待ち時間を学習し、ポーリング間隔と
+終端判定（ページが変わらない）までのタイムアウトを調整する。
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from scripts.fingerprint import FrameComparator, Fingerprint
+from scripts.metrics import percentile
+
+
+DEFAULT_POLL_INTERVAL = 0.05
+DEFAULT_TIMEOUT = 5.0
+
+
+class SettleTracker:
+    """描画待ち時間を記録し、ポーリング間隔とタイムアウトを決める。"""
+
+    def __init__(
+        self,
+        stable_polls: int = 2,
+        min_interval: float = 0.01,
+        max_interval: float = 0.25,
+        min_timeout: float = 1.5,
+        timeout_factor: float = 4.0,
+        warmup: int = 3,
+    ) -> None:
+        if stable_polls < 1:
+            raise ValueError("stable_polls は1以上で指定してください")
+        self.stable_polls = stable_polls
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.min_timeout = min_timeout
+        self.timeout_factor = timeout_factor
+        self.warmup = warmup
+        self.latencies: list[float] = []
+
+    def record(self, latency: float) -> None:
+        self.latencies.append(latency)
+
+    def poll_interval(self) -> float:
+        """典型的な描画時間の1/4程度の間隔でポーリングする。"""
+        if len(self.latencies) < self.warmup:
+            return DEFAULT_POLL_INTERVAL
+        interval = percentile(self.latencies, 50) / 4
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def timeout(self) -> float:
+        """ページが変化しないと判断するまでの秒数。"""
+        if len(self.latencies) < self.warmup:
+            return DEFAULT_TIMEOUT
+        return max(self.min_timeout, percentile(self.latencies, 95) * self.timeout_factor)
+
+    def summary(self) -> dict[str, float]:
+        values = self.latencies
+        if not values:
+            return {"count": 0}
+        return {
+            "count": len(values),
+            "min": min(values),
+            "p50": percentile(values, 50),
+            "p90": percentile(values, 90),
+            "p95": percentile(values, 95),
+            "max": max(values),
+            "mean": sum(values) / len(values),
+        }
+
+
+@dataclass
+class SettleResult:
+    status: str  # "settled" / "unstable" / "timeout"
+    fingerprint: Fingerprint | None
+    latency: float
+    polls: int
+
+
+def wait_for_settle(
+    grab: Callable[[], Fingerprint | None],
+    baseline: Fingerprint | None,
+    comparator: FrameComparator,
+    tracker: SettleTracker,
+    sleep: Callable[[float], None] = time.sleep,
+    clock: Callable[[], float] = time.perf_counter,
+) -> SettleResult:
+    """キー入力直後から低解像度フレームをポーリングし、描画完了を待つ。
+
+    ``baseline`` は前ページの低解像度フィンガープリント。内容が変化しないまま
+    タイムアウトした場合は ``timeout`` を返す（本の終端の可能性があるが、低解像度では
+    変化を見落とすことがあるため、呼び出し側で元の解像度の撮影と照合して確かめる）。
+    """
+    start = clock()
+    deadline = start + tracker.timeout()
+    changed = baseline is None
+    last: Fingerprint | None = None
+    stable_since = start
+    stable_count = 0
+    polls = 0
+
+    while True:
+        now = clock()
+        fingerprint = grab()
+        polls += 1
+        if fingerprint is not None:
+            if not changed and not comparator.is_same(baseline, fingerprint):
+                changed = True
+            if changed:
+                if last is not None and comparator.is_same(last, fingerprint):
+                    stable_count += 1
+                else:
+                    stable_count = 0
+                    stable_since = now
+                last = fingerprint
+                if stable_count >= tracker.stable_polls:
+                    latency = stable_since - start
+                    tracker.record(latency)
+                    return SettleResult("settled", fingerprint, latency, polls)
+
+        if clock() >= deadline:
+            status = "unstable" if changed else "timeout"
+            return SettleResult(status, last or baseline, clock() - start, polls)
+        sleep(tracker.poll_interval())
@@ -0,0 +1,169 @@
+"""
+撮影しながらのアップロード（ストリーミングアップロード）。
+
+撮影ループが保存し終えたページを受け取り、枚数またはバイト数がたまるごとにバックグラウンドで
+mega-put に渡す。撮影とアップロードが重なるため、本が MEGA に上がるまでの時間は
+撮影時間とアップロード時間の和ではなく、ほぼ長い方になる。
+
+送ったページはフォルダのアップロード記録（マニフェスト）に書くため、撮影後の確認や
+``scripts.upload --delta`` は送り済みのページを送り直さない。撮影の最後に残りを送り、
+アップロード先の一覧と照合して足りないページ（失敗したバッチなど）を送り直す。
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from scripts.manifest import LocalFile, Manifest, file_sha256
+from scripts.upload import fetch_remote_index, human_bytes, remote_join, upload_delta, upload_files
+
+
+DEFAULT_BATCH_FILES = 50
+DEFAULT_BATCH_BYTES = 64 * 1024 * 1024
+
+
+@dataclass
+class StreamSummary:
+    batches: int = 0
+    files: int = 0
+    bytes: int = 0
+    failed_batches: int = 0
+    resent_files: int = 0  # 最後の照合で送り直したファイル数
+    complete: bool = False  # 最後の照合まで終わり、全ページが送り済み
+    verified: bool = False  # 照合にアップロード先の一覧を使えた
+    errors: list[str] = field(default_factory=list)
+    elapsed: float = 0.0
+    flush_elapsed: float = 0.0  # 撮影が終わってからアップロードが終わるまで
+
+
+class StreamUploader:
+    """保存済みページをまとめてバックグラウンドでアップロードする。
+
+    ``add`` は保存スレッドから呼ばれてもよい。バッチは1つずつ順に送る。
+    """
+
+    def __init__(
+        self,
+        folder: str | Path,
+        dest: str,
+        mega_put: str,
+        mega_ls: str | None = None,
+        batch_files: int = DEFAULT_BATCH_FILES,
+        batch_bytes: int = DEFAULT_BATCH_BYTES,
+        timeout_sec: int = 600,
+    ) -> None:
+        if batch_files < 1 or batch_bytes < 1:
+            raise ValueError("batch_files と batch_bytes は1以上で指定してください")
+        self.folder = Path(folder)
+        self.dest = dest
+        self.remote_folder = remote_join(dest, self.folder.name)
+        self.mega_put = mega_put
+        self.mega_ls = mega_ls
+        self.batch_files = batch_files
+        self.batch_bytes = batch_bytes
+        self.timeout_sec = timeout_sec
+        self.summary = StreamSummary()
+        self._lock = threading.Lock()
+        self._pending: list[tuple[str, int]] = []
+        self._pending_bytes = 0
+        self._batches: queue.Queue[list[tuple[str, int]] | None] = queue.Queue()
+        self._manifest: Manifest | None = None
+        self._started = time.perf_counter()
+        self._worker = threading.Thread(target=self._run, name="stream-upload", daemon=True)
+        self._worker.start()
+
+    def add(self, filepath: str, size: int) -> None:
+        """保存し終えたページを受け取る。バッチの大きさに達したら送信待ちに回す。"""
+        with self._lock:
+            self._pending.append((os.path.basename(filepath), size))
+            self._pending_bytes += size
+            if len(self._pending) >= self.batch_files or self._pending_bytes >= self.batch_bytes:
+                self._submit_locked()
+
+    def _submit_locked(self) -> None:
+        if self._pending:
+            self._batches.put(self._pending)
+            self._pending, self._pending_bytes = [], 0
+
+    def _run(self) -> None:
+        while True:
+            batch = self._batches.get()
+            if batch is None:
+                return
+            self._send(batch)
+
+    def _send(self, batch: list[tuple[str, int]]) -> None:
+        files: list[LocalFile] = []
+        for name, _size in batch:
+            path = self.folder / name
+            try:
+                st = path.stat()
+                files.append(LocalFile(name, st.st_size, st.st_mtime_ns, file_sha256(path)))
+            except OSError as e:
+                self.summary.errors.append(f"{name}: {e}")
+        if not files:
+            return
+        size = sum(f.size for f in files)
+        try:
+            upload_files(self.mega_put, self.folder, files, self.remote_folder, timeout_sec=self.timeout_sec)
+        except RuntimeError as e:
+            self.summary.failed_batches += 1
+            self.summary.errors.append(str(e))
+            print(f"[警告] ストリーミングアップロード: {len(files)} ファイルの送信に失敗しました（最後に送り直します）: {e}")
+            return
+        if self._manifest is None:
+            self._manifest = Manifest.load(self.folder, self.remote_folder)
+        self._manifest.mark_uploaded(files)
+        self._manifest.save()
+        self.summary.batches += 1
+        self.summary.files += len(files)
+        self.summary.bytes += size
+        print(f"ストリーミングアップロード: {len(files)} ファイル ({human_bytes(size)}) 送信済み (合計 {self.summary.files})")
+
+    def finish(self, verify: bool = True) -> StreamSummary:
+        """残りのページを送り、送信が終わるのを待つ。verify なら一覧と照合して足りないページを送り直す。"""
+        flush_started = time.perf_counter()
+        with self._lock:
+            self._submit_locked()
+        self._batches.put(None)
+        self._worker.join()
+        if verify:
+            self._verify()
+        self.summary.flush_elapsed = time.perf_counter() - flush_started
+        self.summary.elapsed = time.perf_counter() - self._started
+        return self.summary
+
+    def _verify(self) -> None:
+        remote = None
+        if self.mega_ls:
+            try:
+                remote = fetch_remote_index(self.mega_ls, self.remote_folder, timeout_sec=self.timeout_sec)
+            except RuntimeError as e:
+                self.summary.errors.append(str(e))
+                print(f"[警告] アップロード先の一覧を取得できないため、記録だけで照合します: {e}")
+        try:
+            files, _ = upload_delta(self.mega_put, self.folder, self.dest, remote, timeout_sec=self.timeout_sec)
+        except RuntimeError as e:
+            self.summary.errors.append(str(e))
+            print(f"[エラー] 最後の照合で送り直しに失敗しました: {e}")
+            return
+        self.summary.resent_files = files
+        self.summary.complete = True
+        self.summary.verified = remote is not None
+
+
+def print_stream_summary(summary: StreamSummary) -> None:
+    if not summary.complete:
+        status = "未完了"
+    else:
+        status = "一覧と照合済み" if summary.verified else "記録のみで照合"
+    print(
+        f"ストリーミングアップロード: {summary.files} ファイル {human_bytes(summary.bytes)} "
+        f"({summary.batches} バッチ, 失敗 {summary.failed_batches}, 送り直し {summary.resent_files}, {status})"
+    )
+    print(f"  撮影終了からアップロード完了まで {summary.flush_elapsed:.1f}秒")
@@ -0,0 +1,99 @@
+"""
+撮影ループの JSONL トレース出力。
+
+1行1レコードで、反復ごとの結果（状態・段階ごとの所要時間・書き込みバイト数・
+ウィンドウ位置・リトライ回数・重複元ページ）と、最後に百分位数とスループットのサマリーを書き出す。
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from pathlib import Path
+from typing import IO
+
+from scripts.metrics import summarize
+
+
+class TraceWriter:
+    """JSONL 形式でトレースを書き出す（書き込みはスレッドセーフ）。"""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file: IO[str] = open(self.path, "a", encoding="utf-8", buffering=1)
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._statuses: dict[str, int] = {}
+        self._iteration_times: list[float] = []
+        self._bytes = 0
+
+    def _write(self, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def event(self, kind: str, **fields: object) -> None:
+        """任意のイベントを1行書き出す。"""
+        self._write({"type": kind, "t": round(time.perf_counter() - self._started, 6), **fields})
+
+    def iteration(
+        self,
+        iteration: int,
+        status: str,
+        timings: dict[str, float],
+        retries: int = 0,
+        window: dict | None = None,
+        file: str | None = None,
+        bytes_written: int | None = None,
+        duplicate_of: int | None = None,
+    ) -> None:
+        """1回分の反復結果を書き出す。"""
+        with self._lock:
+            self._statuses[status] = self._statuses.get(status, 0) + 1
+            self._iteration_times.append(sum(timings.values()))
+            if bytes_written:
+                self._bytes += bytes_written
+        record: dict[str, object] = {
+            "iteration": iteration,
+            "status": status,
+            "retries": retries,
+            "timings": {name: round(value, 6) for name, value in timings.items()},
+        }
+        if window is not None:
+            record["window"] = {"at": window.get("at"), "size": window.get("size")}
+        if file is not None:
+            record["file"] = file
+        if bytes_written is not None:
+            record["bytes"] = bytes_written
+        if duplicate_of is not None:
+            record["duplicate_of"] = duplicate_of
+        self.event("iteration", **record)
+
+    def written(self, file: str, bytes_written: int) -> None:
+        """バックグラウンド保存の完了を書き出す。"""
+        with self._lock:
+            self._bytes += bytes_written
+        self.event("write", file=file, bytes=bytes_written)
+
+    def summary(self, stages: dict[str, dict[str, float]], saved: int, elapsed: float, stop_reason: str) -> None:
+        with self._lock:
+            statuses = dict(self._statuses)
+            iteration_stats = summarize(self._iteration_times)
+            total_bytes = self._bytes
+        self.event(
+            "summary",
+            saved=saved,
+            elapsed_sec=round(elapsed, 6),
+            pages_per_sec=round(saved / elapsed, 4) if elapsed > 0 else 0.0,
+            bytes_written=total_bytes,
+            stop_reason=stop_reason,
+            statuses=statuses,
+            iteration=iteration_stats,
+            stages=stages,
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,220 @@
+"""
+MEGA の転送状況 (mega-transfers) の解析と、アップロード完了までの追跡。
+
+mega-put -q はキューに追加した時点で戻るため、mega-transfers を定期的に実行して
+フォルダごとの進捗・転送速度・残り時間を求め、完了・失敗・停止を判定する。
+
+mega-transfers の出力例（--col-separator を付けない場合は空白区切り）:
+
+    TYPE     TAG  SOURCEPATH                  DESTINYPATH        PROGRESS            STATE
+     ⇑     8389  /home/user/books/contents/x  /book/x             45.23% of   12.30 MB  ACTIVE
+"""
+
+from __future__ import annotations
+
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Sequence
+
+
+COL_SEPARATOR = "|"
+TRANSFERS_ARGS = (
+    "--only-uploads",
+    "--show-completed",
+    "--limit=100000",
+    "--path-display-size=10000",
+    f"--col-separator={COL_SEPARATOR}",
+)
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_STALL_SEC = 300.0
+RATE_WINDOW_SEC = 30.0  # 転送速度はこの秒数の間に進んだバイト数から求める
+
+FAILED_STATES = {"FAILED", "CANCELLED"}
+COMPLETED_STATES = {"COMPLETED"}
+
+SIZE_UNITS = {"B": 1, "KB": 1024, "MB": 1024**2, "GB": 1024**3, "TB": 1024**4}
+PROGRESS_RE = re.compile(r"(?P<percent>[\d.]+)\s*%\s+of\s+(?P<size>[\d.]+)\s*(?P<unit>[KMGT]?B)", re.IGNORECASE)
+ROW_RE = re.compile(
+    r"^\s*(?P<type>\S+)\s+(?P<tag>\d+)\s+(?P<source>.+?)\s+(?P<dest>/\S*(?:\s\S+)*?)\s+"
+    r"(?P<progress>[\d.]+\s*%\s+of\s+[\d.]+\s*[KMGT]?B)\s+(?P<state>[A-Z_]+)\s*$",
+    re.IGNORECASE,
+)
+
+
+@dataclass(frozen=True)
+class Transfer:
+    tag: int
+    source: str
+    destination: str
+    percent: float
+    size: int
+    state: str
+
+    @property
+    def transferred(self) -> int:
+        if self.state in COMPLETED_STATES:
+            return self.size
+        return min(self.size, round(self.size * self.percent / 100))
+
+
+def parse_size(value: str, unit: str) -> int:
+    return round(float(value) * SIZE_UNITS[unit.upper()])
+
+
+def _transfer(tag: str, source: str, dest: str, progress: str, state: str) -> Transfer | None:
+    m = PROGRESS_RE.search(progress)
+    if not m or not tag.strip().isdigit():
+        return None
+    return Transfer(
+        int(tag),
+        source.strip(),
+        dest.strip(),
+        float(m.group("percent")),
+        parse_size(m.group("size"), m.group("unit")),
+        state.strip().upper(),
+    )
+
+
+def parse_transfers(output: str, separator: str = COL_SEPARATOR) -> list[Transfer]:
+    """mega-transfers の出力を解析する。見出しや解析できない行は無視する。"""
+    transfers: list[Transfer] = []
+    for line in output.splitlines():
+        if not line.strip() or "SOURCEPATH" in line:
+            continue
+        if separator in line:
+            cols = line.split(separator)
+            if len(cols) < 6:
+                continue
+            transfer = _transfer(cols[1], cols[2], cols[3], cols[4], cols[5])
+        else:
+            m = ROW_RE.match(line)
+            transfer = m and _transfer(m["tag"], m["source"], m["dest"], m["progress"], m["state"])
+        if transfer is not None:
+            transfers.append(transfer)
+    return transfers
+
+
+@dataclass
+class FolderProgress:
+    folder: Path
+    started: float
+    state: str = "waiting"  # waiting / active / completed / failed / stalled / missing / timeout
+    total: int = 0
+    done: int = 0
+    files: int = 0
+    error: str | None = None
+    seen: bool = False
+    finished_at: float | None = None
+    last_progress: float = 0.0
+    samples: deque[tuple[float, int]] = field(default_factory=deque)
+
+    @property
+    def finished(self) -> bool:
+        return self.state not in ("waiting", "active")
+
+    @property
+    def ok(self) -> bool:
+        return self.state == "completed"
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or (self.samples[-1][0] if self.samples else self.started)) - self.started
+
+    @property
+    def rate(self) -> float:
+        """直近 RATE_WINDOW_SEC 秒の転送速度 (バイト/秒)。"""
+        if len(self.samples) < 2:
+            return 0.0
+        (t0, b0), (t1, b1) = self.samples[0], self.samples[-1]
+        return (b1 - b0) / (t1 - t0) if t1 > t0 else 0.0
+
+    @property
+    def average_rate(self) -> float:
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> float | None:
+        rate = self.rate
+        if self.finished or rate <= 0 or self.total <= 0:
+            return None
+        return max(0, self.total - self.done) / rate
+
+    def record(self, now: float) -> None:
+        if not self.samples or self.done > self.samples[-1][1]:
+            self.last_progress = now
+        self.samples.append((now, self.done))
+        while len(self.samples) > 2 and now - self.samples[1][0] >= RATE_WINDOW_SEC:
+            self.samples.popleft()
+
+
+def _belongs_to(transfer: Transfer, folder: str) -> bool:
+    return transfer.source == folder or transfer.source.startswith(folder.rstrip("/") + "/")
+
+
+class TransferWatcher:
+    """mega-transfers の出力からフォルダごとの進捗を追跡する。
+
+    フォルダ自体の転送（mega-put でフォルダを送った場合）があればその値を使い、
+    無ければフォルダ以下のファイルの転送を合計する。一度見えた転送が一覧から消えた場合は
+    完了とみなす。stall_sec 秒進まなければ停止、appear_timeout 秒たっても現れなければ見つからない扱いにする。
+    """
+
+    def __init__(
+        self,
+        folders: Sequence[Path],
+        stall_sec: float = DEFAULT_STALL_SEC,
+        appear_timeout: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.clock = clock
+        self.stall_sec = stall_sec
+        self.appear_timeout = stall_sec if appear_timeout is None else appear_timeout
+        now = clock()
+        self.progress = [FolderProgress(Path(folder), started=now, last_progress=now) for folder in folders]
+
+    @property
+    def done(self) -> bool:
+        return all(p.finished for p in self.progress)
+
+    def update(self, transfers: Sequence[Transfer], now: float | None = None) -> None:
+        now = self.clock() if now is None else now
+        for p in self.progress:
+            if p.finished:
+                continue
+            folder = str(p.folder)
+            matched = [t for t in transfers if _belongs_to(t, folder)]
+            own = [t for t in matched if t.source == folder]
+            counted = own or matched
+            if counted:
+                p.seen = True
+                p.total = sum(t.size for t in counted)
+                p.done = sum(t.transferred for t in counted)
+                p.files = sum(1 for t in matched if t.source != folder) or len(counted)
+                p.record(now)
+                failed = [t for t in matched if t.state in FAILED_STATES]
+                if failed:
+                    p.state, p.error = "failed", f"転送が {failed[0].state} になりました: {failed[0].source}"
+                elif all(t.state in COMPLETED_STATES for t in counted):
+                    p.state = "completed"
+                else:
+                    p.state = "active"
+            elif p.seen:
+                p.done = p.total
+                p.record(now)
+                p.state = "completed"
+            elif now - p.started >= self.appear_timeout:
+                p.state, p.error = "missing", "mega-transfers に転送が見つかりません"
+            if p.state == "active" and now - p.last_progress >= self.stall_sec:
+                p.state, p.error = "stalled", f"{now - p.last_progress:.0f}秒間進んでいません"
+            if p.finished:
+                p.finished_at = now
+
+    def expire(self, now: float | None = None) -> None:
+        """待ち時間の上限に達したとき、終わっていないフォルダを timeout にする。"""
+        now = self.clock() if now is None else now
+        for p in self.progress:
+            if not p.finished:
+                p.state, p.error, p.finished_at = "timeout", "待ち時間の上限に達しました", now
@@ -11,26 +11,72 @@
   uv run python -m scripts.upload --folder permutation_city
   uv run python -m scripts.upload --skip-if-exists
   uv run python -m scripts.upload --dry-run
+  uv run python -m scripts.upload --jobs 4
+  uv run python -m scripts.upload --wait
+  uv run python -m scripts.upload --watch
+  uv run python -m scripts.upload --no-session
 """
 
 from __future__ import annotations
 
 import argparse
+import contextlib
 import getpass
 import os
 import re
 import shutil
+import sqlite3
 import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Sequence
+from typing import Callable, Iterator, Sequence
 
+from scripts.archive import ARCHIVE_FORMATS, archive_name, pack_folder
+from scripts.catalog import Catalog, UploadRecord, folder_stats
 from scripts.config import CONTENTS_DIR, MEGA_REMOTE_DEST
+from scripts.manifest import LocalFile, Manifest
+from scripts.megashell import SHELL_COMMAND, MegaShell, MegaShellError
+from scripts.remote import RemoteIndex, invalidate_cached, load_cached, parse_listing, save_cached
+from scripts.transfers import (
+    DEFAULT_POLL_INTERVAL,
+    DEFAULT_STALL_SEC,
+    TRANSFERS_ARGS,
+    FolderProgress,
+    Transfer,
+    TransferWatcher,
+    parse_transfers,
+)
+from scripts.watch import (
+    DEFAULT_MAX_ATTEMPTS,
+    DEFAULT_POLL_SEC,
+    DEFAULT_QUIET_SEC,
+    QUEUE_NAME,
+    UploadQueue,
+    UploadWatcher,
+    latest_change,
+    open_watcher,
+    run_watch,
+)
 
 
-IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tif", ".tiff"}
 DEFAULT_EXCLUDES = {".git", ".venv", "__pycache__"}
+LISTING_CACHE_NAME = ".cache"
+ARCHIVE_DIR_NAME = ".archives"
+DELTA_BATCH_FILES = 100
+NOT_FOUND_SIGNALS = (
+    "not found",
+    "no such file",
+    "could not find",
+    "couldn't find",
+    "cannot find",
+    "does not exist",
+    "not exist",
+)
+UPLOAD_STATUS_LABELS = {"uploaded": "済", "queued": "キュー済", "skipped": "既存", "failed": "失敗", "stalled": "停止"}
 
 
 @dataclass(frozen=True)
@@ -40,6 +86,17 @@ class FolderInfo:
     image_files: int
     total_bytes: int
     last_modified: datetime | None
+    upload: UploadRecord | None = None
+
+
+@dataclass
+class FolderOutcome:
+    folder: Path
+    status: str  # uploaded / skipped / failed / stalled / dry-run
+    elapsed: float = 0.0
+    error: str | None = None
+    files: int = 0  # 送ったファイル数（差分・アーカイブ・--wait で分かる場合）
+    bytes: int = 0
 
 
 def human_bytes(num_bytes: int) -> str:
@@ -53,58 +110,57 @@ def human_bytes(num_bytes: int) -> str:
     return f"{num_bytes}B"
 
 
-def folder_stats(folder: Path) -> tuple[int, int, datetime | None]:
-    image_files = 0
-    total_bytes = 0
-    latest_mtime: float | None = None
-
-    try:
-        with os.scandir(folder) as it:
-            for entry in it:
-                if not entry.is_file():
-                    continue
-                suffix = Path(entry.name).suffix.lower()
-                if suffix in IMAGE_EXTS:
-                    image_files += 1
-                try:
-                    st = entry.stat()
-                except OSError:
-                    continue
-                total_bytes += int(st.st_size)
-                latest_mtime = st.st_mtime if latest_mtime is None else max(latest_mtime, st.st_mtime)
-    except OSError:
-        return 0, 0, None
-
-    last_modified = datetime.fromtimestamp(latest_mtime) if latest_mtime is not None else None
-    return image_files, total_bytes, last_modified
-
-
-def discover_candidate_folders(base_dir: Path, excludes: set[str] | None = None) -> list[FolderInfo]:
+def discover_candidate_folders(
+    base_dir: Path,
+    excludes: set[str] | None = None,
+    catalog: Catalog | None = None,
+    dest: str | None = None,
+    rescan: bool = False,
+) -> list[FolderInfo]:
+    """画像を含むサブフォルダを名前順に返す。catalog を渡すと変更の無いフォルダの走査を省き、アップロード状況も付ける。"""
     excludes = excludes or set(DEFAULT_EXCLUDES)
-    candidates: list[FolderInfo] = []
-
-    for p in sorted(base_dir.iterdir(), key=lambda x: x.name.lower()):
-        if not p.is_dir():
-            continue
-        if p.name in excludes or p.name.startswith("."):
-            continue
+    folders = [
+        p for p in sorted(base_dir.iterdir(), key=lambda x: x.name.lower())
+        if p.is_dir() and p.name not in excludes and not p.name.startswith(".")
+    ]
+    uploads: dict[str, UploadRecord] = {}
+    if catalog is not None:
+        stats, _ = catalog.refresh(folders, force=rescan)
+        if dest is not None:
+            uploads = catalog.upload_status(stats, dest)
+    else:
+        stats = {p.name: folder_stats(p) for p in folders}
 
-        image_files, total_bytes, last_modified = folder_stats(p)
-        if image_files <= 0:
+    candidates: list[FolderInfo] = []
+    for p in folders:
+        st = stats.get(p.name)
+        if st is None or st.image_files <= 0:
             continue
         candidates.append(
             FolderInfo(
                 index=len(candidates) + 1,
                 path=p,
-                image_files=image_files,
-                total_bytes=total_bytes,
-                last_modified=last_modified,
+                image_files=st.image_files,
+                total_bytes=st.total_bytes,
+                last_modified=st.last_modified,
+                upload=uploads.get(p.name),
             )
         )
 
     return candidates
 
 
+def upload_label(info: FolderInfo) -> str:
+    """選択メニューに表示するアップロード状況。アップロード後にページが更新されていれば「更新あり」を付ける。"""
+    record = info.upload
+    if record is None:
+        return "-"
+    label = UPLOAD_STATUS_LABELS.get(record.status, record.status)
+    if record.status in ("uploaded", "queued") and info.last_modified and info.last_modified > record.updated_at:
+        label += "(更新あり)"
+    return f"{label} {record.updated_at:%m-%d %H:%M}"
+
+
 def print_candidates(candidates: Sequence[FolderInfo]) -> None:
     if not candidates:
         print("アップロード対象フォルダが見つかりませんでした。")
@@ -116,7 +172,8 @@ def print_candidates(candidates: Sequence[FolderInfo]) -> None:
         modified = c.last_modified.strftime("%Y-%m-%d %H:%M") if c.last_modified else "-"
         print(
             f" {c.index:>2}) {c.path.name:<{name_width}}  "
-            f"images={c.image_files:<5}  size={human_bytes(c.total_bytes):>8}  updated={modified}"
+            f"images={c.image_files:<5}  size={human_bytes(c.total_bytes):>8}  updated={modified}  "
+            f"upload={upload_label(c)}"
         )
 
 
@@ -180,7 +237,47 @@ def find_megacmd_command(cmd: str) -> str | None:
     return shutil.which(cmd)
 
 
-def run_megacmd(cmd_path: str, args: Sequence[str], timeout_sec: int = 60) -> subprocess.CompletedProcess[str]:
+def start_session(shell_path: str | None = None, start_timeout: float = 15.0) -> MegaShell | None:
+    """mega-cmd を起動してシェルセッションを返す。見つからない・目印が返らない場合は None。"""
+    shell_path = shell_path or find_megacmd_command(SHELL_COMMAND)
+    if shell_path is None:
+        return None
+    shell = MegaShell(shell_path, start_timeout=start_timeout)
+    try:
+        shell.start()
+    except MegaShellError as e:
+        print(f"[警告] {e}（MEGAcmd のコマンドをプロセスごとに実行します）")
+        return None
+    return shell
+
+
+@contextlib.contextmanager
+def megacmd_session(enabled: bool = True, shell_path: str | None = None) -> Iterator[MegaShell | None]:
+    """with の間だけ MEGAcmd のシェルセッションを開く（enabled=False や起動失敗時は None）。
+
+    セッションはモジュールに保持しないので、使う関数には shell= で明示的に渡す。
+    """
+    shell = start_session(shell_path) if enabled else None
+    try:
+        yield shell
+    finally:
+        if shell is not None:
+            shell.close()
+
+
+def run_megacmd(
+    cmd_path: str, args: Sequence[str], timeout_sec: int = 60, shell: MegaShell | None = None,
+) -> subprocess.CompletedProcess[str]:
+    """MEGAcmd のコマンドを実行する。
+
+    shell を渡し、それが空いていればシェル経由で実行する。無い・他のコマンドを実行中・引数を渡せない
+    場合は mega-* のプロセスを起動する（並列アップロードはプロセスごとに実行される）。
+    """
+    name = os.path.basename(cmd_path)
+    if shell is not None and name.startswith("mega-"):
+        result = shell.try_run(name[len("mega-"):], args, timeout_sec)
+        if result is not None:
+            return result
     return subprocess.run(
         [cmd_path, *args],
         capture_output=True,
@@ -201,34 +298,55 @@ def remote_join(dest: str, name: str) -> str:
     return f"{dest}/{name}"
 
 
-def remote_entry_exists(mega_ls: str, remote_path: str) -> bool:
+def _is_not_found(result: subprocess.CompletedProcess[str]) -> bool:
+    text = f"{result.stdout or ''}\n{result.stderr or ''}".lower()
+    return any(sig in text for sig in NOT_FOUND_SIGNALS)
+
+
+def fetch_remote_index(
+    mega_ls: str,
+    dest: str,
+    recursive: bool = False,
+    cache_dir: str | Path | None = None,
+    cache_ttl: float = 0.0,
+    timeout_sec: int = 120,
+    shell: MegaShell | None = None,
+) -> RemoteIndex:
+    """アップロード先を mega-ls -l で1回だけ一覧取得して索引にする。
+
+    cache_ttl > 0 なら cache_dir のキャッシュを ttl 秒まで再利用する。
+    アップロード先が存在しない場合は空の索引を返す。
+    """
+    if cache_dir is not None and cache_ttl > 0:
+        cached = load_cached(cache_dir, dest, recursive, cache_ttl)
+        if cached is not None:
+            return cached
+
+    args = ["-l", "-r", dest] if recursive else ["-l", dest]
     try:
-        result = run_megacmd(mega_ls, [remote_path], timeout_sec=30)
+        result = run_megacmd(mega_ls, args, timeout_sec=timeout_sec, shell=shell)
     except subprocess.TimeoutExpired as e:
         raise RuntimeError("MEGAサーバーへの接続がタイムアウトしました") from e
 
     if result.returncode == 0:
-        return True
-
-    text = f"{result.stdout or ''}\n{result.stderr or ''}".lower()
-    not_found_signals = [
-        "not found",
-        "no such file",
-        "could not find",
-        "cannot find",
-        "does not exist",
-        "not exist",
-    ]
-    if any(sig in text for sig in not_found_signals):
-        return False
+        index = RemoteIndex(dest, parse_listing(result.stdout or "", dest), recursive)
+    elif _is_not_found(result):
+        index = RemoteIndex(dest, [], recursive)
+    else:
+        msg = (result.stderr or result.stdout or "").strip()
+        raise RuntimeError(f"アップロード先の一覧取得に失敗しました (mega-ls): {msg}")
 
-    msg = (result.stderr or result.stdout or "").strip()
-    raise RuntimeError(f"存在確認に失敗しました (mega-ls): {msg}")
+    if cache_dir is not None and cache_ttl > 0:
+        save_cached(cache_dir, index)
+    return index
 
 
-def is_logged_in(mega_whoami: str) -> bool:
+def is_logged_in(mega_whoami: str, shell: MegaShell | None = None) -> bool:
+    """ログインしているか。シェルセッションを渡すと結果をセッションにキャッシュする。"""
+    if shell is not None and shell.logged_in is not None:
+        return shell.logged_in
     try:
-        result = run_megacmd(mega_whoami, [], timeout_sec=30)
+        result = run_megacmd(mega_whoami, [], timeout_sec=30, shell=shell)
     except subprocess.TimeoutExpired as e:
         raise RuntimeError("MEGAサーバーへの接続がタイムアウトしました") from e
 
@@ -236,16 +354,15 @@ def is_logged_in(mega_whoami: str) -> bool:
     err = (result.stderr or "").strip()
     combined = f"{out}\n{err}".lower()
 
-    if result.returncode != 0:
-        return False
-    if "not logged in" in combined:
-        return False
     # mega-whoami がメールアドレスを出すパターンが多い
-    return bool(out)
+    logged_in = result.returncode == 0 and "not logged in" not in combined and bool(out)
+    if shell is not None:
+        shell.logged_in = logged_in
+    return logged_in
 
 
-def ensure_login(mega_login: str | None, mega_whoami: str) -> None:
-    if is_logged_in(mega_whoami):
+def ensure_login(mega_login: str | None, mega_whoami: str, shell: MegaShell | None = None) -> None:
+    if is_logged_in(mega_whoami, shell=shell):
         return
 
     if not mega_login:
@@ -273,24 +390,32 @@ def ensure_login(mega_login: str | None, mega_whoami: str) -> None:
     try:
         # NOTE: MEGAcmdはCLI引数でしかパスワードを受け付けないため、
         # psコマンドで他ユーザーから一時的に見える可能性がある
-        result = run_megacmd(mega_login, [email, password], timeout_sec=60)
+        # （シェルセッション中は標準入力で渡すため見えない）
+        result = run_megacmd(mega_login, [email, password], timeout_sec=60, shell=shell)
     except subprocess.TimeoutExpired as e:
         raise RuntimeError("ログインがタイムアウトしました") from e
 
     if result.returncode != 0:
         msg = (result.stderr or result.stdout or "").strip()
         raise RuntimeError(f"ログインに失敗しました: {msg}")
+    if shell is not None:
+        shell.logged_in = True
 
 
 def upload_folder(
-    mega_put: str, folder_path: Path, dest: str, dry_run: bool = False, timeout_sec: int = 60
+    mega_put: str,
+    folder_path: Path,
+    dest: str,
+    dry_run: bool = False,
+    timeout_sec: int = 60,
+    shell: MegaShell | None = None,
 ) -> None:
     if dry_run:
         print(f"[dry-run] mega-put -c -q \"{folder_path}\" {dest}")
         return
 
     try:
-        result = run_megacmd(mega_put, ["-c", "-q", str(folder_path), dest], timeout_sec=timeout_sec)
+        result = run_megacmd(mega_put, ["-c", "-q", str(folder_path), dest], timeout_sec=timeout_sec, shell=shell)
     except subprocess.TimeoutExpired as e:
         raise RuntimeError("アップロードのキュー追加がタイムアウトしました") from e
 
@@ -299,6 +424,332 @@ def upload_folder(
         raise RuntimeError(f"アップロードに失敗しました: {msg}")
 
 
+def upload_files(
+    mega_put: str,
+    folder_path: Path,
+    files: Sequence[LocalFile],
+    remote_folder: str,
+    timeout_sec: int = 600,
+    shell: MegaShell | None = None,
+) -> None:
+    """ファイルをまとめて1回の mega-put で送り、転送が終わるまで待つ。"""
+    args = ["-c", *(str(folder_path / f.name) for f in files), f"{remote_folder.rstrip('/')}/"]
+    try:
+        result = run_megacmd(mega_put, args, timeout_sec=timeout_sec, shell=shell)
+    except subprocess.TimeoutExpired as e:
+        raise RuntimeError("アップロードがタイムアウトしました") from e
+    if result.returncode != 0:
+        msg = (result.stderr or result.stdout or "").strip()
+        raise RuntimeError(f"アップロードに失敗しました: {msg}")
+
+
+def upload_delta(
+    mega_put: str,
+    folder_path: Path,
+    dest: str,
+    remote: RemoteIndex | None = None,
+    dry_run: bool = False,
+    timeout_sec: int = 600,
+    shell: MegaShell | None = None,
+) -> tuple[int, int]:
+    """マニフェストとリモートの一覧を照合し、新しいファイルと変更されたファイルだけを送る。
+
+    DELTA_BATCH_FILES 件ずつ送り、送り終えるたびにマニフェストを更新する。
+    送ったファイル数とバイト数を返す。
+    """
+    remote_folder = remote_join(dest, folder_path.name)
+    manifest = Manifest.load(folder_path, remote_folder)
+    plan = manifest.plan(manifest.scan(), remote)
+    print(
+        f"差分: {folder_path.name}: 送信 {len(plan.upload)} ファイル ({human_bytes(plan.upload_bytes)}), "
+        f"変更なし {plan.unchanged}, 既存を記録 {len(plan.adopt)}"
+    )
+    if dry_run:
+        for f in plan.upload:
+            print(f"[dry-run] mega-put -c \"{folder_path / f.name}\" {remote_folder}/")
+        return len(plan.upload), plan.upload_bytes
+
+    if plan.adopt:
+        manifest.mark_uploaded(plan.adopt)
+        manifest.save()
+    sent_files = sent_bytes = 0
+    for start in range(0, len(plan.upload), DELTA_BATCH_FILES):
+        batch = plan.upload[start:start + DELTA_BATCH_FILES]
+        upload_files(mega_put, folder_path, batch, remote_folder, timeout_sec=timeout_sec, shell=shell)
+        manifest.mark_uploaded(batch)
+        manifest.save()
+        sent_files += len(batch)
+        sent_bytes += sum(f.size for f in batch)
+    return sent_files, sent_bytes
+
+
+def local_archive_path(folder_path: Path, fmt: str = "cbz", archive_dir: Path | None = None) -> Path:
+    """アーカイブの書き出し先。archive_dir を省略するとフォルダと同じ階層の .archives。"""
+    return (archive_dir or folder_path.parent / ARCHIVE_DIR_NAME) / archive_name(folder_path, fmt)
+
+
+def upload_archive(
+    mega_put: str,
+    folder_path: Path,
+    dest: str,
+    fmt: str = "cbz",
+    archive_dir: Path | None = None,
+    dry_run: bool = False,
+    timeout_sec: int = 600,
+    keep: bool = False,
+    shell: MegaShell | None = None,
+) -> tuple[int, int]:
+    """フォルダを1つのアーカイブにまとめて送り、転送が終わるまで待つ。
+
+    mega-put はローカルのファイルパスしか受け付けないため、アーカイブは archive_dir
+    (デフォルト: フォルダと同じ階層の .archives) に書き出す。
+    keep=False なら送信後に削除する。アーカイブ内のファイル数とアーカイブのバイト数を返す。
+    """
+    archive_path = local_archive_path(folder_path, fmt, archive_dir)
+    if dry_run:
+        print(f"[dry-run] {folder_path} → {archive_path}")
+        print(f"[dry-run] mega-put -c \"{archive_path}\" {dest}/")
+        return 0, 0
+    info = pack_folder(folder_path, archive_path)
+    if info.reused:
+        print(f"アーカイブ: {archive_path.name} (前回のものを再利用, {info.files} ファイル)")
+    else:
+        rate = info.bytes_in / info.elapsed / (1024 * 1024) if info.elapsed > 0 else 0.0
+        print(
+            f"アーカイブ作成: {archive_path.name} ({info.files} ファイル, {human_bytes(info.bytes_out)}, "
+            f"{info.elapsed:.1f}秒, {rate:.1f}MB/秒)"
+        )
+    try:
+        result = run_megacmd(
+            mega_put, ["-c", str(archive_path), f"{dest.rstrip('/')}/"], timeout_sec=timeout_sec, shell=shell,
+        )
+    except subprocess.TimeoutExpired as e:
+        raise RuntimeError("アップロードがタイムアウトしました") from e
+    if result.returncode != 0:
+        msg = (result.stderr or result.stdout or "").strip()
+        raise RuntimeError(f"アップロードに失敗しました: {msg}")
+    if not keep:
+        archive_path.unlink(missing_ok=True)
+    return info.files, info.bytes_out
+
+
+def process_folder(
+    folder: Path,
+    dest: str,
+    mega_put: str,
+    remote: RemoteIndex | None = None,
+    dry_run: bool = False,
+    timeout_sec: int = 600,
+    delta: bool = False,
+    archive: str | None = None,
+    keep_archive: bool = False,
+    archive_dir: Path | None = None,
+    shell: MegaShell | None = None,
+) -> FolderOutcome:
+    """1フォルダの既存チェックとアップロードを行い、結果を返す（失敗は結果に含める）。
+
+    remote を渡すと、アップロード先の索引に同名フォルダがある場合はスキップする。
+    archive 指定時は同名アーカイブがあればアーカイブを作成してサイズを比べ、同じならスキップ、
+    違えば送り直す（リモートのサイズが分からなければスキップする）。
+    delta=True ならフォルダごとではなく、新しいファイルと変更されたファイルだけを送る。
+    archive ("cbz" / "zip") を指定するとフォルダを1つのアーカイブにまとめ、archive_dir に書き出して送る。
+    """
+    started = time.perf_counter()
+
+    def outcome(status: str, error: str | None = None, files: int = 0, size: int = 0) -> FolderOutcome:
+        return FolderOutcome(folder, status, time.perf_counter() - started, error, files, size)
+
+    if delta:
+        try:
+            files, size = upload_delta(
+                mega_put, folder, dest, remote, dry_run=dry_run, timeout_sec=timeout_sec, shell=shell,
+            )
+        except (RuntimeError, OSError) as e:
+            return outcome("failed", str(e))
+        if dry_run:
+            return outcome("dry-run", files=files, size=size)
+        return outcome("uploaded" if files else "skipped", files=files, size=size)
+
+    if remote is not None:
+        remote_target = remote_join(dest, archive_name(folder, archive) if archive else folder.name)
+        if remote.exists(remote_target):
+            detail = ""
+            resend = False
+            if archive:
+                try:
+                    info = pack_folder(folder, local_archive_path(folder, archive, archive_dir))
+                except OSError as e:
+                    return outcome("failed", str(e))
+                remote_size = remote.size(remote_target)
+                resend = remote_size is not None and remote_size != info.bytes_out
+                if resend:
+                    print(
+                        f"サイズが違うため送り直します: {remote_target} "
+                        f"(リモート {human_bytes(remote_size or 0)} / ローカル {human_bytes(info.bytes_out)})"
+                    )
+                else:
+                    detail = f" ({human_bytes(remote_size or 0)})"
+                    if not keep_archive:
+                        info.path.unlink(missing_ok=True)
+            elif remote.recursive:
+                local_files, local_bytes, _ = folder_stats(folder)
+                files = remote.files_under(remote_target)
+                remote_bytes = sum(f.size or 0 for f in files)
+                detail = (
+                    f" (リモート {len(files)} ファイル {human_bytes(remote_bytes)} / "
+                    f"ローカル 画像 {local_files} ファイル {human_bytes(local_bytes)})"
+                )
+            if not resend:
+                print(f"スキップ: 既に存在します: {remote_target}{detail}")
+                return outcome("skipped")
+
+    print(f"アップロード中: {folder}")
+    if archive:
+        try:
+            files, size = upload_archive(
+                mega_put, folder, dest, archive, archive_dir, dry_run=dry_run, timeout_sec=timeout_sec,
+                keep=keep_archive, shell=shell,
+            )
+        except (RuntimeError, OSError) as e:
+            return outcome("failed", str(e))
+        return outcome("dry-run" if dry_run else "uploaded", files=files, size=size)
+    try:
+        upload_folder(mega_put, folder, dest, dry_run=dry_run, timeout_sec=timeout_sec, shell=shell)
+    except RuntimeError as e:
+        return outcome("failed", str(e))
+    return outcome("dry-run" if dry_run else "uploaded")
+
+
+def upload_folders(
+    targets: Sequence[Path],
+    dest: str,
+    mega_put: str,
+    remote: RemoteIndex | None = None,
+    dry_run: bool = False,
+    timeout_sec: int = 600,
+    jobs: int = 1,
+    delta: bool = False,
+    archive: str | None = None,
+    keep_archive: bool = False,
+    archive_dir: Path | None = None,
+    shell: MegaShell | None = None,
+) -> list[FolderOutcome]:
+    """複数フォルダを最大 jobs 並列で処理する。1フォルダの失敗で全体を止めず、結果は targets の順に返す。"""
+    if jobs < 1:
+        raise ValueError("jobs は1以上で指定してください")
+
+    def run(folder: Path) -> FolderOutcome:
+        return process_folder(
+            folder, dest, mega_put, remote, dry_run, timeout_sec, delta, archive, keep_archive, archive_dir, shell,
+        )
+
+    if jobs == 1:
+        return [run(folder) for folder in targets]
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="upload") as pool:
+        return list(pool.map(run, targets))
+
+
+def print_upload_summary(outcomes: Sequence[FolderOutcome], elapsed: float) -> None:
+    labels = {"uploaded": "追加", "skipped": "スキップ", "failed": "失敗", "stalled": "停止", "dry-run": "dry-run"}
+    name_width = max((len(o.folder.name) for o in outcomes), default=0)
+    print("\n結果:")
+    for o in outcomes:
+        detail = f"  {o.error}" if o.error else ""
+        if o.files:
+            rate = f" {o.bytes / o.elapsed / (1024 * 1024):.1f}MB/秒" if o.elapsed > 0 and o.bytes else ""
+            detail = f"  {o.files} ファイル {human_bytes(o.bytes)}{rate}{detail}"
+        print(f"  {o.folder.name:<{name_width}}  {labels.get(o.status, o.status):<6} {o.elapsed:6.1f}秒{detail}")
+    counts = {status: sum(1 for o in outcomes if o.status == status) for status in labels}
+    print(
+        f"合計 {len(outcomes)} フォルダ: 追加 {counts['uploaded']}, スキップ {counts['skipped']}, "
+        f"失敗 {counts['failed']}"
+        + (f", 停止 {counts['stalled']}" if counts["stalled"] else "")
+        + f" (所要時間 {elapsed:.1f}秒)"
+    )
+
+
+def fetch_transfers(mega_transfers: str, timeout_sec: int = 60, shell: MegaShell | None = None) -> list[Transfer]:
+    try:
+        result = run_megacmd(mega_transfers, TRANSFERS_ARGS, timeout_sec=timeout_sec, shell=shell)
+    except subprocess.TimeoutExpired as e:
+        raise RuntimeError("転送状況の取得がタイムアウトしました") from e
+    if result.returncode != 0:
+        msg = (result.stderr or result.stdout or "").strip()
+        raise RuntimeError(f"転送状況の取得に失敗しました: {msg}")
+    return parse_transfers(result.stdout)
+
+
+def format_progress(p: FolderProgress) -> str:
+    percent = f"{p.done * 100 / p.total:5.1f}%" if p.total else "    -"
+    line = f"{p.folder.name}: {percent} {human_bytes(p.done)}/{human_bytes(p.total)}"
+    if p.state == "active":
+        line += f" {p.rate / (1024 * 1024):.1f}MB/秒"
+        if p.eta is not None:
+            line += f" 残り{p.eta:.0f}秒"
+    elif p.state != "waiting":
+        line += f" [{p.state}]"
+    return line
+
+
+def print_progress(progress: Sequence[FolderProgress]) -> None:
+    line = "  " + " | ".join(format_progress(p) for p in progress)
+    if sys.stdout.isatty():
+        print(f"\r\033[K{line}", end="" if not all(p.finished for p in progress) else "\n", flush=True)
+    else:
+        print(line)
+
+
+def wait_for_uploads(
+    mega_transfers: str,
+    folders: Sequence[Path],
+    interval: float = DEFAULT_POLL_INTERVAL,
+    stall_sec: float = DEFAULT_STALL_SEC,
+    timeout_sec: float | None = None,
+    on_update: Callable[[Sequence[FolderProgress]], None] | None = print_progress,
+    shell: MegaShell | None = None,
+) -> list[FolderProgress]:
+    """キューに追加したフォルダの転送がすべて終わる（完了・失敗・停止）まで mega-transfers を確認し続ける。"""
+    watcher = TransferWatcher(folders, stall_sec=stall_sec)
+    started = time.monotonic()
+    last_snapshot = None
+    while True:
+        watcher.update(fetch_transfers(mega_transfers, shell=shell))
+        snapshot = [(p.state, p.done) for p in watcher.progress]
+        if on_update is not None and snapshot != last_snapshot:
+            on_update(watcher.progress)
+            last_snapshot = snapshot
+        if watcher.done:
+            return watcher.progress
+        if timeout_sec is not None and time.monotonic() - started >= timeout_sec:
+            watcher.expire()
+            if on_update is not None:
+                on_update(watcher.progress)
+            return watcher.progress
+        time.sleep(interval)
+
+
+def apply_wait_results(outcomes: Sequence[FolderOutcome], progress: Sequence[FolderProgress]) -> None:
+    """転送の追跡結果をフォルダごとの結果に反映する（失敗は failed、停止・時間切れは stalled）。"""
+    by_folder = {p.folder: p for p in progress}
+    for o in outcomes:
+        p = by_folder.get(o.folder)
+        if p is None:
+            continue
+        o.elapsed += p.elapsed
+        o.files, o.bytes = p.files, p.total
+        if p.state in ("failed", "missing"):
+            o.status, o.error = "failed", p.error
+        elif not p.ok:
+            o.status, o.error = "stalled", p.error
+
+
+def record_outcomes(catalog: Catalog, dest: str, outcomes: Sequence[FolderOutcome], queued_only: bool) -> None:
+    """フォルダごとの結果をカタログに記録する。完了を確認していないアップロードは queued として記録する。"""
+    for o in outcomes:
+        status = "queued" if o.status == "uploaded" and queued_only else o.status
+        catalog.record_upload(o.folder.name, dest, status, o.files, o.bytes, o.error)
+
+
 def resolve_folder_arg(base_dir: Path, folder_arg: str) -> Path:
     p = Path(folder_arg).expanduser()
     if p.is_absolute() or p.exists():
@@ -317,9 +768,93 @@ def main(argv: Sequence[str] | None = None) -> int:
         help="アップロード先に同名フォルダが既にある場合はアップロードしない",
     )
     parser.add_argument("--timeout", type=int, default=600, help="アップロードのタイムアウト秒数 (デフォルト: 600)")
+    parser.add_argument("--jobs", type=int, default=1, help="同時に処理するフォルダ数 (デフォルト: 1)")
+    parser.add_argument(
+        "--recursive-listing",
+        action="store_true",
+        help="既存チェックでアップロード先をサイズ付きで再帰的に一覧取得する（スキップ時にファイル数を比較表示）",
+    )
+    parser.add_argument(
+        "--listing-cache-ttl",
+        type=float,
+        default=0.0,
+        help="アップロード先の一覧を --base の .cache にキャッシュして再利用する秒数 (デフォルト: 0=キャッシュしない)",
+    )
+    parser.add_argument(
+        "--delta",
+        action="store_true",
+        help="フォルダごとではなく、前回から新しく増えた/変わったファイルだけを送る（転送完了まで待つ）",
+    )
+    parser.add_argument(
+        "--archive",
+        choices=ARCHIVE_FORMATS,
+        help="フォルダを1つの無圧縮アーカイブ (<フォルダ名>.cbz / .zip) にまとめて送る（転送完了まで待つ）",
+    )
+    parser.add_argument(
+        "--keep-archive", action="store_true", help="送信後もアーカイブを --base の .archives に残す",
+    )
+    parser.add_argument(
+        "--wait",
+        action="store_true",
+        help="キューに追加した後、mega-transfers で転送の完了まで進捗・速度・残り時間を表示して待つ",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=DEFAULT_POLL_INTERVAL,
+        help=f"--wait で転送状況を確認する間隔 秒 (デフォルト: {DEFAULT_POLL_INTERVAL:g})",
+    )
+    parser.add_argument(
+        "--stall-timeout",
+        type=float,
+        default=DEFAULT_STALL_SEC,
+        help=f"--wait で転送がこの秒数進まなければ停止とみなす (デフォルト: {DEFAULT_STALL_SEC:g})",
+    )
+    parser.add_argument("--wait-timeout", type=float, help="--wait で待つ最大秒数 (デフォルト: 無制限)")
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="contents/ を監視し、撮影が終わった本を自動で差分アップロードし続ける（Ctrl+C で終了）",
+    )
+    parser.add_argument(
+        "--quiet-sec",
+        type=float,
+        default=DEFAULT_QUIET_SEC,
+        help=f"--watch でこの秒数ページが増えなければ撮影が終わったとみなす (デフォルト: {DEFAULT_QUIET_SEC:g})",
+    )
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=DEFAULT_POLL_SEC,
+        help=f"inotify を使えない場合にフォルダを確認する間隔 秒 (デフォルト: {DEFAULT_POLL_SEC:g})",
+    )
+    parser.add_argument("--polling", action="store_true", help="--watch で inotify を使わず定期的な確認で監視する")
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=DEFAULT_MAX_ATTEMPTS,
+        help=f"--watch で失敗したアップロードを試みる最大回数 (デフォルト: {DEFAULT_MAX_ATTEMPTS})",
+    )
+    parser.add_argument(
+        "--rescan", action="store_true", help="フォルダ一覧のキャッシュ (contents/.catalog.sqlite3) を使わずに全フォルダを走査し直す"
+    )
+    parser.add_argument("--no-catalog", action="store_true", help="フォルダ一覧のキャッシュとアップロード状況の記録を使わない")
+    parser.add_argument(
+        "--no-session",
+        action="store_true",
+        help="mega-cmd のシェルを起動したままにせず、MEGAcmd のコマンドを毎回プロセスとして実行する",
+    )
     parser.add_argument("--yes", action="store_true", help="確認プロンプトをスキップ")
     parser.add_argument("--dry-run", action="store_true", help="実行せずにコマンドだけ表示")
     args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs は1以上で指定してください")
+    if args.delta and args.archive:
+        parser.error("--delta と --archive は同時に指定できません")
+    if args.watch and args.folder:
+        parser.error("--watch と --folder は同時に指定できません")
+    if args.max_retries < 1:
+        parser.error("--max-retries は1以上で指定してください")
 
     base_dir = Path(args.base).expanduser().resolve()
     if not base_dir.exists():
@@ -331,11 +866,122 @@ def main(argv: Sequence[str] | None = None) -> int:
         print("[エラー] --dest が空です")
         return 2
 
+    catalog: Catalog | None = None
+    if not args.no_catalog:
+        try:
+            catalog = Catalog.open(base_dir)
+        except (sqlite3.Error, OSError) as e:
+            print(f"[警告] フォルダ一覧のキャッシュを開けないため使わずに続行します: {e}")
+    try:
+        with megacmd_session(enabled=not (args.no_session or args.dry_run)) as shell:
+            if args.watch:
+                return _watch(args, base_dir, dest, catalog, shell)
+            return _run(args, base_dir, dest, catalog, shell)
+    finally:
+        if catalog is not None:
+            catalog.close()
+
+
+def _watch(
+    args: argparse.Namespace, base_dir: Path, dest: str, catalog: Catalog | None, shell: MegaShell | None = None,
+) -> int:
+    """撮影が終わった本を待ち列に入れ、差分（または --archive）アップロードし続ける。"""
+    mega_put = find_megacmd_command("mega-put")
+    mega_whoami = find_megacmd_command("mega-whoami")
+    mega_login = find_megacmd_command("mega-login")
+    # アーカイブは送る前にアップロード先の同名アーカイブとサイズを比べる
+    mega_ls = find_megacmd_command("mega-ls") if args.archive else None
+    if not mega_put or not mega_whoami:
+        print("[エラー] MEGAcmd が見つかりません。https://mega.io/cmd をインストールしてください。")
+        return 3
+    if args.archive and not mega_ls:
+        print("[エラー] --watch --archive には mega-ls が必要です (MEGAcmd のインストールを確認してください)。")
+        return 3
+    try:
+        if not args.dry_run:
+            ensure_login(mega_login, mega_whoami, shell=shell)
+    except RuntimeError as e:
+        print(f"[エラー] {e}")
+        return 4
+
+    def upload_one(folder: Path) -> str | None:
+        started = time.perf_counter()
+        print(f"\n[{datetime.now():%H:%M:%S}] アップロード: {folder.name}")
+        remote: RemoteIndex | None = None
+        if mega_ls and not args.dry_run:
+            try:
+                remote = fetch_remote_index(
+                    mega_ls,
+                    dest,
+                    cache_dir=base_dir / LISTING_CACHE_NAME,
+                    cache_ttl=args.listing_cache_ttl,
+                    shell=shell,
+                )
+            except RuntimeError as e:
+                print(f"[エラー] {e}")
+                return str(e)
+        outcome = process_folder(
+            folder,
+            dest,
+            mega_put,
+            remote,
+            dry_run=args.dry_run,
+            timeout_sec=args.timeout,
+            delta=not args.archive,
+            archive=args.archive,
+            keep_archive=args.keep_archive,
+            archive_dir=base_dir / ARCHIVE_DIR_NAME,
+            shell=shell,
+        )
+        print_upload_summary([outcome], time.perf_counter() - started)
+        if not args.dry_run:
+            invalidate_cached(base_dir / LISTING_CACHE_NAME, dest)
+            if catalog is not None:
+                record_outcomes(catalog, dest, [outcome], queued_only=False)
+        if outcome.status == "failed":
+            return outcome.error or "アップロードに失敗しました"
+        return None
+
+    def already_uploaded(folder: Path) -> bool:
+        """今の内容をアップロードした記録がマニフェストかカタログにあるか。"""
+        if not args.archive and Manifest.load(folder, remote_join(dest, folder.name)).is_current():
+            return True
+        if catalog is None:
+            return False
+        record = catalog.upload_status([folder.name], dest).get(folder.name)
+        if record is None or record.status not in ("uploaded", "queued", "skipped"):
+            return False
+        changed_at = latest_change(folder)
+        return changed_at is not None and record.updated_at.timestamp() >= changed_at
+
+    queue = UploadQueue(base_dir / QUEUE_NAME, max_attempts=args.max_retries)
+    watcher = UploadWatcher(base_dir, upload_one, queue, quiet_sec=args.quiet_sec)
+    source = open_watcher(base_dir, args.watch_interval, polling=args.polling)
+    mode = f"アーカイブ ({args.archive})" if args.archive else "差分"
+    print(f"監視を開始しました [{source.kind}]: {base_dir} → {dest} ({mode}アップロード, Ctrl+C で終了)")
+    pending = queue.pending()
+    if pending:
+        print(f"前回の待ち列から {len(pending)} フォルダを再開します: {', '.join(i.name for i in pending)}")
+    existing = watcher.scan_existing(time.time(), already_uploaded)
+    if existing:
+        print(f"アップロードの記録が無い既存のフォルダ {len(existing)} 件も、撮影が終わっていれば送ります: {', '.join(existing)}")
+    try:
+        run_watch(watcher, source)
+    except KeyboardInterrupt:
+        print("\n監視を終了します。")
+    finally:
+        source.close()
+    return 0
+
+
+def _run(
+    args: argparse.Namespace, base_dir: Path, dest: str, catalog: Catalog | None, shell: MegaShell | None = None,
+) -> int:
     selected_all = False
     if args.folder:
         targets = [resolve_folder_arg(base_dir, args.folder)]
     else:
-        candidates = discover_candidate_folders(base_dir)
+        candidates = discover_candidate_folders(base_dir, catalog=catalog, dest=dest, rescan=args.rescan)
         print_candidates(candidates)
         selected, selected_all = prompt_selection(candidates)
         targets = [c.path for c in selected]
@@ -353,8 +999,10 @@ def main(argv: Sequence[str] | None = None) -> int:
     for p in targets:
         print(f"- {p.name}  ({p})")
     print(f"MEGAアップロード先: {dest}")
-    skip_if_exists = bool(args.skip_if_exists or selected_all)
-    if selected_all and not args.skip_if_exists:
+    skip_if_exists = bool(args.skip_if_exists or selected_all) and not args.delta
+    if args.delta:
+        print("※ 差分モード: 新しいファイルと変更されたファイルだけを送ります。")
+    elif selected_all and not args.skip_if_exists:
         print("※ `all` を選択したため、アップロード先に同名があるフォルダはスキップします。")
 
     if not args.yes:
@@ -370,53 +1018,105 @@ def main(argv: Sequence[str] | None = None) -> int:
     mega_put = find_megacmd_command("mega-put")
     mega_whoami = find_megacmd_command("mega-whoami")
     mega_login = find_megacmd_command("mega-login")
-    mega_ls = find_megacmd_command("mega-ls") if skip_if_exists else None
+    needs_listing = skip_if_exists or args.delta
+    mega_ls = find_megacmd_command("mega-ls") if needs_listing else None
+    # 差分・アーカイブは転送完了まで待つ mega-put なので追跡は不要
+    track = args.wait and not (args.delta or args.archive)
+    mega_transfers = find_megacmd_command("mega-transfers") if track else None
 
     if not mega_put or not mega_whoami:
         print("[エラー] MEGAcmd が見つかりません。https://mega.io/cmd をインストールしてください。")
         return 3
 
-    if skip_if_exists and not mega_ls:
-        print("[エラー] --skip-if-exists には mega-ls が必要です (MEGAcmd のインストールを確認してください)。")
+    if needs_listing and not mega_ls:
+        print("[エラー] --skip-if-exists / --delta には mega-ls が必要です (MEGAcmd のインストールを確認してください)。")
+        return 3
+
+    if track and not mega_transfers:
+        print("[エラー] --wait には mega-transfers が必要です (MEGAcmd のインストールを確認してください)。")
         return 3
 
     try:
         if not args.dry_run:
-            ensure_login(mega_login, mega_whoami)
+            ensure_login(mega_login, mega_whoami, shell=shell)
     except RuntimeError as e:
         print(f"[エラー] {e}")
         return 4
 
-    uploaded_any = False
-    for folder in targets:
-        if skip_if_exists:
-            remote_target = remote_join(dest, folder.name)
-            if args.dry_run:
-                print(f"\n[dry-run] 既存チェック: {remote_target}")
-            else:
-                try:
-                    if remote_entry_exists(mega_ls, remote_target):
-                        print(f"\nスキップ: 既に存在します: {remote_target}")
-                        continue
-                except RuntimeError as e:
-                    print(f"[エラー] {e}")
-                    return 4
-
-        print(f"\nアップロード中: {folder}")
-        try:
-            upload_folder(mega_put, folder, dest, dry_run=args.dry_run, timeout_sec=args.timeout)
-        except RuntimeError as e:
-            print(f"[エラー] {e}")
-            return 5
-        uploaded_any = True
-
+    remote: RemoteIndex | None = None
+    recursive = args.recursive_listing or args.delta
+    if needs_listing and mega_ls:
+        if args.dry_run:
+            print(f"\n[dry-run] 既存チェック: mega-ls -l {'-r ' if recursive else ''}{dest}")
+        else:
+            try:
+                remote = fetch_remote_index(
+                    mega_ls, dest, recursive, base_dir / LISTING_CACHE_NAME, args.listing_cache_ttl, shell=shell,
+                )
+            except RuntimeError as e:
+                print(f"[エラー] {e}")
+                return 4
+            age = time.time() - remote.fetched_at
+            source = f"キャッシュ ({age:.0f}秒前)" if age >= 1 else "取得"
+            print(f"\nアップロード先の一覧: {len(remote)} 件 [{source}]")
+
+    started = time.perf_counter()
+    if args.jobs > 1:
+        print(f"\n{args.jobs} 並列で処理します")
+    outcomes = upload_folders(
+        targets,
+        dest,
+        mega_put,
+        remote,
+        dry_run=args.dry_run,
+        timeout_sec=args.timeout,
+        jobs=args.jobs,
+        delta=args.delta,
+        archive=args.archive,
+        keep_archive=args.keep_archive,
+        archive_dir=base_dir / ARCHIVE_DIR_NAME,
+        shell=shell,
+    )
+    queued = [o for o in outcomes if o.status == "uploaded"]
+    if track and queued and mega_transfers:
+        if args.dry_run:
+            print(f"\n[dry-run] mega-transfers {' '.join(TRANSFERS_ARGS)} で完了まで待機")
+        else:
+            print(f"\n転送の完了を待っています ({len(queued)} フォルダ)...")
+            try:
+                progress = wait_for_uploads(
+                    mega_transfers,
+                    [o.folder for o in queued],
+                    interval=args.poll_interval,
+                    stall_sec=args.stall_timeout,
+                    timeout_sec=args.wait_timeout,
+                    shell=shell,
+                )
+            except RuntimeError as e:
+                print(f"\n[エラー] {e}")
+                return 4
+            apply_wait_results(queued, progress)
+    print_upload_summary(outcomes, time.perf_counter() - started)
+    if catalog is not None and not args.dry_run:
+        record_outcomes(catalog, dest, outcomes, queued_only=not (track or args.delta or args.archive))
+
+    failed = [o for o in outcomes if o.status == "failed"]
+    stalled = [o for o in outcomes if o.status == "stalled"]
+    if any(o.status in ("uploaded", "stalled") for o in outcomes) or failed:
+        invalidate_cached(base_dir / LISTING_CACHE_NAME, dest)
     if args.dry_run:
         print("\n[dry-run] 完了")
-    elif uploaded_any:
+    elif (args.delta or args.archive or track) and not failed and not stalled:
+        print("\n完了: アップロードが終わりました。")
+    elif stalled:
+        print("\n転送が停止または時間切れになったフォルダがあります。`mega-transfers` で状況を確認してください。")
+    elif any(o.status == "uploaded" for o in outcomes):
         print("\n完了: アップロードをキューに追加しました。進捗は `mega-transfers` で確認できます。")
-    else:
+    elif not failed:
         print("\n完了: 既に存在するためアップロードは行いませんでした。")
-    return 0
+    if failed:
+        return 5
+    return 6 if stalled else 0
 
 
 if __name__ == "__main__":
@@ -0,0 +1,535 @@
+"""
+アップロード方式のベンチマーク。
+
+仮想の本 (VirtualBookBackend) のページを PNG で書き出し、ローカルの MEGAcmd 代替
+(scripts.fakemega) に対して「フォルダをそのまま送る」場合と「CBZ にまとめて送る」場合を比べる。
+ファイルごとの遅延と帯域を指定して、実際の MEGA の転送に近いコストを再現できる。
+``--capture`` を付けると撮影も含め、「撮影してからアップロード」と「撮影しながらアップロード」
+(--stream-upload) で本が上がり終えるまでの時間を比べる。
+``--commands`` を付けると、MEGAcmd のコマンド (whoami / ls / transfers) を「毎回プロセスを起動する」
+場合と「mega-cmd のシェルセッションに送る」場合で、1秒あたりのコマンド数を比べる。
+``--library`` を付けると、指定した冊数×ページ数の仮想のライブラリに対して books-upload (scripts.upload.main)
+をそのまま実行し、シナリオ (--wait / --delta / --archive / 並列) とセッションの有無ごとに、
+完了までの時間・起動したプロセス数・実行したコマンド数・転送したバイト数を記録する。
+
+使い方:
+  uv run books-upload-bench
+  uv run books-upload-bench --pages 300 --file-latency 0.05 --bandwidth 20
+  uv run books-upload-bench --output upload-bench.json
+  uv run books-upload-bench --capture --pages 100 --render-latency 0.05 --file-latency 0.05
+  uv run books-upload-bench --commands 200 --cmd-latency 0.005
+  uv run books-upload-bench --library 2x10,8x25 --scenarios delta,archive --output library-bench.json
+  uv run books-upload-bench --library 4x20 --fail-rate 0.05
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Sequence
+
+from scripts.archive import archive_name, pack_folder
+from scripts.backends import VirtualBookBackend
+from scripts.fakemega import TRANSFERS_FILE, install_commands, read_log
+from scripts.metrics import summarize
+from scripts.screenshot import CaptureConfig, CaptureOptions, run_capture
+from scripts.stream import StreamUploader
+from scripts.transfers import TRANSFERS_ARGS
+from scripts import upload
+from scripts.upload import human_bytes, megacmd_session, run_megacmd, upload_archive, upload_folder
+
+
+MODES = ("folder", "archive")
+CAPTURE_MODES = ("sequential", "stream")
+COMMAND_MODES = ("process", "session")
+COMMAND_MIX = (("mega-whoami", ()), ("mega-ls", ("-l", "/Books")), ("mega-transfers", TRANSFERS_ARGS))
+# --library で books-upload に渡す引数（--base / --dest / --yes は共通）
+SCENARIOS = {
+    "queue": ("--wait", "--poll-interval", "0.1"),
+    "delta": ("--delta",),
+    "archive": ("--archive", "cbz"),
+    "parallel": ("--delta", "--jobs", "4"),
+}
+SESSION_MODES = ("session", "process")
+
+
+def make_book(folder: Path, pages: int, size: tuple[int, int]) -> int:
+    """仮想の本のページを PNG で書き出し、合計バイト数を返す。"""
+    folder.mkdir(parents=True, exist_ok=True)
+    backend = VirtualBookBackend(pages=pages, size=size)
+    for index in range(pages):
+        backend.render_page(index).save(folder / f"page_{index + 1:04d}.png")
+    return sum(entry.stat().st_size for entry in os.scandir(folder))
+
+
+def run_mode(mode: str, book: Path, work: Path, file_latency: float, bandwidth: float) -> dict:
+    """1つの方式で本を fakemega に送り、計測結果を返す。"""
+    root = work / f"remote-{mode}"
+    commands = install_commands(work / f"bin-{mode}", root, latency=file_latency, bandwidth=bandwidth)
+    mega_put = commands["mega-put"]
+    files = sum(1 for _ in book.iterdir())
+    total_bytes = sum(p.stat().st_size for p in book.iterdir())
+    pack_sec = 0.0
+    started = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        if mode == "archive":
+            archive_dir = work / "archives"
+            # 先に作成して時間を測る（upload_archive は作成済みのアーカイブを再利用する）
+            pack_sec = pack_folder(book, archive_dir / archive_name(book)).elapsed
+            upload_archive(mega_put, book, "/Books", archive_dir=archive_dir, timeout_sec=3600)
+        else:
+            upload_folder(mega_put, book, "/Books", timeout_sec=3600)
+    elapsed = time.perf_counter() - started
+    sent = [p for p in root.rglob("*") if p.is_file() and not p.name.startswith(".fakemega")]
+    return {
+        "mode": mode,
+        "files": files,
+        "remote_files": len(sent),
+        "bytes": total_bytes,
+        "elapsed_sec": round(elapsed, 4),
+        "pack_sec": round(pack_sec, 4),
+        "files_per_sec": round(files / elapsed, 2) if elapsed > 0 else 0.0,
+        "mb_per_sec": round(total_bytes / elapsed / (1024 * 1024), 3) if elapsed > 0 else 0.0,
+    }
+
+
+def run_capture_mode(
+    mode: str,
+    work: Path,
+    pages: int,
+    size: tuple[int, int],
+    render_latency: float,
+    file_latency: float,
+    bandwidth: float,
+    batch_files: int = 10,
+) -> dict:
+    """仮想の本を撮影し、撮影後に送る (sequential) か撮影しながら送る (stream) かで完了までの時間を測る。"""
+    root = work / f"remote-{mode}"
+    mega_put = install_commands(work / f"bin-{mode}", root, latency=file_latency, bandwidth=bandwidth)["mega-put"]
+    book = work / f"book-{mode}"
+    backend = VirtualBookBackend(pages=pages, size=size, render_latency=render_latency)
+    config = CaptureConfig(action_key="Right", save_dir=str(book))
+    # 描画時間だけ待ってから撮影する（固定待機の撮影と同じ）
+    options = CaptureOptions(max_pages=pages + 1, retry_wait=render_latency, page_delay=render_latency)
+    started = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        if mode == "stream":
+            stream = StreamUploader(book, "/Books", mega_put, batch_files=batch_files, timeout_sec=3600)
+            run_capture(backend, config, options, on_saved=stream.add)
+            capture_sec = time.perf_counter() - started
+            stream.finish()
+        else:
+            run_capture(backend, config, options)
+            capture_sec = time.perf_counter() - started
+            upload_folder(mega_put, book, "/Books", timeout_sec=3600)
+    total = time.perf_counter() - started
+    return {
+        "mode": mode,
+        "files": sum(1 for p in book.iterdir() if not p.name.startswith(".")),
+        "remote_files": sum(1 for p in root.rglob("*") if p.is_file() and not p.name.startswith(".")),
+        "capture_sec": round(capture_sec, 4),
+        "after_capture_sec": round(total - capture_sec, 4),
+        "total_sec": round(total, 4),
+    }
+
+
+def run_capture_benchmark(
+    pages: int,
+    size: tuple[int, int],
+    render_latency: float = 0.0,
+    file_latency: float = 0.0,
+    bandwidth: float = 0.0,
+    batch_files: int = 10,
+) -> dict:
+    with tempfile.TemporaryDirectory(prefix="books-upload-bench-") as tmp:
+        results = [
+            run_capture_mode(mode, Path(tmp), pages, size, render_latency, file_latency, bandwidth, batch_files)
+            for mode in CAPTURE_MODES
+        ]
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "pages": pages,
+            "size": list(size),
+            "render_latency": render_latency,
+            "file_latency": file_latency,
+            "bandwidth": bandwidth,
+            "batch_files": batch_files,
+        },
+        "capture": results,
+    }
+
+
+def run_command_mode(mode: str, work: Path, commands: int, cmd_latency: float = 0.0) -> dict:
+    """COMMAND_MIX を順に commands 回実行し、1秒あたりのコマンド数とレイテンシを測る。"""
+    root = work / "remote"
+    (root / "Books").mkdir(parents=True, exist_ok=True)
+    paths = install_commands(work / f"bin-{mode}", root, cmd_latency=cmd_latency)
+    samples: list[float] = []
+    failed = 0
+    started = time.perf_counter()
+    with megacmd_session(mode == "session", paths["mega-cmd"]) as shell:
+        if mode == "session" and shell is None:
+            raise RuntimeError("MEGAcmd シェル (fakemega) を起動できません")
+        start_sec = time.perf_counter() - started
+        loop_started = time.perf_counter()
+        for i in range(commands):
+            name, args = COMMAND_MIX[i % len(COMMAND_MIX)]
+            t0 = time.perf_counter()
+            result = run_megacmd(paths[name], list(args), timeout_sec=60, shell=shell)
+            samples.append(time.perf_counter() - t0)
+            failed += result.returncode != 0
+        elapsed = time.perf_counter() - loop_started
+    stats = summarize(samples)
+    return {
+        "mode": mode,
+        "commands": commands,
+        # whoami はログインしていないので失敗する（出力の解析まで含めて測る）
+        "failed": failed,
+        "start_sec": round(start_sec, 4),
+        "elapsed_sec": round(elapsed, 4),
+        "commands_per_sec": round(commands / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": round(stats["p50"] * 1000, 3),
+        "p95_ms": round(stats["p95"] * 1000, 3),
+    }
+
+
+def run_command_benchmark(commands: int, cmd_latency: float = 0.0) -> dict:
+    with tempfile.TemporaryDirectory(prefix="books-upload-bench-") as tmp:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            results = [run_command_mode(mode, Path(tmp), commands, cmd_latency) for mode in COMMAND_MODES]
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commands": commands,
+            "cmd_latency": cmd_latency,
+        },
+        "megacmd": results,
+    }
+
+
+def make_library(library: Path, books: int, pages: int, size: tuple[int, int]) -> int:
+    """同じページの本を books 冊書き出し、合計バイト数を返す（描画は1冊分だけ行う）。"""
+    first = library / "book_001"
+    book_bytes = make_book(first, pages, size)
+    for index in range(2, books + 1):
+        shutil.copytree(first, library / f"book_{index:03d}")
+    return book_bytes * books
+
+
+@contextlib.contextmanager
+def upload_environment(bin_dir: Path) -> Iterator[None]:
+    """books-upload が MEGAcmd の代替を使い、番号選択で all を選ぶように環境を一時的に書き換える。"""
+    saved = {name: os.environ.get(name) for name in ("PATH", "MEGA_EMAIL", "MEGA_PASSWORD")}
+    os.environ["PATH"] = f"{bin_dir}{os.pathsep}{saved['PATH'] or ''}"
+    os.environ["MEGA_EMAIL"] = "bench@example.com"
+    os.environ["MEGA_PASSWORD"] = "bench"
+    stdin = sys.stdin
+    sys.stdin = io.StringIO("all\n")
+    try:
+        yield
+    finally:
+        sys.stdin = stdin
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _count_failed_transfers(root: Path) -> int:
+    path = root / TRANSFERS_FILE
+    if not path.exists():
+        return 0
+    return sum(1 for line in path.read_text(encoding="utf-8").splitlines() if json.loads(line)["state"] == "FAILED")
+
+
+def run_library_mode(
+    scenario: str,
+    session: str,
+    template: Path,
+    work: Path,
+    file_latency: float = 0.0,
+    bandwidth: float = 0.0,
+    cmd_latency: float = 0.0,
+    fail_rate: float = 0.0,
+) -> dict:
+    """ライブラリのコピーに対して books-upload を1回実行し、fakemega の記録から計測結果をまとめる。"""
+    name = f"{template.name}-{scenario}-{session}"
+    library = work / name
+    shutil.copytree(template, library)  # 差分のマニフェストやカタログが他の実行に残らないようにする
+    root = work / f"remote-{name}"
+    log = work / f"{name}.jsonl"
+    install_commands(
+        work / f"bin-{name}", root, latency=file_latency, bandwidth=bandwidth, cmd_latency=cmd_latency,
+        fail_rate=fail_rate, log=log,
+    )
+    argv = ["--base", str(library), "--dest", "/Books", "--yes", *SCENARIOS[scenario]]
+    if session == "process":
+        argv.append("--no-session")
+    started = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        with upload_environment(work / f"bin-{name}"):
+            exit_code = upload.main(argv)
+    elapsed = time.perf_counter() - started
+    records = read_log(log)
+    sent_bytes = sum(r["bytes"] for r in records)
+    remote_files = [p for p in root.rglob("*") if p.is_file() and not p.name.startswith(".fakemega")]
+    return {
+        "library": template.name,
+        "scenario": scenario,
+        "session": session,
+        "exit_code": exit_code,
+        "elapsed_sec": round(elapsed, 4),
+        "processes": sum(1 for r in records if r["via"] == "process"),
+        "commands": len(records),
+        "failed_commands": sum(1 for r in records if r["returncode"] != 0),
+        "failed_transfers": _count_failed_transfers(root),
+        "files_sent": sum(r["files"] for r in records),
+        "bytes_sent": sent_bytes,
+        "remote_files": len(remote_files),
+        "mb_per_sec": round(sent_bytes / elapsed / (1024 * 1024), 3) if elapsed > 0 else 0.0,
+    }
+
+
+def run_library_benchmark(
+    libraries: Sequence[tuple[int, int]],
+    size: tuple[int, int],
+    scenarios: Sequence[str] = tuple(SCENARIOS),
+    sessions: Sequence[str] = SESSION_MODES,
+    file_latency: float = 0.0,
+    bandwidth: float = 0.0,
+    cmd_latency: float = 0.0,
+    fail_rate: float = 0.0,
+) -> dict:
+    results = []
+    sizes = []
+    with tempfile.TemporaryDirectory(prefix="books-upload-bench-") as tmp:
+        work = Path(tmp)
+        for books, pages in libraries:
+            template = work / f"{books}x{pages}"
+            library_bytes = make_library(template, books, pages, size)
+            sizes.append({"library": template.name, "books": books, "pages": pages, "bytes": library_bytes})
+            results += [
+                run_library_mode(scenario, session, template, work, file_latency, bandwidth, cmd_latency, fail_rate)
+                for scenario in scenarios
+                for session in sessions
+            ]
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "libraries": sizes,
+            "size": list(size),
+            "file_latency": file_latency,
+            "bandwidth": bandwidth,
+            "cmd_latency": cmd_latency,
+            "fail_rate": fail_rate,
+        },
+        "library": results,
+    }
+
+
+def run_benchmark(
+    pages: int,
+    size: tuple[int, int],
+    modes: Sequence[str] = MODES,
+    file_latency: float = 0.0,
+    bandwidth: float = 0.0,
+) -> dict:
+    with tempfile.TemporaryDirectory(prefix="books-upload-bench-") as tmp:
+        work = Path(tmp)
+        book = work / "virtual_book"
+        book_bytes = make_book(book, pages, size)
+        results = [run_mode(mode, book, work, file_latency, bandwidth) for mode in modes]
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "pages": pages,
+            "size": list(size),
+            "book_bytes": book_bytes,
+            "file_latency": file_latency,
+            "bandwidth": bandwidth,
+        },
+        "modes": results,
+    }
+
+
+def _parse_size(value: str) -> tuple[int, int]:
+    try:
+        width, height = (int(v) for v in value.lower().split("x"))
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"サイズは WxH で指定してください: {value}") from e
+    return width, height
+
+
+def _parse_choices(value: str, choices: Sequence[str]) -> list[str]:
+    values = [v.strip() for v in value.split(",") if v.strip()]
+    unknown = [v for v in values if v not in choices]
+    if unknown or not values:
+        raise argparse.ArgumentTypeError(f"不明な方式: {','.join(unknown)} (選択肢: {','.join(choices)})")
+    return values
+
+
+def _parse_modes(value: str) -> list[str]:
+    return _parse_choices(value, MODES)
+
+
+def _parse_library(value: str) -> list[tuple[int, int]]:
+    libraries = []
+    for item in (v.strip() for v in value.split(",")):
+        try:
+            books, pages = (int(v) for v in item.lower().split("x"))
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(f"ライブラリは 冊数xページ数 で指定してください: {item}") from e
+        if books < 1 or pages < 1:
+            raise argparse.ArgumentTypeError(f"冊数とページ数は1以上で指定してください: {item}")
+        libraries.append((books, pages))
+    return libraries
+
+
+def print_report(report: dict) -> None:
+    meta = report["meta"]
+    if "library" in report:
+        libraries = ", ".join(f"{m['library']} ({human_bytes(m['bytes'])})" for m in meta["libraries"])
+        print(f"books-upload をライブラリ全体に実行: {libraries}")
+        print(
+            f"{'ライブラリ':<10} {'シナリオ':<10} {'方式':<8} {'秒':>8} {'プロセス':>8} {'コマンド':>8} "
+            f"{'送信':>10} {'MB/秒':>8} {'終了':>4}"
+        )
+        for r in report["library"]:
+            print(
+                f"{r['library']:<10} {r['scenario']:<10} {r['session']:<8} {r['elapsed_sec']:>8.2f} "
+                f"{r['processes']:>8} {r['commands']:>8} {human_bytes(r['bytes_sent']):>10} "
+                f"{r['mb_per_sec']:>8.2f} {r['exit_code']:>4}"
+            )
+        return
+    if "megacmd" in report:
+        print(f"MEGAcmd コマンド {meta['commands']} 回 (whoami / ls / transfers)")
+        print(f"{'方式':<10} {'起動秒':>8} {'秒':>8} {'コマンド/秒':>12} {'p50':>10} {'p95':>10}")
+        for r in report["megacmd"]:
+            print(
+                f"{r['mode']:<10} {r['start_sec']:>8.2f} {r['elapsed_sec']:>8.2f} {r['commands_per_sec']:>12.1f} "
+                f"{r['p50_ms']:>8.2f}ms {r['p95_ms']:>8.2f}ms"
+            )
+        return
+    if "capture" in report:
+        print(f"{meta['pages']} ページ (撮影込み)")
+        print(f"{'方式':<12} {'撮影秒':>8} {'撮影後秒':>8} {'合計秒':>8} {'リモート':>8}")
+        for r in report["capture"]:
+            print(
+                f"{r['mode']:<12} {r['capture_sec']:>8.2f} {r['after_capture_sec']:>8.2f} "
+                f"{r['total_sec']:>8.2f} {r['remote_files']:>8}"
+            )
+        return
+    print(f"{meta['pages']} ページ, {human_bytes(meta['book_bytes'])}")
+    print(f"{'方式':<8} {'秒':>8} {'作成秒':>8} {'ファイル/秒':>12} {'MB/秒':>8} {'リモート':>8}")
+    for r in report["modes"]:
+        print(
+            f"{r['mode']:<8} {r['elapsed_sec']:>8.2f} {r['pack_sec']:>8.2f} "
+            f"{r['files_per_sec']:>12.1f} {r['mb_per_sec']:>8.2f} {r['remote_files']:>8}"
+        )
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="アップロード方式と MEGAcmd の呼び出し方のベンチマーク (MEGAcmd 代替を使用)")
+    parser.add_argument("--pages", type=int, default=200, help="ページ数 (デフォルト: 200)")
+    parser.add_argument("--size", type=_parse_size, default=(1280, 1800), help="ページサイズ WxH (デフォルト: 1280x1800)")
+    parser.add_argument(
+        "--modes", type=_parse_modes, default=list(MODES), help=f"方式 (カンマ区切り, 選択肢: {','.join(MODES)})"
+    )
+    parser.add_argument("--file-latency", type=float, default=0.02, help="ファイルごとの遅延 秒 (デフォルト: 0.02)")
+    parser.add_argument("--bandwidth", type=float, default=0.0, help="帯域 MB/秒 (デフォルト: 0=無制限)")
+    parser.add_argument(
+        "--capture", action="store_true", help="撮影も含め、撮影後のアップロードと撮影しながらのアップロードを比べる",
+    )
+    parser.add_argument(
+        "--render-latency", type=float, default=0.02, help="--capture: ページ送り後の描画時間 秒 (デフォルト: 0.02)",
+    )
+    parser.add_argument(
+        "--batch-files", type=int, default=10, help="--capture: 撮影しながら送るときの1回のページ数 (デフォルト: 10)",
+    )
+    parser.add_argument(
+        "--commands",
+        type=int,
+        help="MEGAcmd のコマンドをこの回数実行し、プロセス起動とシェルセッションでコマンド/秒を比べる",
+    )
+    parser.add_argument(
+        "--cmd-latency",
+        type=float,
+        default=0.0,
+        help="--commands / --library: コマンドごとのサーバーの遅延 秒 (デフォルト: 0)",
+    )
+    parser.add_argument(
+        "--library",
+        type=_parse_library,
+        help="冊数xページ数 (カンマ区切り, 例: 2x10,8x25) の仮想のライブラリに books-upload を実行して比べる",
+    )
+    parser.add_argument(
+        "--scenarios",
+        type=lambda v: _parse_choices(v, tuple(SCENARIOS)),
+        default=list(SCENARIOS),
+        help=f"--library: シナリオ (カンマ区切り, 選択肢: {','.join(SCENARIOS)})",
+    )
+    parser.add_argument(
+        "--sessions",
+        type=lambda v: _parse_choices(v, SESSION_MODES),
+        default=list(SESSION_MODES),
+        help=f"--library: mega-cmd のシェルセッションの有無 (カンマ区切り, 選択肢: {','.join(SESSION_MODES)})",
+    )
+    parser.add_argument(
+        "--fail-rate", type=float, default=0.0, help="--library: 転送を失敗させるファイルの割合 0〜1 (デフォルト: 0)",
+    )
+    parser.add_argument("--output", help="結果を書き出す JSON ファイル")
+    args = parser.parse_args(argv)
+    if args.pages < 1:
+        parser.error("--pages は1以上で指定してください")
+    if args.batch_files < 1:
+        parser.error("--batch-files は1以上で指定してください")
+
+    if args.commands is not None and args.commands < 1:
+        parser.error("--commands は1以上で指定してください")
+    if not 0.0 <= args.fail_rate <= 1.0:
+        parser.error("--fail-rate は0〜1で指定してください")
+
+    bandwidth = args.bandwidth * 1024 * 1024
+    if args.commands:
+        try:
+            report = run_command_benchmark(args.commands, args.cmd_latency)
+        except RuntimeError as e:
+            print(f"[エラー] {e}")
+            return 1
+    elif args.library:
+        report = run_library_benchmark(
+            args.library,
+            args.size,
+            args.scenarios,
+            args.sessions,
+            file_latency=args.file_latency,
+            bandwidth=bandwidth,
+            cmd_latency=args.cmd_latency,
+            fail_rate=args.fail_rate,
+        )
+    elif args.capture:
+        report = run_capture_benchmark(
+            args.pages, args.size, args.render_latency, args.file_latency, bandwidth, args.batch_files,
+        )
+    else:
+        report = run_benchmark(args.pages, args.size, args.modes, file_latency=args.file_latency, bandwidth=bandwidth)
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"結果を書き出しました: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
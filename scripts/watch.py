@@ -0,0 +1,396 @@
+"""
+撮影が終わった本フォルダの自動アップロード（監視モード）。
+
+contents/ を inotify で監視し（使えない環境では定期的な stat による監視に切り替える）、
+撮影ジャーナルが撮り終えたことを示すか、一定時間ページが増えなくなったフォルダを
+アップロード待ちの列に入れる。待ち列は contents/.upload_queue.json に保存され、
+失敗したアップロードは間隔を空けて再試行する。再起動しても待ち列から続きを処理する。
+監視を始める前に撮り終えていたフォルダも、アップロードの記録が無ければ待ち列に入れる。
+
+フォルダの内容はアップロード対象のファイル（名前・サイズ・更新時刻）のハッシュで比較するため、
+マニフェストなどの隠しファイルの書き込みでは再アップロードしない。
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import hashlib
+import json
+import os
+import select
+import struct
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Iterable
+
+from scripts.journal import JOURNAL_NAME, is_complete
+from scripts.manifest import is_upload_candidate
+
+
+QUEUE_NAME = ".upload_queue.json"
+DEFAULT_QUIET_SEC = 600.0  # この秒数ファイルが増えなければ撮影が終わったとみなす
+DEFAULT_SETTLE_SEC = 5.0  # ジャーナルが撮り終えたことを示してから待つ秒数
+DEFAULT_POLL_SEC = 5.0
+DEFAULT_MAX_ATTEMPTS = 5
+RETRY_BASE_SEC = 30.0
+RETRY_MAX_SEC = 1800.0
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+BASE_MASK = IN_CREATE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE | IN_ONLYDIR
+FOLDER_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE | IN_MODIFY | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def _is_book_dir(path: Path) -> bool:
+    return path.is_dir() and not path.name.startswith(".")
+
+
+def _is_relevant(name: str) -> bool:
+    """ページ・ジャーナルの変更だけを撮影の進み具合として扱う。"""
+    return name == JOURNAL_NAME or is_upload_candidate(name)
+
+
+def content_signature(folder: str | Path) -> str | None:
+    """アップロード対象ファイルの名前・サイズ・更新時刻のハッシュ。ファイルが無ければ None。"""
+    digest = hashlib.sha1()
+    count = 0
+    try:
+        with os.scandir(folder) as it:
+            entries = sorted((e for e in it if e.is_file() and is_upload_candidate(e.name)), key=lambda e: e.name)
+        for entry in entries:
+            st = entry.stat()
+            digest.update(f"{entry.name}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+            count += 1
+    except OSError:
+        return None
+    return digest.hexdigest() if count else None
+
+
+def latest_change(folder: str | Path) -> float | None:
+    """ページ・ジャーナルのうち最後に更新されたものの更新時刻。どちらも無ければ None。"""
+    latest: float | None = None
+    try:
+        with os.scandir(folder) as it:
+            for entry in it:
+                if entry.is_file() and _is_relevant(entry.name):
+                    mtime = entry.stat().st_mtime
+                    latest = mtime if latest is None else max(latest, mtime)
+    except OSError:
+        return None
+    return latest
+
+
+class PollingWatcher:
+    """各フォルダの更新時刻を定期的に stat して、内容が変わったフォルダを返す。"""
+
+    kind = "polling"
+
+    def __init__(self, base_dir: str | Path, interval: float = DEFAULT_POLL_SEC) -> None:
+        self.base_dir = Path(base_dir)
+        self.interval = interval
+        self._state: dict[str, tuple[int, int, str | None]] = {}
+        self._scan(initial=True)
+        self._next_scan = time.monotonic() + interval
+
+    def _scan(self, initial: bool = False) -> set[str]:
+        changed: set[str] = set()
+        seen: set[str] = set()
+        for path in self.base_dir.iterdir():
+            if not _is_book_dir(path):
+                continue
+            seen.add(path.name)
+            try:
+                dir_mtime = path.stat().st_mtime_ns
+                journal = path / JOURNAL_NAME
+                journal_size = journal.stat().st_size if journal.exists() else 0
+            except OSError:
+                continue
+            previous = self._state.get(path.name)
+            if previous is not None and previous[:2] == (dir_mtime, journal_size):
+                continue
+            signature = content_signature(path)
+            if previous is None or previous[1] != journal_size or previous[2] != signature:
+                if not initial:
+                    changed.add(path.name)
+            self._state[path.name] = (dir_mtime, journal_size, signature)
+        for name in set(self._state) - seen:
+            del self._state[name]
+        return changed
+
+    def wait(self, timeout: float) -> set[str]:
+        time.sleep(max(0.0, timeout))
+        if time.monotonic() < self._next_scan:
+            return set()
+        self._next_scan = time.monotonic() + self.interval
+        return self._scan()
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """inotify で contents/ と各本フォルダの変更を受け取る。"""
+
+    kind = "inotify"
+
+    def __init__(self, base_dir: str | Path) -> None:
+        self.base_dir = Path(base_dir)
+        libc_name = ctypes.util.find_library("c")
+        if not libc_name:
+            raise OSError("libc が見つかりません")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 に失敗しました")
+        self.fd = fd
+        self._folders: dict[int, str] = {}
+        self._base_wd = self._add_watch(self.base_dir, BASE_MASK)
+        for path in self.base_dir.iterdir():
+            if _is_book_dir(path):
+                self._watch_folder(path)
+
+    def _add_watch(self, path: Path, mask: int) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch に失敗しました: {path}")
+        return wd
+
+    def _watch_folder(self, path: Path) -> None:
+        try:
+            self._folders[self._add_watch(path, FOLDER_MASK)] = path.name
+        except OSError:
+            pass  # 作成直後に削除されたフォルダなど
+
+    def wait(self, timeout: float) -> set[str]:
+        readable, _, _ = select.select([self.fd], [], [], max(0.0, timeout))
+        if not readable:
+            return set()
+        changed: set[str] = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                raw = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length]
+                name = os.fsdecode(raw.rstrip(b"\0"))
+                offset += EVENT_HEADER.size + length
+                changed |= self._handle(wd, mask, name)
+        return changed
+
+    def _handle(self, wd: int, mask: int, name: str) -> set[str]:
+        if mask & IN_Q_OVERFLOW:
+            # イベントを取りこぼしたので全フォルダを変更ありとして扱う
+            return {p.name for p in self.base_dir.iterdir() if _is_book_dir(p)}
+        if mask & IN_IGNORED:
+            self._folders.pop(wd, None)
+            return set()
+        if wd == self._base_wd:
+            path = self.base_dir / name
+            if mask & (IN_CREATE | IN_MOVED_TO) and mask & IN_ISDIR and _is_book_dir(path):
+                self._watch_folder(path)
+                return {name}
+            return set()
+        folder = self._folders.get(wd)
+        if folder is None or (name and not _is_relevant(name)):
+            return set()
+        return {folder}
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def open_watcher(base_dir: str | Path, interval: float = DEFAULT_POLL_SEC, polling: bool = False):
+    """inotify が使えれば InotifyWatcher、使えなければ PollingWatcher を返す。"""
+    if not polling:
+        try:
+            return InotifyWatcher(base_dir)
+        except (OSError, AttributeError) as e:
+            print(f"[警告] inotify を使えないため定期的な確認で監視します: {e}")
+    return PollingWatcher(base_dir, interval)
+
+
+@dataclass
+class QueueItem:
+    name: str
+    signature: str | None
+    status: str = "pending"  # pending / done / failed
+    attempts: int = 0
+    next_attempt: float = 0.0
+    error: str | None = None
+    updated_at: float = 0.0
+
+
+class UploadQueue:
+    """アップロード待ちの列。変更のたびにファイルへ書き出す。"""
+
+    def __init__(self, path: str | Path, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> None:
+        self.path = Path(path)
+        self.max_attempts = max_attempts
+        self.items: dict[str, QueueItem] = {}
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            self.items = {item["name"]: QueueItem(**item) for item in data.get("items", [])}
+        except (OSError, ValueError, TypeError, KeyError, AttributeError):
+            self.items = {}
+
+    def save(self) -> None:
+        data = {"items": [asdict(item) for item in self.items.values()]}
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def enqueue(self, name: str, signature: str | None, now: float) -> bool:
+        """待ち列に入れる。同じ内容が待機中またはアップロード済みなら何もしない。"""
+        item = self.items.get(name)
+        if item is not None and item.signature == signature and item.status in ("pending", "done"):
+            return False
+        self.items[name] = QueueItem(name, signature, updated_at=now)
+        self.save()
+        return True
+
+    def due(self, now: float) -> list[QueueItem]:
+        return [i for i in self.items.values() if i.status == "pending" and i.next_attempt <= now]
+
+    def pending(self) -> list[QueueItem]:
+        return [i for i in self.items.values() if i.status == "pending"]
+
+    def drop(self, name: str) -> None:
+        if self.items.pop(name, None) is not None:
+            self.save()
+
+    def mark_done(self, name: str, now: float) -> None:
+        item = self.items[name]
+        item.status, item.error, item.updated_at = "done", None, now
+        self.save()
+
+    def mark_failed(self, name: str, error: str | None, now: float) -> None:
+        """失敗を記録する。max_attempts 回までは間隔を倍にしながら再試行する。"""
+        item = self.items[name]
+        item.attempts += 1
+        item.error, item.updated_at = error, now
+        if item.attempts >= self.max_attempts:
+            item.status = "failed"
+        else:
+            item.next_attempt = now + min(RETRY_MAX_SEC, RETRY_BASE_SEC * 2 ** (item.attempts - 1))
+        self.save()
+
+
+class UploadWatcher:
+    """フォルダの変更を受け取り、撮影が終わったものを待ち列に入れてアップロードする。
+
+    upload はフォルダを受け取り、成功なら None、失敗ならエラーメッセージを返す。
+    """
+
+    def __init__(
+        self,
+        base_dir: str | Path,
+        upload: Callable[[Path], str | None],
+        queue: UploadQueue,
+        quiet_sec: float = DEFAULT_QUIET_SEC,
+        settle_sec: float = DEFAULT_SETTLE_SEC,
+    ) -> None:
+        self.base_dir = Path(base_dir)
+        self.upload = upload
+        self.queue = queue
+        self.quiet_sec = quiet_sec
+        self.settle_sec = settle_sec
+        self.last_change: dict[str, float] = {}
+
+    def notice(self, names: Iterable[str], now: float) -> None:
+        for name in names:
+            self.last_change[name] = now
+
+    def scan_existing(self, now: float, uploaded: Callable[[Path], bool] | None = None) -> list[str]:
+        """起動前からあるフォルダのうち、アップロード済みでないものを見張り始める。
+
+        ページ・ジャーナルを最後に更新した時刻から数えるため、撮り終えたフォルダや
+        quiet_sec 以上止まっているフォルダは次の tick で待ち列に入る。
+        uploaded がフォルダを受け取って True を返したもの（カタログ等にアップロードの記録があるもの）は除く。
+        """
+        names: list[str] = []
+        for path in sorted(self.base_dir.iterdir()):
+            if not _is_book_dir(path) or path.name in self.last_change:
+                continue
+            item = self.queue.items.get(path.name)
+            if item is not None and item.status == "pending":
+                continue  # 前回の待ち列から再開する
+            changed_at = latest_change(path)
+            if changed_at is None or (uploaded is not None and uploaded(path)):
+                continue
+            self.last_change[path.name] = min(now, changed_at)
+            names.append(path.name)
+        return names
+
+    def _ready(self, name: str, since: float) -> bool:
+        folder = self.base_dir / name
+        if not folder.is_dir():
+            return True  # 削除された（待ち列には入れない）
+        if since >= self.quiet_sec:
+            return True
+        return since >= self.settle_sec and is_complete(folder)
+
+    def tick(self, now: float) -> list[tuple[str, str | None]]:
+        """撮影が終わったフォルダを待ち列に入れ、再試行時刻になったものをアップロードする。"""
+        for name, changed_at in list(self.last_change.items()):
+            if not self._ready(name, now - changed_at):
+                continue
+            del self.last_change[name]
+            folder = self.base_dir / name
+            signature = content_signature(folder) if folder.is_dir() else None
+            if signature is not None and self.queue.enqueue(name, signature, now):
+                print(f"アップロード待ちに追加: {name}")
+
+        results: list[tuple[str, str | None]] = []
+        for item in self.queue.due(now):
+            if item.name in self.last_change:
+                continue  # 再び変更されている間は待つ
+            folder = self.base_dir / item.name
+            if not folder.is_dir():
+                print(f"[警告] {item.name}: フォルダが無くなったため待ち列から外します")
+                self.queue.drop(item.name)
+                continue
+            error = self.upload(folder)
+            if error is None:
+                self.queue.mark_done(item.name, now)
+            else:
+                self.queue.mark_failed(item.name, error, now)
+                item = self.queue.items[item.name]
+                if item.status == "failed":
+                    print(f"[エラー] {item.name}: {item.attempts} 回失敗したため諦めます: {error}")
+                else:
+                    print(f"[警告] {item.name}: アップロードに失敗しました（{item.next_attempt - now:.0f}秒後に再試行）: {error}")
+            results.append((item.name, error))
+        return results
+
+
+def run_watch(
+    watcher: UploadWatcher,
+    source,
+    tick_sec: float = 1.0,
+    clock: Callable[[], float] = time.time,
+    should_stop: Callable[[], bool] = lambda: False,
+) -> None:
+    """Ctrl+C (または should_stop) まで変更の受け取りとアップロードを繰り返す。"""
+    while not should_stop():
+        changed = source.wait(tick_sec)
+        now = clock()
+        watcher.notice(changed, now)
+        watcher.tick(now)
@@ -0,0 +1,66 @@
+import os
+import zipfile
+
+from scripts.archive import archive_name, is_archive_current, pack_folder
+
+
+def _book(tmp_path, pages=3):
+    folder = tmp_path / "book"
+    folder.mkdir()
+    for i in range(1, pages + 1):
+        (folder / f"screenshot_{i:04d}.png").write_bytes(bytes([i]) * (100 * i))
+    return folder
+
+
+class TestPackFolder:
+    def test_stores_pages_uncompressed(self, tmp_path):
+        folder = _book(tmp_path)
+        info = pack_folder(folder, tmp_path / archive_name(folder))
+
+        assert info.files == 3
+        assert info.bytes_in == 600
+        assert not info.reused
+        with zipfile.ZipFile(info.path) as zf:
+            assert zf.namelist() == ["screenshot_0001.png", "screenshot_0002.png", "screenshot_0003.png"]
+            assert all(i.compress_type == zipfile.ZIP_STORED for i in zf.infolist())
+            assert zf.read("screenshot_0002.png") == bytes([2]) * 200
+        assert not list(tmp_path.glob(".*.tmp"))
+
+    def test_excludes_hidden_and_temp_files(self, tmp_path):
+        folder = _book(tmp_path, pages=1)
+        (folder / ".capture_journal.jsonl").write_text("{}", encoding="utf-8")
+        (folder / ".screenshot_0002.png.tmp").write_bytes(b"x")
+        info = pack_folder(folder, tmp_path / "book.zip")
+        with zipfile.ZipFile(info.path) as zf:
+            assert zf.namelist() == ["screenshot_0001.png"]
+
+    def test_reuses_current_archive(self, tmp_path):
+        folder = _book(tmp_path)
+        path = tmp_path / "book.cbz"
+        pack_folder(folder, path)
+        assert is_archive_current(folder, path)
+        assert pack_folder(folder, path).reused
+
+    def test_rebuilds_when_pages_change(self, tmp_path):
+        folder = _book(tmp_path)
+        path = tmp_path / "book.cbz"
+        pack_folder(folder, path)
+        (folder / "screenshot_0004.png").write_bytes(b"new")
+        assert not is_archive_current(folder, path)
+        info = pack_folder(folder, path)
+        assert not info.reused and info.files == 4
+
+    def test_rebuilds_when_page_is_newer(self, tmp_path):
+        folder = _book(tmp_path)
+        path = tmp_path / "book.cbz"
+        pack_folder(folder, path)
+        page = folder / "screenshot_0001.png"
+        later = path.stat().st_mtime + 10
+        os.utime(page, (later, later))
+        assert not is_archive_current(folder, path)
+
+    def test_broken_archive_is_not_current(self, tmp_path):
+        folder = _book(tmp_path)
+        path = tmp_path / "book.cbz"
+        path.write_bytes(b"not a zip")
+        assert not is_archive_current(folder, path)
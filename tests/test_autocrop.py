@@ -0,0 +1,108 @@
+from PIL import Image
+
+from scripts.autocrop import AutoCropper, content_box, detect_crop
+from scripts.backends import VirtualBookBackend
+from scripts.journal import CaptureJournal, load_crop, load_pages
+from scripts.screenshot import CaptureConfig, CaptureOptions, run_capture
+
+
+FAST = {"page_delay": 0.0, "retry_wait": 0.0}
+
+
+def _book(**kwargs):
+    return VirtualBookBackend(size=(320, 480), toolbar=6, **kwargs)
+
+
+class TestContentBox:
+    def test_excludes_margins_and_toolbar(self):
+        page = _book().render_page(0)
+        left, top, right, bottom = content_box(page)
+        assert (left, top) == (20, 20)  # 余白 (幅/16) とツールバー (6px) を含まない
+        assert right <= 301 and bottom < 480
+
+    def test_blank_page(self):
+        assert content_box(Image.new("RGB", (40, 40), (255, 255, 255))) is None
+
+    def test_union_of_samples(self):
+        book = _book()
+        samples = [book.render_page(i) for i in range(3)]
+        box = detect_crop(samples, padding=2)
+        for image in samples:
+            single = content_box(image)
+            assert box[0] <= single[0] and box[1] <= single[1] and box[2] >= single[2] and box[3] >= single[3]
+
+    def test_not_worth_cropping(self):
+        image = Image.new("RGB", (40, 40), (255, 255, 255))
+        image.putpixel((0, 0), (0, 0, 0))
+        image.putpixel((39, 39), (0, 0, 0))
+        assert detect_crop([image]) is None
+
+
+class TestRegion:
+    def _cropper(self, scale):
+        cropper = AutoCropper(samples=1)
+        frame = Image.new("RGB", (int(100 * scale), int(200 * scale)))
+        cropper.hold(1, "a.png", frame, {"at": [10, 20], "size": [100, 200]})
+        cropper.box = (11, 21, 81, 161)
+        cropper.decided = True
+        return cropper
+
+    def test_integer_scale_uses_grab_geometry(self):
+        window, residual = self._cropper(1).region({"at": [10, 20], "size": [100, 200]})
+        assert window["at"] == [21, 41] and window["size"] == [70, 140]
+        assert residual is None
+
+    def test_hidpi_keeps_residual(self):
+        window, residual = self._cropper(2).region({"at": [0, 0], "size": [100, 200]})
+        assert window["at"] == [5, 10] and window["size"] == [36, 71]
+        assert residual == (1, 1, 71, 141)
+
+    def test_fractional_scale_crops_in_memory(self):
+        window, residual = self._cropper(1.5).region({"at": [0, 0], "size": [100, 200]})
+        assert window["size"] == [100, 200]
+        assert residual == (11, 21, 81, 161)
+
+    def test_resized_window_disables_crop(self):
+        window, residual = self._cropper(1).region({"at": [0, 0], "size": [120, 200]})
+        assert window["size"] == [120, 200] and residual is None
+
+
+class TestRunCaptureAutocrop:
+    def test_all_pages_cropped(self, tmp_path):
+        config = CaptureConfig(action_key="Right", save_dir=str(tmp_path))
+        journal = CaptureJournal(tmp_path)
+        result = run_capture(_book(pages=6), config, CaptureOptions(autocrop=True, **FAST), journal=journal)
+        journal.close()
+
+        assert result.saved == 6 and result.stop_reason == "end"
+        box = result.crop_box
+        assert box is not None
+        sizes = set()
+        for path in sorted(tmp_path.glob("*.png")):
+            with Image.open(path) as image:
+                sizes.add(image.size)
+        assert sizes == {(box[2] - box[0], box[3] - box[1])}
+        assert load_crop(tmp_path)["box"] == list(box)
+        assert {p.fingerprint.size for p in load_pages(tmp_path)} == sizes
+
+    def test_pipeline_and_short_book(self, tmp_path):
+        config = CaptureConfig(action_key="Right", save_dir=str(tmp_path))
+        result = run_capture(_book(pages=2), config, CaptureOptions(autocrop=True, pipeline=True, **FAST))
+        assert result.saved == 2
+        assert result.crop_box is not None
+        assert len(list(tmp_path.glob("*.png"))) == 2
+
+    def test_resume_reuses_recorded_crop(self, tmp_path):
+        config = CaptureConfig(action_key="Right", save_dir=str(tmp_path))
+        options = CaptureOptions(autocrop=True, book_index=True, **FAST)
+        journal = CaptureJournal(tmp_path)
+        first = run_capture(_book(pages=8), config, CaptureOptions(autocrop=True, max_pages=4, **FAST), journal=journal)
+        journal.close()
+
+        journal = CaptureJournal(tmp_path)
+        second = run_capture(_book(pages=8), config, options, journal=journal, resume_pages=load_pages(tmp_path))
+        journal.close()
+
+        assert second.crop_box == first.crop_box
+        assert second.saved == 4
+        assert [d[1] for d in second.duplicates] == [1, 2, 3, 4]
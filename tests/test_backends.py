@@ -0,0 +1,163 @@
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+from PIL import Image, ImageChops, ImageStat
+
+from scripts.backends import HyprlandBackend, VirtualBookBackend
+from scripts.fakehypr import FakeHyprland, install_wtype
+from scripts.fingerprint import images_are_same
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestVirtualBookBackend:
+    def test_deterministic_pages(self):
+        a = VirtualBookBackend(size=(100, 140), seed=1)
+        b = VirtualBookBackend(size=(100, 140), seed=1)
+        assert a.render_page(3).tobytes() == b.render_page(3).tobytes()
+
+    @pytest.mark.parametrize("layout", ["text", "blocks"])
+    def test_adjacent_pages_differ(self, layout):
+        book = VirtualBookBackend(size=(100, 140), layout=layout)
+        assert not images_are_same(book.render_page(0), book.render_page(1))
+
+    def test_text_layout(self):
+        book = VirtualBookBackend(size=(1920, 1080))
+        assert book.layout == "text"
+        a, b = book.render_page(0), book.render_page(1)
+        assert not images_are_same(a, b)
+        # 文字ほどの大きさの線なので、縮小するとページの違いがほとんど消える
+        thumb_a, thumb_b = (img.resize((32, 32), Image.Resampling.BOX).convert("L") for img in (a, b))
+        assert ImageStat.Stat(ImageChops.difference(thumb_a, thumb_b)).mean[0] < 2.0
+        assert a.tobytes() == VirtualBookBackend(size=(1920, 1080)).render_page(0).tobytes()
+
+    def test_window_matches_size(self):
+        book = VirtualBookBackend(size=(100, 140))
+        assert book.active_window()["size"] == [100, 140]
+
+    def test_forward_key_only(self):
+        book = VirtualBookBackend(pages=3, forward_key="Left")
+        book.send_key("Right")
+        assert book.page == 0
+        book.send_key("Left")
+        assert book.page == 1
+        assert book.key_presses == 2
+
+    def test_end_stay(self):
+        book = VirtualBookBackend(pages=2, end="stay")
+        book.send_key("Right")
+        book.send_key("Right")
+        assert book.page == 1
+
+    def test_end_wrap(self):
+        book = VirtualBookBackend(pages=2, end="wrap")
+        book.send_key("Right")
+        book.send_key("Right")
+        assert book.page == 0
+
+    def test_render_latency_and_transition(self):
+        clock = FakeClock()
+        book = VirtualBookBackend(pages=3, size=(60, 80), render_latency=0.3, transition_frames=2, clock=clock)
+        window = book.active_window()
+        page0, page1 = book.render_page(0).tobytes(), book.render_page(1).tobytes()
+        book.send_key("Right")
+        assert book.grab(window).tobytes() == page0
+        clock.now = 0.15
+        mid = book.grab(window).tobytes()
+        assert mid not in (page0, page1)
+        clock.now = 0.3
+        assert book.grab(window).tobytes() == page1
+
+    def test_scaled_grab(self):
+        book = VirtualBookBackend(size=(100, 140))
+        assert book.grab(book.active_window(), scale=0.5).size == (50, 70)
+
+    def test_invalid_arguments(self):
+        with pytest.raises(ValueError):
+            VirtualBookBackend(pages=0)
+        with pytest.raises(ValueError):
+            VirtualBookBackend(end="loop")
+        with pytest.raises(ValueError):
+            VirtualBookBackend(layout="braille")
+
+
+@pytest.fixture
+def fake_hyprland(monkeypatch):
+    # AF_UNIX のパス長制限があるため tmp_path ではなく短いディレクトリを使う
+    with tempfile.TemporaryDirectory(prefix="hypr") as tmp:
+        fake = FakeHyprland(Path(tmp) / "hypr" / "sig")
+        log = Path(tmp) / "wtype.log"
+        install_wtype(Path(tmp) / "bin", log)
+        monkeypatch.setenv("XDG_RUNTIME_DIR", tmp)
+        monkeypatch.setenv("HYPRLAND_INSTANCE_SIGNATURE", "sig")
+        monkeypatch.setenv("PATH", f"{Path(tmp) / 'bin'}{os.pathsep}{os.environ['PATH']}")
+        try:
+            yield fake, log
+        finally:
+            fake.close()
+
+
+class TestHyprlandBackendKeys:
+    def _wtype_calls(self, log):
+        return log.read_text().splitlines() if log.exists() else []
+
+    def test_sendshortcut_to_captured_window(self, fake_hyprland):
+        fake, log = fake_hyprland
+        backend = HyprlandBackend()
+        try:
+            backend.send_key("Right")
+            backend.active_window()
+            backend.send_key("Left")
+        finally:
+            backend.close()
+        assert fake.shortcuts == [",Right", ",Left,address:0x1"]
+        assert self._wtype_calls(log) == []
+
+    def test_auto_falls_back_to_wtype(self, fake_hyprland):
+        fake, log = fake_hyprland
+        fake.fail_dispatch = True
+        backend = HyprlandBackend()
+        try:
+            backend.send_key("Right")
+            backend.send_key("Right")
+        finally:
+            backend.close()
+        assert backend.key_method == "wtype"
+        assert len(fake.shortcuts) == 1
+        assert self._wtype_calls(log) == ["-k Right", "-k Right"]
+
+    def test_ipc_only_does_not_spawn_wtype(self, fake_hyprland):
+        fake, log = fake_hyprland
+        fake.fail_dispatch = True
+        backend = HyprlandBackend(key_method="ipc")
+        try:
+            backend.send_key("Right")
+        finally:
+            backend.close()
+        assert backend.key_method == "ipc"
+        assert "wtype" not in backend.missing_requirements()
+        assert self._wtype_calls(log) == []
+
+    def test_wtype_method(self, fake_hyprland):
+        fake, log = fake_hyprland
+        backend = HyprlandBackend(key_method="wtype")
+        try:
+            backend.send_key("Left")
+        finally:
+            backend.close()
+        assert fake.shortcuts == []
+        assert self._wtype_calls(log) == ["-k Left"]
+
+    def test_without_socket_uses_wtype(self, monkeypatch):
+        monkeypatch.delenv("HYPRLAND_INSTANCE_SIGNATURE", raising=False)
+        assert HyprlandBackend(key_method="ipc").key_method == "wtype"
+        with pytest.raises(ValueError):
+            HyprlandBackend(key_method="xdotool")
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from scripts.backends import VirtualBookBackend
+from scripts.batch import (
+    BatchJob,
+    BatchResults,
+    JobFileError,
+    JobResult,
+    default_results_path,
+    focus_job_window,
+    load_jobs,
+)
+
+
+def _write(path, data):
+    path.write_text(json.dumps(data), encoding="utf-8")
+    return path
+
+
+class TestLoadJobs:
+    def test_jobs_object(self, tmp_path):
+        path = _write(tmp_path / "jobs.json", {"jobs": [
+            {"folder": "market_wizards", "key": "right", "max_pages": 400, "window_class": "kindle"},
+            {"folder": "book-2", "key": "Left", "window_title": "Reminiscences"},
+        ]})
+        assert load_jobs(path) == [
+            BatchJob("market_wizards", "Right", 400, "kindle", None),
+            BatchJob("book-2", "Left", None, None, "Reminiscences"),
+        ]
+
+    def test_top_level_list(self, tmp_path):
+        path = _write(tmp_path / "jobs.json", [{"folder": "a", "key": "Right"}])
+        assert load_jobs(path) == [BatchJob("a", "Right")]
+
+    @pytest.mark.parametrize("job", [
+        {"folder": "日本語", "key": "Right"},
+        {"folder": "a", "key": "Up"},
+        {"folder": "a", "key": "Right", "max_pages": 0},
+        {"folder": "a", "key": "Right", "max_pages": "10"},
+        {"folder": "a", "key": "Right", "window_class": "("},
+        {"folder": "a", "key": "Right", "window": "kindle"},
+    ])
+    def test_invalid_job(self, tmp_path, job):
+        with pytest.raises(JobFileError):
+            load_jobs(_write(tmp_path / "jobs.json", [job]))
+
+    def test_duplicate_folder(self, tmp_path):
+        path = _write(tmp_path / "jobs.json", [{"folder": "a", "key": "Right"}, {"folder": "a", "key": "Left"}])
+        with pytest.raises(JobFileError, match="重複"):
+            load_jobs(path)
+
+    def test_empty_or_broken(self, tmp_path):
+        with pytest.raises(JobFileError):
+            load_jobs(_write(tmp_path / "jobs.json", {"jobs": []}))
+        (tmp_path / "broken.json").write_text("{", encoding="utf-8")
+        with pytest.raises(JobFileError):
+            load_jobs(tmp_path / "broken.json")
+        with pytest.raises(JobFileError):
+            load_jobs(tmp_path / "missing.json")
+
+
+class TestBatchResults:
+    def test_written_after_each_job(self, tmp_path):
+        path = default_results_path(tmp_path / "night.json")
+        assert path == tmp_path / "night.results.json"
+        results = BatchResults(path, job_file="night.json")
+        results.add(JobResult("a", "done", elapsed=4.0, saved=10))
+        data = json.loads(path.read_text(encoding="utf-8"))
+        assert data["finished_at"] is None
+        assert data["jobs"][0]["pages_per_sec"] == 2.5
+
+        results.add(JobResult("b", "focus_failed", error="見つかりません"))
+        results.finish()
+        data = json.loads(path.read_text(encoding="utf-8"))
+        assert [job["status"] for job in data["jobs"]] == ["done", "focus_failed"]
+        assert data["finished_at"] is not None
+        assert not results.ok
+
+
+class TestFocusJobWindow:
+    def test_without_window_uses_active(self):
+        backend = VirtualBookBackend(pages=2, size=(32, 48))
+        assert focus_job_window(backend, BatchJob("a", "Right"))["title"] == "virtual book"
+
+    def test_matching_window(self):
+        backend = VirtualBookBackend(pages=2, size=(32, 48))
+        job = BatchJob("a", "Right", window_class="^virtual$", window_title="book")
+        assert focus_job_window(backend, job)["class"] == "virtual"
+
+    def test_missing_window(self):
+        backend = VirtualBookBackend(pages=2, size=(32, 48))
+        assert focus_job_window(backend, BatchJob("a", "Right", window_class="kindle")) is None
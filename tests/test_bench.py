@@ -0,0 +1,44 @@
+import argparse
+import json
+
+import pytest
+
+from scripts.bench import Scenario, _parse_modes, _parse_sizes, main, run_scenario
+
+
+class TestParsers:
+    def test_sizes(self):
+        assert _parse_sizes("64x96, 128x192") == [(64, 96), (128, 192)]
+
+    def test_invalid_size(self):
+        with pytest.raises(argparse.ArgumentTypeError):
+            _parse_sizes("64")
+
+    def test_invalid_mode(self):
+        with pytest.raises(argparse.ArgumentTypeError):
+            _parse_modes("serial,turbo")
+
+
+class TestRunScenario:
+    def test_reports_throughput_and_stages(self):
+        result = run_scenario(Scenario(pages=4, width=64, height=96, mode="pipeline"))
+        assert result["saved"] == 4
+        assert result["pages_per_sec"] > 0
+        assert result["bytes_written"] > 0
+        assert result["peak_rss_kb"] > 0
+        for stage in ("window", "grab", "fingerprint", "compare", "write", "key"):
+            assert result["stages"][stage]["count"] >= 3
+
+    def test_text_pages_are_all_saved(self):
+        result = run_scenario(Scenario(pages=4, width=1920, height=1080, layout="text"))
+        assert result["saved"] == 4
+        assert result["scenario"]["layout"] == "text"
+
+
+class TestMain:
+    def test_writes_json(self, tmp_path, capsys):
+        output = tmp_path / "bench.json"
+        assert main(["--pages", "3", "--sizes", "64x96", "--modes", "serial", "--output", str(output)]) == 0
+        report = json.loads(output.read_text(encoding="utf-8"))
+        assert [s["name"] for s in report["scenarios"]] == ["serial-64x96-3p"]
+        assert "timestamp" in report["meta"]
@@ -0,0 +1,74 @@
+import pytest
+from PIL import Image
+
+from scripts.backends import VirtualBookBackend
+from scripts.bookindex import BookIndex
+from scripts.fingerprint import compute_fingerprint
+
+
+@pytest.fixture
+def pages():
+    book = VirtualBookBackend(size=(120, 160))
+    return [compute_fingerprint(book.render_page(i)) for i in range(5)]
+
+
+class TestBookIndex:
+    def test_exact_match(self, pages):
+        index = BookIndex()
+        for i, fp in enumerate(pages, start=1):
+            index.add(i, fp)
+        match = index.lookup(pages[2])
+        assert match.page == 3
+        assert match.exact is True
+        assert len(index) == 5
+
+    def test_no_match(self, pages):
+        index = BookIndex()
+        index.add(1, pages[0])
+        assert index.lookup(pages[1]) is None
+
+    def test_near_match(self):
+        book = VirtualBookBackend(size=(120, 160))
+        img = book.render_page(0)
+        changed = img.copy()
+        changed.putpixel((1, 1), (0, 0, 0))
+        index = BookIndex()
+        index.add(7, compute_fingerprint(img))
+        match = index.lookup(compute_fingerprint(changed))
+        assert match.page == 7
+        assert match.exact is False
+
+    def test_distinct_text_pages_do_not_match(self):
+        # 本文のページは dHash と縮小画像がほぼ一致するが、帯チェックサムで別のページと分かる
+        book = VirtualBookBackend(pages=20, size=(1920, 1080))
+        index = BookIndex()
+        for i in range(20):
+            fingerprint = compute_fingerprint(book.render_page(i))
+            assert index.lookup(fingerprint) is None
+            index.add(i + 1, fingerprint)
+
+    def test_near_match_needs_matching_bands(self):
+        img = Image.new("RGB", (64, 256), (255, 255, 255))
+        changed = img.copy()
+        changed.paste((0, 0, 0), (0, 0, 64, 8))
+        strict, loose = BookIndex(threshold=0.9), BookIndex(threshold=0.9, band_threshold=0.9)
+        for index in (strict, loose):
+            index.add(1, compute_fingerprint(img))
+        # 256 帯のうち 8 帯が変わっている
+        assert strict.lookup(compute_fingerprint(changed)) is None
+        assert loose.lookup(compute_fingerprint(changed)).page == 1
+
+    def test_near_match_respects_size(self):
+        index = BookIndex()
+        index.add(1, compute_fingerprint(Image.new("RGB", (64, 64), (255, 255, 255))))
+        assert index.lookup(compute_fingerprint(Image.new("RGB", (64, 65), (255, 255, 255)))) is None
+
+    def test_first_page_wins(self, pages):
+        index = BookIndex()
+        index.add(1, pages[0])
+        index.add(9, pages[0])
+        assert index.lookup(pages[0]).page == 1
+
+    def test_invalid_distance(self):
+        with pytest.raises(ValueError):
+            BookIndex(max_distance=4)
@@ -0,0 +1,116 @@
+import os
+from datetime import datetime, timedelta
+
+from scripts import catalog as catalog_mod
+from scripts.catalog import CATALOG_NAME, Catalog, folder_stats
+
+
+def _book(base, name, pages=2):
+    folder = base / name
+    folder.mkdir()
+    for i in range(1, pages + 1):
+        (folder / f"screenshot_{i:04d}.png").write_bytes(b"x" * 10 * i)
+    return folder
+
+
+def _touch_dir(folder, delta=5):
+    st = folder.stat()
+    os.utime(folder, ns=(st.st_atime_ns, st.st_mtime_ns + delta * 10**9))
+
+
+class CountingScan:
+    def __init__(self):
+        self.scanned = []
+
+    def __call__(self, folder):
+        self.scanned.append(folder.name)
+        return folder_stats(folder)
+
+
+class TestFolderStats:
+    def test_counts_images_and_bytes(self, tmp_path):
+        folder = _book(tmp_path, "book", pages=3)
+        (folder / ".capture_journal.jsonl").write_text("{}", encoding="utf-8")
+        stats = folder_stats(folder)
+        assert stats.image_files == 3
+        assert stats.total_bytes == 60
+        assert stats.last_modified is not None
+
+    def test_missing_folder(self, tmp_path):
+        assert folder_stats(tmp_path / "missing").image_files == 0
+
+
+class TestCatalogRefresh:
+    def test_rescans_only_changed_folders(self, tmp_path, monkeypatch):
+        a, b = _book(tmp_path, "a"), _book(tmp_path, "b")
+        scan = CountingScan()
+        monkeypatch.setattr(catalog_mod, "folder_stats", scan)
+
+        with Catalog.open(tmp_path) as catalog:
+            stats, info = catalog.refresh([a, b])
+            assert sorted(scan.scanned) == ["a", "b"] and info.scanned == 2
+            assert stats["a"].image_files == 2
+
+        (b / "screenshot_0003.png").write_bytes(b"new")
+        _touch_dir(b)
+        scan.scanned.clear()
+        with Catalog.open(tmp_path) as catalog:
+            stats, info = catalog.refresh([a, b])
+        assert scan.scanned == ["b"]
+        assert stats["a"].image_files == 2 and stats["b"].image_files == 3
+        assert stats["a"].last_modified is not None
+
+    def test_appended_journal_does_not_stale_cache(self, tmp_path):
+        folder = _book(tmp_path, "a")
+        journal = folder / ".capture_journal.jsonl"
+        journal.write_text("{}\n", encoding="utf-8")
+        with Catalog.open(tmp_path) as catalog:
+            catalog.refresh([folder])
+            mtime_ns = folder.stat().st_mtime_ns
+            with journal.open("a", encoding="utf-8") as f:
+                f.write('{"event": "end"}\n')
+            os.utime(journal, (journal.stat().st_atime + 60, journal.stat().st_mtime + 60))
+            assert folder.stat().st_mtime_ns == mtime_ns  # 追記ではディレクトリの更新時刻は変わらない
+            stats, info = catalog.refresh([folder])
+        assert info.scanned == 0
+        assert stats["a"] == folder_stats(folder)
+
+    def test_force_rescans_everything(self, tmp_path, monkeypatch):
+        folders = [_book(tmp_path, "a"), _book(tmp_path, "b")]
+        with Catalog.open(tmp_path) as catalog:
+            catalog.refresh(folders)
+            scan = CountingScan()
+            monkeypatch.setattr(catalog_mod, "folder_stats", scan)
+            _, info = catalog.refresh(folders, force=True)
+        assert info.scanned == 2
+
+    def test_inode_change_is_rescanned(self, tmp_path):
+        folder = _book(tmp_path, "a")
+        with Catalog.open(tmp_path) as catalog:
+            catalog.refresh([folder])
+            # 同じ名前・同じ更新時刻で別のフォルダに置き換わった場合
+            catalog.conn.execute("UPDATE folders SET inode = inode + 1, image_files = 99")
+            stats, info = catalog.refresh([folder])
+        assert info.scanned == 1 and stats["a"].image_files == 2
+
+    def test_parallel_scan_and_removal(self, tmp_path):
+        folders = [_book(tmp_path, f"book{i}", pages=i + 1) for i in range(6)]
+        with Catalog.open(tmp_path) as catalog:
+            stats, info = catalog.refresh(folders, workers=4)
+            assert [stats[f.name].image_files for f in folders] == [1, 2, 3, 4, 5, 6]
+            _, info = catalog.refresh(folders[:4])
+        assert info.removed == 2 and info.scanned == 0
+        assert (tmp_path / CATALOG_NAME).exists()
+
+
+class TestUploadStatus:
+    def test_records_latest_status_per_dest(self, tmp_path):
+        with Catalog.open(tmp_path) as catalog:
+            catalog.record_upload("a", "/book", "failed", error="API error")
+            catalog.record_upload("a", "/book", "uploaded", files=3, size=300)
+            catalog.record_upload("b", "/other", "uploaded")
+            records = catalog.upload_status(["a", "b"], "/book")
+        assert list(records) == ["a"]
+        assert records["a"].status == "uploaded"
+        assert records["a"].files == 3 and records["a"].error is None
+        assert datetime.now() - records["a"].updated_at < timedelta(minutes=1)
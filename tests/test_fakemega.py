@@ -0,0 +1,70 @@
+import subprocess
+
+from scripts.fakemega import FakeSettings, install_commands, put, read_log, transfers
+from scripts.transfers import TRANSFERS_ARGS, parse_transfers
+
+
+def _book(tmp_path, name="book", pages=4):
+    folder = tmp_path / name
+    folder.mkdir()
+    for i in range(pages):
+        (folder / f"page_{i + 1:04d}.png").write_bytes(b"x" * (i + 1))
+    return folder
+
+
+class TestFailureInjection:
+    def test_pattern_stops_plain_put(self, tmp_path, capsys):
+        book = _book(tmp_path)
+        settings = FakeSettings(fail_pattern=r"page_0003")
+        assert put(["-c", str(book), "/Books"], tmp_path / "remote", settings) == 1
+        assert "page_0003.png" in capsys.readouterr().err
+        sent = sorted(p.name for p in (tmp_path / "remote" / "Books" / "book").iterdir())
+        assert sent == ["page_0001.png", "page_0002.png"]
+
+    def test_rate_is_deterministic(self, tmp_path):
+        paths = [tmp_path / "book" / f"page_{i:04d}.png" for i in range(200)]
+        first = [FakeSettings(fail_rate=0.25, seed="1").should_fail(p) for p in paths]
+        assert first == [FakeSettings(fail_rate=0.25, seed="1").should_fail(p) for p in paths]
+        assert first != [FakeSettings(fail_rate=0.25, seed="2").should_fail(p) for p in paths]
+        assert 20 < sum(first) < 80
+        assert not any(FakeSettings().should_fail(p) for p in paths)
+
+
+class TestTransfers:
+    def test_queued_put_is_listed(self, tmp_path, capsys):
+        root = tmp_path / "remote"
+        good, bad = _book(tmp_path, "good"), _book(tmp_path, "bad")
+        settings = FakeSettings(fail_pattern="/bad/")
+        assert put(["-c", "-q", str(good), "/Books"], root, settings) == 0
+        assert put(["-c", "-q", str(bad), "/Books"], root, settings) == 0
+        capsys.readouterr()
+
+        transfers(TRANSFERS_ARGS, root)
+        rows = parse_transfers(capsys.readouterr().out)
+        assert [(t.source, t.destination, t.state) for t in rows] == [
+            (str(good), "/Books/good", "COMPLETED"),
+            (str(bad), "/Books/bad", "FAILED"),
+        ]
+        assert [t.tag for t in rows] == [1, 2]
+
+        transfers(["--only-uploads"], root)
+        assert parse_transfers(capsys.readouterr().out) == []
+
+
+class TestCommandLog:
+    def test_records_processes_and_shell_commands(self, tmp_path):
+        book = _book(tmp_path)
+        log = tmp_path / "log.jsonl"
+        commands = install_commands(tmp_path / "bin", tmp_path / "remote", log=log)
+        subprocess.run([commands["mega-put"], "-c", str(book), "/Books"], check=True)
+        subprocess.run([commands["mega-whoami"]], capture_output=True)
+        subprocess.run(
+            [commands["mega-cmd"]], input="echo marker\nls /Books\nexit\n", capture_output=True, text=True, check=True,
+        )
+        assert [(r["command"], r["via"], r["returncode"]) for r in read_log(log)] == [
+            ("put", "process", 0),
+            ("whoami", "process", 57),
+            ("shell", "process", 0),
+            ("ls", "shell", 0),
+        ]
+        assert read_log(log)[0]["files"] == 4 and read_log(log)[0]["bytes"] == 10
@@ -0,0 +1,114 @@
+import random
+
+import pytest
+from PIL import Image, ImageDraw
+
+from scripts.fingerprint import FrameComparator, compute_fingerprint, similarity
+
+
+def _page(seed, size=(200, 300)):
+    img = Image.new("RGB", size, (250, 250, 245))
+    draw = ImageDraw.Draw(img)
+    for row in range(12):
+        width = 40 + (seed * 37 + row * 53) % 120
+        draw.rectangle([10, 10 + row * 22, 10 + width, 22 + row * 22], fill=(20, 20, 20))
+    top = (seed * 61) % (size[1] - 80)
+    draw.rectangle([size[0] - 90, top, size[0] - 10, top + 80], fill=(60, 90, 160))
+    return img
+
+
+def _text_page(seed, size=(1920, 1080)):
+    """本文のような細かい文字だけのページ（縮小するとほぼ一様な灰色になる）。"""
+    rng = random.Random(seed)
+    img = Image.new("RGB", size, (250, 248, 240))
+    draw = ImageDraw.Draw(img)
+    margin, glyph, advance = size[0] // 16, 8, 5
+    for top in range(margin, size[1] - margin - 12, 12):
+        x, letters = margin, rng.randint(2, 8)
+        while x + advance <= size[0] - margin:
+            if letters == 0:
+                # 単語の区切り
+                x, letters = x + advance, rng.randint(2, 8)
+                continue
+            letters -= 1
+            stem = x + rng.randrange(advance - 1)
+            draw.line([(stem, top), (stem, top + glyph - 1)], fill=(40, 40, 40))
+            bar = top + rng.randrange(glyph)
+            draw.line([(x, bar), (x + advance - 2, bar)], fill=(40, 40, 40))
+            x += advance
+    return img
+
+
+class TestComputeFingerprint:
+    def test_deterministic(self):
+        assert compute_fingerprint(_page(1)) == compute_fingerprint(_page(1))
+
+    def test_different_pages(self):
+        assert compute_fingerprint(_page(1)).digest != compute_fingerprint(_page(2)).digest
+
+    def test_does_not_keep_image_by_default(self):
+        assert compute_fingerprint(_page(1)).image is None
+        assert compute_fingerprint(_page(1), keep_image=True).image is not None
+
+
+class TestSimilarity:
+    def test_identical(self):
+        fp = compute_fingerprint(_page(1))
+        assert similarity(fp, fp, "thumb") == 1.0
+        assert similarity(fp, fp, "dhash") == 1.0
+
+    def test_unknown_metric(self):
+        fp = compute_fingerprint(_page(1))
+        with pytest.raises(ValueError):
+            similarity(fp, fp, "full")
+
+
+class TestFrameComparator:
+    @pytest.mark.parametrize("metric", ["thumb", "dhash", "full"])
+    def test_same_page(self, metric):
+        comparator = FrameComparator(metric)
+        assert comparator.is_same(comparator.fingerprint(_page(1)), comparator.fingerprint(_page(1))) is True
+
+    @pytest.mark.parametrize("metric", ["thumb", "dhash", "full"])
+    def test_different_page(self, metric):
+        comparator = FrameComparator(metric)
+        assert comparator.is_same(comparator.fingerprint(_page(1)), comparator.fingerprint(_page(4))) is False
+
+    def test_none(self):
+        comparator = FrameComparator()
+        assert comparator.is_same(None, compute_fingerprint(_page(1))) is False
+
+    def test_different_size(self):
+        comparator = FrameComparator()
+        a = compute_fingerprint(_page(1, size=(100, 100)))
+        b = compute_fingerprint(_page(1, size=(120, 100)))
+        assert comparator.is_same(a, b) is False
+
+    def test_tiny_change_is_same(self):
+        img = _page(1)
+        changed = img.copy()
+        changed.putpixel((150, 290), (0, 0, 0))
+        comparator = FrameComparator("thumb", threshold=0.99)
+        assert comparator.is_same(compute_fingerprint(img), compute_fingerprint(changed)) is True
+
+    @pytest.mark.parametrize("metric", ["thumb", "dhash"])
+    def test_text_pages_are_different(self, metric):
+        # 本文のページは縮小画像がほぼ一致するので、縮小画像の類似度だけでは同じと判定しない
+        comparator = FrameComparator(metric)
+        fingerprints = [comparator.fingerprint(_text_page(seed)) for seed in range(4)]
+        assert similarity(fingerprints[0], fingerprints[1], "thumb") > 0.995
+        assert not any(comparator.is_same(a, b) for a, b in zip(fingerprints, fingerprints[1:]))
+
+    def test_similar_thumbnail_is_checked_with_bands(self):
+        img = Image.new("L", (64, 256), 0)
+        changed = img.copy()
+        changed.paste(255, (0, 0, 64, 1))
+        comparator = FrameComparator("thumb", threshold=0.99, margin=0.5)
+        assert comparator.is_same(compute_fingerprint(img), compute_fingerprint(changed)) is True
+        assert comparator.fallbacks == 1
+
+    def test_invalid_arguments(self):
+        with pytest.raises(ValueError):
+            FrameComparator("md5")
+        with pytest.raises(ValueError):
+            FrameComparator(threshold=1.5)
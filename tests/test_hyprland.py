@@ -0,0 +1,133 @@
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+from scripts.fakehypr import FakeHyprland
+from scripts.hyprland import HyprlandClient, HyprlandError, WindowCache, find_client, socket_dir, window_matches
+
+
+WINDOW = {"title": "reader", "at": [10, 20], "size": [800, 600]}
+CLIENTS = [
+    {"address": "0x1", "class": "firefox", "title": "Kindle Cloud Reader", "mapped": True, "focusHistoryID": 2},
+    {"address": "0x2", "class": "kindle", "title": "Market Wizards", "mapped": True, "focusHistoryID": 1},
+    {"address": "0x3", "class": "kindle", "title": "Market Wizards", "mapped": True, "hidden": True, "focusHistoryID": 0},
+]
+
+
+@pytest.fixture
+def hypr_dir(monkeypatch):
+    with tempfile.TemporaryDirectory(prefix="hypr") as tmp:
+        directory = Path(tmp) / "hypr" / "sig"
+        directory.mkdir(parents=True)
+        monkeypatch.setenv("XDG_RUNTIME_DIR", tmp)
+        monkeypatch.setenv("HYPRLAND_INSTANCE_SIGNATURE", "sig")
+        fake = FakeHyprland(directory, window=WINDOW, clients=CLIENTS)
+        try:
+            yield directory, fake
+        finally:
+            fake.close()
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestSocketDir:
+    def test_missing_signature(self, monkeypatch):
+        monkeypatch.delenv("HYPRLAND_INSTANCE_SIGNATURE", raising=False)
+        assert socket_dir() is None
+
+    def test_runtime_dir(self, hypr_dir):
+        directory, _ = hypr_dir
+        assert socket_dir() == directory
+
+
+class TestHyprlandClient:
+    def test_active_window(self, hypr_dir):
+        client = HyprlandClient.from_env()
+        assert client.active_window() == WINDOW
+
+    def test_no_title(self, hypr_dir):
+        _, fake = hypr_dir
+        fake.window = {}
+        assert HyprlandClient.from_env().active_window() is None
+
+    def test_invalid_json(self, hypr_dir):
+        with pytest.raises(HyprlandError):
+            HyprlandClient.from_env().request_json("version")
+
+    def test_connection_error(self, tmp_path):
+        with pytest.raises(HyprlandError):
+            HyprlandClient(tmp_path / "missing.sock").request("j/activewindow")
+
+    def test_clients_and_dispatch(self, hypr_dir):
+        _, fake = hypr_dir
+        client = HyprlandClient.from_env()
+        assert [c["address"] for c in client.clients()] == ["0x1", "0x2", "0x3"]
+        client.dispatch("focuswindow address:0x2")
+        assert fake.requests[-1] == "dispatch focuswindow address:0x2"
+        with pytest.raises(HyprlandError):
+            client.dispatch("nosuchdispatcher")
+
+
+class TestFindClient:
+    def test_matches_class_and_title(self):
+        assert find_client(CLIENTS, window_class="^kindle$")["address"] == "0x2"
+        assert find_client(CLIENTS, window_title="Kindle")["address"] == "0x1"
+        assert find_client(CLIENTS, "firefox", "Wizards") is None
+
+    def test_prefers_recently_focused(self):
+        # 0x3 は最後にフォーカスされたが非表示なので対象外
+        assert find_client(CLIENTS)["address"] == "0x2"
+
+    def test_window_matches(self):
+        window = {"class": "kindle", "title": "Market Wizards"}
+        assert window_matches(window)
+        assert window_matches(window, "kind", "Wizards$")
+        assert not window_matches(window, window_title="^Wizards")
+
+
+class TestWindowCache:
+    def test_caches_until_event(self, hypr_dir):
+        _, fake = hypr_dir
+        cache = WindowCache.from_env()
+        try:
+            assert _wait_for(lambda: fake.event_clients)
+            assert cache.caching
+            assert cache.get() == WINDOW
+            assert cache.get() == WINDOW
+            assert fake.requests == ["j/activewindow"]
+
+            fake.window = {"title": "reader", "at": [0, 0], "size": [640, 480]}
+            fake.emit("movewindow>>abc,1")
+            assert _wait_for(lambda: cache.get()["size"] == [640, 480])
+        finally:
+            cache.close()
+
+    def test_ignores_unrelated_events(self, hypr_dir):
+        _, fake = hypr_dir
+        cache = WindowCache.from_env()
+        try:
+            assert _wait_for(lambda: fake.event_clients)
+            cache.get()
+            fake.emit("urgent>>abc")
+            time.sleep(0.05)
+            cache.get()
+            assert fake.requests == ["j/activewindow"]
+        finally:
+            cache.close()
+
+    def test_no_caching_without_events(self, hypr_dir):
+        directory, fake = hypr_dir
+        cache = WindowCache(HyprlandClient(directory / ".socket.sock"))
+        cache.get()
+        cache.get()
+        assert not cache.caching
+        assert len(fake.requests) == 2
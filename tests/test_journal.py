@@ -0,0 +1,67 @@
+from PIL import Image
+
+from scripts.fingerprint import Fingerprint, compute_fingerprint
+from scripts.journal import CaptureJournal, is_complete, journal_path, load_pages, read_journal
+
+
+def _fp(value):
+    return compute_fingerprint(Image.new("RGB", (32, 48), (value, value, value)))
+
+
+def _write_page(folder, name):
+    (folder / name).write_bytes(b"png")
+
+
+class TestFingerprintSerialization:
+    def test_round_trip(self):
+        fp = _fp(10)
+        assert Fingerprint.from_dict(fp.to_dict()) == fp
+
+
+class TestCaptureJournal:
+    def test_records_and_loads_pages(self, tmp_path):
+        journal = CaptureJournal(tmp_path)
+        for page in (1, 2):
+            _write_page(tmp_path, f"screenshot_{page:04d}.png")
+            journal.record_page(page, f"screenshot_{page:04d}.png", _fp(page))
+        journal.record_duplicate(3, 1)
+        journal.close()
+
+        pages = load_pages(tmp_path)
+        assert [p.page for p in pages] == [1, 2]
+        assert pages[1].fingerprint == _fp(2)
+        assert [r["type"] for r in read_journal(tmp_path)] == ["page", "page", "duplicate"]
+
+    def test_skips_pages_without_file(self, tmp_path):
+        journal = CaptureJournal(tmp_path)
+        _write_page(tmp_path, "screenshot_0001.png")
+        journal.record_page(1, "screenshot_0001.png", _fp(1))
+        journal.record_page(2, "screenshot_0002.png", _fp(2))
+        journal.close()
+        assert [p.page for p in load_pages(tmp_path)] == [1]
+
+    def test_ignores_truncated_line(self, tmp_path):
+        journal = CaptureJournal(tmp_path)
+        _write_page(tmp_path, "screenshot_0001.png")
+        journal.record_page(1, "screenshot_0001.png", _fp(1))
+        journal.close()
+        with open(journal_path(tmp_path), "a", encoding="utf-8") as f:
+            f.write('{"type": "page", "page": 2, "fi')
+        assert [p.page for p in load_pages(tmp_path)] == [1]
+
+    def test_reset(self, tmp_path):
+        journal = CaptureJournal(tmp_path)
+        journal.record_session("start")
+        journal.close()
+        CaptureJournal(tmp_path, reset=True).close()
+        assert read_journal(tmp_path) == []
+
+    def test_is_complete(self, tmp_path):
+        assert is_complete(tmp_path) is False
+        journal = CaptureJournal(tmp_path)
+        journal.record_session("end", complete=True)
+        assert is_complete(tmp_path) is True
+        journal.record_session("start")
+        journal.record_session("end", complete=False)
+        journal.close()
+        assert is_complete(tmp_path) is False
@@ -0,0 +1,20 @@
+import json
+
+from scripts.keybench import main, run_benchmark
+
+
+class TestRunBenchmark:
+    def test_measures_each_method_against_fakes(self):
+        report = run_benchmark(["ipc", "wtype"], "Right", presses=5)
+        assert report["meta"]["environment"] == "fake"
+        assert [r["method"] for r in report["methods"]] == ["ipc", "wtype"]
+        assert all(r["count"] == 5 and r["p50"] > 0 for r in report["methods"])
+
+
+class TestMain:
+    def test_writes_json(self, tmp_path, capsys):
+        output = tmp_path / "keys.json"
+        assert main(["--presses", "3", "--methods", "ipc", "--output", str(output)]) == 0
+        report = json.loads(output.read_text(encoding="utf-8"))
+        assert [r["method"] for r in report["methods"]] == ["ipc"]
+        assert "ipc" in capsys.readouterr().out
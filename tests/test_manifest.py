@@ -0,0 +1,65 @@
+from scripts import manifest as manifest_module
+from scripts.manifest import MANIFEST_NAME, Manifest
+from scripts.remote import RemoteEntry, RemoteIndex
+
+
+def _write(folder, name, data):
+    (folder / name).write_bytes(data)
+
+
+class TestManifest:
+    def test_scan_skips_hidden_and_temp_files(self, tmp_path):
+        _write(tmp_path, "a.png", b"a")
+        _write(tmp_path, "b.png.tmp", b"b")
+        _write(tmp_path, ".capture_journal.jsonl", b"{}")
+        assert [f.name for f in Manifest(tmp_path, "/book/x").scan()] == ["a.png"]
+
+    def test_reuses_hash_for_unchanged_files(self, tmp_path, monkeypatch):
+        _write(tmp_path, "a.png", b"a")
+        manifest = Manifest(tmp_path, "/book/x")
+        manifest.mark_uploaded(manifest.scan())
+        manifest.save()
+
+        calls = []
+        monkeypatch.setattr(manifest_module, "file_sha256", lambda path: calls.append(path) or "x")
+        loaded = Manifest.load(tmp_path, "/book/x")
+        assert loaded.plan(loaded.scan()).unchanged == 1
+        assert calls == []
+
+    def test_other_destination_starts_empty(self, tmp_path):
+        _write(tmp_path, "a.png", b"a")
+        manifest = Manifest(tmp_path, "/book/x")
+        manifest.mark_uploaded(manifest.scan())
+        manifest.save()
+        assert Manifest.load(tmp_path, "/other/x").files == {}
+        (tmp_path / MANIFEST_NAME).write_text("{broken")
+        assert Manifest.load(tmp_path, "/book/x").files == {}
+
+    def test_is_current(self, tmp_path):
+        _write(tmp_path, "a.png", b"a")
+        manifest = Manifest(tmp_path, "/book/x")
+        assert not manifest.is_current()
+        manifest.mark_uploaded(manifest.scan())
+        _write(tmp_path, ".capture_journal.jsonl", b"{}")
+        assert manifest.is_current()
+        _write(tmp_path, "b.png", b"b")
+        assert not manifest.is_current()
+
+    def test_plan(self, tmp_path):
+        for name in ("same.png", "changed.png", "new.png", "adopt.png", "lost.png"):
+            _write(tmp_path, name, b"old")
+        manifest = Manifest(tmp_path, "/book/x")
+        manifest.mark_uploaded([f for f in manifest.scan() if f.name in ("same.png", "changed.png", "lost.png")])
+        _write(tmp_path, "changed.png", b"new!")
+        remote = RemoteIndex("/book", [
+            RemoteEntry("/book/x", True, None, ""),
+            RemoteEntry("/book/x/same.png", False, 3, ""),
+            RemoteEntry("/book/x/changed.png", False, 3, ""),
+            RemoteEntry("/book/x/adopt.png", False, 3, ""),
+        ], recursive=True)
+
+        plan = manifest.plan(manifest.scan(), remote)
+
+        assert sorted(f.name for f in plan.upload) == ["changed.png", "lost.png", "new.png"]
+        assert [f.name for f in plan.adopt] == ["adopt.png"]
+        assert plan.unchanged == 1
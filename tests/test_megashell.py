@@ -0,0 +1,137 @@
+import subprocess
+
+import pytest
+
+from scripts import upload
+from scripts.fakemega import install_commands
+from scripts.manifest import LocalFile
+from scripts.megashell import MegaShell, MegaShellError, quote_arg, strip_prompt
+
+
+@pytest.fixture
+def commands(tmp_path):
+    (tmp_path / "remote" / "book").mkdir(parents=True)
+    return install_commands(tmp_path / "bin", tmp_path / "remote")
+
+
+@pytest.fixture
+def shell(commands):
+    shell = MegaShell(commands["mega-cmd"], start_timeout=10)
+    shell.start()
+    yield shell
+    shell.close()
+
+
+class TestHelpers:
+    def test_quote_arg(self):
+        assert quote_arg("/book/market_wizards") == "/book/market_wizards"
+        assert quote_arg("my book") == '"my book"'
+        assert quote_arg('say "hi"') == "'say \"hi\"'"
+        assert quote_arg("both \" and '") is None
+        assert quote_arg("a\nb") is None
+        assert quote_arg("") == '""'
+
+    def test_strip_prompt(self):
+        assert strip_prompt("MEGA CMD> MEGA CMD> user@example.com") == "user@example.com"
+        assert strip_prompt("user@example.com:/book$ FLAGS") == "FLAGS"
+        assert strip_prompt("plain line") == "plain line"
+
+
+class TestMegaShell:
+    def test_frames_each_command(self, shell, tmp_path):
+        result = shell.run("ls", ["-l", "/book"])
+        assert result.returncode == 0
+        assert result.stdout.startswith("FLAGS")
+        result = shell.run("echo", ["a b"])
+        assert result.stdout == "a b\n"
+        assert shell.commands == 2
+
+    def test_error_lines_set_returncode(self, shell):
+        result = shell.run("ls", ["/missing"])
+        assert result.returncode == 1
+        assert "Couldn't find /missing" in result.stderr
+        assert result.stdout == ""
+
+    def test_timeout_kills_and_restarts(self, tmp_path):
+        commands = install_commands(tmp_path / "bin", tmp_path / "remote", cmd_latency=1.0)
+        shell = MegaShell(commands["mega-cmd"], start_timeout=10)
+        shell.start()
+        try:
+            with pytest.raises(subprocess.TimeoutExpired):
+                shell.run("whoami", timeout_sec=0.2)
+            assert not shell.alive
+            result = shell.try_run("echo", ["back"], timeout_sec=10)
+            assert result is not None and result.stdout == "back\n"
+            assert shell.restarts == 1
+        finally:
+            shell.close()
+
+    def test_busy_or_unquotable_falls_back(self, shell):
+        assert shell.try_run("echo", ["both \" and '"]) is None
+        with shell._lock:
+            assert shell.try_run("echo", ["x"]) is None
+
+    def test_unsupported_shell(self, tmp_path):
+        script = tmp_path / "mega-cmd"
+        script.write_text('#!/bin/sh\nwhile read line; do echo "Command not found: echo"; done\n')
+        script.chmod(0o755)
+        with pytest.raises(MegaShellError):
+            MegaShell(str(script), start_timeout=5).start()
+
+    def test_shell_that_only_echoes_input(self, tmp_path):
+        script = tmp_path / "mega-cmd"
+        script.write_text('#!/bin/sh\nwhile read line; do echo "> $line"; done\n')
+        script.chmod(0o755)
+        with pytest.raises(MegaShellError):
+            MegaShell(str(script), start_timeout=1).start()
+
+    def test_silent_shell(self, tmp_path):
+        script = tmp_path / "mega-cmd"
+        script.write_text("#!/bin/sh\nwhile read line; do :; done\n")
+        script.chmod(0o755)
+        with pytest.raises(MegaShellError):
+            MegaShell(str(script), start_timeout=0.5).start()
+        assert upload.start_session(str(script), start_timeout=0.5) is None
+
+
+class TestUploadSession:
+    def test_commands_go_through_session(self, commands, tmp_path, monkeypatch):
+        monkeypatch.setenv("MEGA_EMAIL", "user@example.com")
+        monkeypatch.setenv("MEGA_PASSWORD", "pass word")
+        folder = tmp_path / "market_wizards"
+        folder.mkdir()
+        (folder / "p1.png").write_bytes(b"png")
+        with upload.megacmd_session(shell_path=commands["mega-cmd"]) as shell:
+            assert shell is not None
+            upload.ensure_login(commands["mega-login"], commands["mega-whoami"], shell=shell)
+            assert shell.commands == 2  # whoami と login
+            assert upload.is_logged_in(commands["mega-whoami"], shell=shell)
+            assert shell.commands == 2  # セッション中はキャッシュを使う
+            shell.logged_in = None
+            assert upload.is_logged_in(commands["mega-whoami"], shell=shell)
+            before = shell.commands
+
+            upload.upload_files(
+                commands["mega-put"], folder, [LocalFile("p1.png", 3, 0, "x")], "/book/market_wizards", shell=shell,
+            )
+            index = upload.fetch_remote_index(commands["mega-ls"], "/book", recursive=True, shell=shell)
+            assert index.exists("/book/market_wizards/p1.png")
+            assert len(upload.fetch_remote_index(commands["mega-ls"], "/nothing", shell=shell)) == 0
+            assert shell.commands == before + 3
+        assert not shell.alive
+        assert (tmp_path / "remote" / "book" / "market_wizards" / "p1.png").read_bytes() == b"png"
+
+    def test_without_session_runs_processes(self, commands):
+        with upload.megacmd_session(enabled=False) as shell:
+            assert shell is None
+            result = upload.run_megacmd(commands["mega-ls"], ["-l", "/book"])
+        assert result.returncode == 0
+
+    def test_session_is_used_only_when_passed(self, commands):
+        with upload.megacmd_session(shell_path=commands["mega-cmd"]) as shell:
+            assert shell is not None
+            result = upload.run_megacmd(commands["mega-ls"], ["-l", "/book"])
+            assert result.returncode == 0
+            assert shell.commands == 0
+            upload.run_megacmd(commands["mega-ls"], ["-l", "/book"], shell=shell)
+            assert shell.commands == 1
@@ -0,0 +1,46 @@
+from scripts.metrics import NULL_TIMER, StageTimer, percentile, summarize
+
+
+class TestPercentile:
+    def test_empty(self):
+        assert percentile([], 50) == 0.0
+
+    def test_interpolates(self):
+        assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.5
+        assert percentile([1.0, 2.0, 3.0, 4.0], 100) == 4.0
+
+
+class TestSummarize:
+    def test_empty(self):
+        assert summarize([]) == {"count": 0}
+
+    def test_values(self):
+        stats = summarize([1.0, 2.0, 3.0])
+        assert stats["count"] == 3
+        assert stats["total"] == 6.0
+        assert stats["p50"] == 2.0
+        assert stats["max"] == 3.0
+
+
+class TestStageTimer:
+    def test_records_stages(self):
+        timer = StageTimer()
+        with timer.stage("grab"):
+            pass
+        with timer.stage("grab"):
+            pass
+        assert timer.summary()["grab"]["count"] == 2
+
+    def test_records_on_exception(self):
+        timer = StageTimer()
+        try:
+            with timer.stage("write"):
+                raise OSError
+        except OSError:
+            pass
+        assert len(timer.samples["write"]) == 1
+
+    def test_null_timer(self):
+        with NULL_TIMER.stage("grab"):
+            pass
+        assert NULL_TIMER.summary() == {}
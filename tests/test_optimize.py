@@ -0,0 +1,189 @@
+import random
+
+from PIL import Image, ImageDraw
+
+from scripts.backends import VirtualBookBackend
+from scripts.fingerprint import compute_fingerprint
+from scripts.journal import CaptureJournal, load_pages
+from scripts.optimize import (
+    ReduceOptions,
+    classify_page,
+    find_images,
+    max_pixel_error,
+    optimize_file,
+    optimize_folder,
+    optimize_folders,
+    pixels_identical,
+    reduce_colors,
+)
+
+
+def _write_pages(folder, count=3):
+    book = VirtualBookBackend(pages=count, size=(120, 160))
+    originals = {}
+    for page in range(count):
+        image = book.render_page(page)
+        path = folder / f"screenshot_{page + 1:04d}.png"
+        # compress_level=1 は grim の弱い圧縮を模したもの
+        image.save(path, format="PNG", compress_level=1)
+        originals[path.stem] = image.copy()
+    return originals
+
+
+def _illustration(size=(120, 160)):
+    rng = random.Random(1)
+    image = Image.new("RGB", size, (250, 248, 240))
+    draw = ImageDraw.Draw(image)
+    for _ in range(60):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        color = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        draw.ellipse([x, y, x + 30, y + 30], fill=color)
+    return image
+
+
+def _gray_text(size=(120, 160)):
+    """アンチエイリアスのかかった黒文字（灰色の階調が多い）。"""
+    image = Image.new("L", size, 255)
+    draw = ImageDraw.Draw(image)
+    for top in range(8, size[1] - 16, 12):
+        draw.text((6, top), "The quick brown fox jumps", fill=0)
+    return image.convert("RGB")
+
+
+class TestOptimizeFile:
+    def test_webp_replaces_png(self, tmp_path):
+        originals = _write_pages(tmp_path, 1)
+        result = optimize_file(tmp_path / "screenshot_0001.png", "webp")
+
+        assert result.status == "replaced"
+        assert result.bytes_after < result.bytes_before
+        assert not (tmp_path / "screenshot_0001.png").exists()
+        with Image.open(tmp_path / "screenshot_0001.webp") as image:
+            assert pixels_identical(originals["screenshot_0001"], image)
+
+    def test_keeps_file_when_not_smaller(self, tmp_path):
+        _write_pages(tmp_path, 1)
+        path = tmp_path / "screenshot_0001.png"
+        assert optimize_file(path, "png").status == "replaced"
+        data = path.read_bytes()
+
+        result = optimize_file(path, "png")
+        assert result.status == "kept"
+        assert path.read_bytes() == data
+
+    def test_skips_existing_target(self, tmp_path):
+        _write_pages(tmp_path, 1)
+        (tmp_path / "screenshot_0001.webp").write_bytes(b"other")
+        result = optimize_file(tmp_path / "screenshot_0001.png", "webp")
+        assert result.status == "skipped"
+        assert (tmp_path / "screenshot_0001.png").exists()
+
+    def test_rgba_round_trip(self, tmp_path):
+        image = Image.new("RGBA", (40, 40), (10, 20, 30, 0))
+        image.putpixel((5, 5), (200, 100, 50, 128))
+        path = tmp_path / "alpha.png"
+        image.save(path, compress_level=0)
+        result = optimize_file(path, "webp")
+        assert result.status == "replaced"
+        with Image.open(tmp_path / "alpha.webp") as decoded:
+            assert pixels_identical(image, decoded)
+
+    def test_dry_run_leaves_files(self, tmp_path):
+        _write_pages(tmp_path, 1)
+        result = optimize_file(tmp_path / "screenshot_0001.png", "webp", dry_run=True)
+        assert result.status == "replaced"
+        assert find_images(tmp_path) == [tmp_path / "screenshot_0001.png"]
+
+
+class TestPixelsIdentical:
+    def test_detects_difference(self):
+        a = Image.new("RGB", (8, 8), (0, 0, 0))
+        b = a.copy()
+        assert pixels_identical(a, b)
+        b.putpixel((7, 7), (0, 0, 1))
+        assert not pixels_identical(a, b)
+        assert not pixels_identical(a, Image.new("RGB", (8, 9)))
+
+    def test_mode_difference(self):
+        assert pixels_identical(Image.new("L", (4, 4), 80), Image.new("RGB", (4, 4), (80, 80, 80)))
+
+
+class TestOptimizeFolder:
+    def test_parallel(self, tmp_path):
+        originals = _write_pages(tmp_path, 4)
+        (tmp_path / "notes.txt").write_text("x")
+        (tmp_path / ".capture_journal.jsonl").write_text("")
+
+        summary = optimize_folder(tmp_path, "webp", workers=2)
+
+        assert summary.count("replaced") == 4
+        assert summary.bytes_saved > 0
+        assert [p.name for p in find_images(tmp_path)] == [f"screenshot_{i:04d}.webp" for i in range(1, 5)]
+        for path in find_images(tmp_path):
+            with Image.open(path) as image:
+                assert pixels_identical(originals[path.stem], image)
+        assert (tmp_path / "notes.txt").exists()
+
+    def test_journal_follows_new_extension(self, tmp_path):
+        originals = _write_pages(tmp_path, 2)
+        journal = CaptureJournal(tmp_path)
+        for page in (1, 2):
+            name = f"screenshot_{page:04d}"
+            journal.record_page(page, f"{name}.png", compute_fingerprint(originals[name]))
+        journal.close()
+
+        optimize_folder(tmp_path, "webp", workers=1)
+
+        assert [p.file for p in load_pages(tmp_path)] == ["screenshot_0001.webp", "screenshot_0002.webp"]
+
+
+class TestColorReduction:
+    def test_classifies_text_and_illustration(self):
+        page = VirtualBookBackend(pages=1, size=(120, 160)).render_page(0)
+        assert classify_page(page).kind == "text"
+        assert classify_page(_gray_text()).kind == "text"
+        assert classify_page(_illustration()).kind == "illustrated"
+
+    def test_gray_photo_is_illustrated(self):
+        gradient = Image.linear_gradient("L").resize((120, 160)).convert("RGB")
+        result = classify_page(gradient)
+        assert result.kind == "illustrated"
+        assert result.midtones > 0.5
+
+    def test_reduce_colors(self):
+        page = VirtualBookBackend(pages=1, size=(120, 160)).render_page(0)
+        reduced, kind, error = reduce_colors(page)
+        assert kind == "palette"
+        assert error == 0
+        assert max_pixel_error(page, reduced) == 0
+
+    def test_quality_gate(self):
+        gradient = Image.linear_gradient("L").resize((64, 64)).convert("RGB")
+        gradient.putpixel((0, 0), (255, 0, 0))
+        assert reduce_colors(gradient, ReduceOptions(max_error=0, colors=4)) is None
+        reduced = reduce_colors(gradient, ReduceOptions(max_error=255, colors=4))
+        assert reduced is not None and reduced[2] <= 255
+
+    def test_optimize_file_reduces_text_pages_only(self, tmp_path):
+        _write_pages(tmp_path, 1)
+        _illustration().save(tmp_path / "illustration.png", compress_level=1)
+
+        text = optimize_file(tmp_path / "screenshot_0001.png", "png", reduce=ReduceOptions())
+        illustration = optimize_file(tmp_path / "illustration.png", "png", reduce=ReduceOptions())
+
+        assert (text.page_kind, text.reduced, text.status) == ("text", "palette", "replaced")
+        with Image.open(tmp_path / "screenshot_0001.png") as image:
+            assert image.mode == "P"
+        assert (illustration.page_kind, illustration.reduced) == ("illustrated", None)
+        with Image.open(tmp_path / "illustration.png") as image:
+            assert image.mode == "RGB"
+
+    def test_reduced_smaller_than_lossless(self, tmp_path):
+        plain, reduced = tmp_path / "plain", tmp_path / "reduced"
+        for folder in (plain, reduced):
+            folder.mkdir()
+            _write_pages(folder, 3)
+        baseline, = optimize_folders([plain], "png", workers=1)
+        summary, = optimize_folders([reduced], "png", workers=1, reduce=ReduceOptions())
+        assert summary.reduced() == summary.reduced("palette") == 3
+        assert summary.bytes_after < baseline.bytes_after
@@ -1,7 +1,22 @@
+import json
+import threading
+
 import pytest
 from PIL import Image
 
-from scripts.screenshot import images_are_same
+from scripts.backends import CaptureBackend, VirtualBookBackend
+from scripts.batch import BatchJob, BatchResults
+from scripts.fingerprint import compute_fingerprint, images_are_same
+from scripts.journal import CaptureJournal, is_complete, load_pages
+from scripts.screenshot import (
+    CaptureConfig,
+    CaptureOptions,
+    FrameWriter,
+    capture_current,
+    main,
+    run_batch,
+    run_capture,
+)
 
 
 class TestImagesAreSame:
@@ -41,3 +56,287 @@ class TestImagesAreSame:
         img1 = self._make_image(color=(255, 0, 0), size=(10, 10))
         img2 = self._make_image(color=(0, 0, 0), size=(10, 10))
         assert images_are_same(img1, img2, threshold=0.99) is False
+
+
+class TestFrameWriter:
+    def test_writes_all_frames(self, tmp_path):
+        writer = FrameWriter(workers=2, max_pending=1)
+        for i in range(3):
+            writer.submit(Image.new("RGB", (4, 4), (i, 0, 0)), str(tmp_path / f"{i}.png"))
+        assert writer.close() == []
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["0.png", "1.png", "2.png"]
+        with Image.open(tmp_path / "2.png") as img:
+            assert img.getpixel((0, 0)) == (2, 0, 0)
+
+    def test_collects_errors(self, tmp_path):
+        writer = FrameWriter()
+        writer.submit(Image.new("RGB", (4, 4)), str(tmp_path / "missing" / "x.png"))
+        errors = writer.close()
+        assert len(errors) == 1
+        assert not (tmp_path / "missing").exists()
+
+    def test_invalid_arguments(self):
+        with pytest.raises(ValueError):
+            FrameWriter(workers=0)
+
+
+class StubBackend(CaptureBackend):
+    def __init__(self, frame, window=None):
+        self.frame = frame
+        self.window = window or {"title": "reader", "at": [0, 0], "size": [10, 10]}
+
+    def active_window(self):
+        return self.window
+
+    def grab(self, window, scale=None):
+        return self.frame
+
+    def send_key(self, key):
+        pass
+
+
+class TestCaptureCurrent:
+    def test_new_frame_is_saved(self, tmp_path):
+        frame = Image.new("RGB", (10, 10), (255, 0, 0))
+        config = CaptureConfig(action_key="Right", save_dir=str(tmp_path))
+        result, status = capture_current(StubBackend(frame), config, 1, None)
+        assert status == "new"
+        assert result == compute_fingerprint(frame)
+        assert [p.name for p in tmp_path.iterdir()] == ["screenshot_0001.png"]
+
+    def test_same_frame_writes_nothing(self, tmp_path):
+        frame = Image.new("RGB", (10, 10), (255, 0, 0))
+        config = CaptureConfig(action_key="Right", save_dir=str(tmp_path))
+        _, status = capture_current(StubBackend(frame.copy()), config, 2, compute_fingerprint(frame))
+        assert status == "same"
+        assert list(tmp_path.iterdir()) == []
+
+    def test_grab_failure_keeps_previous(self, tmp_path):
+        prev = compute_fingerprint(Image.new("RGB", (10, 10)))
+        config = CaptureConfig(action_key="Right", save_dir=str(tmp_path))
+        result, status = capture_current(StubBackend(None), config, 1, prev)
+        assert status == "error"
+        assert result is prev
+
+
+class TestRunCapture:
+    FAST = {"page_delay": 0.0, "retry_wait": 0.0}
+
+    def test_captures_whole_virtual_book(self, tmp_path):
+        backend = VirtualBookBackend(pages=5, size=(120, 160))
+        config = CaptureConfig(action_key="Right", save_dir=str(tmp_path))
+        result = run_capture(backend, config, CaptureOptions(**self.FAST))
+        assert result.saved == 5
+        assert result.stop_reason == "end"
+        assert len(list(tmp_path.iterdir())) == 5
+
+    def test_captures_text_pages(self, tmp_path):
+        # 縮小画像がほぼ同じになる本文のページも、1ページずつ別のページとして保存する
+        backend = VirtualBookBackend(pages=6, size=(1920, 1080))
+        config = CaptureConfig(action_key="Right", save_dir=str(tmp_path))
+        result = run_capture(backend, config, CaptureOptions(**self.FAST))
+        assert result.saved == 6
+        assert result.stop_reason == "end"
+
+    def test_respects_max_pages(self, tmp_path):
+        backend = VirtualBookBackend(pages=5, size=(120, 160))
+        config = CaptureConfig(action_key="Right", save_dir=str(tmp_path))
+        result = run_capture(backend, config, CaptureOptions(max_pages=3, pipeline=True, **self.FAST))
+        assert result.saved == 3
+        assert result.stop_reason == "max"
+        assert len(list(tmp_path.iterdir())) == 3
+
+    def test_stop_event(self, tmp_path):
+        stop_event = threading.Event()
+        stop_event.set()
+        backend = VirtualBookBackend(pages=5, size=(120, 160))
+        config = CaptureConfig(action_key="Right", save_dir=str(tmp_path))
+        result = run_capture(backend, config, CaptureOptions(**self.FAST), stop_event)
+        assert result.saved == 0
+        assert result.stop_reason == "stopped"
+
+    def test_settle_waits_for_render(self, tmp_path):
+        backend = VirtualBookBackend(pages=4, size=(120, 160), render_latency=0.05, transition_frames=2)
+        config = CaptureConfig(action_key="Right", save_dir=str(tmp_path))
+        result = run_capture(backend, config, CaptureOptions(settle=True, **self.FAST))
+        assert result.saved == 4
+        assert result.stop_reason == "end"
+        assert result.settle["count"] == 3
+        assert result.settle["p50"] >= 0.03
+
+    @pytest.mark.parametrize("compare", ["thumb", "full"])
+    def test_settle_text_pages(self, tmp_path, compare):
+        backend = VirtualBookBackend(pages=4, size=(1920, 1080), render_latency=0.05)
+        config = CaptureConfig(action_key="Right", save_dir=str(tmp_path))
+        result = run_capture(backend, config, CaptureOptions(settle=True, compare=compare, **self.FAST))
+        assert result.saved == 4
+        assert result.stop_reason == "end"
+        assert result.settle["count"] == 3
+
+    def test_settle_timeout_is_confirmed_at_full_resolution(self, tmp_path, monkeypatch):
+        # プレビューでは変化が見えなくても、元の解像度で別のページなら撮影を続ける
+        monkeypatch.setattr("scripts.settle.DEFAULT_TIMEOUT", 0.05)
+        backend = BlindPreviewBook(pages=3, size=(120, 160))
+        config = CaptureConfig(action_key="Right", save_dir=str(tmp_path))
+        result = run_capture(backend, config, CaptureOptions(settle=True, **self.FAST))
+        assert result.saved == 3
+        assert result.stop_reason == "end"
+
+
+class BlindPreviewBook(VirtualBookBackend):
+    """低解像度の撮影では常に同じ画像を返す仮想の本（プレビューが変化を見落とす場合の再現用）。"""
+
+    def grab(self, window, scale=None):
+        if scale is not None:
+            return Image.new("RGB", (30, 40), (255, 255, 255))
+        return super().grab(window, scale)
+
+
+class RepeatingBook(VirtualBookBackend):
+    """ページ番号を別のページに読み替える仮想の本（重複ページ・ループの再現用）。"""
+
+    def __init__(self, mapping, **kwargs):
+        super().__init__(**kwargs)
+        self.mapping = mapping
+
+    def render_page(self, index):
+        return super().render_page(self.mapping(index))
+
+
+class TestRunCaptureBookIndex:
+    FAST = {"page_delay": 0.0, "retry_wait": 0.0, "book_index": True}
+
+    def test_skips_repeated_page(self, tmp_path):
+        backend = RepeatingBook(lambda i: 1 if i == 3 else i, pages=5, size=(120, 160))
+        config = CaptureConfig(action_key="Right", save_dir=str(tmp_path))
+        result = run_capture(backend, config, CaptureOptions(**self.FAST))
+        assert result.saved == 4
+        assert result.duplicates == [(4, 2)]
+        assert result.stop_reason == "end"
+        assert sorted(p.name for p in tmp_path.iterdir()) == [f"screenshot_{n:04d}.png" for n in range(1, 5)]
+
+    def test_stops_on_loop(self, tmp_path):
+        backend = RepeatingBook(lambda i: i % 3, pages=50, size=(120, 160))
+        config = CaptureConfig(action_key="Right", save_dir=str(tmp_path))
+        result = run_capture(backend, config, CaptureOptions(repeat_limit=3, **self.FAST))
+        assert result.saved == 3
+        assert result.stop_reason == "loop"
+        assert result.iterations == 6
+
+    def test_index_disabled(self, tmp_path):
+        backend = RepeatingBook(lambda i: i % 3, pages=6, size=(120, 160))
+        config = CaptureConfig(action_key="Right", save_dir=str(tmp_path))
+        result = run_capture(backend, config, CaptureOptions(**{**self.FAST, "book_index": False}))
+        assert result.saved == 6
+        assert result.duplicates == []
+
+
+class TestRunCaptureResume:
+    FAST = {"page_delay": 0.0, "retry_wait": 0.0, "book_index": True}
+
+    def test_resume_continues_numbering(self, tmp_path):
+        config = CaptureConfig(action_key="Right", save_dir=str(tmp_path))
+        journal = CaptureJournal(tmp_path)
+        first = run_capture(
+            VirtualBookBackend(pages=6, size=(120, 160)), config, CaptureOptions(max_pages=3, **self.FAST),
+            journal=journal,
+        )
+        journal.close()
+        assert first.saved == 3
+        assert not is_complete(tmp_path)
+
+        # リーダーを開き直して表紙から再開しても、保存済みページは撮り直さない
+        pages = load_pages(tmp_path)
+        journal = CaptureJournal(tmp_path)
+        second = run_capture(
+            VirtualBookBackend(pages=6, size=(120, 160)), config, CaptureOptions(**self.FAST),
+            journal=journal, resume_pages=pages,
+        )
+        journal.close()
+        assert second.saved == 3
+        assert second.stop_reason == "end"
+        assert [d[1] for d in second.duplicates] == [1, 2, 3]
+        assert is_complete(tmp_path)
+        names = sorted(p.name for p in tmp_path.iterdir() if p.suffix == ".png")
+        assert names == [f"screenshot_{n:04d}.png" for n in range(1, 7)]
+        assert [p.page for p in load_pages(tmp_path)] == [1, 2, 3, 4, 5, 6]
+
+    def test_resume_requires_index(self, tmp_path):
+        config = CaptureConfig(action_key="Right", save_dir=str(tmp_path))
+        journal = CaptureJournal(tmp_path)
+        run_capture(VirtualBookBackend(pages=2, size=(64, 96)), config, CaptureOptions(**self.FAST), journal=journal)
+        journal.close()
+        with pytest.raises(ValueError):
+            run_capture(
+                VirtualBookBackend(pages=2, size=(64, 96)), config, CaptureOptions(**{**self.FAST, "book_index": False}),
+                resume_pages=load_pages(tmp_path),
+            )
+
+
+class TestRunBatch:
+    FAST = {"page_delay": 0.0, "retry_wait": 0.0, "book_index": True}
+
+    def _run(self, tmp_path, jobs, backend=None, **kwargs):
+        results = BatchResults(tmp_path / "results.json")
+        backend = backend or VirtualBookBackend(pages=4, size=(64, 96), end="wrap")
+        run_batch(
+            backend, jobs, CaptureOptions(**self.FAST), results, contents_dir=tmp_path / "contents",
+            focus_timeout=0.0, job_delay=0.0, **kwargs,
+        )
+        return results
+
+    def test_runs_jobs_and_records_results(self, tmp_path):
+        jobs = [
+            BatchJob("first", "Right", window_class="virtual"),
+            BatchJob("missing", "Right", window_class="kindle"),
+            BatchJob("second", "Right", max_pages=2),
+        ]
+        results = self._run(tmp_path, jobs)
+        assert [(r.folder, r.status, r.saved) for r in results.jobs] == [
+            ("first", "done", 4), ("missing", "focus_failed", 0), ("second", "incomplete", 2),
+        ]
+        assert results.jobs[0].stop_reason == "loop"
+        assert results.jobs[0].window == "virtual book"
+        assert len(list((tmp_path / "contents" / "second").glob("*.png"))) == 2
+        data = json.loads((tmp_path / "results.json").read_text(encoding="utf-8"))
+        assert [job["status"] for job in data["jobs"]] == ["done", "focus_failed", "incomplete"]
+        assert data["finished_at"] is not None
+
+    def test_job_file_option(self, tmp_path, capsys):
+        # scripts.upload の --jobs（並列数）と紛らわしいため、ジョブファイルは --job-file で渡す
+        with pytest.raises(SystemExit):
+            main(["--jobs", "night.json"])
+        with pytest.raises(SystemExit):
+            main(["--job-file", str(tmp_path / "missing.json")])
+        assert "ジョブファイルを読めません" in capsys.readouterr().err
+
+    def test_rerun_skips_finished_and_resumes_incomplete(self, tmp_path):
+        jobs = [BatchJob("first", "Right"), BatchJob("second", "Right", max_pages=2)]
+        self._run(tmp_path, jobs)
+        results = self._run(tmp_path, [jobs[0], BatchJob("second", "Right")])
+        assert [(r.status, r.resumed_pages) for r in results.jobs] == [("skipped", 0), ("done", 2)]
+        names = sorted(p.name for p in (tmp_path / "contents" / "second").glob("*.png"))
+        assert names == [f"screenshot_{n:04d}.png" for n in range(1, 5)]
+
+    def test_stop_leaves_remaining_jobs(self, tmp_path):
+        stop_event = threading.Event()
+
+        def after_job(job, result):
+            stop_event.set()
+
+        results = self._run(
+            tmp_path, [BatchJob("a", "Right"), BatchJob("b", "Right")], stop_event=stop_event, after_job=after_job,
+        )
+        assert [r.status for r in results.jobs] == ["done", "not_started"]
+
+    def test_error_does_not_stop_batch(self, tmp_path):
+        calls = []
+
+        def after_job(job, result):
+            calls.append(job.folder)
+            if job.folder == "a":
+                raise OSError("disk full")
+
+        results = self._run(tmp_path, [BatchJob("a", "Right"), BatchJob("b", "Right")], after_job=after_job)
+        assert [(r.status, r.error) for r in results.jobs] == [("error", "disk full"), ("done", None)]
+        assert calls == ["a", "b"]
@@ -0,0 +1,70 @@
+import pytest
+from PIL import Image
+
+from scripts.fingerprint import FrameComparator, compute_fingerprint
+from scripts.settle import SettleTracker, wait_for_settle
+
+
+def _fp(value):
+    return compute_fingerprint(Image.new("L", (16, 16), value))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestSettleTracker:
+    def test_defaults_before_warmup(self):
+        tracker = SettleTracker(warmup=3)
+        tracker.record(0.2)
+        assert tracker.timeout() == 5.0
+
+    def test_learns_from_latencies(self):
+        tracker = SettleTracker(warmup=3, min_timeout=0.5, timeout_factor=4.0)
+        for latency in (0.2, 0.2, 0.2, 0.2):
+            tracker.record(latency)
+        assert tracker.poll_interval() == pytest.approx(0.05)
+        assert tracker.timeout() == pytest.approx(0.8)
+        assert tracker.summary()["p50"] == pytest.approx(0.2)
+
+    def test_invalid_stable_polls(self):
+        with pytest.raises(ValueError):
+            SettleTracker(stable_polls=0)
+
+
+class TestWaitForSettle:
+    def _run(self, frames, baseline, tracker):
+        clock = FakeClock()
+        it = iter(frames)
+        return wait_for_settle(
+            lambda: next(it, frames[-1]), baseline, FrameComparator(), tracker, sleep=clock.sleep, clock=clock,
+        )
+
+    def test_settles_after_transition(self):
+        tracker = SettleTracker(stable_polls=2)
+        # 前ページ → 遷移中 → 新ページが安定
+        frames = [_fp(0), _fp(128), _fp(255), _fp(255), _fp(255)]
+        result = self._run(frames, _fp(0), tracker)
+        assert result.status == "settled"
+        assert result.fingerprint == _fp(255)
+        assert result.polls == 5
+        assert tracker.latencies == [pytest.approx(0.1)]
+
+    def test_timeout_when_unchanged(self):
+        tracker = SettleTracker()
+        result = self._run([_fp(0)], _fp(0), tracker)
+        assert result.status == "timeout"
+        assert tracker.latencies == []
+
+    def test_unstable_when_never_stops_changing(self):
+        tracker = SettleTracker(stable_polls=2)
+        frames = [_fp(v % 256) for v in range(0, 100000, 40)]
+        result = self._run(frames, _fp(255), tracker)
+        assert result.status == "unstable"
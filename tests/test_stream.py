@@ -0,0 +1,133 @@
+import subprocess
+import threading
+
+import pytest
+
+from scripts import upload
+from scripts.backends import VirtualBookBackend
+from scripts.fakemega import install_commands
+from scripts.manifest import Manifest
+from scripts.screenshot import CaptureConfig, CaptureOptions, main as screenshot_main, run_capture
+from scripts.stream import StreamUploader
+
+
+FAST = {"page_delay": 0.0, "retry_wait": 0.0}
+
+
+def _pages(folder, count, size=10):
+    folder.mkdir(exist_ok=True)
+    paths = []
+    for i in range(1, count + 1):
+        path = folder / f"screenshot_{i:04d}.png"
+        path.write_bytes(bytes([i]) * size)
+        paths.append(path)
+    return paths
+
+
+class RecordingPut:
+    """run_megacmd の差し替え。mega-put に渡されたファイル名を記録し、fail 回目の呼び出しを失敗させる。"""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def __call__(self, cmd_path, args, timeout_sec=60, shell=None):
+        with self._lock:
+            call = len(self.batches) + 1
+            names = [a.rsplit("/", 1)[-1] for a in args[1:-1]]
+            self.batches.append(names)
+        if call in self.fail:
+            return subprocess.CompletedProcess(args, 1, "", "API error")
+        return subprocess.CompletedProcess(args, 0, "", "")
+
+
+class TestStreamUploader:
+    def test_uploads_in_batches_through_megacmd(self, tmp_path):
+        commands = install_commands(tmp_path / "bin", tmp_path / "remote")
+        book = tmp_path / "book"
+        stream = StreamUploader(book, "/Books", commands["mega-put"], batch_files=2)
+        for path in _pages(book, 5):
+            stream.add(str(path), path.stat().st_size)
+        summary = stream.finish()
+
+        assert summary.complete and summary.files == 5 and summary.batches == 3
+        assert summary.resent_files == 0
+        sent = sorted(p.name for p in (tmp_path / "remote" / "Books" / "book").iterdir())
+        assert sent == [f"screenshot_{i:04d}.png" for i in range(1, 6)]
+        assert len(Manifest.load(book, "/Books/book").files) == 5
+
+    def test_batches_by_bytes(self, tmp_path, monkeypatch):
+        put = RecordingPut()
+        monkeypatch.setattr(upload, "run_megacmd", put)
+        book = tmp_path / "book"
+        stream = StreamUploader(book, "/Books", "mega-put", batch_files=100, batch_bytes=25)
+        for path in _pages(book, 5):
+            stream.add(str(path), 10)
+        stream.finish(verify=False)
+        assert [len(b) for b in put.batches] == [3, 2]
+
+    def test_failed_batch_is_resent_at_the_end(self, tmp_path, monkeypatch, capsys):
+        put = RecordingPut(fail={1})
+        monkeypatch.setattr(upload, "run_megacmd", put)
+        book = tmp_path / "book"
+        stream = StreamUploader(book, "/Books", "mega-put", batch_files=2)
+        for path in _pages(book, 4):
+            stream.add(str(path), path.stat().st_size)
+        summary = stream.finish()
+
+        assert summary.failed_batches == 1
+        assert summary.resent_files == 2 and summary.complete
+        assert put.batches[-1] == ["screenshot_0001.png", "screenshot_0002.png"]
+        assert "最後に送り直します" in capsys.readouterr().out
+
+    def test_verify_against_remote_listing(self, tmp_path):
+        commands = install_commands(tmp_path / "bin", tmp_path / "remote")
+        book = tmp_path / "book"
+        paths = _pages(book, 3)
+        mega_ls = tmp_path / "bin" / "mega-ls"
+        # 2ページ目だけが上がっていない一覧を返す
+        mega_ls.write_text(
+            "#!/bin/sh\n"
+            "echo 'FLAGS VERS SIZE DATE NAME'\n"
+            "echo '-ep-    1  10  15Jan2024 10:00:00 screenshot_0001.png'\n"
+            "echo '-ep-    1  10  15Jan2024 10:00:00 screenshot_0003.png'\n",
+            encoding="utf-8",
+        )
+        mega_ls.chmod(0o755)
+        stream = StreamUploader(book, "/Books", commands["mega-put"], str(mega_ls), batch_files=10)
+        for path in paths:
+            stream.add(str(path), path.stat().st_size)
+        summary = stream.finish()
+        assert summary.verified and summary.resent_files == 1
+
+    def test_invalid_batch_size(self, tmp_path):
+        with pytest.raises(ValueError):
+            StreamUploader(tmp_path, "/Books", "mega-put", batch_files=0)
+
+
+class TestRunCaptureOnSaved:
+    @pytest.mark.parametrize("pipeline", [False, True])
+    def test_reports_every_saved_page(self, tmp_path, pipeline):
+        saved = []
+        lock = threading.Lock()
+
+        def on_saved(path, size):
+            with lock:
+                saved.append((path, size))
+
+        backend = VirtualBookBackend(pages=5, size=(320, 480), toolbar=6)
+        config = CaptureConfig(action_key="Right", save_dir=str(tmp_path))
+        options = CaptureOptions(pipeline=pipeline, autocrop=True, crop_samples=2, **FAST)
+        result = run_capture(backend, config, options, on_saved=on_saved)
+
+        assert result.saved == 5
+        on_disk = {str(p): p.stat().st_size for p in tmp_path.iterdir()}
+        assert dict(saved) == on_disk
+        assert len(saved) == 5
+
+
+class TestScreenshotMain:
+    def test_stream_upload_conflicts_with_optimize(self):
+        with pytest.raises(SystemExit):
+            screenshot_main(["--stream-upload", "--optimize", "webp"])
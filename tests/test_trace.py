@@ -0,0 +1,59 @@
+import json
+
+from scripts.backends import VirtualBookBackend
+from scripts.screenshot import CaptureConfig, CaptureOptions, run_capture
+from scripts.trace import TraceWriter
+
+
+def _records(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+class TestTraceWriter:
+    def test_iteration_and_summary(self, tmp_path):
+        path = tmp_path / "nested" / "trace.jsonl"
+        trace = TraceWriter(path)
+        trace.iteration(1, "new", {"grab": 0.01}, window={"at": [0, 0], "size": [10, 10], "title": "x"},
+                        file="a.png", bytes_written=100)
+        trace.iteration(2, "same", {"grab": 0.02}, retries=1)
+        trace.written("b.png", 50)
+        trace.summary({"grab": {"count": 2}}, saved=1, elapsed=2.0, stop_reason="end")
+        trace.close()
+
+        records = _records(path)
+        assert [r["type"] for r in records] == ["iteration", "iteration", "write", "summary"]
+        assert records[0]["window"] == {"at": [0, 0], "size": [10, 10]}
+        assert records[0]["bytes"] == 100
+        assert records[1]["retries"] == 1
+        summary = records[-1]
+        assert summary["statuses"] == {"new": 1, "same": 1}
+        assert summary["bytes_written"] == 150
+        assert summary["pages_per_sec"] == 0.5
+
+    def test_appends(self, tmp_path):
+        path = tmp_path / "trace.jsonl"
+        for _ in range(2):
+            trace = TraceWriter(path)
+            trace.event("start")
+            trace.close()
+        assert len(_records(path)) == 2
+
+
+class TestRunCaptureTrace:
+    def test_records_every_iteration(self, tmp_path):
+        path = tmp_path / "trace.jsonl"
+        trace = TraceWriter(path)
+        backend = VirtualBookBackend(pages=3, size=(64, 96))
+        config = CaptureConfig(action_key="Right", save_dir=str(tmp_path / "book"))
+        options = CaptureOptions(page_delay=0.0, retry_wait=0.0)
+        result = run_capture(backend, config, options, trace=trace)
+        trace.close()
+
+        records = _records(path)
+        iterations = [r for r in records if r["type"] == "iteration"]
+        assert [r["status"] for r in iterations] == ["new", "new", "new", "same"]
+        assert iterations[0]["bytes"] > 0
+        assert "grab" in iterations[0]["timings"]
+        assert iterations[-1]["retries"] == 1
+        assert records[-1]["type"] == "summary"
+        assert records[-1]["saved"] == result.saved == 3
@@ -0,0 +1,105 @@
+from pathlib import Path
+
+from scripts.transfers import TransferWatcher, parse_size, parse_transfers
+
+
+SEPARATED = """\
+TYPE|TAG|SOURCEPATH|DESTINYPATH|PROGRESS|STATE
+⇑|8389|/home/u/contents/permutation city|/book/permutation city| 45.50% of   12.00 MB|ACTIVE
+⇑|8390|/home/u/contents/diaspora/screenshot_0001.png|/book/diaspora/screenshot_0001.png|100.00% of  512.00 KB|COMPLETED
+"""
+
+PLAIN = """\
+TYPE     TAG  SOURCEPATH                        DESTINYPATH            PROGRESS            STATE
+ ⇑      8389  /home/u/contents/permutation_city  /book/permutation_city   45.50% of   12.00 MB  ACTIVE
+ ⇑      8391  /home/u/contents/diaspora          /book/diaspora            0.00% of    1.50 GB  QUEUED
+"""
+
+
+class TestParseTransfers:
+    def test_separated_columns(self):
+        first, second = parse_transfers(SEPARATED)
+        assert first.tag == 8389
+        assert first.source == "/home/u/contents/permutation city"
+        assert first.destination == "/book/permutation city"
+        assert first.size == 12 * 1024 * 1024
+        assert first.transferred == round(12 * 1024 * 1024 * 0.455)
+        assert first.state == "ACTIVE"
+        assert second.transferred == 512 * 1024
+
+    def test_whitespace_columns(self):
+        first, second = parse_transfers(PLAIN)
+        assert first.source == "/home/u/contents/permutation_city"
+        assert first.destination == "/book/permutation_city"
+        assert second.size == parse_size("1.5", "GB")
+        assert second.state == "QUEUED"
+
+    def test_ignores_noise(self):
+        assert parse_transfers("No transfers\n\nTYPE|TAG|SOURCEPATH\n") == []
+
+
+def _snapshot(*rows):
+    lines = (f"⇑|{tag}|{src}|/book/x|{pct:.2f}% of 10.00 MB|{state}" for tag, src, pct, state in rows)
+    return parse_transfers("\n".join(lines))
+
+
+class TestTransferWatcher:
+    def test_progress_rate_and_completion(self):
+        watcher = TransferWatcher([Path("/c/a")], stall_sec=60, clock=lambda: 0.0)
+        watcher.update(_snapshot((1, "/c/a", 0, "QUEUED")), now=0.0)
+        watcher.update(_snapshot((1, "/c/a", 50, "ACTIVE")), now=5.0)
+        p, = watcher.progress
+        assert p.state == "active"
+        assert p.done == 5 * 1024 * 1024
+        assert p.rate == 1024 * 1024
+        assert p.eta == 5.0
+
+        watcher.update(_snapshot((1, "/c/a", 100, "COMPLETED")), now=10.0)
+        assert watcher.done and p.ok
+        assert p.elapsed == 10.0
+
+    def test_sums_file_transfers(self):
+        watcher = TransferWatcher([Path("/c/a")], clock=lambda: 0.0)
+        snapshot = _snapshot(
+            (1, "/c/a/1.png", 100, "COMPLETED"), (2, "/c/a/2.png", 50, "ACTIVE"), (3, "/c/ab/1.png", 0, "ACTIVE"),
+        )
+        watcher.update(snapshot, now=1.0)
+        p, = watcher.progress
+        assert p.files == 2
+        assert p.total == 20 * 1024 * 1024
+        assert p.done == 15 * 1024 * 1024
+
+    def test_failed_transfer(self):
+        watcher = TransferWatcher([Path("/c/a"), Path("/c/b")], clock=lambda: 0.0)
+        watcher.update(_snapshot((1, "/c/a", 10, "FAILED"), (2, "/c/b", 10, "ACTIVE")), now=1.0)
+        a, b = watcher.progress
+        assert a.state == "failed" and "FAILED" in a.error
+        assert b.state == "active" and not watcher.done
+
+    def test_stall_detection(self):
+        watcher = TransferWatcher([Path("/c/a")], stall_sec=30, clock=lambda: 0.0)
+        watcher.update(_snapshot((1, "/c/a", 10, "ACTIVE")), now=1.0)
+        watcher.update(_snapshot((1, "/c/a", 10, "RETRYING")), now=20.0)
+        assert watcher.progress[0].state == "active"
+        watcher.update(_snapshot((1, "/c/a", 10, "RETRYING")), now=31.0)
+        assert watcher.progress[0].state == "stalled"
+
+    def test_vanished_after_seen_is_completed(self):
+        watcher = TransferWatcher([Path("/c/a")], clock=lambda: 0.0)
+        watcher.update(_snapshot((1, "/c/a", 90, "ACTIVE")), now=1.0)
+        watcher.update([], now=2.0)
+        p, = watcher.progress
+        assert p.ok and p.done == p.total
+
+    def test_never_seen_is_missing(self):
+        watcher = TransferWatcher([Path("/c/a")], appear_timeout=5, clock=lambda: 0.0)
+        watcher.update([], now=1.0)
+        assert not watcher.done
+        watcher.update([], now=6.0)
+        assert watcher.progress[0].state == "missing"
+
+    def test_expire(self):
+        watcher = TransferWatcher([Path("/c/a")], clock=lambda: 0.0)
+        watcher.update(_snapshot((1, "/c/a", 10, "ACTIVE")), now=1.0)
+        watcher.expire(now=2.0)
+        assert watcher.progress[0].state == "timeout"
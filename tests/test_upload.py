@@ -1,6 +1,28 @@
+import io
+import os
+import subprocess
+import threading
+import time
+import zipfile
+from pathlib import Path
+
 import pytest
 
-from scripts.upload import human_bytes, parse_selection, remote_join
+from scripts import upload
+from scripts.archive import pack_folder
+from scripts.catalog import Catalog
+from scripts.fakemega import install_commands, read_log
+from scripts.manifest import Manifest
+from scripts.remote import RemoteIndex, load_cached, parse_listing
+from scripts.upload import (
+    fetch_remote_index,
+    human_bytes,
+    parse_selection,
+    remote_join,
+    upload_archive,
+    upload_delta,
+    upload_folders,
+)
 
 
 class TestHumanBytes:
@@ -70,3 +92,508 @@ class TestRemoteJoin:
 
     def test_whitespace_dest(self):
         assert remote_join("  ", "test") == "test"
+
+
+REAL_RUN_MEGACMD = upload.run_megacmd
+
+
+class FakeMegaCmd:
+    """run_megacmd の差し替え。リモートのファイル構成を保持し、mega-ls と mega-put を再現する。
+
+    それ以外のコマンド（mega-transfers の再生スクリプトなど）は実際に実行する。
+
+    existing は既存のリモートフォルダ、failing はアップロードを失敗させるフォルダ名。
+    """
+
+    def __init__(self, existing=(), failing=(), delay=0.0):
+        self.remote = {path: None for path in existing}  # パス → サイズ（フォルダは None）
+        self.failing = set(failing)
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, cmd_path, args, timeout_sec=60, shell=None):
+        if cmd_path not in ("mega-ls", "mega-put"):
+            return REAL_RUN_MEGACMD(cmd_path, args, timeout_sec, shell=shell)
+        with self._lock:
+            self.calls.append((cmd_path, list(args)))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            if cmd_path == "mega-ls":
+                return self._ls(args)
+            return self._put(args)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def _ls(self, args):
+        root = args[-1].rstrip("/")
+        recursive = "-r" in args
+        dirs = [root] + sorted(p for p, size in self.remote.items() if size is None and p.startswith(root + "/"))
+        lines = []
+        for parent in dirs if recursive else [root]:
+            children = sorted(p for p in self.remote if p.rsplit("/", 1)[0] == parent)
+            if parent != root:
+                lines += ["", f"{parent}:"]
+            lines.append("FLAGS VERS SIZE DATE NAME")
+            for child in children:
+                size = self.remote[child]
+                flags, text = ("d---", "-") if size is None else ("-ep-", str(size))
+                lines.append(f"{flags}    1  {text:>8}  15Jan2024 10:00:00 {child.rsplit('/', 1)[1]}")
+        if len(lines) == 1:
+            return subprocess.CompletedProcess(args, 1, "", f"[API:err: 10:00:00] Couldn't find {root}")
+        return subprocess.CompletedProcess(args, 0, "\n".join(lines) + "\n", "")
+
+    def _put(self, args):
+        paths = [a for a in args if not a.startswith("-")]
+        dst, sources = paths[-1], [Path(p) for p in paths[:-1]]
+        folder_name = sources[0].name if sources[0].is_dir() else sources[0].parent.name
+        if folder_name in self.failing:
+            return subprocess.CompletedProcess(args, 1, "", "API error")
+        with self._lock:
+            for source in sources:
+                if source.is_dir():
+                    base = f"{dst.rstrip('/')}/{source.name}"
+                    self.remote[base] = None
+                    for f in source.iterdir():
+                        self.remote[f"{base}/{f.name}"] = f.stat().st_size
+                else:
+                    self.remote[dst.rstrip("/")] = None
+                    self.remote[f"{dst.rstrip('/')}/{source.name}"] = source.stat().st_size
+        return subprocess.CompletedProcess(args, 0, "", "")
+
+    def uploaded_files(self, cmd="mega-put"):
+        return [Path(a).name for c, args in self.calls if c == cmd for a in args[1:-1] if not a.startswith("-")]
+
+
+def _folders(tmp_path, names):
+    paths = []
+    for name in names:
+        path = tmp_path / name
+        path.mkdir()
+        (path / "screenshot_0001.png").write_bytes(b"png")
+        paths.append(path)
+    return paths
+
+
+class TestUploadFolders:
+    def test_parallel_jobs(self, tmp_path, monkeypatch):
+        fake = FakeMegaCmd(delay=0.05)
+        monkeypatch.setattr(upload, "run_megacmd", fake)
+        targets = _folders(tmp_path, ["a", "b", "c", "d"])
+
+        outcomes = upload_folders(targets, "/book", "mega-put", jobs=4)
+
+        assert [o.folder for o in outcomes] == targets
+        assert all(o.status == "uploaded" for o in outcomes)
+        assert fake.max_active > 1
+
+    def test_errors_are_per_folder(self, tmp_path, monkeypatch):
+        fake = FakeMegaCmd(existing={"/book/a"}, failing={"b"})
+        monkeypatch.setattr(upload, "run_megacmd", fake)
+        targets = _folders(tmp_path, ["a", "b", "c"])
+
+        remote = fetch_remote_index("mega-ls", "/book")
+        outcomes = upload_folders(targets, "/book", "mega-put", remote, jobs=2)
+
+        assert [o.status for o in outcomes] == ["skipped", "failed", "uploaded"]
+        assert "API error" in outcomes[1].error
+        assert sum(1 for cmd, _ in fake.calls if cmd == "mega-ls") == 1
+
+    def test_main_returns_failure_code(self, tmp_path, monkeypatch, capsys):
+        monkeypatch.setattr(upload, "run_megacmd", FakeMegaCmd(failing={"b"}))
+        monkeypatch.setattr(upload, "find_megacmd_command", lambda cmd: cmd)
+        monkeypatch.setattr(upload, "is_logged_in", lambda whoami, shell=None: True)
+        _folders(tmp_path, ["a", "b"])
+
+        for name, code in (("a", 0), ("b", 5)):
+            assert upload.main(["--base", str(tmp_path), "--folder", name, "--yes", "--jobs", "2"]) == code
+        assert "失敗 1" in capsys.readouterr().out
+
+
+LISTING = """\
+FLAGS VERS          SIZE            DATE       NAME
+d---    -              -  15Jan2024 10:00:00 permutation_city
+-ep-    1          12345  15Jan2024 10:00:01 notes with space.txt
+
+/book/permutation_city:
+FLAGS VERS          SIZE            DATE       NAME
+-ep-    1           2048  15Jan2024 10:00:02 screenshot_0001.png
+-ep-    1           4096  15Jan2024 10:00:03 screenshot_0002.png
+"""
+
+
+class TestRemoteListing:
+    def test_parse_recursive(self):
+        entries = parse_listing(LISTING, "/book")
+        by_path = {e.path: e for e in entries}
+        assert by_path["/book/permutation_city"].is_dir
+        assert by_path["/book/notes with space.txt"].size == 12345
+        assert by_path["/book/permutation_city/screenshot_0002.png"].size == 4096
+
+    def test_index_queries(self):
+        index = RemoteIndex("/book", parse_listing(LISTING, "/book"), recursive=True)
+        assert index.exists("/book/permutation_city")
+        assert index.exists("/book/permutation_city/")
+        assert not index.exists("/book/diaspora")
+        assert [e.path for e in index.children("/book")] == ["/book/permutation_city", "/book/notes with space.txt"]
+        assert sum(e.size for e in index.files_under("/book/permutation_city")) == 6144
+
+    def test_missing_dest_is_empty(self, monkeypatch):
+        monkeypatch.setattr(upload, "run_megacmd", FakeMegaCmd())
+        assert len(fetch_remote_index("mega-ls", "/book")) == 0
+
+    def test_other_errors_raise(self, monkeypatch):
+        monkeypatch.setattr(
+            upload, "run_megacmd", lambda *a, **k: subprocess.CompletedProcess(a, 1, "", "Not logged in"),
+        )
+        with pytest.raises(RuntimeError, match="一覧取得"):
+            fetch_remote_index("mega-ls", "/book")
+
+    def test_cache(self, tmp_path, monkeypatch):
+        fake = FakeMegaCmd(existing={"/book/a"})
+        monkeypatch.setattr(upload, "run_megacmd", fake)
+        first = fetch_remote_index("mega-ls", "/book", cache_dir=tmp_path, cache_ttl=60)
+        second = fetch_remote_index("mega-ls", "/book", cache_dir=tmp_path, cache_ttl=60)
+        assert len(fake.calls) == 1
+        assert second.exists("/book/a") and second.fetched_at == first.fetched_at
+        assert load_cached(tmp_path, "/book", False, ttl=-1) is None
+
+
+class TestDeltaUpload:
+    def test_only_new_and_changed_files(self, tmp_path, monkeypatch):
+        fake = FakeMegaCmd()
+        monkeypatch.setattr(upload, "run_megacmd", fake)
+        folder, = _folders(tmp_path, ["book"])
+        (folder / "screenshot_0002.png").write_bytes(b"png2")
+        (folder / ".capture_journal.jsonl").write_text("{}")
+
+        assert upload_delta("mega-put", folder, "/book", fetch_remote_index("mega-ls", "/book", True)) == (2, 7)
+        assert sorted(fake.uploaded_files()) == ["screenshot_0001.png", "screenshot_0002.png"]
+
+        # 再開した撮影で1ページ増え、1ページが再圧縮で変わった
+        (folder / "screenshot_0003.png").write_bytes(b"png3")
+        (folder / "screenshot_0001.png").write_bytes(b"PNG!")
+        fake.calls.clear()
+        assert upload_delta("mega-put", folder, "/book", fetch_remote_index("mega-ls", "/book", True)) == (2, 8)
+        assert sorted(fake.uploaded_files()) == ["screenshot_0001.png", "screenshot_0003.png"]
+
+        fake.calls.clear()
+        assert upload_delta("mega-put", folder, "/book", fetch_remote_index("mega-ls", "/book", True)) == (0, 0)
+        assert fake.uploaded_files() == []
+
+    def test_missing_remote_file_is_resent(self, tmp_path, monkeypatch):
+        fake = FakeMegaCmd()
+        monkeypatch.setattr(upload, "run_megacmd", fake)
+        folder, = _folders(tmp_path, ["book"])
+        upload_delta("mega-put", folder, "/book", fetch_remote_index("mega-ls", "/book", True))
+
+        del fake.remote["/book/book/screenshot_0001.png"]
+        fake.calls.clear()
+        assert upload_delta("mega-put", folder, "/book", fetch_remote_index("mega-ls", "/book", True)) == (1, 3)
+
+    def test_adopts_folder_uploaded_before(self, tmp_path, monkeypatch):
+        fake = FakeMegaCmd()
+        monkeypatch.setattr(upload, "run_megacmd", fake)
+        folder, = _folders(tmp_path, ["book"])
+        upload_folders([folder], "/book", "mega-put")
+
+        fake.calls.clear()
+        assert upload_delta("mega-put", folder, "/book", fetch_remote_index("mega-ls", "/book", True)) == (0, 0)
+        assert (folder / ".upload_manifest.json").exists()
+
+    def test_failed_batch_keeps_manifest(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(upload, "run_megacmd", FakeMegaCmd(failing={"book"}))
+        folder, = _folders(tmp_path, ["book"])
+        outcome, = upload_folders([folder], "/book", "mega-put", delta=True)
+        assert outcome.status == "failed"
+        assert not (folder / ".upload_manifest.json").exists()
+
+
+class TestArchiveUpload:
+    def test_packs_and_sends_one_file(self, tmp_path):
+        commands = install_commands(tmp_path / "bin", tmp_path / "remote")
+        folder, = _folders(tmp_path, ["book"])
+        (folder / "screenshot_0002.png").write_bytes(b"png2")
+        archive_dir = tmp_path / "archives"
+
+        files, size = upload_archive(commands["mega-put"], folder, "/Books", archive_dir=archive_dir)
+
+        assert files == 2
+        sent = tmp_path / "remote" / "Books" / "book.cbz"
+        assert sent.stat().st_size == size
+        with zipfile.ZipFile(sent) as zf:
+            assert zf.namelist() == ["screenshot_0001.png", "screenshot_0002.png"]
+        assert not (archive_dir / "book.cbz").exists()
+
+    def test_keep_archive(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(upload, "run_megacmd", FakeMegaCmd())
+        folder, = _folders(tmp_path, ["book"])
+        upload_archive("mega-put", folder, "/Books", "zip", archive_dir=tmp_path / "archives", keep=True)
+        assert (tmp_path / "archives" / "book.zip").exists()
+
+    def test_skips_existing_archive(self, tmp_path, monkeypatch):
+        fake = FakeMegaCmd(existing={"/book/a"})
+        targets = _folders(tmp_path, ["a", "b"])
+        fake.remote["/book/b.cbz"] = pack_folder(targets[1], tmp_path / "packed" / "b.cbz").bytes_out
+        monkeypatch.setattr(upload, "run_megacmd", fake)
+
+        remote = fetch_remote_index("mega-ls", "/book")
+        outcomes = upload_folders(targets, "/book", "mega-put", remote, archive="cbz")
+
+        assert [o.status for o in outcomes] == ["uploaded", "skipped"]
+        assert fake.uploaded_files() == ["a.cbz"]
+        assert not list((tmp_path / ".archives").iterdir())
+
+    def test_resends_archive_with_other_size(self, tmp_path, monkeypatch, capsys):
+        # 同名でも途中で切れたアーカイブや、ページが増える前のアーカイブは送り直す
+        fake = FakeMegaCmd()
+        fake.remote["/book/b.cbz"] = 1024
+        monkeypatch.setattr(upload, "run_megacmd", fake)
+        targets = _folders(tmp_path, ["b"])
+
+        remote = fetch_remote_index("mega-ls", "/book")
+        outcomes = upload_folders(targets, "/book", "mega-put", remote, archive="cbz")
+
+        assert [o.status for o in outcomes] == ["uploaded"]
+        assert fake.uploaded_files() == ["b.cbz"]
+        assert "サイズが違うため送り直します" in capsys.readouterr().out
+
+    def test_archive_and_delta_conflict(self, tmp_path):
+        with pytest.raises(SystemExit):
+            upload.main(["--base", str(tmp_path), "--archive", "cbz", "--delta"])
+
+
+def replay_transfers(tmp_path, snapshots):
+    """記録した mega-transfers の出力を呼ばれるたびに1つずつ返すスクリプト（最後の出力は繰り返す）。"""
+    for i, snapshot in enumerate(snapshots):
+        (tmp_path / f"transfers_{i}.txt").write_text(snapshot, encoding="utf-8")
+    script = tmp_path / "mega-transfers"
+    script.write_text(
+        "#!/bin/sh\n"
+        f"cd '{tmp_path}'\n"
+        "n=$(cat transfers_count 2>/dev/null || echo 0)\n"
+        f"[ \"$n\" -lt {len(snapshots) - 1} ] && echo $((n + 1)) > transfers_count\n"
+        "cat transfers_$n.txt\n",
+        encoding="utf-8",
+    )
+    script.chmod(0o755)
+    return str(script)
+
+
+def _transfers_row(tag, folder, percent, state, size="2.00 MB"):
+    return f"⇑|{tag}|{folder}|/book/{folder.name}|{percent:6.2f}% of {size}|{state}\n"
+
+
+HEADER = "TYPE|TAG|SOURCEPATH|DESTINYPATH|PROGRESS|STATE\n"
+
+
+class TestWaitForUploads:
+    def test_tracks_until_completed(self, tmp_path):
+        folder = tmp_path / "book"
+        mega_transfers = replay_transfers(tmp_path, [
+            HEADER + _transfers_row(1, folder, 0, "QUEUED"),
+            HEADER + _transfers_row(1, folder, 50, "ACTIVE"),
+            HEADER + _transfers_row(1, folder, 100, "COMPLETED"),
+        ])
+        updates = []
+        progress = upload.wait_for_uploads(
+            mega_transfers, [folder], interval=0, on_update=lambda p: updates.append(p[0].state),
+        )
+        assert progress[0].ok
+        assert progress[0].total == 2 * 1024 * 1024
+        assert updates == ["active", "active", "completed"]
+
+    def test_main_exit_codes(self, tmp_path, monkeypatch, capsys):
+        base = tmp_path / "contents"
+        base.mkdir()
+        good, bad = _folders(base, ["good", "bad"])
+        mega_transfers = replay_transfers(tmp_path, [
+            HEADER + _transfers_row(1, good, 30, "ACTIVE") + _transfers_row(2, bad, 10, "ACTIVE"),
+            HEADER + _transfers_row(1, good, 100, "COMPLETED") + _transfers_row(2, bad, 10, "FAILED"),
+        ])
+        monkeypatch.setattr(upload, "run_megacmd", FakeMegaCmd())
+        monkeypatch.setattr(upload, "find_megacmd_command", lambda cmd: mega_transfers if cmd == "mega-transfers" else cmd)
+        monkeypatch.setattr(upload, "is_logged_in", lambda whoami, shell=None: True)
+
+        args = ["--base", str(base), "--yes", "--wait", "--poll-interval", "0"]
+        assert upload.main([*args, "--folder", "good"]) == 0
+        assert "完了: アップロードが終わりました" in capsys.readouterr().out
+        (tmp_path / "transfers_count").unlink()
+        assert upload.main([*args, "--folder", "bad"]) == 5
+        assert "FAILED" in capsys.readouterr().out
+
+    def test_main_reports_stall(self, tmp_path, monkeypatch, capsys):
+        base = tmp_path / "contents"
+        base.mkdir()
+        folder, = _folders(base, ["book"])
+        mega_transfers = replay_transfers(tmp_path, [HEADER + _transfers_row(1, folder, 10, "RETRYING")])
+        monkeypatch.setattr(upload, "run_megacmd", FakeMegaCmd())
+        monkeypatch.setattr(upload, "find_megacmd_command", lambda cmd: mega_transfers if cmd == "mega-transfers" else cmd)
+        monkeypatch.setattr(upload, "is_logged_in", lambda whoami, shell=None: True)
+
+        args = ["--base", str(base), "--folder", "book", "--yes", "--wait", "--poll-interval", "0.01"]
+        assert upload.main([*args, "--stall-timeout", "0.05"]) == 6
+        assert "停止 1" in capsys.readouterr().out
+
+
+class TestCatalogIntegration:
+    def test_menu_shows_upload_status(self, tmp_path, monkeypatch, capsys):
+        monkeypatch.setattr(upload, "run_megacmd", FakeMegaCmd())
+        monkeypatch.setattr(upload, "find_megacmd_command", lambda cmd: cmd)
+        monkeypatch.setattr(upload, "is_logged_in", lambda whoami, shell=None: True)
+        _folders(tmp_path, ["a", "b"])
+
+        assert upload.main(["--base", str(tmp_path), "--folder", "a", "--yes"]) == 0
+        with Catalog.open(tmp_path) as catalog:
+            candidates = upload.discover_candidate_folders(tmp_path, catalog=catalog, dest="/book")
+        a, b = candidates
+        assert a.upload.status == "queued" and b.upload is None
+        assert upload.upload_label(a).startswith("キュー済")
+        assert upload.upload_label(b) == "-"
+
+    def test_modified_after_upload(self, tmp_path):
+        folder, = _folders(tmp_path, ["a"])
+        with Catalog.open(tmp_path) as catalog:
+            catalog.record_upload("a", "/book", "uploaded")
+            later = time.time() + 60
+            os.utime(folder / "screenshot_0001.png", (later, later))
+            os.utime(folder, (later, later))
+            a, = upload.discover_candidate_folders(tmp_path, catalog=catalog, dest="/book")
+        assert upload.upload_label(a).startswith("済(更新あり)")
+
+
+class TestWatchMode:
+    def test_uploads_finished_books(self, tmp_path, monkeypatch, capsys):
+        fake = FakeMegaCmd()
+        monkeypatch.setattr(upload, "run_megacmd", fake)
+        monkeypatch.setattr(upload, "find_megacmd_command", lambda cmd: cmd)
+        monkeypatch.setattr(upload, "is_logged_in", lambda whoami, shell=None: True)
+        folder, = _folders(tmp_path, ["book"])
+
+        def one_round(watcher, source):
+            assert source.kind == "polling"
+            watcher.notice({"book"}, now=0)
+            watcher.tick(now=1)
+            raise KeyboardInterrupt
+
+        monkeypatch.setattr(upload, "run_watch", one_round)
+        assert upload.main(["--base", str(tmp_path), "--watch", "--polling", "--quiet-sec", "1"]) == 0
+
+        assert fake.uploaded_files() == ["screenshot_0001.png"]
+        assert (folder / ".upload_manifest.json").exists()
+        with Catalog.open(tmp_path) as catalog:
+            assert catalog.upload_status(["book"], "/book")["book"].status == "uploaded"
+        assert "監視を終了します" in capsys.readouterr().out
+
+    def test_uploads_book_finished_before_start(self, tmp_path, monkeypatch):
+        fake = FakeMegaCmd()
+        monkeypatch.setattr(upload, "run_megacmd", fake)
+        monkeypatch.setattr(upload, "find_megacmd_command", lambda cmd: cmd)
+        monkeypatch.setattr(upload, "is_logged_in", lambda whoami, shell=None: True)
+        finished, uploaded, recorded = _folders(tmp_path, ["finished", "uploaded", "recorded"])
+        for folder in (finished, uploaded, recorded):
+            (folder / ".capture_journal.jsonl").write_text('{"type": "session", "event": "end", "complete": true}\n')
+        manifest = Manifest(uploaded, "/book/uploaded")
+        manifest.mark_uploaded(manifest.scan())
+        manifest.save()
+        with Catalog.open(tmp_path) as catalog:
+            catalog.record_upload("recorded", "/book", "queued", files=1)
+
+        def one_round(watcher, source):
+            watcher.tick(now=time.time() + 10)  # 変更の通知が無くても、撮り終えてから時間が経てば送る
+            raise KeyboardInterrupt
+
+        monkeypatch.setattr(upload, "run_watch", one_round)
+        assert upload.main(["--base", str(tmp_path), "--watch", "--polling"]) == 0
+        assert fake.uploaded_files() == ["screenshot_0001.png"]
+        assert (finished / ".upload_manifest.json").exists()
+        assert not (recorded / ".upload_manifest.json").exists()
+
+
+    def test_archive_skips_same_size_remote(self, tmp_path, monkeypatch):
+        fake = FakeMegaCmd()
+        monkeypatch.setattr(upload, "run_megacmd", fake)
+        monkeypatch.setattr(upload, "find_megacmd_command", lambda cmd: cmd)
+        monkeypatch.setattr(upload, "is_logged_in", lambda whoami, shell=None: True)
+        same, changed = _folders(tmp_path, ["same", "changed"])
+        fake.remote["/book/same.cbz"] = pack_folder(same, tmp_path / ".packed" / "same.cbz").bytes_out
+        fake.remote["/book/changed.cbz"] = 1024
+
+        def one_round(watcher, source):
+            watcher.notice({"same", "changed"}, now=0)
+            watcher.tick(now=1)
+            raise KeyboardInterrupt
+
+        monkeypatch.setattr(upload, "run_watch", one_round)
+        assert upload.main(["--base", str(tmp_path), "--watch", "--polling", "--quiet-sec", "1", "--archive", "cbz"]) == 0
+        assert fake.uploaded_files() == ["changed.cbz"]
+        with Catalog.open(tmp_path) as catalog:
+            status = catalog.upload_status(["same", "changed"], "/book")
+        assert {name: record.status for name, record in status.items()} == {"same": "skipped", "changed": "uploaded"}
+
+
+class TestMainWithFakeMega:
+    """MEGAcmd の代替 (scripts.fakemega) を PATH に置き、main を最後まで実行する。"""
+
+    @pytest.fixture
+    def fakemega(self, tmp_path, monkeypatch):
+        def install(**kwargs):
+            commands = install_commands(tmp_path / "bin", tmp_path / "remote", log=tmp_path / "log.jsonl", **kwargs)
+            monkeypatch.setenv("PATH", f"{tmp_path / 'bin'}{os.pathsep}{os.environ['PATH']}")
+            monkeypatch.setenv("MEGA_EMAIL", "user@example.com")
+            monkeypatch.setenv("MEGA_PASSWORD", "secret")
+            monkeypatch.setattr("sys.stdin", io.StringIO("all\n"))
+            return commands
+
+        return install
+
+    def _library(self, tmp_path):
+        base = tmp_path / "contents"
+        base.mkdir()
+        return base, _folders(base, ["a", "b"])
+
+    def test_wait_logs_in_and_uploads_all(self, tmp_path, fakemega):
+        fakemega()
+        base, _ = self._library(tmp_path)
+        assert upload.main(["--base", str(base), "--dest", "/Books", "--yes", "--wait", "--poll-interval", "0.05"]) == 0
+        assert (tmp_path / "remote" / "Books" / "a" / "screenshot_0001.png").read_bytes() == b"png"
+        assert (tmp_path / "remote" / "Books" / "b" / "screenshot_0001.png").exists()
+        log = read_log(tmp_path / "log.jsonl")
+        assert [r["command"] for r in log if r["via"] == "process"] == ["shell"]
+        assert [r["command"] for r in log if r["via"] == "shell"][:2] == ["whoami", "login"]
+        assert sum(r["bytes"] for r in log) == 6
+
+    def test_delta_without_session_reports_failed_book(self, tmp_path, fakemega):
+        fakemega(fail_pattern="/b/")
+        base, _ = self._library(tmp_path)
+        assert upload.main(["--base", str(base), "--dest", "/Books", "--yes", "--delta", "--no-session"]) == 5
+        assert (tmp_path / "remote" / "Books" / "a" / "screenshot_0001.png").exists()
+        assert not (tmp_path / "remote" / "Books" / "b" / "screenshot_0001.png").exists()
+        log = read_log(tmp_path / "log.jsonl")
+        assert all(r["via"] == "process" for r in log)
+        assert [r["returncode"] for r in log if r["command"] == "put"] == [0, 1]
+
+    def test_wait_reports_failed_transfer(self, tmp_path, fakemega, capsys):
+        fakemega(fail_pattern="/a/")
+        base, _ = self._library(tmp_path)
+        assert upload.main(["--base", str(base), "--dest", "/Books", "--yes", "--wait", "--poll-interval", "0.05"]) == 5
+        assert "FAILED" in capsys.readouterr().out
+
+    def test_archive(self, tmp_path, fakemega):
+        fakemega()
+        base, _ = self._library(tmp_path)
+        assert upload.main(["--base", str(base), "--dest", "/Books", "--yes", "--archive", "cbz"]) == 0
+        assert sorted(p.name for p in (tmp_path / "remote" / "Books").iterdir()) == ["a.cbz", "b.cbz"]
+        assert not list((base / ".archives").iterdir())
+
+    def test_listing_cache_is_kept_under_base(self, tmp_path, fakemega):
+        fakemega()
+        base, _ = self._library(tmp_path)
+        args = ["--base", str(base), "--dest", "/Books", "--yes", "--skip-if-exists", "--listing-cache-ttl", "300"]
+        assert upload.main(args) == 0
+        assert (base / ".cache").is_dir()
@@ -0,0 +1,68 @@
+import json
+
+from scripts.uploadbench import (
+    main,
+    run_benchmark,
+    run_capture_benchmark,
+    run_command_benchmark,
+    run_library_benchmark,
+)
+
+
+class TestRunBenchmark:
+    def test_compares_folder_and_archive(self):
+        report = run_benchmark(pages=4, size=(64, 96))
+        folder, archive = report["modes"]
+        assert folder["mode"] == "folder" and folder["remote_files"] == 4
+        assert archive["mode"] == "archive" and archive["remote_files"] == 1
+        assert all(r["files_per_sec"] > 0 for r in report["modes"])
+
+
+class TestRunCaptureBenchmark:
+    def test_sequential_and_stream_upload_every_page(self):
+        report = run_capture_benchmark(pages=4, size=(64, 96), batch_files=2)
+        sequential, stream = report["capture"]
+        assert sequential["mode"] == "sequential" and stream["mode"] == "stream"
+        assert sequential["remote_files"] == stream["remote_files"] == 4
+        assert all(r["total_sec"] >= r["capture_sec"] for r in report["capture"])
+
+
+class TestRunCommandBenchmark:
+    def test_process_and_session_run_same_commands(self):
+        report = run_command_benchmark(commands=6)
+        process, session = report["megacmd"]
+        assert process["mode"] == "process" and session["mode"] == "session"
+        # whoami はログインしていないので両方とも同じ回数だけ失敗する
+        assert process["failed"] == session["failed"] == 2
+        assert all(r["commands_per_sec"] > 0 for r in report["megacmd"])
+
+
+class TestMain:
+    def test_writes_json(self, tmp_path, capsys):
+        output = tmp_path / "bench.json"
+        assert main(["--pages", "2", "--size", "64x96", "--modes", "archive", "--output", str(output)]) == 0
+        report = json.loads(output.read_text(encoding="utf-8"))
+        assert [r["mode"] for r in report["modes"]] == ["archive"]
+
+
+class TestRunLibraryBenchmark:
+    def test_runs_upload_main_per_scenario(self):
+        report = run_library_benchmark(
+            [(2, 3)], size=(64, 96), scenarios=["delta", "archive"], sessions=["session", "process"],
+        )
+        rows = {(r["scenario"], r["session"]): r for r in report["library"]}
+        assert sorted(rows) == [("archive", "process"), ("archive", "session"), ("delta", "process"), ("delta", "session")]
+        assert all(r["exit_code"] == 0 for r in rows.values())
+        assert rows["delta", "session"]["remote_files"] == 6 and rows["archive", "session"]["remote_files"] == 2
+        assert rows["delta", "session"]["bytes_sent"] == rows["delta", "process"]["bytes_sent"]
+        # セッションありは mega-cmd の1プロセスだけ、なしはコマンドごとにプロセスを起動する
+        assert rows["delta", "session"]["processes"] == 1
+        assert rows["delta", "process"]["processes"] == rows["delta", "process"]["commands"] > 1
+
+    def test_failures_are_reported(self):
+        report = run_library_benchmark(
+            [(2, 3)], size=(64, 96), scenarios=["queue"], sessions=["session"], fail_rate=1.0,
+        )
+        row, = report["library"]
+        assert row["exit_code"] == 5
+        assert row["failed_transfers"] == 2 and row["files_sent"] == 0
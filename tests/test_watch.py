@@ -0,0 +1,211 @@
+import json
+import time
+
+import pytest
+
+from scripts.journal import JOURNAL_NAME
+from scripts.watch import (
+    RETRY_BASE_SEC,
+    InotifyWatcher,
+    PollingWatcher,
+    UploadQueue,
+    UploadWatcher,
+    content_signature,
+    run_watch,
+)
+
+
+def _book(base, name, pages=2):
+    folder = base / name
+    folder.mkdir()
+    for i in range(1, pages + 1):
+        (folder / f"screenshot_{i:04d}.png").write_bytes(b"png")
+    return folder
+
+
+def _finish_capture(folder, complete=True):
+    with open(folder / JOURNAL_NAME, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"type": "session", "event": "end", "complete": complete}) + "\n")
+
+
+class FakeUpload:
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls = []
+
+    def __call__(self, folder):
+        self.calls.append(folder.name)
+        return self.errors.pop(0) if self.errors else None
+
+
+class TestContentSignature:
+    def test_ignores_hidden_files(self, tmp_path):
+        folder = _book(tmp_path, "book")
+        before = content_signature(folder)
+        (folder / ".upload_manifest.json").write_text("{}", encoding="utf-8")
+        assert content_signature(folder) == before
+        (folder / "screenshot_0003.png").write_bytes(b"png")
+        assert content_signature(folder) != before
+
+    def test_empty_folder(self, tmp_path):
+        (tmp_path / "empty").mkdir()
+        assert content_signature(tmp_path / "empty") is None
+
+
+class TestPollingWatcher:
+    def test_reports_page_changes_only(self, tmp_path):
+        folder = _book(tmp_path, "book")
+        watcher = PollingWatcher(tmp_path, interval=0)
+        assert watcher.wait(0) == set()
+
+        (folder / ".upload_manifest.json").write_text("{}", encoding="utf-8")
+        assert watcher.wait(0) == set()
+
+        (folder / "screenshot_0003.png").write_bytes(b"png")
+        assert watcher.wait(0) == {"book"}
+        _book(tmp_path, "new")
+        assert watcher.wait(0) == {"new"}
+
+
+class TestInotifyWatcher:
+    @pytest.fixture
+    def watcher(self, tmp_path):
+        try:
+            watcher = InotifyWatcher(tmp_path)
+        except OSError as e:
+            pytest.skip(f"inotify が使えない環境: {e}")
+        yield watcher
+        watcher.close()
+
+    def test_reports_pages_journal_and_new_folders(self, tmp_path, watcher):
+        folder = _book(tmp_path, "book")
+        assert watcher.wait(1) == {"book"}
+
+        (folder / ".screenshot_0003.png.tmp").write_bytes(b"png")
+        assert watcher.wait(0.05) == set()
+        (folder / ".screenshot_0003.png.tmp").rename(folder / "screenshot_0003.png")
+        assert watcher.wait(1) == {"book"}
+
+        _finish_capture(folder)
+        assert watcher.wait(1) == {"book"}
+
+
+class TestUploadQueue:
+    def test_dedupes_and_persists(self, tmp_path):
+        path = tmp_path / "queue.json"
+        queue = UploadQueue(path)
+        assert queue.enqueue("a", "sig1", now=0)
+        assert not queue.enqueue("a", "sig1", now=1)
+        queue.mark_done("a", now=2)
+        assert not queue.enqueue("a", "sig1", now=3)
+        assert queue.enqueue("a", "sig2", now=4)
+
+        reloaded = UploadQueue(path)
+        assert [i.name for i in reloaded.pending()] == ["a"]
+        assert reloaded.items["a"].signature == "sig2"
+
+    def test_backoff_and_give_up(self, tmp_path):
+        queue = UploadQueue(tmp_path / "queue.json", max_attempts=3)
+        queue.enqueue("a", "sig", now=0)
+        queue.mark_failed("a", "API error", now=10)
+        assert queue.due(10) == []
+        assert [i.name for i in queue.due(10 + RETRY_BASE_SEC)] == ["a"]
+        queue.mark_failed("a", "API error", now=100)
+        assert queue.items["a"].next_attempt == 100 + 2 * RETRY_BASE_SEC
+        queue.mark_failed("a", "API error", now=200)
+        assert queue.items["a"].status == "failed"
+        assert queue.pending() == []
+
+    def test_broken_file_starts_empty(self, tmp_path):
+        path = tmp_path / "queue.json"
+        path.write_text("{broken", encoding="utf-8")
+        assert UploadQueue(path).items == {}
+
+
+class TestUploadWatcher:
+    def _watcher(self, tmp_path, upload, **kwargs):
+        queue = UploadQueue(tmp_path / ".upload_queue.json")
+        return UploadWatcher(tmp_path, upload, queue, quiet_sec=60, settle_sec=5, **kwargs), queue
+
+    def test_complete_journal_triggers_after_settle(self, tmp_path):
+        folder = _book(tmp_path, "book")
+        upload = FakeUpload()
+        watcher, queue = self._watcher(tmp_path, upload)
+        _finish_capture(folder)
+        watcher.notice({"book"}, now=100)
+        assert watcher.tick(now=102) == []
+        assert watcher.tick(now=106) == [("book", None)]
+        assert queue.items["book"].status == "done"
+
+        watcher.notice({"book"}, now=200)  # 内容が変わらなければ再アップロードしない
+        assert watcher.tick(now=206) == []
+
+    def test_quiescence_triggers_without_journal(self, tmp_path):
+        _book(tmp_path, "book")
+        upload = FakeUpload()
+        watcher, _ = self._watcher(tmp_path, upload)
+        watcher.notice({"book"}, now=0)
+        assert watcher.tick(now=30) == []
+        watcher.notice({"book"}, now=30)
+        assert watcher.tick(now=80) == []
+        assert watcher.tick(now=90) == [("book", None)]
+
+    def test_incomplete_capture_waits_for_quiescence(self, tmp_path):
+        folder = _book(tmp_path, "book")
+        _finish_capture(folder, complete=False)
+        watcher, _ = self._watcher(tmp_path, FakeUpload())
+        watcher.notice({"book"}, now=0)
+        assert watcher.tick(now=10) == []
+        assert watcher.tick(now=60) == [("book", None)]
+
+    def test_scan_existing_tracks_books_not_yet_uploaded(self, tmp_path):
+        for name in ("done", "uploaded", "capturing"):
+            _finish_capture(_book(tmp_path, name), complete=name != "capturing")
+        (tmp_path / "empty").mkdir()
+        upload = FakeUpload()
+        watcher, _ = self._watcher(tmp_path, upload)
+        now = time.time()
+        names = watcher.scan_existing(now, uploaded=lambda folder: folder.name == "uploaded")
+        assert names == ["capturing", "done"]
+        assert watcher.tick(now + 5) == [("done", None)]
+        assert watcher.tick(now + 60) == [("capturing", None)]
+        assert upload.calls == ["done", "capturing"]
+
+    def test_retries_failed_upload(self, tmp_path):
+        folder = _book(tmp_path, "book")
+        _finish_capture(folder)
+        upload = FakeUpload(errors=["API error"])
+        watcher, queue = self._watcher(tmp_path, upload)
+        watcher.notice({"book"}, now=0)
+        assert watcher.tick(now=5) == [("book", "API error")]
+        assert watcher.tick(now=6) == []
+        assert watcher.tick(now=5 + RETRY_BASE_SEC) == [("book", None)]
+        assert upload.calls == ["book", "book"]
+        assert queue.items["book"].attempts == 1
+
+    def test_resumes_pending_queue(self, tmp_path):
+        folder = _book(tmp_path, "book")
+        queue = UploadQueue(tmp_path / ".upload_queue.json")
+        queue.enqueue("book", content_signature(folder), now=0)
+        upload = FakeUpload()
+        watcher = UploadWatcher(tmp_path, upload, UploadQueue(tmp_path / ".upload_queue.json"))
+        assert watcher.tick(now=1) == [("book", None)]
+
+    def test_removed_folder_is_dropped(self, tmp_path):
+        queue = UploadQueue(tmp_path / ".upload_queue.json")
+        queue.enqueue("gone", "sig", now=0)
+        upload = FakeUpload()
+        assert UploadWatcher(tmp_path, upload, queue).tick(now=1) == []
+        assert upload.calls == [] and queue.items == {}
+
+
+class TestRunWatch:
+    def test_polls_until_stopped(self, tmp_path):
+        folder = _book(tmp_path, "book")
+        source = PollingWatcher(tmp_path, interval=0)
+        upload = FakeUpload()
+        watcher = UploadWatcher(tmp_path, upload, UploadQueue(tmp_path / ".q.json"), quiet_sec=0, settle_sec=0)
+        (folder / "screenshot_0003.png").write_bytes(b"png")
+        ticks = iter(range(3))
+        run_watch(watcher, source, tick_sec=0, should_stop=lambda: next(ticks, None) is None)
+        assert upload.calls == ["book"]